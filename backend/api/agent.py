@@ -24,8 +24,10 @@ from typing import Optional, List, Dict
 from fastapi import APIRouter, Depends, HTTPException, BackgroundTasks
 from fastapi.responses import StreamingResponse, JSONResponse
 from pydantic import BaseModel
+from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy.orm import Session
 
+from core import async_read_service
 from core.content_block_reference import (
     build_blocks_by_id,
     find_block_by_identifier,
@@ -33,7 +35,7 @@ from core.content_block_reference import (
 )
 from core.content_block_runtime_surface import build_block_runtime_surface
 from core.dependency_regeneration_service import finalize_block_content_change, schedule_project_auto_trigger
-from core.database import get_db
+from core.database import get_async_db, get_db
 from core.locale_text import rt
 from core.localization import DEFAULT_LOCALE, normalize_locale
 from core.models import (
@@ -44,6 +46,7 @@ from core.models.content_block import ContentBlock
 from core.orchestrator import get_agent_graph
 from core.agent_tools import PRODUCE_TOOLS
 from core.llm_compat import normalize_content
+from core.llm_rate_limiter import PRIORITY_INTERACTIVE, iterate_with_llm_priority
 
 router = APIRouter()
 logger = logging.getLogger("agent")
@@ -612,53 +615,45 @@ def batch_delete_conversations(
 
 
 @router.get("/conversations/{conversation_id}/messages", response_model=List[ChatMessageResponse])
-def get_conversation_messages(
+async def get_conversation_messages(
     conversation_id: str,
     project_id: str,
     limit: int = 200,
-    db: Session = Depends(get_db),
+    db: AsyncSession = Depends(get_async_db),
 ):
-    _get_project_conversation_or_404(
+    conversation = await async_read_service.get_project_conversation(
         db,
         conversation_id=conversation_id,
         project_id=project_id,
     )
-    messages = db.query(ChatMessage).filter(
-        ChatMessage.conversation_id == conversation_id,
-        ChatMessage.project_id == project_id,
-    ).order_by(ChatMessage.created_at.asc()).limit(limit).all()
+    if not conversation:
+        raise HTTPException(status_code=404, detail="Conversation not found")
+    messages = await async_read_service.list_chat_messages(
+        db,
+        project_id=project_id,
+        conversation_id=conversation_id,
+        limit=limit,
+    )
     return [_to_message_response(m) for m in messages]
 
 
 @router.get("/history/{project_id}", response_model=List[ChatMessageResponse])
-def get_chat_history(
+async def get_chat_history(
     project_id: str,
     limit: int = 100,
     mode: Optional[str] = None,
     mode_id: Optional[str] = None,
     conversation_id: Optional[str] = None,
-    db: Session = Depends(get_db),
+    db: AsyncSession = Depends(get_async_db),
 ):
     """获取项目的对话历史（可按 mode_id 或 mode 过滤）"""
-    query = db.query(ChatMessage).filter(ChatMessage.project_id == project_id)
-
-    if conversation_id:
-        query = query.filter(ChatMessage.conversation_id == conversation_id)
-
-    if mode_id:
-        from sqlalchemy import func
-        mode_id_expr = func.json_extract(ChatMessage.message_metadata, "$.mode_id")
-        query = query.filter(mode_id_expr == mode_id)
-    elif mode:
-        # message_metadata 是 JSON 字段，用 json_extract 按 mode 过滤（SQLite 兼容）
-        from sqlalchemy import func, or_
-        mode_expr = func.json_extract(ChatMessage.message_metadata, "$.mode")
-        query = query.filter(or_(mode_expr == mode, mode_expr.is_(None)))
-
-    messages = (
-        query.order_by(ChatMessage.created_at.asc())
-        .limit(limit)
-        .all()
+    messages = await async_read_service.list_chat_messages(
+        db,
+        project_id=project_id,
+        limit=limit,
+        conversation_id=conversation_id,
+        mode=mode,
+        mode_id=mode_id,
     )
     return [_to_message_response(m) for m in messages]
 
@@ -1279,8 +1274,10 @@ async def stream_chat(
                         request.project_id, current_phase)
 
             _graph = await get_agent_graph()
-            async for event in _graph.astream_events(
-                input_state, config=config, version="v2"
+            # 实时对话优先级：图内节点 / 工具发起的 LLM 调用排在批量生成与 Eval 之前
+            async for event in iterate_with_llm_priority(
+                PRIORITY_INTERACTIVE,
+                _graph.astream_events(input_state, config=config, version="v2"),
             ):
                 kind = event["event"]
                 event_count += 1
@@ -1649,8 +1646,8 @@ async def stream_chat(
                 from core.agent_tools import PENDING_SUGGESTIONS as _PS
                 for _sc in suggestion_cards_emitted:
                     _cid = _sc.get("id")
-                    if _cid and _cid in _PS:
-                        _PS[_cid]["message_id"] = agent_msg.id
+                    if _cid:
+                        _PS.patch(_cid, message_id=agent_msg.id)
 
             # GenerationLog 由 GenerationLogCallback 自动记录（完整 messages + 不截断）
             # 不再手动创建重复日志
@@ -1850,14 +1847,12 @@ async def confirm_suggestion(
         cards_to_process = [(suggestion_id, single_card)]
     else:
         # suggestion_id 可能是 group_id — 查找所有属于该 group 的 cards
-        for cid, cdata in list(PENDING_SUGGESTIONS.items()):
-            if cdata.get("group_id") == suggestion_id:
-                cards_to_process.append((cid, cdata))
+        cards_to_process = PENDING_SUGGESTIONS.find_group(suggestion_id)
 
-    # ===== DB 回退：内存缓存丢失时（后端重启等），从 ChatMessage.message_metadata 恢复 =====
+    # ===== DB 回退：卡片已过期或早于 pending_suggestions 表产生时，从 ChatMessage.message_metadata 恢复 =====
     if not cards_to_process:
         logger.info(
-            "[confirm-suggestion] 内存未找到 %s，尝试从 DB message_metadata 恢复...",
+            "[confirm-suggestion] 建议存储未找到 %s，尝试从 DB message_metadata 恢复...",
             suggestion_id[:8],
         )
         recent_msgs = (
@@ -1877,16 +1872,16 @@ async def confirm_suggestion(
                 # 按 card_id 或 group_id 匹配
                 if card_meta.get("id") == suggestion_id:
                     if card_meta.get("target_entity_id") and card_meta.get("modified_content") is not None:
-                        restored = {**card_meta, "message_id": msg.id}
+                        restored = {**card_meta, "message_id": msg.id, "project_id": request.project_id}
                         cards_to_process = [(suggestion_id, restored)]
-                        # 同时恢复到内存缓存
+                        # 同时恢复到建议存储
                         PENDING_SUGGESTIONS[suggestion_id] = restored
                         logger.info("[confirm-suggestion] 从 DB 恢复单卡: %s", suggestion_id[:8])
                     break
                 if card_meta.get("group_id") == suggestion_id:
                     if card_meta.get("target_entity_id") and card_meta.get("modified_content") is not None:
                         cid = card_meta["id"]
-                        restored = {**card_meta, "message_id": msg.id}
+                        restored = {**card_meta, "message_id": msg.id, "project_id": request.project_id}
                         cards_to_process.append((cid, restored))
                         PENDING_SUGGESTIONS[cid] = restored
             if cards_to_process:
@@ -1938,7 +1933,7 @@ async def confirm_suggestion(
             status_code=404,
             detail=(
                 f"修改建议 {suggestion_id[:8]}... 未找到。"
-                "可能原因：后端重启后旧建议数据丢失，或建议已被处理。"
+                "可能原因：建议已过期，或已被处理。"
                 "请让 AI 重新生成修改建议。"
             ),
         )
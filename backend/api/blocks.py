@@ -1,6 +1,7 @@
 # backend/api/blocks.py
 # 功能: 统一内容块 API，支持 CRUD、移动、生成
-# 主要路由: /api/blocks
+# 主要路由: /api/blocks（树支持 view=outline 轻量大纲 + ETag；/batch-get 批量拉取正文；
+#           /project/{id}/run-jobs 后台运行队列状态；/project/{id}/run-stream 运行进度 SSE）
 # 数据结构: ContentBlock 的树形操作
 
 """
@@ -10,13 +11,16 @@
 """
 
 import asyncio
+import hashlib
 import logging
-from typing import Optional, List, Dict, Any
-from fastapi import APIRouter, Depends, HTTPException, BackgroundTasks
+from typing import Optional, List, Dict, Any, Union
+from fastapi import APIRouter, Depends, HTTPException, BackgroundTasks, Header, Response
 from pydantic import BaseModel, Field
+from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy.orm import Session
 
-from core.database import get_db
+from core import async_read_service
+from core.database import get_async_db, get_db
 from core.localization import DEFAULT_LOCALE, locale_fallback_chain, normalize_locale
 from core.llm_compat import normalize_content, resolve_model
 from datetime import datetime
@@ -51,6 +55,7 @@ from core.block_generation_service import (
     update_parent_status,
 )
 from core.pre_question_utils import normalize_pre_answers, normalize_pre_questions
+from core.project_run_queue import project_run_queue
 from core.project_run_service import run_project_blocks
 
 
@@ -152,6 +157,51 @@ class BlockTreeResponse(BaseModel):
     total_count: int
 
 
+class BlockOutlineResponse(BaseModel):
+    """内容块大纲（view=outline）：只含结构元数据，正文通过 GET /{id} 或 batch-get 按需拉取"""
+    id: str
+    project_id: str
+    parent_id: Optional[str]
+    name: str
+    block_type: str
+    depth: int
+    order_index: int
+    status: str
+    depends_on: List[str]
+    special_handler: Optional[str]
+    need_review: bool
+    auto_generate: bool = False
+    needs_regeneration: bool = False
+    is_collapsed: bool
+    content_length: int
+    content_hash: str
+    children: List["BlockOutlineResponse"] = Field(default_factory=list)
+    created_at: Optional[str]
+    updated_at: Optional[str]
+
+
+class BlockOutlineTreeResponse(BaseModel):
+    """项目内容块大纲树响应（view=outline）"""
+    project_id: str
+    view: str = "outline"
+    blocks: List[BlockOutlineResponse]
+    total_count: int
+
+
+class BlockBatchGetRequest(BaseModel):
+    """批量获取内容块请求"""
+    block_ids: List[str] = Field(default_factory=list, max_length=500)
+
+
+class BlockBatchGetResponse(BaseModel):
+    """批量获取内容块响应（按请求顺序返回，不存在/已删除的 ID 列入 missing_ids）"""
+    blocks: List[BlockResponse]
+    missing_ids: List[str] = Field(default_factory=list)
+
+
+TREE_VIEWS = {"full", "outline"}
+
+
 class SaveBlockAsFieldTemplateRequest(BaseModel):
     """保存单个内容块/分组为内容块模板请求"""
     name: str
@@ -206,6 +256,54 @@ def _block_to_response(
     )
 
 
+def _block_to_outline(block: ContentBlock) -> BlockOutlineResponse:
+    """转换 ContentBlock 为大纲响应（只读结构列 + 正文长度/hash）"""
+    content = block.content or ""
+    return BlockOutlineResponse(
+        id=block.id,
+        project_id=block.project_id,
+        parent_id=block.parent_id,
+        name=block.name,
+        block_type=_normalize_block_type(block.block_type),
+        depth=block.depth,
+        order_index=block.order_index,
+        status=block.status or "pending",
+        depends_on=block.depends_on or [],
+        special_handler=block.special_handler,
+        need_review=block.need_review,
+        auto_generate=bool(block.auto_generate),
+        needs_regeneration=bool(block.needs_regeneration),
+        is_collapsed=block.is_collapsed,
+        content_length=len(content),
+        content_hash=hashlib.md5(content.encode("utf-8")).hexdigest(),
+        created_at=block.created_at.isoformat() if block.created_at else None,
+        updated_at=block.updated_at.isoformat() if block.updated_at else None,
+    )
+
+
+def _assemble_block_tree(rows: List[ContentBlock], *, outline: bool = False) -> list:
+    """
+    将已加载的内容块（同一项目、未删除）按 parent_id 组装为树形响应。
+    不访问 children 关系，适用于 AsyncSession / 批量预加载场景。
+    父块不在 rows 中的非顶级块（父块已删除）被丢弃，与 include_children 语义一致。
+    outline=True 时节点为 BlockOutlineResponse，否则为 BlockResponse。
+    """
+    children_by_parent: Dict[Optional[str], List[ContentBlock]] = {}
+    for row in rows:
+        children_by_parent.setdefault(row.parent_id, []).append(row)
+    for siblings in children_by_parent.values():
+        siblings.sort(key=lambda b: b.order_index or 0)
+
+    convert = _block_to_outline if outline else _block_to_response
+
+    def _build(block: ContentBlock):
+        response = convert(block)
+        response.children = [_build(c) for c in children_by_parent.get(block.id, [])]
+        return response
+
+    return [_build(b) for b in children_by_parent.get(None, [])]
+
+
 def _calculate_depth(block: ContentBlock, db: Session) -> int:
     """计算内容块的层级深度"""
     if not block.parent_id:
@@ -285,54 +383,82 @@ def _reorder_siblings(project_id: str, parent_id: Optional[str], db: Session):
 
 # ========== API 路由 ==========
 
-@router.get("/project/{project_id}", response_model=BlockTreeResponse)
-def get_project_blocks(
+def _block_tree_etag(project_id: str, max_updated_at: str, total: int, view: str = "full") -> str:
+    """内容块树 ETag：项目 + 块的最大 updated_at + 未删除块数 + 视图。"""
+    digest = hashlib.sha1(f"{project_id}|{max_updated_at}|{total}".encode("utf-8")).hexdigest()[:20]
+    return f'W/"{view}-{digest}"'
+
+
+def _etag_matches(if_none_match: Optional[str], etag: str) -> bool:
+    if not if_none_match:
+        return False
+    candidates = {tag.strip() for tag in if_none_match.split(",")}
+    return "*" in candidates or etag in candidates or etag.removeprefix("W/") in candidates
+
+
+@router.get(
+    "/project/{project_id}",
+    response_model=Union[BlockTreeResponse, BlockOutlineTreeResponse],
+)
+async def get_project_blocks(
     project_id: str,
-    db: Session = Depends(get_db),
+    response: Response,
+    view: str = "full",
+    if_none_match: Optional[str] = Header(default=None),
+    db: AsyncSession = Depends(get_async_db),
 ):
-    """获取项目的所有内容块（树形结构，排除已删除）"""
-    project = db.query(Project).filter(Project.id == project_id).first()
+    """
+    获取项目的所有内容块（树形结构，排除已删除）。走 AsyncSession，不阻塞事件循环。
+
+    - view=full（默认）：每个节点带完整 content / ai_prompt / constraints / pre_*
+    - view=outline：只返回结构元数据 + content_length / content_hash，
+      正文通过 GET /api/blocks/{id} 或 POST /api/blocks/batch-get 按需拉取
+    - 先用一条聚合查询算出水位线（max updated_at + 块数）作为 ETag，
+      If-None-Match 命中时直接 304，不再加载任何块
+    - 未命中时一次查询取回全部未删除块，在内存中按 parent_id 组装树
+    - 卡住块恢复只在水位线查询发现卡住块时执行
+    """
+    if view not in TREE_VIEWS:
+        raise HTTPException(status_code=400, detail=f"不支持的视图: {view}")
+
+    project = await db.get(Project, project_id)
     if not project:
         raise HTTPException(status_code=404, detail="项目不存在")
-    
-    # 自动修复卡住的块：in_progress 但无内容且超过 5 分钟 → 重置为 pending
-    # 注意：刚开始生成的块也是 in_progress + 无内容，不能立即重置，否则会干扰正常生成！
-    stuck_blocks = db.query(ContentBlock).filter(
-        ContentBlock.project_id == project_id,
-        ContentBlock.deleted_at == None,
-        ContentBlock.status == "in_progress",
-        (ContentBlock.content == None) | (ContentBlock.content == ""),
-    ).all()
-    if stuck_blocks:
-        now = datetime.utcnow()
-        for sb in stuck_blocks:
-            # 只重置超过 5 分钟的卡住块（给正在生成的块足够时间）
-            updated = sb.updated_at or sb.created_at
-            if updated and (now - updated).total_seconds() > 300:
-                print(f"[RECOVERY] 重置卡住的块: {sb.name} (in_progress → pending, 卡住 {(now - updated).total_seconds():.0f}s)")
-                sb.status = "pending"
-        db.commit()
-    
-    # 获取所有顶级块（parent_id = None，排除已删除）
-    top_level_blocks = db.query(ContentBlock).filter(
-        ContentBlock.project_id == project_id,
-        ContentBlock.parent_id == None,
-        ContentBlock.deleted_at == None,
-    ).order_by(ContentBlock.order_index).all()
-    
-    # 转换为响应（包含子块）
-    blocks = [_block_to_response(b, include_children=True) for b in top_level_blocks]
-    
-    # 统计总数（排除已删除）
-    total = db.query(ContentBlock).filter(
-        ContentBlock.project_id == project_id,
-        ContentBlock.deleted_at == None,
-    ).count()
-    
-    return BlockTreeResponse(
+
+    max_updated_at, total, stuck = await async_read_service.get_block_tree_watermark(db, project_id)
+    if stuck:
+        # 自动修复卡住的块：in_progress 但无内容且超过 5 分钟 → 重置为 pending
+        await async_read_service.recover_stuck_blocks(db, project_id)
+        max_updated_at, total, _ = await async_read_service.get_block_tree_watermark(db, project_id)
+
+    etag = _block_tree_etag(project_id, max_updated_at, total, view)
+    if _etag_matches(if_none_match, etag):
+        return Response(status_code=304, headers={"ETag": etag, "Cache-Control": "no-cache"})
+
+    outline = view == "outline"
+    rows = await async_read_service.load_project_blocks(db, project_id, outline=outline)
+    response.headers["ETag"] = etag
+    response.headers["Cache-Control"] = "no-cache"
+    tree_cls = BlockOutlineTreeResponse if outline else BlockTreeResponse
+    return tree_cls(
         project_id=project_id,
-        blocks=blocks,
-        total_count=total,
+        blocks=_assemble_block_tree(rows, outline=outline),
+        total_count=len(rows),
+    )
+
+
+@router.post("/batch-get", response_model=BlockBatchGetResponse)
+async def batch_get_blocks(
+    request: BlockBatchGetRequest,
+    db: AsyncSession = Depends(get_async_db),
+):
+    """按 ID 批量获取内容块完整内容（配合 view=outline 的树按需拉取正文，不含子块）"""
+    requested = list(dict.fromkeys(request.block_ids))
+    rows = await async_read_service.get_blocks_by_ids(db, requested)
+    by_id = {row.id: row for row in rows}
+    return BlockBatchGetResponse(
+        blocks=[_block_to_response(by_id[bid]) for bid in requested if bid in by_id],
+        missing_ids=[bid for bid in requested if bid not in by_id],
     )
 
 
@@ -373,13 +499,99 @@ async def run_project(
     if not project:
         raise HTTPException(status_code=404, detail="项目不存在")
 
-    return await run_project_blocks(
-        project_id=project_id,
-        mode=request.mode,
-        max_concurrency=request.max_concurrency,
+    # 与队列 worker 共用项目级互斥：该项目已有运行中任务时等待其结束
+    return await project_run_queue.run_inline(
+        project_id,
+        request.mode,
+        lambda: run_project_blocks(
+            project_id=project_id,
+            mode=request.mode,
+            max_concurrency=request.max_concurrency,
+        ),
     )
 
 
+# run-stream 启动的运行任务：客户端断开后继续跑完，这里持有引用防止被回收
+_detached_project_runs: set[asyncio.Task] = set()
+
+
+@router.post("/project/{project_id}/run-stream")
+async def run_project_stream(
+    project_id: str,
+    request: ProjectRunRequest,
+    db: Session = Depends(get_db),
+):
+    """
+    与 /run 相同的 DAG 调度，以 SSE 逐条推送进度事件：
+    [queued →] plan → block_started / block_completed / block_failed … → done。
+    该项目已有运行中任务（队列 worker 或其他请求）时先推送 queued，等其结束后再开始。
+    客户端断开不会中断运行。
+    """
+    from fastapi.responses import StreamingResponse
+    import json
+
+    project = db.query(Project).filter(Project.id == project_id).first()
+    if not project:
+        raise HTTPException(status_code=404, detail="项目不存在")
+
+    events: asyncio.Queue = asyncio.Queue()
+
+    async def _run() -> None:
+        try:
+            await project_run_queue.run_inline(
+                project_id,
+                request.mode,
+                lambda: run_project_blocks(
+                    project_id=project_id,
+                    mode=request.mode,
+                    max_concurrency=request.max_concurrency,
+                    on_event=events.put_nowait,
+                ),
+                on_queued=lambda: events.put_nowait({"type": "queued", "project_id": project_id}),
+            )
+        except HTTPException as exc:
+            events.put_nowait({"type": "error", "error": str(exc.detail)})
+        except Exception as exc:
+            logger.exception("[project-run] run-stream failed for %s", project_id)
+            events.put_nowait({"type": "error", "error": str(exc)})
+
+    task = asyncio.create_task(_run())
+    _detached_project_runs.add(task)
+    task.add_done_callback(_detached_project_runs.discard)
+
+    async def event_stream():
+        while True:
+            event = await events.get()
+            yield f"data: {json.dumps(event, ensure_ascii=False, default=str)}\n\n"
+            if event.get("type") in ("done", "error"):
+                return
+
+    return StreamingResponse(
+        event_stream(),
+        media_type="text/event-stream",
+        headers={
+            "Cache-Control": "no-cache",
+            "Connection": "keep-alive",
+        },
+    )
+
+
+@router.get("/project/{project_id}/run-jobs")
+def get_project_run_jobs(
+    project_id: str,
+    limit: int = 10,
+    db: Session = Depends(get_db),
+):
+    """
+    项目运行队列状态（auto_trigger 后台任务）：
+    排队数、当前运行中的任务，以及最近的任务记录（含失败原因与执行摘要）。
+    """
+    project = db.query(Project).filter(Project.id == project_id).first()
+    if not project:
+        raise HTTPException(status_code=404, detail="项目不存在")
+    return project_run_queue.status(project_id, db=db, limit=min(max(limit, 1), 50))
+
+
 @router.get("/{block_id}", response_model=BlockResponse)
 def get_block(
     block_id: str,
@@ -1183,12 +1395,7 @@ async def generate_block_content_stream(
             if block.parent_id:
                 update_parent_status(block.parent_id, db)
 
-            # 使用独立 daemon 线程，而非 asyncio 线程池。
-            # asyncio.to_thread() 会复用线程池中的线程；enqueue_project_auto_trigger 内部调用
-            # asyncio.run() 会创建并关闭一个新的 event loop，导致线程被回收后再次使用时
-            # LangChain/httpx/anyio 的资源绑定在已关闭的 loop 上，引发 "Event loop is closed"。
-            # schedule_project_auto_trigger 通过 _launch_auto_trigger_thread() 启动独立 daemon 线程，
-            # 与 asyncio 线程池完全隔离，避免上述问题。
+            # 只写入持久化队列，由主事件循环上的 project_run_queue worker 执行下游自动生成
             schedule_project_auto_trigger(block.project_id)
             
             # 发送完成事件
@@ -6,12 +6,14 @@
 #   - /api/eval/runs/{project_id}: CRUD EvalRun
 #   - /api/eval/run/{run_id}/tasks: CRUD EvalTask
 #   - /api/eval/run/{run_id}/execute: 执行评估（并行执行所有 Task）
-#   - /api/eval/task/{task_id}/execute: 执行单个 Task
+#   - /api/eval/task/{task_id}/execute: 执行单个 Task（V2 Task 复用结果缓存，?force=true 全部重跑）
+#   - /api/eval/tasks/{project_id}/execute-all | pause-all | stop-all: 项目全部 V2 Task 共用一个 Trial 并发池
+#   - /api/eval/task/{task_id}/events | /api/eval/tasks/{project_id}/events: SSE 进度事件流（?cursor= / Last-Event-ID 续传）
 #   - /api/eval/run/{run_id}/trials: 获取所有 Trial
 #   - /api/eval/trial/{trial_id}: 获取 Trial 详情（含完整 LLM 日志）
 #   - /api/eval/run/{run_id}/diagnose: 运行综合诊断
 #   - /api/eval/generate-for-block/{block_id}: 为 ContentBlock 字段生成评估
-# 数据结构: EvalRun, EvalTask, EvalTrial
+# 数据结构: EvalRun, EvalTask, EvalTrial; V2: EvalTaskV2 / EvalTrialConfigV2 / EvalTrialResultV2 + EvalResultCacheV2
 
 """
 Eval V2 API
@@ -22,17 +24,23 @@ EvalRun → EvalTask[] → EvalTrial[]
 
 import json
 import asyncio
+import logging
 import threading
 import hashlib
 import re
+from contextvars import ContextVar
+from dataclasses import dataclass, field
 from typing import Optional, List
 from datetime import datetime, timezone
-from fastapi import APIRouter, Depends, HTTPException
+from fastapi import APIRouter, Depends, HTTPException, Header, Request
+from fastapi.responses import StreamingResponse
 from pydantic import BaseModel as PydanticBase
+from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy.orm import Session, sessionmaker
 from langchain_core.messages import SystemMessage, HumanMessage
 
-from core.database import get_db, get_session_maker
+from core import async_read_service
+from core.database import get_async_db, get_db, get_session_maker
 from core.localization import DEFAULT_LOCALE, normalize_locale, resolve_eval_anchor_name
 from core.locale_text import rt
 from core.models import (
@@ -67,15 +75,26 @@ from core.tools.eval_v2_service import (
     compute_content_hash,
     compute_weighted_grader_score,
     aggregate_task_scores,
+    TaskScoreAggregator,
 )
 from core.tools.eval_v2_executor import run_experience_trial
+from core.eval_result_cache import (
+    get_cached_result,
+    grader_cache_key,
+    grader_spec,
+    store_result,
+    trial_cache_key,
+)
 from core.models.grader import Grader
 from core.llm import get_chat_model
 from core.llm_compat import normalize_content, get_model_name
+from core.llm_rate_limiter import PRIORITY_EVAL, run_with_llm_priority
+from core.eval_progress import eval_progress_bus, format_sse
 from core.config import settings
 
 
 router = APIRouter(prefix="/api/eval", tags=["eval"])
+logger = logging.getLogger(__name__)
 
 # 运行期状态（内存态，不落库）
 _TASK_RUNTIME_STATE = {}
@@ -494,6 +513,34 @@ def delete_project_persona(persona_id: str, db: Session = Depends(get_db)):
 
 # ============== Eval V2 Task CRUD (新链路) ==============
 
+def _heal_lost_running_task(task: EvalTaskV2, db: Session) -> None:
+    """
+    运行态已丢失的 running Task：Trial 结果是逐条提交的，当前 batch 已有结果时置为 paused
+    （可 resume 续跑，跳过已完成的 Trial），否则置为 failed。由调用方 commit。
+    """
+    locale = _project_locale(task.project_id, db)
+    has_results = bool(task.latest_batch_id) and db.query(EvalTrialResultV2.id).filter(
+        EvalTrialResultV2.task_id == task.id,
+        EvalTrialResultV2.batch_id == task.latest_batch_id,
+    ).first() is not None
+    if has_results:
+        task.status = "paused"
+        task.last_error = _locale_text(
+            locale,
+            "実行が中断されました。完了した Trial の結果は保存済みで、再開できます。",
+            "执行被中断，已完成的 Trial 结果已保存，可继续执行。",
+        )
+        return
+    task.status = "failed"
+    if not (task.last_error or "").strip():
+        task.last_error = _locale_text(
+            locale,
+            "実行状態が失われました（サービス再起動またはタスク中断）。再実行してください。",
+            "执行状态丢失（服务重启或任务中断），请重新执行。",
+        )
+
+
+
 @router.get("/tasks/{project_id}")
 def list_eval_v2_tasks(project_id: str, db: Session = Depends(get_db)):
     tasks = (
@@ -507,13 +554,7 @@ def list_eval_v2_tasks(project_id: str, db: Session = Depends(get_db)):
         rt = _get_task_runtime(t.id)
         if t.status == "running" and not rt.get("is_running", False):
             # 运行态丢失（常见于服务重启/进程中断），避免界面长期假 running
-            t.status = "failed"
-            if not (t.last_error or "").strip():
-                t.last_error = _locale_text(
-                    _project_locale(t.project_id, db),
-                    "実行状態が失われました（サービス再起動またはタスク中断）。再実行してください。",
-                    "执行状态丢失（服务重启或任务中断），请重新执行。",
-                )
+            _heal_lost_running_task(t, db)
             healed = True
     if healed:
         db.commit()
@@ -580,7 +621,13 @@ def update_eval_v2_task(task_id: str, request: UpdateTaskV2Request, db: Session
 
 
 @router.post("/tasks/{project_id}/execute-all")
-async def execute_eval_v2_all_tasks(project_id: str, db: Session = Depends(get_db)):
+async def execute_eval_v2_all_tasks(project_id: str, force: bool = False, db: Session = Depends(get_db)):
+    """
+    执行项目下全部 V2 Task：所有 Task 的 Trial 共用一个并发池（eval_max_parallel_trials），
+    不再逐个 Task 串行等待；暂停 / 终止见 pause-all / stop-all。
+
+    输入未变的 Trial / Grader 复用上次结果（只为改动过的内容重新付费）；force=true 时全部重新执行。
+    """
     project_locale = _project_locale(project_id, db)
     tasks = (
         db.query(EvalTaskV2)
@@ -594,25 +641,12 @@ async def execute_eval_v2_all_tasks(project_id: str, db: Session = Depends(get_d
             detail=_locale_text(project_locale, "このプロジェクトには実行可能な Eval Task がありません", "当前项目没有可执行的 Eval Task"),
         )
 
-    executed = []
-    failed = []
-    for t in tasks:
-        try:
-            out = await _execute_task_v2(t.id, db)
-            executed.append({"task_id": t.id, "batch_id": out.get("batch_id"), "overall": out.get("overall")})
-        except Exception as e:
-            failed.append({"task_id": t.id, "error": str(e)})
-    return {"executed": executed, "failed": failed}
+    return await _execute_project_tasks_v2(tasks, db, force=force)
 
 
 @router.get("/tasks/{project_id}/report")
-def get_eval_v2_report(project_id: str, db: Session = Depends(get_db)):
-    tasks = (
-        db.query(EvalTaskV2)
-        .filter(EvalTaskV2.project_id == project_id)
-        .order_by(EvalTaskV2.updated_at.desc())
-        .all()
-    )
+async def get_eval_v2_report(project_id: str, db: AsyncSession = Depends(get_async_db)):
+    tasks = await async_read_service.list_eval_task_report_rows(db, project_id)
     rows = []
     for t in tasks:
         rows.append({
@@ -1254,6 +1288,7 @@ def batch_create_tasks(request: BatchCreateTasksRequest, db: Session = Depends(g
 # ============== Execute ==============
 
 @router.post("/run/{run_id}/execute")
+@run_with_llm_priority(PRIORITY_EVAL)
 async def execute_eval_run(run_id: str, db: Session = Depends(get_db)):
     """
     执行 EvalRun 的所有 Task（并行执行）
@@ -1411,11 +1446,12 @@ async def execute_eval_run(run_id: str, db: Session = Depends(get_db)):
 
 
 @router.post("/task/{task_id}/execute")
-async def execute_single_task(task_id: str, db: Session = Depends(get_db)):
-    """执行单个 Task"""
+@run_with_llm_priority(PRIORITY_EVAL)
+async def execute_single_task(task_id: str, force: bool = False, db: Session = Depends(get_db)):
+    """执行单个 Task（V2 Task 默认复用结果缓存，force=true 时全部重新执行）"""
     task_v2 = db.query(EvalTaskV2).filter(EvalTaskV2.id == task_id).first()
     if task_v2:
-        return await _execute_task_v2(task_id, db)
+        return await _execute_task_v2(task_id, db, force=force)
 
     task = db.query(EvalTask).filter(EvalTask.id == task_id).first()
     if not task:
@@ -1488,9 +1524,10 @@ async def execute_single_task(task_id: str, db: Session = Depends(get_db)):
 
 
 @router.post("/task/{task_id}/start")
-async def start_eval_v2_task(task_id: str, db: Session = Depends(get_db)):
+async def start_eval_v2_task(task_id: str, force: bool = False, db: Session = Depends(get_db)):
     """
     异步启动 V2 Task 执行（立即返回），用于前端实时进度展示。
+    force=true 时不复用结果缓存。
     """
     task = db.query(EvalTaskV2).filter(EvalTaskV2.id == task_id).first()
     if not task:
@@ -1529,6 +1566,7 @@ async def start_eval_v2_task(task_id: str, db: Session = Depends(get_db)):
             "batch_id": "",
             "total": total_runs,
             "completed": 0,
+            "cache_hits": 0,
             "is_running": True,
             "is_paused": False,
             "pause_requested": False,
@@ -1539,7 +1577,7 @@ async def start_eval_v2_task(task_id: str, db: Session = Depends(get_db)):
             "updated_at": datetime.now(timezone.utc).isoformat(),
         },
     )
-    asyncio.create_task(_execute_task_v2_background(task_id))
+    asyncio.create_task(_execute_task_v2_background(task_id, force=force))
     return {"message": _locale_text(task_locale, "実行を開始しました", "已开始执行"), "task_id": task_id}
 
 
@@ -1653,6 +1691,205 @@ def stop_eval_v2_task(task_id: str, db: Session = Depends(get_db)):
     return {"message": _locale_text(task_locale, "停止をリクエストしました", "已请求终止"), "task_id": task_id}
 
 
+@router.post("/tasks/{project_id}/pause-all")
+def pause_eval_v2_all_tasks(project_id: str, db: Session = Depends(get_db)):
+    """
+    请求暂停项目下全部运行中的 V2 Task（execute-all 共享并发池不再派发这些 Task 的新 Trial）。
+    """
+    project_locale = _project_locale(project_id, db)
+    task_ids = _running_task_v2_ids(project_id, db)
+    for task_id in task_ids:
+        _set_task_runtime(
+            task_id,
+            {
+                "pause_requested": True,
+                "is_paused": False,
+                "updated_at": datetime.now(timezone.utc).isoformat(),
+            },
+        )
+    return {"message": _locale_text(project_locale, "一時停止をリクエストしました", "已请求暂停"), "task_ids": task_ids}
+
+
+@router.post("/tasks/{project_id}/stop-all")
+def stop_eval_v2_all_tasks(project_id: str, db: Session = Depends(get_db)):
+    """
+    请求终止项目下全部运行中的 V2 Task（在 Trial 边界生效，终止后不可 resume）。
+    """
+    project_locale = _project_locale(project_id, db)
+    task_ids = _running_task_v2_ids(project_id, db)
+    if task_ids:
+        db.query(EvalTaskV2).filter(EvalTaskV2.id.in_(task_ids)).update(
+            {"status": "stopped"}, synchronize_session=False,
+        )
+        db.commit()
+    for task_id in task_ids:
+        _set_task_runtime(
+            task_id,
+            {
+                "stop_requested": True,
+                "pause_requested": False,
+                "is_paused": False,
+                "updated_at": datetime.now(timezone.utc).isoformat(),
+            },
+        )
+    return {"message": _locale_text(project_locale, "停止をリクエストしました", "已请求终止"), "task_ids": task_ids}
+
+
+def _running_task_v2_ids(project_id: str, db: Session) -> list[str]:
+    task_ids = [
+        tid for (tid,) in db.query(EvalTaskV2.id).filter(EvalTaskV2.project_id == project_id)
+    ]
+    return [tid for tid in task_ids if _get_task_runtime(tid).get("is_running")]
+
+
+# ============== Eval V2 进度事件流（SSE） ==============
+
+_SSE_HEARTBEAT_SECONDS = 15.0
+_TERMINAL_PROGRESS_EVENTS = ("paused", "stopped", "finished")
+
+
+def _resolve_event_cursor(cursor: Optional[str], last_event_id: Optional[str]) -> Optional[int]:
+    """
+    ?cursor= 优先，其次浏览器 EventSource 重连时带的 Last-Event-ID；两者都是事件 id（"<epoch>:<seq>" 或纯 seq）。
+    来自其他 epoch（服务重启前）的 id 返回 None，按无游标处理。
+    """
+    if cursor is not None:
+        return eval_progress_bus.parse_event_id(cursor)
+    if last_event_id:
+        return eval_progress_bus.parse_event_id(last_event_id)
+    return None
+
+
+def _task_progress_snapshot(task: EvalTaskV2) -> dict:
+    return {
+        "task_id": task.id,
+        "status": task.status,
+        "latest_overall": task.latest_overall,
+        "progress": _build_task_progress_payload(task),
+    }
+
+
+async def _stream_progress_events(
+    request: Request,
+    cursor: int,
+    snapshot: Optional[dict],
+    *,
+    task_id: Optional[str] = None,
+    **filters,
+):
+    """
+    先推送快照（如有），再推送 seq > cursor 的事件；无事件时每 _SSE_HEARTBEAT_SECONDS 发一次心跳注释。
+    单 Task 流在该 Task 暂停 / 终止 / 结束（或本就未在运行且无待补事件）时关闭；项目流持续到客户端断开。
+    """
+    if snapshot is not None:
+        yield format_sse(snapshot)
+    scope = {"task_id": task_id, **filters} if task_id else filters
+    while True:
+        if await request.is_disconnected():
+            return
+        pending, _, _ = eval_progress_bus.events_since(cursor, **scope)
+        if task_id and not pending and not _get_task_runtime(task_id).get("is_running"):
+            return
+        events, gap, last_seq = await eval_progress_bus.wait_for_events(cursor, _SSE_HEARTBEAT_SECONDS, **scope)
+        if gap:
+            # 断线太久，部分事件已被挤出缓冲区：通知客户端重新拉取一次完整状态，游标跳到最新
+            cursor = last_seq
+            yield format_sse({
+                "epoch": eval_progress_bus.epoch, "seq": cursor, "type": "resync", "task_id": task_id or "", **filters,
+            })
+            continue
+        if not events:
+            # 没有匹配的事件（超时或只有其他 Task / 项目的事件）：游标推进到最新，避免之后误报 gap
+            cursor = last_seq
+            yield ": keep-alive\n\n"
+            continue
+        for event in events:
+            cursor = event["seq"]
+            yield format_sse(event)
+            if task_id and event["type"] in _TERMINAL_PROGRESS_EVENTS:
+                return
+
+
+def _progress_stream_response(stream) -> StreamingResponse:
+    return StreamingResponse(
+        stream,
+        media_type="text/event-stream",
+        headers={
+            "Cache-Control": "no-cache",
+            "Connection": "keep-alive",
+            "X-Accel-Buffering": "no",
+        },
+    )
+
+
+@router.get("/task/{task_id}/events")
+async def stream_eval_v2_task_events(
+    task_id: str,
+    request: Request,
+    batch_id: Optional[str] = None,
+    cursor: Optional[str] = None,
+    last_event_id: Optional[str] = Header(None),
+    db: Session = Depends(get_db),
+):
+    """
+    单个 V2 Task 的进度事件流（SSE）：trial_started / trial_finished / grader_finished / paused / stopped / finished。
+    不带游标时先推送一次快照（type=snapshot）；带 ?cursor= 或 Last-Event-ID 时从该 seq 之后续传
+    （游标已不可续传——事件被挤出缓冲区、超过当前最新 seq，或 epoch 不同（服务重启过）——时同样先推送快照）。
+    """
+    task = db.query(EvalTaskV2).filter(EvalTaskV2.id == task_id).first()
+    if not task:
+        raise HTTPException(status_code=404, detail="EvalTask not found")
+    start = _resolve_event_cursor(cursor, last_event_id)
+    filters = {"batch_id": batch_id} if batch_id else {}
+    snapshot = None
+    if start is None or eval_progress_bus.events_since(start, task_id=task_id, **filters)[1]:
+        start = eval_progress_bus.last_seq
+        snapshot = {
+            "epoch": eval_progress_bus.epoch,
+            "seq": start,
+            "type": "snapshot",
+            "project_id": task.project_id,
+            "batch_id": batch_id or task.latest_batch_id or "",
+            **_task_progress_snapshot(task),
+        }
+    return _progress_stream_response(
+        _stream_progress_events(request, start, snapshot, task_id=task_id, **filters)
+    )
+
+
+@router.get("/tasks/{project_id}/events")
+async def stream_eval_v2_project_events(
+    project_id: str,
+    request: Request,
+    cursor: Optional[str] = None,
+    last_event_id: Optional[str] = Header(None),
+    db: Session = Depends(get_db),
+):
+    """
+    项目下全部 V2 Task 的进度事件流（SSE，替代轮询 /tasks/{project_id}）；游标语义同单 Task 流，连接保持到客户端断开。
+    """
+    start = _resolve_event_cursor(cursor, last_event_id)
+    snapshot = None
+    if start is None or eval_progress_bus.events_since(start, project_id=project_id)[1]:
+        start = eval_progress_bus.last_seq
+        tasks = (
+            db.query(EvalTaskV2)
+            .filter(EvalTaskV2.project_id == project_id)
+            .order_by(EvalTaskV2.order_index, EvalTaskV2.created_at)
+            .all()
+        )
+        snapshot = {
+            "epoch": eval_progress_bus.epoch,
+            "seq": start,
+            "type": "snapshot",
+            "project_id": project_id,
+            "tasks": [_task_progress_snapshot(t) for t in tasks],
+        }
+    return _progress_stream_response(
+        _stream_progress_events(request, start, snapshot, project_id=project_id)
+    )
+
+
 async def _execute_single_task(
     task: EvalTask,
     content: str,
@@ -1703,6 +1940,7 @@ def get_eval_trial(trial_id: str, db: Session = Depends(get_db)):
 # ============== Diagnosis ==============
 
 @router.post("/run/{run_id}/diagnose")
+@run_with_llm_priority(PRIORITY_EVAL)
 async def run_diagnosis(run_id: str, db: Session = Depends(get_db)):
     """对已完成的评估运行执行跨角色诊断"""
     run = db.query(EvalRun).filter(EvalRun.id == run_id).first()
@@ -1750,6 +1988,7 @@ async def run_diagnosis(run_id: str, db: Session = Depends(get_db)):
 
 
 @router.post("/task/{task_id}/diagnose")
+@run_with_llm_priority(PRIORITY_EVAL)
 async def run_task_diagnosis(task_id: str, batch_id: Optional[str] = None, db: Session = Depends(get_db)):
     """新链路：对单个 Task 的最新 batch 运行跨 Trial 分析。"""
     task = db.query(EvalTaskV2).filter(EvalTaskV2.id == task_id).first()
@@ -1792,6 +2031,7 @@ async def run_task_diagnosis(task_id: str, batch_id: Optional[str] = None, db: S
 # ============== Legacy: Run Full Eval ==============
 
 @router.post("/run", response_model=EvalRunResponse)
+@run_with_llm_priority(PRIORITY_EVAL)
 async def run_evaluation(request: RunEvalRequest, db: Session = Depends(get_db)):
     """兼容旧接口：运行完整评估"""
     project = db.query(Project).filter(Project.id == request.project_id).first()
@@ -1872,6 +2112,7 @@ async def run_evaluation(request: RunEvalRequest, db: Session = Depends(get_db))
 # ============== Generate for ContentBlock ==============
 
 @router.post("/generate-for-block/{block_id}")
+@run_with_llm_priority(PRIORITY_EVAL)
 async def generate_eval_for_block(block_id: str, db: Session = Depends(get_db)):
     """
     为 ContentBlock 字段生成评估
@@ -2813,6 +3054,7 @@ def _build_task_progress_payload(task: EvalTaskV2) -> dict:
     return {
         "total": total,
         "completed": completed,
+        "cache_hits": int(rt.get("cache_hits", 0) or 0),
         "percent": percent,
         "max_parallel": int(rt.get("max_parallel", max(1, int(settings.eval_max_parallel_trials or 1)))),
         "is_running": is_running,
@@ -2902,7 +3144,11 @@ def _serialize_task_v2(task: EvalTaskV2) -> dict:
 
 def _serialize_trial_result_v2(row: EvalTrialResultV2, locale: str = DEFAULT_LOCALE) -> dict:
     locale = normalize_locale(locale)
-    grader_results = row.grader_results or []
+    cached_grader_ids = set(row.cached_grader_ids or [])
+    grader_results = [
+        {**gr, "cached": gr.get("grader_id") in cached_grader_ids} if isinstance(gr, dict) else gr
+        for gr in row.grader_results or []
+    ]
     evidence = _build_score_evidence(grader_results, locale=locale)
     suggestions = _extract_independent_suggestions(grader_results, locale=locale)
     return {
@@ -2927,6 +3173,8 @@ def _serialize_trial_result_v2(row: EvalTrialResultV2, locale: str = DEFAULT_LOC
         "cost": row.cost or 0.0,
         "status": row.status,
         "error": row.error or "",
+        "cache_hit": bool(row.cache_hit),
+        "cached_grader_ids": row.cached_grader_ids or [],
         "created_at": row.created_at.isoformat() if row.created_at else "",
     }
 
@@ -3144,9 +3392,16 @@ async def _run_selected_graders(
     fallback_grader_outputs: list,
     db: Session,
     locale: str = DEFAULT_LOCALE,
-) -> tuple[list, list]:
+    *,
+    repeat_index: int = 0,
+    project_id: str = "",
+    force: bool = False,
+) -> tuple[list, list, list]:
     """
-    运行选定 Grader（返回 grader_results, llm_calls）。
+    运行选定 Grader（返回 grader_results, llm_calls, cached_grader_ids）。
+
+    输入未变的 Grader 评分从结果缓存复用，其 ID 单独列在 cached_grader_ids 中（评分本身不带标记，
+    可原样写入 Trial 结果与 Trial 缓存）；force=True 时全部重新评分并覆盖缓存。
     """
     locale = normalize_locale(locale)
     if not grader_ids:
@@ -3162,7 +3417,7 @@ async def _run_selected_graders(
                 "comments": go.get("comments", {}) or {},
                 "feedback": go.get("feedback", go.get("analysis", go.get("summary", ""))),
             })
-        return mapped, []
+        return mapped, [], []
 
     process_transcript = _build_process_transcript(process, locale=locale)
 
@@ -3170,11 +3425,24 @@ async def _run_selected_graders(
     grader_map = {g.id: g for g in graders}
     tasks = []
     task_order = []
+    task_keys = []
+    cached_results: dict[str, dict] = {}
     for gid in grader_ids:
         g = grader_map.get(gid)
         if not g:
             continue
         grader_locale = normalize_locale(getattr(g, "locale", locale))
+        cache_key = grader_cache_key(
+            spec=grader_spec(g, grader_locale),
+            content=content,
+            process_transcript=process_transcript,
+            repeat_index=repeat_index,
+        )
+        cached = None if force else get_cached_result(db, cache_key)
+        if cached is not None:
+            cached_results[gid] = {k: v for k, v in cached.items() if k != "cached"}
+            continue
+        task_keys.append(cache_key)
         tasks.append(
             run_individual_grader(
                 grader_name=g.name,
@@ -3189,24 +3457,40 @@ async def _run_selected_graders(
         )
         task_order.append(gid)
 
-    results = await asyncio.gather(*tasks, return_exceptions=True)
-    grader_results = []
+    for gid, cached in cached_results.items():
+        _publish_grader_finished(gid, cached, cached=True)
+    results = await asyncio.gather(
+        *(_notify_grader_finished(gid, coro) for gid, coro in zip(task_order, tasks)),
+        return_exceptions=True,
+    )
+    fresh_results: dict[str, dict] = {}
     llm_calls = []
     for idx, res in enumerate(results):
         if isinstance(res, Exception):
             continue
         go, go_call = res
         gid = task_order[idx] if idx < len(task_order) else ""
-        grader_results.append({
+        fresh_results[gid] = {
             "grader_id": gid,
             "grader_name": go.get("grader_name", ""),
             "scores": go.get("scores", {}) or {},
             "comments": go.get("comments", {}) or {},
             "feedback": go.get("feedback", ""),
-        })
+        }
+        store_result(db, task_keys[idx], "grader", project_id, fresh_results[gid])
         if go_call:
             llm_calls.append(go_call.to_dict() if hasattr(go_call, "to_dict") else go_call)
-    return grader_results, llm_calls
+    if fresh_results:
+        db.commit()
+
+    # 保持 grader_ids 的顺序
+    grader_results = [
+        cached_results.get(gid) or fresh_results[gid]
+        for gid in grader_ids
+        if gid in cached_results or gid in fresh_results
+    ]
+    cached_grader_ids = [gid for gid in grader_ids if gid in cached_results]
+    return grader_results, llm_calls, cached_grader_ids
 
 
 def _build_process_transcript(process: list, locale: str = DEFAULT_LOCALE) -> str:
@@ -3292,6 +3576,93 @@ def _build_process_transcript(process: list, locale: str = DEFAULT_LOCALE) -> st
     return "\n".join(lines).strip()
 
 
+def _referenced_persona_ids(form_config: dict) -> list[str]:
+    return [
+        str(form_config[k])
+        for k in ("persona_id", "role_a_persona_id", "role_b_persona_id")
+        if form_config.get(k)
+    ]
+
+
+def _trial_cache_key_for(
+    trial_cfg: EvalTrialConfigV2,
+    repeat_index: int,
+    persona_map: dict,
+    content_text: str,
+    content_blocks: list,
+    creator_profile: str,
+    intent: str,
+    locale: str,
+    db: Session,
+) -> tuple[str, set[str]]:
+    """
+    Trial 结果缓存键（见 core.eval_result_cache；Grader 权重不参与）与应产出评分的 Grader ID 集合。
+    """
+    form_config = trial_cfg.form_config or {}
+    grader_ids = trial_cfg.grader_ids or []
+    grader_map = {g.id: g for g in db.query(Grader).filter(Grader.id.in_(grader_ids)).all()} if grader_ids else {}
+    graders = [
+        grader_spec(grader_map[gid], normalize_locale(getattr(grader_map[gid], "locale", locale)))
+        if gid in grader_map else {"id": gid}
+        for gid in grader_ids
+    ]
+    key = trial_cache_key(
+        content_text=content_text,
+        content_blocks=content_blocks,
+        form_type=trial_cfg.form_type,
+        form_config=form_config,
+        probe=trial_cfg.probe or "",
+        personas={pid: persona_map.get(pid) for pid in _referenced_persona_ids(form_config)},
+        graders=graders,
+        creator_profile=creator_profile,
+        intent=intent,
+        locale=locale,
+        repeat_index=repeat_index,
+    )
+    return key, set(grader_map)
+
+
+def _trial_result_from_cache(
+    task: EvalTaskV2,
+    trial_cfg: EvalTrialConfigV2,
+    repeat_index: int,
+    batch_id: str,
+    cached: dict,
+) -> EvalTrialResultV2:
+    """由缓存的 Trial 结果构造本 batch 的结果行（不调用 LLM；按当前权重重新计算加权分）。"""
+    # 旧版本写入的缓存可能带 cached 标记，去掉后再落库
+    grader_results = [
+        {k: v for k, v in gr.items() if k != "cached"} if isinstance(gr, dict) else gr
+        for gr in cached.get("grader_results") or []
+    ]
+    overall_score, dimension_scores = compute_weighted_grader_score(
+        grader_results, trial_cfg.grader_weights or {}
+    )
+    if overall_score is None:
+        overall_score = cached.get("overall_score")
+        dimension_scores = cached.get("dimension_scores") or {}
+    return EvalTrialResultV2(
+        id=generate_uuid(),
+        task_id=task.id,
+        trial_config_id=trial_cfg.id,
+        project_id=task.project_id,
+        batch_id=batch_id,
+        repeat_index=repeat_index,
+        form_type=trial_cfg.form_type,
+        process=cached.get("process") or [],
+        grader_results=grader_results,
+        dimension_scores=dimension_scores,
+        overall_score=overall_score,
+        llm_calls=[],
+        tokens_in=0,
+        tokens_out=0,
+        cost=0.0,
+        status="completed",
+        error="",
+        cache_hit=True,
+    )
+
+
 async def _run_trial_config_once(
     task: EvalTaskV2,
     trial_cfg: EvalTrialConfigV2,
@@ -3324,9 +3695,22 @@ async def _run_trial_config_once(
         creator_profile = _get_creator_profile(project, db)
     intent = _get_project_intent(project, db) if project else ""
 
+    # force 与 stop/pause 一样经运行态传递（_execute_task_v2 写入）
+    force = bool(_get_task_runtime(task.id).get("force_rerun"))
+    trial_key, expected_grader_ids = _trial_cache_key_for(
+        trial_cfg, repeat_index, persona_map, content_text, content_blocks,
+        creator_profile, intent, project_locale, db,
+    )
+    if not force:
+        cached = get_cached_result(db, trial_key)
+        if cached is not None:
+            task.content_hash = compute_content_hash(raw_contents)
+            return _trial_result_from_cache(task, trial_cfg, repeat_index, batch_id, cached)
+
     llm_calls = []
     process = []
     grader_results = []
+    cached_grader_ids = []
     dimension_scores = {}
     overall_score = None
     status = "completed"
@@ -3342,13 +3726,16 @@ async def _run_trial_config_once(
 
         if form == "assessment":
             # 直接判定：只跑 Grader
-            grader_results, g_calls = await _run_selected_graders(
+            grader_results, g_calls, cached_grader_ids = await _run_selected_graders(
                 trial_cfg.grader_ids or [],
                 content_text,
                 [],
                 [],
                 db,
                 locale=project_locale,
+                repeat_index=repeat_index,
+                project_id=task.project_id,
+                force=force,
             )
             llm_calls.extend(g_calls)
             overall_score, dimension_scores = compute_weighted_grader_score(
@@ -3374,13 +3761,16 @@ async def _run_trial_config_once(
                 status = "failed"
                 error = exp_result.error
 
-            selected_graders, g_calls = await _run_selected_graders(
+            selected_graders, g_calls, cached_grader_ids = await _run_selected_graders(
                 trial_cfg.grader_ids or [],
                 content_text,
                 process,
                 [],
                 db,
                 locale=project_locale,
+                repeat_index=repeat_index,
+                project_id=task.project_id,
+                force=force,
             )
             grader_results = selected_graders
             llm_calls.extend(g_calls)
@@ -3487,13 +3877,16 @@ async def _run_trial_config_once(
                 status = "failed"
                 error = trial.error or _locale_text(project_locale, "trial 実行失敗", "trial 执行失败")
 
-            selected_graders, g_calls = await _run_selected_graders(
+            selected_graders, g_calls, cached_grader_ids = await _run_selected_graders(
                 trial_cfg.grader_ids or [],
                 content_text,
                 process,
                 trial.grader_outputs or [],
                 db,
                 locale=project_locale,
+                repeat_index=repeat_index,
+                project_id=task.project_id,
+                force=force,
             )
             grader_results = selected_graders
             llm_calls.extend(g_calls)
@@ -3515,6 +3908,17 @@ async def _run_trial_config_once(
             tokens_out += int(c.get("tokens_out", 0) or 0)
             cost += float(c.get("cost", 0.0) or 0.0)
 
+    # 只缓存完整的结果：有分数且每个 Grader 都给出了评分（单个 Grader 调用失败不应被固化）
+    scored_grader_ids = {str(gr.get("grader_id", "")) for gr in grader_results if isinstance(gr, dict)}
+    if status == "completed" and overall_score is not None and expected_grader_ids <= scored_grader_ids:
+        store_result(db, trial_key, "trial", task.project_id, {
+            "process": process,
+            "grader_results": grader_results,
+            "dimension_scores": dimension_scores,
+            "overall_score": overall_score,
+        })
+        db.commit()
+
     return EvalTrialResultV2(
         id=generate_uuid(),
         task_id=task.id,
@@ -3533,6 +3937,7 @@ async def _run_trial_config_once(
         cost=cost,
         status=status,
         error=error,
+        cached_grader_ids=cached_grader_ids,
     )
 
 
@@ -3564,9 +3969,36 @@ def _row_to_payload(row: EvalTrialResultV2) -> dict:
         "cost": row.cost or 0.0,
         "status": row.status or "failed",
         "error": row.error or "",
+        "cache_hit": bool(row.cache_hit),
+        "cached_grader_ids": row.cached_grader_ids or [],
     }
 
 
+# 当前 Trial 的事件归属（在 _run_trial_plan_item_isolated 内设置，供 Grader 评分完成事件使用）
+_TRIAL_EVENT_SCOPE: ContextVar[Optional[dict]] = ContextVar("eval_trial_event_scope", default=None)
+
+
+def _publish_grader_finished(grader_id: str, result: dict, cached: bool = False) -> None:
+    scope = _TRIAL_EVENT_SCOPE.get()
+    if scope is None:
+        return
+    eval_progress_bus.publish(
+        "grader_finished",
+        **scope,
+        grader_id=grader_id,
+        grader_name=result.get("grader_name", ""),
+        scores=result.get("scores", {}) or {},
+        cached=cached,
+    )
+
+
+async def _notify_grader_finished(grader_id: str, coro):
+    res = await coro
+    go, _call = res
+    _publish_grader_finished(grader_id, go or {})
+    return res
+
+
 async def _run_trial_plan_item_isolated(
     session_factory,
     task_id: str,
@@ -3592,6 +4024,13 @@ async def _run_trial_plan_item_isolated(
                 "error": _locale_text(locale, "Task または Trial 設定が存在しません", "任务或试验配置不存在"),
             }
         persona_map = _get_persona_map(task.project_id, wdb)
+        _TRIAL_EVENT_SCOPE.set({
+            "task_id": task_id,
+            "project_id": task.project_id,
+            "batch_id": batch_id,
+            "trial_config_id": trial_config_id,
+            "repeat_index": repeat_index,
+        })
         locale = _project_locale(task.project_id, wdb)
         try:
             row = await asyncio.wait_for(
@@ -3615,19 +4054,93 @@ async def _run_trial_plan_item_isolated(
         wdb.close()
 
 
-def _load_done_keys_for_batch(task_id: str, batch_id: str, db: Session) -> set[tuple[str, int]]:
-    rows = (
-        db.query(EvalTrialResultV2.trial_config_id, EvalTrialResultV2.repeat_index)
+def _load_batch_rows(task_id: str, batch_id: str, db: Session) -> list[EvalTrialResultV2]:
+    return (
+        db.query(EvalTrialResultV2)
         .filter(
             EvalTrialResultV2.task_id == task_id,
             EvalTrialResultV2.batch_id == batch_id,
         )
+        .order_by(EvalTrialResultV2.created_at.asc())
         .all()
     )
-    return {(str(tc_id), int(ridx)) for tc_id, ridx in rows}
 
 
-async def _execute_task_v2(task_id: str, db: Session, resume_batch_id: Optional[str] = None) -> dict:
+def _persist_trial_rows(session_factory, payloads: list[dict]) -> tuple[list[EvalTrialResultV2], bool]:
+    """
+    用独立写入 session 把一轮收尾的 Trial 结果立即提交（进程中断后 resume 可跳过这些 Trial）。
+
+    返回 (rows, committed)：提交成功时 rows 为已脱离写入 session、字段已加载的对象；
+    失败时回滚并返回未持久化的对象，由调用方交给主 session 在收尾时提交。
+    """
+    rows = [EvalTrialResultV2(**payload) for payload in payloads]
+    wdb = session_factory()
+    try:
+        wdb.add_all(rows)
+        wdb.commit()
+        wdb.expunge_all()
+        return rows, True
+    except Exception:
+        wdb.rollback()
+        logger.warning("[eval] Trial 结果即时提交失败，改为收尾时提交", exc_info=True)
+        return [EvalTrialResultV2(**payload) for payload in payloads], False
+    finally:
+        wdb.close()
+
+
+@dataclass
+class _TaskV2Run:
+    """一次 V2 Task 执行的调度状态（单 Task 执行与 execute-all 共用一个调度器）。"""
+
+    task: EvalTaskV2
+    batch_id: str
+    locale: str
+    done_count: int
+    pending_plan: list[tuple[str, int]]
+    total: int = 0
+    cursor: int = 0
+    inflight: int = 0
+    prior_rows: list = field(default_factory=list)
+    run_rows: list = field(default_factory=list)
+    aggregator: TaskScoreAggregator = field(default_factory=TaskScoreAggregator)
+    completed_any: bool = False
+    errors: list[str] = field(default_factory=list)
+    stopped: bool = False
+    paused: bool = False
+    finished: bool = False
+
+    def record(self, row: EvalTrialResultV2) -> None:
+        """把一条已落库的 Trial 结果计入增量聚合（与收尾时按整个 batch 聚合的口径一致）。"""
+        if row.status == "completed":
+            self.completed_any = True
+            self.aggregator.add({"overall_score": row.overall_score, "dimension_scores": row.dimension_scores or {}})
+        if row.error:
+            self.errors.append(row.error)
+
+    def publish(self, event_type: str, **data) -> None:
+        eval_progress_bus.publish(
+            event_type,
+            task_id=self.task.id,
+            project_id=self.task.project_id,
+            batch_id=self.batch_id,
+            **data,
+        )
+
+    def halt_requested(self) -> bool:
+        rt = _get_task_runtime(self.task.id)
+        return bool(rt.get("stop_requested") or rt.get("pause_requested"))
+
+    def has_pending(self) -> bool:
+        return self.cursor < len(self.pending_plan) and not self.halt_requested()
+
+
+def _prepare_task_v2_run(
+    task_id: str,
+    db: Session,
+    resume_batch_id: Optional[str] = None,
+    force: bool = False,
+) -> _TaskV2Run:
+    """校验 Task、生成 batch 与待执行计划，并写入运行态（status=running）。"""
     task = db.query(EvalTaskV2).filter(EvalTaskV2.id == task_id).first()
     if not task:
         raise HTTPException(status_code=404, detail="EvalTask not found")
@@ -3648,14 +4161,9 @@ async def _execute_task_v2(task_id: str, db: Session, resume_batch_id: Optional[
     plan = _build_trial_plan(configs)
     total_runs = len(plan)
     batch_id = resume_batch_id or generate_uuid()
-    done_keys = _load_done_keys_for_batch(task_id, batch_id, db) if resume_batch_id else set()
+    prior_rows = _load_batch_rows(task_id, batch_id, db) if resume_batch_id else []
+    done_keys = {(str(r.trial_config_id), int(r.repeat_index)) for r in prior_rows}
     pending_plan = [(cfg.id, ridx) for cfg, ridx in plan if (cfg.id, ridx) not in done_keys]
-    max_parallel = max(1, int(settings.eval_max_parallel_trials or 1))
-    worker_session_factory = sessionmaker(
-        autocommit=False,
-        autoflush=False,
-        bind=db.get_bind(),
-    )
 
     task.status = "running"
     task.last_error = ""
@@ -3673,113 +4181,177 @@ async def _execute_task_v2(task_id: str, db: Session, resume_batch_id: Optional[
             "is_paused": False,
             "pause_requested": False,
             "stop_requested": False,
+            "force_rerun": force,
             "started_at": _get_task_runtime(task_id).get("started_at", datetime.now(timezone.utc).isoformat()),
             "updated_at": datetime.now(timezone.utc).isoformat(),
         },
     )
+    run = _TaskV2Run(
+        task=task,
+        batch_id=batch_id,
+        locale=task_locale,
+        done_count=len(done_keys),
+        pending_plan=pending_plan,
+        total=total_runs,
+        prior_rows=prior_rows,
+    )
+    for row in prior_rows:
+        run.record(row)
+    run.publish("run_started", total=total_runs, completed=len(done_keys), resumed=bool(resume_batch_id))
+    return run
 
-    run_rows = []
-    stopped = False
-    paused = False
-    inflight: dict[asyncio.Task, tuple[str, int]] = {}
-    cursor = 0
-    while cursor < len(pending_plan) or inflight:
-        rt = _get_task_runtime(task_id)
-        while (
-            cursor < len(pending_plan)
-            and len(inflight) < max_parallel
-            and not rt.get("stop_requested")
-            and not rt.get("pause_requested")
-        ):
-            cfg_id, ridx = pending_plan[cursor]
-            cursor += 1
-            t = asyncio.create_task(_run_trial_plan_item_isolated(worker_session_factory, task_id, cfg_id, ridx, batch_id))
-            inflight[t] = (cfg_id, ridx)
 
+async def _schedule_task_v2_runs(runs: List[_TaskV2Run], db: Session, on_finished=None) -> None:
+    """
+    把多个 Task 的待执行 Trial 放进同一个有界并发池（eval_max_parallel_trials）。
+
+    - 按 Task 顺序取下一个 Trial，前一个 Task 取完即接着取下一个，Task 边界不留空闲槽位
+    - 每个 Task 的 stop / pause 请求只影响该 Task：不再派发新 Trial，已在执行的 Trial 正常收尾
+    - 每轮收尾的 Trial 结果立即经独立写入 session 提交，并计入该 Task 的增量聚合
+    - 某个 Task 的 Trial 全部收尾后立即 on_finished(run)（写回 Task 状态、更新运行态）
+    """
+    max_parallel = max(1, int(settings.eval_max_parallel_trials or 1))
+    worker_session_factory = sessionmaker(
+        autocommit=False,
+        autoflush=False,
+        bind=db.get_bind(),
+    )
+    writer_session_factory = sessionmaker(
+        autocommit=False,
+        autoflush=False,
+        expire_on_commit=False,
+        bind=db.get_bind(),
+    )
+    inflight: dict[asyncio.Task, tuple[_TaskV2Run, str, int]] = {}
+
+    async def finish_idle_runs() -> None:
+        for run in runs:
+            if run.finished or run.inflight or run.has_pending():
+                continue
+            rt = _get_task_runtime(run.task.id)
+            run.stopped = bool(rt.get("stop_requested"))
+            run.paused = bool(rt.get("pause_requested"))
+            run.finished = True
+            if on_finished is not None:
+                await on_finished(run)
+
+    await finish_idle_runs()
+    while True:
+        for run in runs:
+            while len(inflight) < max_parallel and not run.finished and run.has_pending():
+                cfg_id, ridx = run.pending_plan[run.cursor]
+                run.cursor += 1
+                run.inflight += 1
+                run.publish("trial_started", trial_config_id=cfg_id, repeat_index=ridx)
+                t = asyncio.create_task(
+                    _run_trial_plan_item_isolated(worker_session_factory, run.task.id, cfg_id, ridx, run.batch_id)
+                )
+                inflight[t] = (run, cfg_id, ridx)
         if not inflight:
-            if rt.get("stop_requested"):
-                stopped = True
-            if rt.get("pause_requested"):
-                paused = True
             break
 
         done, _ = await asyncio.wait(set(inflight.keys()), return_when=asyncio.FIRST_COMPLETED)
+        landed: list[tuple[_TaskV2Run, dict]] = []
         for t in done:
-            cfg_id, ridx = inflight.pop(t, ("", 0))
+            run, cfg_id, ridx = inflight.pop(t)
+            run.inflight -= 1
             try:
                 payload = t.result()
             except Exception as e:
                 payload = {
                     "id": generate_uuid(),
-                    "task_id": task.id,
+                    "task_id": run.task.id,
                     "trial_config_id": cfg_id,
-                    "project_id": task.project_id,
-                    "batch_id": batch_id,
+                    "project_id": run.task.project_id,
+                    "batch_id": run.batch_id,
                     "repeat_index": ridx,
                     "form_type": "assessment",
                     "status": "failed",
                     "error": str(e),
                 }
-            row = EvalTrialResultV2(**payload)
-            db.add(row)
-            run_rows.append(row)
+            landed.append((run, payload))
+
+        rows, committed = _persist_trial_rows(writer_session_factory, [payload for _, payload in landed])
+        for (run, _), row in zip(landed, rows):
+            # 已提交的行以 load=False 并入主 session（不再查询），序列化时仍可加载 trial_config
+            row = db.merge(row, load=False) if committed else row
+            if not committed:
+                db.add(row)
+            run.run_rows.append(row)
+            run.record(row)
+            run.publish(
+                "trial_finished",
+                trial_config_id=row.trial_config_id,
+                repeat_index=row.repeat_index,
+                trial_result_id=row.id,
+                status=row.status,
+                overall_score=row.overall_score,
+                cache_hit=bool(row.cache_hit),
+                error=row.error or "",
+                completed=run.done_count + len(run.run_rows),
+                total=run.total,
+            )
+        for run in {id(run): run for run, _ in landed}.values():
+            overall = run.aggregator.result().get("overall") or {}
             _set_task_runtime(
-                task_id,
+                run.task.id,
                 {
-                    "completed": len(done_keys) + len(run_rows),
+                    "completed": run.done_count + len(run.run_rows),
+                    "cache_hits": sum(1 for r in run.run_rows if r.cache_hit),
+                    "overall": overall.get("mean"),
                     "updated_at": datetime.now(timezone.utc).isoformat(),
                 },
             )
+        await finish_idle_runs()
+    await finish_idle_runs()
 
-        rt_after = _get_task_runtime(task_id)
-        if rt_after.get("stop_requested"):
-            stopped = True
-        if rt_after.get("pause_requested"):
-            paused = True
 
-    db.flush()
+def _finalize_task_v2_run(run: _TaskV2Run, db: Session) -> dict:
+    """
+    写回 Task 状态与运行态，返回执行结果。
 
-    all_rows = (
-        db.query(EvalTrialResultV2)
-        .filter(
-            EvalTrialResultV2.task_id == task_id,
-            EvalTrialResultV2.batch_id == batch_id,
-        )
-        .order_by(EvalTrialResultV2.created_at.asc())
-        .all()
-    )
-    aggregate_input = [
-        {"overall_score": r.overall_score, "dimension_scores": r.dimension_scores or {}}
-        for r in all_rows
-        if r.status == "completed"
-    ]
-    agg = aggregate_task_scores(aggregate_input)
+    聚合分来自执行中逐条累计的 run.aggregator，Trial 列表为续跑前已有的行 + 本次落库的行，
+    不再重新查询整个 batch。
+    """
+    task = run.task
+    task_id = task.id
+    batch_id = run.batch_id
+    all_rows = sorted(run.prior_rows + run.run_rows, key=lambda r: r.created_at or datetime.min)
+    agg = run.aggregator.result()
     task.latest_scores = agg
     task.latest_overall = (agg.get("overall") or {}).get("mean") if agg.get("overall") else None
     task.latest_batch_id = batch_id
     task.last_executed_at = datetime.now(timezone.utc)
-    if stopped:
+    if run.stopped:
         task.status = "stopped"
-    elif paused:
+    elif run.paused:
         task.status = "paused"
     else:
-        task.status = "completed" if any(r.status == "completed" for r in all_rows) else "failed"
-    task.last_error = "; ".join([r.error for r in all_rows if r.error])[:2000]
+        task.status = "completed" if run.completed_any else "failed"
+    task.last_error = "; ".join(run.errors)[:2000]
 
     db.commit()
     db.refresh(task)
     _set_task_runtime(
         task_id,
         {
-            "completed": len(done_keys) + len(run_rows),
+            "completed": run.done_count + len(run.run_rows),
             "is_running": False,
-            "is_paused": paused,
+            "is_paused": run.paused,
             "pause_requested": False,
             "stop_requested": False,
-            "max_parallel": max_parallel,
+            "max_parallel": max(1, int(settings.eval_max_parallel_trials or 1)),
             "updated_at": datetime.now(timezone.utc).isoformat(),
         },
     )
+    run.publish(
+        task.status if task.status in ("paused", "stopped") else "finished",
+        status=task.status,
+        overall=task.latest_overall,
+        completed=run.done_count + len(run.run_rows),
+        total=run.total,
+        error=task.last_error or "",
+    )
 
     # 若用户在“暂停尚未落稳”阶段已点击恢复，则自动续跑
     rt_final = _get_task_runtime(task_id)
@@ -3791,24 +4363,124 @@ async def _execute_task_v2(task_id: str, db: Session, resume_batch_id: Optional[
         "task": _serialize_task_v2(task),
         "batch_id": batch_id,
         "overall": task.latest_overall,
-        "trials": [_serialize_trial_result_v2(r, locale=task_locale) for r in all_rows],
+        "cache": _summarize_cache_hits(run.run_rows),
+        "trials": [_serialize_trial_result_v2(r, locale=run.locale) for r in all_rows],
+    }
+
+
+@run_with_llm_priority(PRIORITY_EVAL)
+async def _execute_task_v2(
+    task_id: str,
+    db: Session,
+    resume_batch_id: Optional[str] = None,
+    force: bool = False,
+) -> dict:
+    """
+    执行 V2 Task 的全部 TrialConfig × repeat（可从 resume_batch_id 续跑）。
+
+    输入未变的 Trial / Grader 复用结果缓存（core.eval_result_cache）；force=True 时全部重新执行。
+    """
+    run = _prepare_task_v2_run(task_id, db, resume_batch_id=resume_batch_id, force=force)
+    await _schedule_task_v2_runs([run], db)
+    return _finalize_task_v2_run(run, db)
+
+
+@run_with_llm_priority(PRIORITY_EVAL)
+async def _execute_project_tasks_v2(tasks: List[EvalTaskV2], db: Session, force: bool = False) -> dict:
+    """
+    执行项目下多个 V2 Task：全部 Trial 共用一个有界并发池（见 _schedule_task_v2_runs），
+    每个 Task 的进度 / 暂停 / 终止仍走各自的运行态。
+    """
+    runs = []
+    failed = []
+    for t in tasks:
+        try:
+            runs.append(_prepare_task_v2_run(t.id, db, force=force))
+        except Exception as e:
+            failed.append({"task_id": t.id, "error": str(e.detail if isinstance(e, HTTPException) else e)})
+
+    outcomes: dict[str, dict] = {}
+
+    async def on_finished(run: _TaskV2Run) -> None:
+        try:
+            outcomes[run.task.id] = _finalize_task_v2_run(run, db)
+        except Exception as e:
+            db.rollback()
+            failed.append({"task_id": run.task.id, "error": str(e)})
+
+    try:
+        await _schedule_task_v2_runs(runs, db, on_finished=on_finished)
+    finally:
+        # 调度异常中断时，未收尾的 Task 不能一直停在 running
+        for run in runs:
+            if not run.finished:
+                _set_task_runtime(run.task.id, {"is_running": False, "updated_at": datetime.now(timezone.utc).isoformat()})
+
+    executed = []
+    cache = {"trials": 0, "trial_hits": 0, "grader_runs": 0, "grader_hits": 0}
+    for run in runs:
+        out = outcomes.get(run.task.id)
+        if out is None:
+            continue
+        executed.append({
+            "task_id": run.task.id,
+            "batch_id": out.get("batch_id"),
+            "overall": out.get("overall"),
+            "status": out["task"].get("status"),
+            "cache": out.get("cache"),
+        })
+        for k, v in (out.get("cache") or {}).items():
+            cache[k] = cache.get(k, 0) + v
+    return {"executed": executed, "failed": failed, "cache": cache}
+
+
+def _summarize_cache_hits(rows: List[EvalTrialResultV2]) -> dict:
+    """本次执行的缓存命中统计（Trial 整体命中 / 未命中 Trial 中复用的 Grader 评分）。"""
+    grader_hits = 0
+    grader_total = 0
+    for r in rows:
+        if r.cache_hit:
+            continue
+        cached_grader_ids = set(r.cached_grader_ids or [])
+        for gr in r.grader_results or []:
+            if isinstance(gr, dict):
+                grader_total += 1
+                grader_hits += 1 if gr.get("grader_id") in cached_grader_ids else 0
+    return {
+        "trials": len(rows),
+        "trial_hits": sum(1 for r in rows if r.cache_hit),
+        "grader_runs": grader_total,
+        "grader_hits": grader_hits,
     }
 
 
-async def _execute_task_v2_background(task_id: str, resume_batch_id: Optional[str] = None) -> None:
+async def _execute_task_v2_background(
+    task_id: str,
+    resume_batch_id: Optional[str] = None,
+    force: bool = False,
+) -> None:
     """
     后台执行 V2 Task，使用独立 DB Session，避免请求结束后 session 失效。
     """
     SessionLocal = get_session_maker()
     db = SessionLocal()
     try:
-        await _execute_task_v2(task_id, db, resume_batch_id=resume_batch_id)
+        await _execute_task_v2(task_id, db, resume_batch_id=resume_batch_id, force=force)
     except Exception as e:
         task = db.query(EvalTaskV2).filter(EvalTaskV2.id == task_id).first()
         if task:
             task.status = "failed"
             task.last_error = str(e)[:2000]
             db.commit()
+            eval_progress_bus.publish(
+                "finished",
+                task_id=task_id,
+                project_id=task.project_id,
+                batch_id=task.latest_batch_id or "",
+                status="failed",
+                overall=None,
+                error=task.last_error,
+            )
     finally:
         rt = _get_task_runtime(task_id)
         _set_task_runtime(
@@ -20,7 +20,7 @@ from sqlalchemy.orm import Session
 import json
 
 from core.database import get_db
-from core.models import ProjectField, Project, FieldTemplate, generate_uuid, GenerationLog, ContentVersion
+from core.models import ProjectField, Project, FieldTemplate, generate_uuid, GenerationLog
 from core.tools import generate_field, generate_field_stream, resolve_field_order
 from core.pre_question_utils import normalize_pre_answers, normalize_pre_questions
 from core.prompt_engine import prompt_engine, PromptContext, GoldenContext
@@ -37,26 +37,8 @@ def _save_field_version(field: ProjectField, source: str, db, source_detail: str
     """
     保存 ProjectField 当前内容为一个历史版本
     """
-    if not field.content or not field.content.strip():
-        return
-    
-    max_version = db.query(ContentVersion.version_number).filter(
-        ContentVersion.block_id == field.id
-    ).order_by(ContentVersion.version_number.desc()).first()
-    
-    next_version = (max_version[0] + 1) if max_version else 1
-    
-    version = ContentVersion(
-        id=generate_uuid(),
-        block_id=field.id,
-        version_number=next_version,
-        content=field.content,
-        source=source,
-        source_detail=source_detail,
-    )
-    db.add(version)
-    db.flush()
-    logger.info(f"[版本] 保存 {field.name} v{next_version} ({source})")
+    from core.version_service import save_content_version
+    save_content_version(db, field.id, field.content, source, source_detail)
 
 
 router = APIRouter()
@@ -1,10 +1,12 @@
 # backend/api/projects.py
 # 功能: 项目管理API — CRUD、版本管理、完整导入/导出、复制、全局搜索替换
-# 主要路由: CRUD, /export, /import, /duplicate, /versions, /search, /replace
+# 主要路由: CRUD, /export, /export-stream（NDJSON 流）, /import, /import-stream, /duplicate, /versions,
+#   /search（跨项目）, /{id}/search, /replace
 # 导出/导入范围: Project, CreatorProfile, ContentBlock, ProjectField, ChatMessage,
 #   ContentVersion, BlockHistory, SimulationRecord, EvalRun/Task/Trial,
 #   MemoryItem, Grader, GenerationLog(可选)
-# 数据结构: ProjectCreate, ProjectUpdate, ProjectResponse, ProjectImportRequest
+# 数据结构: ProjectCreate, ProjectUpdate, ProjectResponse, ProjectImportRequest,
+#   _ProjectImporter（JSON / 流式导入共用，分批 flush）
 
 """
 项目管理 API
@@ -13,17 +15,30 @@
 import json
 from datetime import datetime
 from typing import Optional, List, Dict, Any, Literal
-from fastapi import APIRouter, Depends, HTTPException, Request
+from fastapi import APIRouter, Depends, File, HTTPException, Request, UploadFile
+from fastapi.responses import StreamingResponse
 from pydantic import BaseModel
 from sqlalchemy.orm import Session
 
-from core.database import get_db
+from core.database import get_db, get_session_maker
 from core.localization import DEFAULT_LOCALE, normalize_locale
 from core.locale_text import rt
 from core.models import Project, CreatorProfile, PROJECT_PHASES, generate_uuid
 from core.llm_compat import get_model_name
 from core.project_mode_bootstrap import ensure_project_agent_modes
 from core.pre_question_utils import normalize_pre_answers, normalize_pre_questions
+from core.project_transfer_service import (
+    EXPORT_SECTIONS,
+    PREREGISTERED_SECTIONS,
+    STREAM_FORMAT,
+    export_section_queries,
+    gzip_chunks,
+    iter_export_records,
+    iter_ndjson_chunks,
+    iter_ndjson_records,
+    serialize_row,
+    serialize_section_rows,
+)
 
 
 router = APIRouter()
@@ -315,8 +330,10 @@ def _delete_project_with_related_data(db: Session, project: Project) -> None:
     from core.models.eval_run import EvalRun
     from core.models.eval_task import EvalTask
     from core.models.eval_trial import EvalTrial
-    from core.models.content_version import ContentVersion
     from core.models.grader import Grader
+    from core.version_service import delete_version_history
+    from core.eval_result_cache import clear_project_cache
+    from core.prompt_blob_store import project_prompt_hashes, release_prompt_blobs
 
     project_id = project.id
 
@@ -329,11 +346,8 @@ def _delete_project_with_related_data(db: Session, project: Project) -> None:
     ).all()]
     all_versioned_ids = block_ids + field_ids
 
-    # 删除 ContentVersion（通过 block_id 关联 block 和 field）
-    if all_versioned_ids:
-        db.query(ContentVersion).filter(
-            ContentVersion.block_id.in_(all_versioned_ids)
-        ).delete(synchronize_session=False)
+    # 删除 ContentVersion 及版本计数器（通过 block_id 关联 block 和 field）
+    delete_version_history(db, all_versioned_ids)
 
     # 删除 EvalTrial + EvalTask（通过 EvalRun 关联项目）
     run_ids = [r.id for r in db.query(EvalRun.id).filter(
@@ -343,9 +357,12 @@ def _delete_project_with_related_data(db: Session, project: Project) -> None:
         db.query(EvalTrial).filter(EvalTrial.eval_run_id.in_(run_ids)).delete(synchronize_session=False)
         db.query(EvalTask).filter(EvalTask.eval_run_id.in_(run_ids)).delete(synchronize_session=False)
     db.query(EvalRun).filter(EvalRun.project_id == project_id).delete()
+    clear_project_cache(db, project_id)
 
-    # 删除关联的生成日志
+    # 删除关联的生成日志，扣减其 prompt 正文的引用计数（归零的 blob 一并删除）
+    blob_refs = project_prompt_hashes(db, project_id)
     db.query(GenerationLog).filter(GenerationLog.project_id == project_id).delete()
+    release_prompt_blobs(db, blob_refs)
 
     # 删除关联的块历史记录
     db.query(BlockHistory).filter(BlockHistory.project_id == project_id).delete()
@@ -771,6 +788,8 @@ def duplicate_project(
                 block_id=all_id_mapping.get(old_ver.block_id, old_ver.block_id),
                 version_number=old_ver.version_number,
                 content=old_ver.content,
+                storage=old_ver.storage,
+                delta=old_ver.delta,
                 source=old_ver.source,
                 source_detail=old_ver.source_detail,
             )
@@ -1190,38 +1209,14 @@ def export_project(
 
     包含：项目本身、内容块、字段、对话记录、版本历史、
     模拟记录、评估记录（V2）、记忆条目、评分器、生成日志（可选）
+    整份数据在内存中拼装；大项目请用 /{project_id}/export-stream。
     """
-    from core.models import (
-        ProjectField, ContentBlock, GenerationLog,
-        SimulationRecord,
-        EvalRun, EvalTask, EvalTrial,
-        MemoryItem, ProjectStructureDraft, AgentMode, Conversation,
-    )
-    from core.models.chat_history import ChatMessage
-    from core.models.content_version import ContentVersion
-    from core.models.block_history import BlockHistory
-    from core.models.grader import Grader
-
     project = db.query(Project).filter(Project.id == project_id).first()
     if not project:
         raise HTTPException(status_code=404, detail="项目不存在")
 
-    # --- 辅助：把 ORM 对象序列化为 dict ---
-    def _ser(obj, exclude=None):
-        """序列化 SQLAlchemy 模型为 dict"""
-        exclude = set(exclude or [])
-        d = {}
-        for col in obj.__table__.columns:
-            if col.name in exclude:
-                continue
-            val = getattr(obj, col.name)
-            if isinstance(val, datetime):
-                val = val.isoformat()
-            d[col.name] = val
-        return d
-
     # 项目本体
-    project_data = _ser(project)
+    project_data = serialize_row(project)
 
     # 创作者特质
     creator_profile_data = None
@@ -1230,137 +1225,75 @@ def export_project(
             CreatorProfile.id == project.creator_profile_id
         ).first()
         if cp:
-            creator_profile_data = _ser(cp)
-
-    # ContentBlocks（排除已软删除的）
-    blocks = db.query(ContentBlock).filter(
-        ContentBlock.project_id == project_id,
-        ContentBlock.deleted_at == None,  # noqa: E711 — 不导出已软删除的块
-    ).order_by(ContentBlock.order_index).all()
-    blocks_data = [_ser(b) for b in blocks]
-
-    # ProjectFields（旧架构）
-    fields = db.query(ProjectField).filter(
-        ProjectField.project_id == project_id,
-    ).all()
-    fields_data = [_ser(f) for f in fields]
-
-    # Conversations + ChatMessages
-    conversations = db.query(Conversation).filter(
-        Conversation.project_id == project_id,
-    ).order_by(
-        Conversation.last_message_at.asc(),
-        Conversation.created_at.asc(),
-    ).all()
-    conversations_data = [_ser(c) for c in conversations]
-
-    messages = db.query(ChatMessage).filter(
-        ChatMessage.project_id == project_id,
-    ).order_by(ChatMessage.created_at).all()
-    messages_data = [_ser(m) for m in messages]
-
-    # ContentVersions（通过 block_id 关联）
-    block_ids = [b.id for b in blocks]
-    field_ids = [f.id for f in fields]
-    all_versioned_ids = block_ids + field_ids
-    versions_data = []
-    if all_versioned_ids:
-        versions = db.query(ContentVersion).filter(
-            ContentVersion.block_id.in_(all_versioned_ids),
-        ).order_by(ContentVersion.version_number).all()
-        versions_data = [_ser(v) for v in versions]
-
-    # BlockHistory
-    history = db.query(BlockHistory).filter(
-        BlockHistory.project_id == project_id,
-    ).order_by(BlockHistory.created_at).all()
-    history_data = [_ser(h) for h in history]
-
-    # SimulationRecords
-    sim_records = db.query(SimulationRecord).filter(
-        SimulationRecord.project_id == project_id,
-    ).all()
-    sim_data = [_ser(s) for s in sim_records]
-
-    # EvalRuns + Tasks + Trials
-    eval_runs = db.query(EvalRun).filter(
-        EvalRun.project_id == project_id,
-    ).all()
-    eval_runs_data = [_ser(r) for r in eval_runs]
-
-    run_ids = [r.id for r in eval_runs]
-    tasks_data = []
-    trials_data = []
-    if run_ids:
-        tasks = db.query(EvalTask).filter(
-            EvalTask.eval_run_id.in_(run_ids),
-        ).all()
-        tasks_data = [_ser(t) for t in tasks]
-
-        trials = db.query(EvalTrial).filter(
-            EvalTrial.eval_run_id.in_(run_ids),
-        ).all()
-        trials_data = [_ser(t) for t in trials]
-
-    # MemoryItems（项目级记忆）
-    from sqlalchemy import or_
-    memories = db.query(MemoryItem).filter(
-        or_(
-            MemoryItem.project_id == project_id,
-            MemoryItem.project_id.is_(None),  # 全局记忆也导出，导入时按原 project_id 还原
-        )
-    ).order_by(MemoryItem.created_at).all()
-    memories_data = [_ser(m) for m in memories]
-
-    # AgentModes（项目级角色）
-    agent_modes = db.query(AgentMode).filter(
-        AgentMode.project_id == project_id,
-        AgentMode.is_template.is_(False),
-    ).order_by(AgentMode.sort_order, AgentMode.created_at).all()
-    agent_modes_data = [_ser(m) for m in agent_modes]
-
-    # Graders（项目专用评分器）
-    graders = db.query(Grader).filter(
-        Grader.project_id == project_id,
-    ).all()
-    graders_data = [_ser(g) for g in graders]
-
-    drafts = db.query(ProjectStructureDraft).filter(
-        ProjectStructureDraft.project_id == project_id,
-    ).all()
-    drafts_data = [_ser(d) for d in drafts]
+            creator_profile_data = serialize_row(cp)
 
-    # GenerationLogs（可选，可能很大）
-    logs_data = []
-    if include_logs:
-        logs = db.query(GenerationLog).filter(
-            GenerationLog.project_id == project_id,
-        ).order_by(GenerationLog.created_at).all()
-        logs_data = [_ser(l) for l in logs]
+    queries = export_section_queries(db, project_id, include_logs=include_logs)
+    sections = {
+        section: serialize_section_rows(db, section, query.all())
+        for section, query in queries.items()
+    }
 
     return {
         "export_version": "2.0",
         "exported_at": datetime.now().isoformat(),
         "project": project_data,
         "creator_profile": creator_profile_data,
-        "content_blocks": blocks_data,
-        "project_fields": fields_data,
-        "conversations": conversations_data,
-        "chat_messages": messages_data,
-        "content_versions": versions_data,
-        "block_history": history_data,
-        "simulation_records": sim_data,
-        "eval_runs": eval_runs_data,
-        "eval_tasks": tasks_data,
-        "eval_trials": trials_data,
-        "memory_items": memories_data,
-        "agent_modes": agent_modes_data,
-        "graders": graders_data,
-        "project_structure_drafts": drafts_data,
-        "generation_logs": logs_data,
+        "content_blocks": sections["content_blocks"],
+        "project_fields": sections["project_fields"],
+        "conversations": sections["conversations"],
+        "chat_messages": sections["chat_messages"],
+        "content_versions": sections["content_versions"],
+        "block_history": sections["block_history"],
+        "simulation_records": sections["simulation_records"],
+        "eval_runs": sections["eval_runs"],
+        "eval_tasks": sections["eval_tasks"],
+        "eval_trials": sections["eval_trials"],
+        "memory_items": sections["memory_items"],
+        "agent_modes": sections["agent_modes"],
+        "graders": sections["graders"],
+        "project_structure_drafts": sections["project_structure_drafts"],
+        "generation_logs": sections.get("generation_logs", []),
     }
 
 
+@router.get("/{project_id}/export-stream")
+def export_project_stream(
+    project_id: str,
+    include_logs: bool = False,
+    compression: Literal["gzip", "none"] = "gzip",
+    db: Session = Depends(get_db),
+):
+    """
+    流式导出项目（NDJSON，默认 gzip 压缩）
+
+    内容与 /export 相同，按分段用服务端游标逐批读取、逐行写出，内存占用与项目大小无关。
+    格式见 core/project_transfer_service.py，可直接交给 /import-stream 导入。
+    """
+    if not db.query(Project.id).filter(Project.id == project_id).first():
+        raise HTTPException(status_code=404, detail="项目不存在")
+
+    def _ndjson():
+        # 响应体在请求依赖释放后才开始迭代，使用独立 Session
+        stream_db = get_session_maker()()
+        try:
+            yield from iter_ndjson_chunks(
+                iter_export_records(stream_db, project_id, include_logs=include_logs)
+            )
+        finally:
+            stream_db.close()
+
+    filename = f"project-{project_id}.ndjson"
+    if compression == "gzip":
+        body, media_type, filename = gzip_chunks(_ndjson()), "application/gzip", f"{filename}.gz"
+    else:
+        body, media_type = _ndjson(), "application/x-ndjson"
+    return StreamingResponse(
+        body,
+        media_type=media_type,
+        headers={"Content-Disposition": f'attachment; filename="{filename}"'},
+    )
+
+
 @router.get("/{project_id}/export-markdown")
 def export_project_markdown(
     project_id: str,
@@ -1500,84 +1433,104 @@ class ProjectImportRequest(BaseModel):
     match_creator_profile: bool = True
 
 
-@router.post("/import")
-def import_project(
-    request: ProjectImportRequest,
-    db: Session = Depends(get_db),
-):
-    """
-    导入项目（从 JSON）
+# 导入时每写入这么多行 flush 一次并清空 identity map
+IMPORT_BATCH_SIZE = 500
 
-    自动为所有实体生成新 ID，维护内部引用关系。
-    """
-    from core.models import (
-        ProjectField, ContentBlock, GenerationLog,
-        SimulationRecord,
-        EvalRun, EvalTask, EvalTrial,
-        MemoryItem, ProjectStructureDraft, AgentMode, Conversation,
-    )
-    from core.models.chat_history import ChatMessage
-    from core.models.content_version import ContentVersion
-    from core.models.block_history import BlockHistory
-    from core.models.grader import Grader
+# 导入结果 stats 中统计的分段
+_IMPORT_STAT_SECTIONS = (
+    "content_blocks", "project_fields", "conversations", "chat_messages", "content_versions",
+    "simulation_records", "eval_runs", "memory_items", "agent_modes", "project_structure_drafts",
+    "graders", "generation_logs",
+)
 
-    data = request.data
-    if "project" not in data:
-        raise HTTPException(status_code=400, detail="缺少 project 字段")
 
-    def _parse_dt(val) -> Optional[datetime]:
-        """解析 ISO datetime 字符串，失败返回 None（让 DB 用 default）"""
-        if not val:
-            return None
-        if isinstance(val, datetime):
-            return val
-        try:
-            return datetime.fromisoformat(str(val))
-        except (ValueError, TypeError):
-            return None
+def _parse_dt(val) -> Optional[datetime]:
+    """解析 ISO datetime 字符串，失败返回 None（让 DB 用 default）"""
+    if not val:
+        return None
+    if isinstance(val, datetime):
+        return val
+    try:
+        return datetime.fromisoformat(str(val))
+    except (ValueError, TypeError):
+        return None
 
-    def _set_timestamps(obj, data_dict: dict):
-        """从导出数据中恢复 created_at / updated_at 时间戳"""
-        ca = _parse_dt(data_dict.get("created_at"))
-        ua = _parse_dt(data_dict.get("updated_at"))
-        if ca:
-            obj.created_at = ca
-        if ua:
-            obj.updated_at = ua
+
+def _set_timestamps(obj, data_dict: dict):
+    """从导出数据中恢复 created_at / updated_at 时间戳"""
+    ca = _parse_dt(data_dict.get("created_at"))
+    ua = _parse_dt(data_dict.get("updated_at"))
+    if ca:
+        obj.created_at = ca
+    if ua:
+        obj.updated_at = ua
+
+
+class _ProjectImporter:
+    """
+    把导出数据写入为新项目：自动为所有实体生成新 ID，维护内部引用关系。
+
+    /import（整份 JSON）与 /import-stream（NDJSON 流）共用。调用顺序：
+    begin() 写入创作者特质与项目 → register_ids() 预先登记被引用分段的 ID
+    → 按 EXPORT_SECTIONS 顺序逐行 add() → finish() 提交。
+    每 batch_size 行 flush 一次并清空 identity map，内存占用与项目大小无关。
+    """
+
+    def __init__(self, db: Session, *, match_creator_profile: bool = True, batch_size: Optional[int] = None):
+        self.db = db
+        self.match_creator_profile = match_creator_profile
+        self.batch_size = max(1, batch_size or IMPORT_BATCH_SIZE)
+        self.import_locale = DEFAULT_LOCALE
+        self.project_locale = DEFAULT_LOCALE
+        self.new_proj_id = ""
+        self.id_map: Dict[str, str] = {}
+        self.conversation_id_mapping: Dict[str, str] = {}
+        self.counts: Dict[str, int] = {}
+        self._pending = 0
 
     # ============ ID 映射 ============
-    id_map: Dict[str, str] = {}
 
-    def _new_id(old_id: str) -> str:
+    def _new_id(self, old_id: str) -> str:
         """为旧 ID 生成新 ID 并缓存"""
         if not old_id:
             return ""
-        if old_id not in id_map:
-            id_map[old_id] = generate_uuid()
-        return id_map[old_id]
+        if old_id not in self.id_map:
+            self.id_map[old_id] = generate_uuid()
+        return self.id_map[old_id]
 
-    def _map_id(old_id: Optional[str]) -> Optional[str]:
+    def _map_id(self, old_id: Optional[str]) -> Optional[str]:
         """映射可选 ID"""
         if not old_id:
             return None
-        return id_map.get(old_id, old_id)
+        return self.id_map.get(old_id, old_id)
 
-    def _map_list(old_ids: list) -> list:
+    def _map_list(self, old_ids: list) -> list:
         """映射 ID 列表"""
         if not old_ids:
             return []
-        return [id_map.get(oid, oid) for oid in old_ids]
+        return [self.id_map.get(oid, oid) for oid in old_ids]
+
+    def register_ids(self, section: str, old_ids) -> None:
+        """预先登记一批 ID（被同分段或前面分段引用，需在写入行之前确定新 ID）"""
+        for old_id in old_ids:
+            if not old_id:
+                continue
+            new_id = self._new_id(old_id)
+            if section == "conversations":
+                self.conversation_id_mapping[old_id] = new_id
 
-    import_locale = DEFAULT_LOCALE
+    # ============ 1-2. 创作者特质 + 项目 ============
+
+    def begin(self, proj_data: Dict[str, Any], cp_data: Optional[Dict[str, Any]]) -> None:
+        db = self.db
+        self.project_locale = proj_data.get("locale", DEFAULT_LOCALE)
+        self.import_locale = normalize_locale(self.project_locale)
 
-    try:
-        # ============ 1. 创作者特质 ============
-        cp_data = data.get("creator_profile")
         new_cp_id = None
         if cp_data:
             old_cp_id = cp_data.get("id", "")
             creator_locale = normalize_locale(cp_data.get("locale", DEFAULT_LOCALE))
-            if request.match_creator_profile and cp_data.get("name"):
+            if self.match_creator_profile and cp_data.get("name"):
                 # 尝试按名称匹配已有特质
                 existing = db.query(CreatorProfile).filter(
                     CreatorProfile.name == cp_data["name"],
@@ -1585,10 +1538,10 @@ def import_project(
                 ).first()
                 if existing:
                     new_cp_id = existing.id
-                    id_map[old_cp_id] = existing.id
+                    self.id_map[old_cp_id] = existing.id
 
             if not new_cp_id:
-                new_cp_id = _new_id(old_cp_id)
+                new_cp_id = self._new_id(old_cp_id)
                 cp = CreatorProfile(
                     id=new_cp_id,
                     name=cp_data.get("name", rt(creator_locale, "project.import.default_creator_name")),
@@ -1603,14 +1556,10 @@ def import_project(
                 _set_timestamps(cp, cp_data)
                 db.add(cp)
 
-        # ============ 2. 项目 ============
-        proj_data = data["project"]
-        import_locale = normalize_locale(proj_data.get("locale", DEFAULT_LOCALE))
-        old_proj_id = proj_data.get("id", "")
-        new_proj_id = _new_id(old_proj_id)
-
+        import_locale = self.import_locale
+        self.new_proj_id = self._new_id(proj_data.get("id", ""))
         new_project = Project(
-            id=new_proj_id,
+            id=self.new_proj_id,
             name=proj_data.get("name", rt(import_locale, "project.import.default_project_name")),
             creator_profile_id=new_cp_id,
             locale=import_locale,
@@ -1626,377 +1575,417 @@ def import_project(
         )
         _set_timestamps(new_project, proj_data)
         db.add(new_project)
+        self.flush()
+
+    # ============ 3-11. 各分段逐行写入 ============
+
+    def add(self, section: str, row: Dict[str, Any]) -> None:
+        """写入一行分段数据（未知分段忽略，兼容更新版本的导出文件）"""
+        builder = getattr(self, f"_build_{section}", None)
+        if builder is None:
+            return
+        obj = builder(row)
+        if obj is None:
+            return
+        _set_timestamps(obj, row)
+        self.db.add(obj)
+        self.counts[section] = self.counts.get(section, 0) + 1
+        self._pending += 1
+        if self._pending >= self.batch_size:
+            self.flush()
+
+    def flush(self) -> None:
+        self.db.flush()
+        # 已写入的对象不再需要，避免整个项目的行堆积在 Session 中
+        self.db.expunge_all()
+        self._pending = 0
+
+    def _build_content_blocks(self, b):
+        # 过滤掉已软删除的块（安全兜底：正常导出已排除，但旧版导出文件可能包含）
+        if b.get("deleted_at"):
+            return None
+        from core.models import ContentBlock
+
+        return ContentBlock(
+            id=self._new_id(b.get("id", "")),
+            project_id=self.new_proj_id,
+            parent_id=self._map_id(b.get("parent_id")),
+            name=b.get("name", ""),
+            block_type=b.get("block_type", "field"),
+            depth=b.get("depth", 0),
+            order_index=b.get("order_index", 0),
+            content=b.get("content", ""),
+            status=b.get("status", "pending"),
+            ai_prompt=b.get("ai_prompt", ""),
+            constraints=b.get("constraints", {}),
+            pre_questions=normalize_pre_questions(b.get("pre_questions", [])),
+            pre_answers=normalize_pre_answers(b.get("pre_answers", {}), b.get("pre_questions", [])),
+            guidance_input=b.get("guidance_input", ""),
+            guidance_output=b.get("guidance_output", ""),
+            depends_on=self._map_list(b.get("depends_on", [])),
+            special_handler=b.get("special_handler"),
+            need_review=b.get("need_review", True),
+            auto_generate=b.get("auto_generate", False),
+            needs_regeneration=bool(b.get("needs_regeneration", False)),
+            is_collapsed=b.get("is_collapsed", False),
+            model_override=b.get("model_override"),
+            digest=b.get("digest"),
+        )
 
-        # AgentMode 会被 Conversation / ChatMessage / MemoryItem 引用，先注册 ID 映射。
-        for mode_data in data.get("agent_modes", []):
-            old_mode_id = mode_data.get("id", "")
-            if old_mode_id:
-                _new_id(old_mode_id)
+    def _build_project_fields(self, f):
+        from core.models import ProjectField
 
-        # ============ 3. ContentBlocks ============
-        # 过滤掉已软删除的块（安全兜底：正常导出已排除，但旧版导出文件可能包含）
-        active_blocks = [
-            b for b in data.get("content_blocks", [])
-            if not b.get("deleted_at")
-        ]
-        for b in active_blocks:
-            old_id = b.get("id", "")
-            _new_id(old_id)  # 预先注册所有 block ID
-
-        for b in active_blocks:
-            old_id = b.get("id", "")
-            new_block = ContentBlock(
-                id=id_map[old_id],
-                project_id=new_proj_id,
-                parent_id=_map_id(b.get("parent_id")),
-                name=b.get("name", ""),
-                block_type=b.get("block_type", "field"),
-                depth=b.get("depth", 0),
-                order_index=b.get("order_index", 0),
-                content=b.get("content", ""),
-                status=b.get("status", "pending"),
-                ai_prompt=b.get("ai_prompt", ""),
-                constraints=b.get("constraints", {}),
-                pre_questions=normalize_pre_questions(b.get("pre_questions", [])),
-                pre_answers=normalize_pre_answers(b.get("pre_answers", {}), b.get("pre_questions", [])),
-                guidance_input=b.get("guidance_input", ""),
-                guidance_output=b.get("guidance_output", ""),
-                depends_on=_map_list(b.get("depends_on", [])),
-                special_handler=b.get("special_handler"),
-                need_review=b.get("need_review", True),
-                auto_generate=b.get("auto_generate", False),
-                needs_regeneration=bool(b.get("needs_regeneration", False)),
-                is_collapsed=b.get("is_collapsed", False),
-                model_override=b.get("model_override"),
-                digest=b.get("digest"),
-            )
-            _set_timestamps(new_block, b)
-            db.add(new_block)
-
-        # ============ 4. ProjectFields ============
-        for f in data.get("project_fields", []):
-            old_id = f.get("id", "")
-            _new_id(old_id)
-
-        for f in data.get("project_fields", []):
-            old_id = f.get("id", "")
-            old_deps = f.get("dependencies", {})
-            new_deps = {
-                **old_deps,
-                "depends_on": _map_list(old_deps.get("depends_on", [])),
-            }
-            new_field = ProjectField(
-                id=id_map[old_id],
-                project_id=new_proj_id,
-                template_id=f.get("template_id"),
-                phase=f.get("phase", "intent"),
-                name=f.get("name", ""),
-                field_type=f.get("field_type", "text"),
-                content=f.get("content", ""),
-                status=f.get("status", "pending"),
-                ai_prompt=f.get("ai_prompt", ""),
-                pre_questions=normalize_pre_questions(f.get("pre_questions", [])),
-                pre_answers=normalize_pre_answers(f.get("pre_answers", {}), f.get("pre_questions", [])),
-                dependencies=new_deps,
-                constraints=f.get("constraints", {}),
-                need_review=f.get("need_review", True),
-                order=f.get("order", 0),
-                digest=f.get("digest"),
-            )
-            _set_timestamps(new_field, f)
-            db.add(new_field)
-
-        # ============ 5. Conversations ============
-        conversation_id_mapping: Dict[str, str] = {}
-        for conversation_data in data.get("conversations", []):
-            old_id = conversation_data.get("id", "")
-            if old_id:
-                conversation_id_mapping[old_id] = _new_id(old_id)
-
-        for conversation_data in data.get("conversations", []):
-            old_id = conversation_data.get("id", "")
-            new_conversation = Conversation(
-                id=id_map[old_id],
-                project_id=new_proj_id,
-                mode_id=_map_id(conversation_data.get("mode_id")),
-                mode=conversation_data.get("mode", "assistant"),
-                title=conversation_data.get("title", ""),
-                status=conversation_data.get("status", "active"),
-                bootstrap_policy=conversation_data.get("bootstrap_policy", "memory_only"),
-                last_message_at=_parse_dt(conversation_data.get("last_message_at")),
-                message_count=conversation_data.get("message_count", 0),
-            )
-            _set_timestamps(new_conversation, conversation_data)
-            db.add(new_conversation)
-
-        # ============ 6. ChatMessages ============
-        for m in data.get("chat_messages", []):
-            old_id = m.get("id", "")
-            _new_id(old_id)
-
-        for m in data.get("chat_messages", []):
-            old_id = m.get("id", "")
-            new_msg = ChatMessage(
-                id=id_map[old_id],
-                project_id=new_proj_id,
-                conversation_id=conversation_id_mapping.get(m.get("conversation_id")) if m.get("conversation_id") else None,
-                role=m.get("role", "user"),
-                content=m.get("content", ""),
-                original_content=m.get("original_content", ""),
-                is_edited=m.get("is_edited", False),
-                message_metadata=_rewrite_chat_message_metadata_for_project(
-                    m.get("message_metadata", {}),
-                    block_id_mapping=id_map,
-                    mode_id_mapping=id_map,
-                ),
-                parent_message_id=_map_id(m.get("parent_message_id")),
-            )
-            _set_timestamps(new_msg, m)
-            db.add(new_msg)
+        old_deps = f.get("dependencies", {})
+        new_deps = {
+            **old_deps,
+            "depends_on": self._map_list(old_deps.get("depends_on", [])),
+        }
+        return ProjectField(
+            id=self._new_id(f.get("id", "")),
+            project_id=self.new_proj_id,
+            template_id=f.get("template_id"),
+            phase=f.get("phase", "intent"),
+            name=f.get("name", ""),
+            field_type=f.get("field_type", "text"),
+            content=f.get("content", ""),
+            status=f.get("status", "pending"),
+            ai_prompt=f.get("ai_prompt", ""),
+            pre_questions=normalize_pre_questions(f.get("pre_questions", [])),
+            pre_answers=normalize_pre_answers(f.get("pre_answers", {}), f.get("pre_questions", [])),
+            dependencies=new_deps,
+            constraints=f.get("constraints", {}),
+            need_review=f.get("need_review", True),
+            digest=f.get("digest"),
+        )
 
-        # ============ 7. ContentVersions ============
-        for v in data.get("content_versions", []):
-            old_id = v.get("id", "")
-            new_ver = ContentVersion(
-                id=_new_id(old_id),
-                block_id=_map_id(v.get("block_id")) or "",
-                version_number=v.get("version_number", 1),
-                content=v.get("content", ""),
-                source=v.get("source", "manual"),
-                source_detail=v.get("source_detail"),
-            )
-            _set_timestamps(new_ver, v)
-            db.add(new_ver)
+    def _build_conversations(self, conversation_data):
+        from core.models import Conversation
+
+        old_id = conversation_data.get("id", "")
+        self.register_ids("conversations", [old_id])
+        return Conversation(
+            id=self._new_id(old_id),
+            project_id=self.new_proj_id,
+            mode_id=self._map_id(conversation_data.get("mode_id")),
+            mode=conversation_data.get("mode", "assistant"),
+            title=conversation_data.get("title", ""),
+            status=conversation_data.get("status", "active"),
+            bootstrap_policy=conversation_data.get("bootstrap_policy", "memory_only"),
+            last_message_at=_parse_dt(conversation_data.get("last_message_at")),
+            message_count=conversation_data.get("message_count", 0),
+        )
 
-        # ============ 7. BlockHistory ============
-        for h in data.get("block_history", []):
-            old_id = h.get("id", "")
-            snap = h.get("block_snapshot", {})
-            # 映射快照中的 ID
-            if snap.get("id"):
-                snap["id"] = _map_id(snap["id"]) or snap["id"]
-            if snap.get("parent_id"):
-                snap["parent_id"] = _map_id(snap["parent_id"])
-            children_snaps = h.get("children_snapshots", [])
-            for cs in children_snaps:
-                if cs.get("id"):
-                    cs["id"] = _map_id(cs["id"]) or cs["id"]
-                if cs.get("parent_id"):
-                    cs["parent_id"] = _map_id(cs["parent_id"])
-
-            new_hist = BlockHistory(
-                id=_new_id(old_id),
-                project_id=new_proj_id,
-                action=h.get("action", "create"),
-                block_id=_map_id(h.get("block_id")) or "",
-                block_snapshot=snap,
-                children_snapshots=children_snaps,
-                undone=h.get("undone", False),
-            )
-            _set_timestamps(new_hist, h)
-            db.add(new_hist)
-
-        # ============ 8. SimulationRecords ============
-        for s in data.get("simulation_records", []):
-            old_id = s.get("id", "")
-            new_sim = SimulationRecord(
-                id=_new_id(old_id),
-                project_id=new_proj_id,
-                simulator_id=s.get("simulator_id", ""),
-                target_field_ids=_map_list(s.get("target_field_ids", [])),
-                persona=s.get("persona", {}),
-                interaction_log=s.get("interaction_log", []),
-                feedback=s.get("feedback", {}),
-                status=s.get("status", "completed"),
-            )
-            _set_timestamps(new_sim, s)
-            db.add(new_sim)
-
-        # ============ 9. EvalRuns + Tasks + Trials ============
-        for run in data.get("eval_runs", []):
-            old_id = run.get("id", "")
-            new_run = EvalRun(
-                id=_new_id(old_id),
-                project_id=new_proj_id,
-                name=run.get("name", rt(import_locale, "project.import.default_eval_run_name")),
-                config=run.get("config", {}),
-                status=run.get("status", "completed"),
-                summary=run.get("summary", ""),
-                overall_score=run.get("overall_score"),
-                role_scores=run.get("role_scores", {}),
-                trial_count=run.get("trial_count", 0),
-                content_block_id=_map_id(run.get("content_block_id")),
-            )
-            _set_timestamps(new_run, run)
-            db.add(new_run)
+    def _build_chat_messages(self, m):
+        from core.models.chat_history import ChatMessage
+
+        return ChatMessage(
+            id=self._new_id(m.get("id", "")),
+            project_id=self.new_proj_id,
+            conversation_id=self.conversation_id_mapping.get(m.get("conversation_id")) if m.get("conversation_id") else None,
+            role=m.get("role", "user"),
+            content=m.get("content", ""),
+            original_content=m.get("original_content", ""),
+            is_edited=m.get("is_edited", False),
+            message_metadata=_rewrite_chat_message_metadata_for_project(
+                m.get("message_metadata", {}),
+                block_id_mapping=self.id_map,
+                mode_id_mapping=self.id_map,
+            ),
+            parent_message_id=self._map_id(m.get("parent_message_id")),
+        )
 
-        for task in data.get("eval_tasks", []):
-            old_id = task.get("id", "")
-            new_task = EvalTask(
-                id=_new_id(old_id),
-                eval_run_id=_map_id(task.get("eval_run_id")) or "",
-                name=task.get("name", ""),
-                simulator_type=task.get("simulator_type", "coach"),
-                interaction_mode=task.get("interaction_mode", "review"),
-                simulator_config=task.get("simulator_config", {}),
-                persona_config=task.get("persona_config", {}),
-                target_block_ids=_map_list(task.get("target_block_ids", [])),
-                grader_config=task.get("grader_config", {}),
-                order_index=task.get("order_index", 0),
-                status=task.get("status", "completed"),
-            )
-            _set_timestamps(new_task, task)
-            db.add(new_task)
+    def _build_content_versions(self, v):
+        from core.models.content_version import ContentVersion
 
-        for trial in data.get("eval_trials", []):
-            old_id = trial.get("id", "")
-            new_trial = EvalTrial(
-                id=_new_id(old_id),
-                eval_run_id=_map_id(trial.get("eval_run_id")) or "",
-                eval_task_id=_map_id(trial.get("eval_task_id")),
-                role=trial.get("role", "coach"),
-                role_config=trial.get("role_config", {}),
-                interaction_mode=trial.get("interaction_mode", "review"),
-                input_block_ids=_map_list(trial.get("input_block_ids", [])),
-                persona=trial.get("persona", {}),
-                nodes=trial.get("nodes", []),
-                result=trial.get("result", {}),
-                grader_outputs=trial.get("grader_outputs", []),
-                llm_calls=trial.get("llm_calls", []),
-                overall_score=trial.get("overall_score"),
-                status=trial.get("status", "completed"),
-                error=trial.get("error", ""),
-                tokens_in=trial.get("tokens_in", 0),
-                tokens_out=trial.get("tokens_out", 0),
-                cost=trial.get("cost", 0.0),
-            )
-            _set_timestamps(new_trial, trial)
-            db.add(new_trial)
+        return ContentVersion(
+            id=self._new_id(v.get("id", "")),
+            block_id=self._map_id(v.get("block_id")) or "",
+            version_number=v.get("version_number", 1),
+            content=v.get("content", ""),
+            source=v.get("source", "manual"),
+            source_detail=v.get("source_detail"),
+        )
 
-        # ============ 10. MemoryItems ============
-        for mem in data.get("memory_items", []):
-            old_id = mem.get("id", "")
-            # 全局记忆（project_id 为 None）保持全局；项目记忆映射到新项目
-            old_mem_proj_id = mem.get("project_id")
-            new_mem_proj_id = new_proj_id if old_mem_proj_id else None
-            new_mem = MemoryItem(
-                id=_new_id(old_id),
-                project_id=new_mem_proj_id,
-                content=mem.get("content", ""),
-                source_mode_id=_map_id(mem.get("source_mode_id")),
-                source_mode=mem.get("source_mode", "assistant"),
-                source_phase=mem.get("source_phase", ""),
-                related_blocks=mem.get("related_blocks", []),
-            )
-            _set_timestamps(new_mem, mem)
-            db.add(new_mem)
-
-        # ============ 10a. AgentModes（项目级角色） ============
-        for mode_data in data.get("agent_modes", []):
-            old_id = mode_data.get("id", "")
-            if old_id:
-                _new_id(old_id)
-            default_mode_name = rt(import_locale, "project.import.default_mode_display_name")
-            new_mode = AgentMode(
-                id=_new_id(old_id),
-                project_id=new_proj_id,
-                name=f"mode_{generate_uuid().replace('-', '')[:12]}",
-                stable_key=mode_data.get("stable_key", mode_data.get("name", mode_data.get("display_name", default_mode_name))),
-                locale=normalize_locale(mode_data.get("locale", proj_data.get("locale", DEFAULT_LOCALE))),
-                display_name=mode_data.get("display_name", default_mode_name),
-                description=mode_data.get("description", ""),
-                system_prompt=mode_data.get("system_prompt", ""),
-                icon=mode_data.get("icon", "🤖"),
-                is_system=False,
-                is_template=False,
-                sort_order=mode_data.get("sort_order", 0),
-            )
-            _set_timestamps(new_mode, mode_data)
-            db.add(new_mode)
-
-        # ============ 10b. ProjectStructureDrafts ============
-        for draft_data in data.get("project_structure_drafts", []):
-            old_id = draft_data.get("id", "")
-            if old_id:
-                _new_id(old_id)
-            new_draft = _import_structure_draft_for_project(
-                draft_data,
-                new_project_id=new_proj_id,
-                id_map=id_map,
-            )
-            _set_timestamps(new_draft, draft_data)
-            db.add(new_draft)
-
-        # ============ 10c. Graders（项目专用） ============
-        for g in data.get("graders", []):
-            old_id = g.get("id", "")
-            new_grader = Grader(
-                id=_new_id(old_id),
-                name=g.get("name", ""),
-                stable_key=g.get("stable_key", g.get("name", "")),
-                locale=normalize_locale(g.get("locale", proj_data.get("locale", DEFAULT_LOCALE))),
-                grader_type=g.get("grader_type", "content_only"),
-                prompt_template=g.get("prompt_template", ""),
-                dimensions=g.get("dimensions", []),
-                scoring_criteria=g.get("scoring_criteria", {}),
-                is_preset=g.get("is_preset", False),
-                project_id=new_proj_id,  # 导入时关联到新项目
-            )
-            _set_timestamps(new_grader, g)
-            db.add(new_grader)
-
-        # ============ 11. GenerationLogs ============
-        for log in data.get("generation_logs", []):
-            old_id = log.get("id", "")
-            new_log = GenerationLog(
-                id=_new_id(old_id),
-                project_id=new_proj_id,
-                field_id=_map_id(log.get("field_id")),
-                phase=log.get("phase", ""),
-                operation=log.get("operation", ""),
-                model=log.get("model", get_model_name()),
-                prompt_input=log.get("prompt_input", ""),
-                prompt_output=log.get("prompt_output", ""),
-                tokens_in=log.get("tokens_in", 0),
-                tokens_out=log.get("tokens_out", 0),
-                duration_ms=log.get("duration_ms", 0),
-                cost=log.get("cost", 0.0),
-                status=log.get("status", "success"),
-                error_message=log.get("error_message", ""),
-            )
-            _set_timestamps(new_log, log)
-            db.add(new_log)
+    def _build_block_history(self, h):
+        from core.models.block_history import BlockHistory
 
-        if not data.get("agent_modes"):
-            ensure_project_agent_modes(db, new_proj_id, locale=new_project.locale)
+        snap = h.get("block_snapshot", {})
+        # 映射快照中的 ID
+        if snap.get("id"):
+            snap["id"] = self._map_id(snap["id"]) or snap["id"]
+        if snap.get("parent_id"):
+            snap["parent_id"] = self._map_id(snap["parent_id"])
+        children_snaps = h.get("children_snapshots", [])
+        for cs in children_snaps:
+            if cs.get("id"):
+                cs["id"] = self._map_id(cs["id"]) or cs["id"]
+            if cs.get("parent_id"):
+                cs["parent_id"] = self._map_id(cs["parent_id"])
+
+        return BlockHistory(
+            id=self._new_id(h.get("id", "")),
+            project_id=self.new_proj_id,
+            action=h.get("action", "create"),
+            block_id=self._map_id(h.get("block_id")) or "",
+            block_snapshot=snap,
+            children_snapshots=children_snaps,
+            undone=h.get("undone", False),
+        )
+
+    def _build_simulation_records(self, s):
+        from core.models import SimulationRecord
+
+        return SimulationRecord(
+            id=self._new_id(s.get("id", "")),
+            project_id=self.new_proj_id,
+            simulator_id=s.get("simulator_id", ""),
+            target_field_ids=self._map_list(s.get("target_field_ids", [])),
+            persona=s.get("persona", {}),
+            interaction_log=s.get("interaction_log", []),
+            feedback=s.get("feedback", {}),
+            status=s.get("status", "completed"),
+        )
+
+    def _build_eval_runs(self, run):
+        from core.models import EvalRun
+
+        return EvalRun(
+            id=self._new_id(run.get("id", "")),
+            project_id=self.new_proj_id,
+            name=run.get("name", rt(self.import_locale, "project.import.default_eval_run_name")),
+            config=run.get("config", {}),
+            status=run.get("status", "completed"),
+            summary=run.get("summary", ""),
+            overall_score=run.get("overall_score"),
+            role_scores=run.get("role_scores", {}),
+            trial_count=run.get("trial_count", 0),
+            content_block_id=self._map_id(run.get("content_block_id")),
+        )
+
+    def _build_eval_tasks(self, task):
+        from core.models import EvalTask
+
+        return EvalTask(
+            id=self._new_id(task.get("id", "")),
+            eval_run_id=self._map_id(task.get("eval_run_id")) or "",
+            name=task.get("name", ""),
+            simulator_type=task.get("simulator_type", "coach"),
+            interaction_mode=task.get("interaction_mode", "review"),
+            simulator_config=task.get("simulator_config", {}),
+            persona_config=task.get("persona_config", {}),
+            target_block_ids=self._map_list(task.get("target_block_ids", [])),
+            grader_config=task.get("grader_config", {}),
+            order_index=task.get("order_index", 0),
+            status=task.get("status", "completed"),
+        )
+
+    def _build_eval_trials(self, trial):
+        from core.models import EvalTrial
+
+        return EvalTrial(
+            id=self._new_id(trial.get("id", "")),
+            eval_run_id=self._map_id(trial.get("eval_run_id")) or "",
+            eval_task_id=self._map_id(trial.get("eval_task_id")),
+            role=trial.get("role", "coach"),
+            role_config=trial.get("role_config", {}),
+            interaction_mode=trial.get("interaction_mode", "review"),
+            input_block_ids=self._map_list(trial.get("input_block_ids", [])),
+            persona=trial.get("persona", {}),
+            nodes=trial.get("nodes", []),
+            result=trial.get("result", {}),
+            grader_outputs=trial.get("grader_outputs", []),
+            llm_calls=trial.get("llm_calls", []),
+            overall_score=trial.get("overall_score"),
+            status=trial.get("status", "completed"),
+            error=trial.get("error", ""),
+            tokens_in=trial.get("tokens_in", 0),
+            tokens_out=trial.get("tokens_out", 0),
+            cost=trial.get("cost", 0.0),
+        )
+
+    def _build_memory_items(self, mem):
+        from core.models import MemoryItem
+
+        # 全局记忆（project_id 为 None）保持全局；项目记忆映射到新项目
+        new_mem_proj_id = self.new_proj_id if mem.get("project_id") else None
+        return MemoryItem(
+            id=self._new_id(mem.get("id", "")),
+            project_id=new_mem_proj_id,
+            content=mem.get("content", ""),
+            source_mode_id=self._map_id(mem.get("source_mode_id")),
+            source_mode=mem.get("source_mode", "assistant"),
+            source_phase=mem.get("source_phase", ""),
+            related_blocks=mem.get("related_blocks", []),
+        )
+
+    def _build_agent_modes(self, mode_data):
+        from core.models import AgentMode
+
+        default_mode_name = rt(self.import_locale, "project.import.default_mode_display_name")
+        return AgentMode(
+            id=self._new_id(mode_data.get("id", "")),
+            project_id=self.new_proj_id,
+            name=f"mode_{generate_uuid().replace('-', '')[:12]}",
+            stable_key=mode_data.get("stable_key", mode_data.get("name", mode_data.get("display_name", default_mode_name))),
+            locale=normalize_locale(mode_data.get("locale", self.project_locale)),
+            display_name=mode_data.get("display_name", default_mode_name),
+            description=mode_data.get("description", ""),
+            system_prompt=mode_data.get("system_prompt", ""),
+            icon=mode_data.get("icon", "🤖"),
+            is_system=False,
+            is_template=False,
+            sort_order=mode_data.get("sort_order", 0),
+        )
+
+    def _build_project_structure_drafts(self, draft_data):
+        self._new_id(draft_data.get("id", ""))
+        return _import_structure_draft_for_project(
+            draft_data,
+            new_project_id=self.new_proj_id,
+            id_map=self.id_map,
+        )
+
+    def _build_graders(self, g):
+        from core.models.grader import Grader
+
+        return Grader(
+            id=self._new_id(g.get("id", "")),
+            name=g.get("name", ""),
+            stable_key=g.get("stable_key", g.get("name", "")),
+            locale=normalize_locale(g.get("locale", self.project_locale)),
+            grader_type=g.get("grader_type", "content_only"),
+            prompt_template=g.get("prompt_template", ""),
+            dimensions=g.get("dimensions", []),
+            scoring_criteria=g.get("scoring_criteria", {}),
+            is_preset=g.get("is_preset", False),
+            project_id=self.new_proj_id,  # 导入时关联到新项目
+        )
+
+    def _build_generation_logs(self, log):
+        from core.models import GenerationLog
+
+        return GenerationLog(
+            id=self._new_id(log.get("id", "")),
+            project_id=self.new_proj_id,
+            field_id=self._map_id(log.get("field_id")),
+            phase=log.get("phase", ""),
+            operation=log.get("operation", ""),
+            model=log.get("model", get_model_name()),
+            prompt_input=log.get("prompt_input", ""),
+            prompt_output=log.get("prompt_output", ""),
+            tokens_in=log.get("tokens_in", 0),
+            tokens_out=log.get("tokens_out", 0),
+            duration_ms=log.get("duration_ms", 0),
+            cost=log.get("cost", 0.0),
+            status=log.get("status", "success"),
+            error_message=log.get("error_message", ""),
+        )
+
+    # ============ 提交 ============
+
+    def finish(self) -> Dict[str, Any]:
+        """补齐默认角色、提交，返回与 /import 一致的响应"""
+        db = self.db
+        if not self.counts.get("agent_modes"):
+            ensure_project_agent_modes(db, self.new_proj_id, locale=self.import_locale)
 
         db.commit()
-        db.refresh(new_project)
+        new_project = db.query(Project).filter(Project.id == self.new_proj_id).first()
 
         project_response = _project_to_response(new_project).model_dump()
         return {
-            "message": rt(import_locale, "project.import.success", name=new_project.name),
+            "message": rt(self.import_locale, "project.import.success", name=new_project.name),
             **project_response,
             "project": project_response,
-            "stats": {
-                "content_blocks": len(active_blocks),
-                "project_fields": len(data.get("project_fields", [])),
-                "conversations": len(data.get("conversations", [])),
-                "chat_messages": len(data.get("chat_messages", [])),
-                "content_versions": len(data.get("content_versions", [])),
-                "simulation_records": len(data.get("simulation_records", [])),
-                "eval_runs": len(data.get("eval_runs", [])),
-                "memory_items": len(data.get("memory_items", [])),
-                "agent_modes": len(data.get("agent_modes", [])),
-                "project_structure_drafts": len(data.get("project_structure_drafts", [])),
-                "graders": len(data.get("graders", [])),
-                "generation_logs": len(data.get("generation_logs", [])),
-            },
+            "stats": {section: self.counts.get(section, 0) for section in _IMPORT_STAT_SECTIONS},
         }
 
+
+@router.post("/import")
+def import_project(
+    request: ProjectImportRequest,
+    db: Session = Depends(get_db),
+):
+    """
+    导入项目（从 JSON）
+
+    自动为所有实体生成新 ID，维护内部引用关系。
+    """
+    data = request.data
+    if "project" not in data:
+        raise HTTPException(status_code=400, detail="缺少 project 字段")
+
+    importer = _ProjectImporter(db, match_creator_profile=request.match_creator_profile)
+    try:
+        importer.begin(data["project"], data.get("creator_profile"))
+        # AgentMode 会被 Conversation / ChatMessage / MemoryItem 引用，块之间有 parent_id / depends_on，
+        # 消息之间有 parent_message_id：先注册 ID 映射。
+        for section in PREREGISTERED_SECTIONS:
+            rows = data.get(section, [])
+            if section == "content_blocks":
+                rows = [b for b in rows if not b.get("deleted_at")]
+            importer.register_ids(section, [row.get("id", "") for row in rows])
+
+        for section in EXPORT_SECTIONS:
+            for row in data.get(section, []):
+                importer.add(section, row)
+
+        return importer.finish()
+
+    except Exception as e:
+        db.rollback()
+        raise HTTPException(status_code=500, detail=rt(importer.import_locale, "project.import.failed", message=str(e)))
+
+
+@router.post("/import-stream")
+def import_project_stream(
+    file: UploadFile = File(...),
+    match_creator_profile: bool = True,
+    db: Session = Depends(get_db),
+):
+    """
+    导入项目（从 /export-stream 导出的 NDJSON 文件，gzip 或未压缩）
+
+    逐行解析并分批写入，内存占用与文件大小无关；响应与 /import 相同。
+    """
+    importer = _ProjectImporter(db, match_creator_profile=match_creator_profile)
+    try:
+        records = iter_ndjson_records(file.file)
+        header = next(records, None)
+        if not header or header.get("type") != "header" or header.get("format") != STREAM_FORMAT:
+            raise ValueError("不是项目流式导出文件")
+
+        creator_profile = None
+        started = False
+        for record in records:
+            record_type = record.get("type")
+            if record_type == "creator_profile":
+                creator_profile = record.get("row")
+            elif record_type == "project":
+                if started:
+                    raise ValueError("重复的 project 记录")
+                importer.begin(record.get("row") or {}, creator_profile)
+                started = True
+            elif record_type in ("ids", "row"):
+                if not started:
+                    raise ValueError("project 记录必须位于分段数据之前")
+                if record_type == "ids":
+                    importer.register_ids(record.get("section", ""), record.get("ids") or [])
+                else:
+                    importer.add(record.get("section", ""), record.get("row") or {})
+            elif record_type == "end":
+                break
+        if not started:
+            raise ValueError("缺少 project 记录")
+
+        return importer.finish()
+
+    except ValueError as exc:
+        db.rollback()
+        raise HTTPException(status_code=400, detail=str(exc)) from exc
     except Exception as e:
         db.rollback()
-        raise HTTPException(status_code=500, detail=rt(import_locale, "project.import.failed", message=str(e)))
+        raise HTTPException(status_code=500, detail=rt(importer.import_locale, "project.import.failed", message=str(e)))
 
 
 # ============== Global Search & Replace ==============
@@ -2018,6 +2007,140 @@ class ReplaceRequest(BaseModel):
     targets: Optional[List[Dict[str, Any]]] = None
 
 
+class GlobalSearchRequest(BaseModel):
+    """跨项目搜索请求"""
+    query: str
+    case_sensitive: bool = False
+    # 不传则搜索全部项目
+    project_ids: Optional[List[str]] = None
+    # 最多返回的字段/块数（按相关度排序）
+    limit: int = 50
+
+
+def _load_search_candidates(
+    db: Session,
+    query: str,
+    *,
+    project_ids: Optional[List[str]] = None,
+    limit: Optional[int] = None,
+    offset: int = 0,
+) -> tuple[list, bool]:
+    """
+    返回 (可能包含 query 的 (type, 字段/块, 相关度) 列表, 是否还有后续候选)。
+
+    优先用 FTS5 索引（core.search_index_service）按相关度分页加载候选行（limit / offset）；
+    索引不可用或查询过短时退回全量扫描（字段在前、块在后，相关度为 None，一次返回全部）。
+    调用方仍需对 content 做精确匹配（索引不区分大小写）。
+    """
+    from core.models import ProjectField, ContentBlock
+    from core.search_index_service import find_matching_items
+
+    hits = find_matching_items(db, query, project_ids=project_ids, limit=limit, offset=offset)
+    if hits is None:
+        field_query = db.query(ProjectField)
+        block_query = db.query(ContentBlock).filter(ContentBlock.deleted_at == None)
+        if project_ids is not None:
+            field_query = field_query.filter(ProjectField.project_id.in_(project_ids))
+            block_query = block_query.filter(ContentBlock.project_id.in_(project_ids))
+        candidates = [("field", f, None) for f in field_query.all()]
+        candidates += [("block", b, None) for b in block_query.all()]
+        return candidates, False
+
+    field_ids = [hit.item_id for hit in hits if hit.item_type == "field"]
+    block_ids = [hit.item_id for hit in hits if hit.item_type == "block"]
+    loaded = {}
+    if field_ids:
+        loaded.update({
+            ("field", f.id): f
+            for f in db.query(ProjectField).filter(ProjectField.id.in_(field_ids)).all()
+        })
+    if block_ids:
+        loaded.update({
+            ("block", b.id): b
+            for b in db.query(ContentBlock).filter(
+                ContentBlock.id.in_(block_ids),
+                ContentBlock.deleted_at == None,
+            ).all()
+        })
+    candidates = [
+        (hit.item_type, loaded[(hit.item_type, hit.item_id)], hit.score)
+        for hit in hits
+        if (hit.item_type, hit.item_id) in loaded
+    ]
+    return candidates, limit is not None and len(hits) >= limit
+
+
+def _search_results(candidates: list, pattern, query: str) -> list:
+    """对候选行做精确匹配，构建带片段的搜索结果。"""
+    results = []
+    for item_type, item, score in candidates:
+        if not item.content:
+            continue
+        matches = list(pattern.finditer(item.content))
+        if not matches:
+            continue
+        result = {
+            "type": item_type,
+            "id": item.id,
+            "name": item.name,
+            "phase": (item.phase or "") if item_type == "field" else "",
+            "match_count": len(matches),
+            "snippets": _build_search_snippets(item.content, matches, query),
+            "score": round(score, 4) if score is not None else None,
+        }
+        if item_type == "block":
+            result["parent_id"] = item.parent_id
+        results.append(result)
+    return results
+
+
+@router.post("/search")
+def search_all_projects(
+    request: GlobalSearchRequest,
+    db: Session = Depends(get_db),
+):
+    """
+    跨项目搜索：按相关度返回各项目中匹配的字段和内容块（含项目名与匹配片段）。
+    """
+    import re
+
+    query = request.query
+    if not query:
+        return {"results": [], "total_matches": 0}
+
+    flags = 0 if request.case_sensitive else re.IGNORECASE
+    pattern = re.compile(re.escape(query), flags)
+    limit = max(1, min(request.limit, 500))
+
+    # 索引候选不区分大小写，精确匹配后可能不足 limit 条：按相关度分页继续取候选，直到凑满或候选耗尽
+    results: list = []
+    item_projects: dict = {}
+    offset, page_size = 0, limit
+    while len(results) < limit:
+        candidates, has_more = _load_search_candidates(
+            db, query, project_ids=request.project_ids, limit=page_size, offset=offset,
+        )
+        item_projects.update({(item_type, item.id): item.project_id for item_type, item, _ in candidates})
+        results.extend(_search_results(candidates, pattern, query))
+        if not has_more:
+            break
+        offset += page_size
+        page_size *= 2
+    results = results[:limit]
+
+    project_ids = {item_projects[(r["type"], r["id"])] for r in results}
+    project_names = dict(
+        db.query(Project.id, Project.name).filter(Project.id.in_(project_ids)).all()
+    ) if project_ids else {}
+    for r in results:
+        project_id = item_projects[(r["type"], r["id"])]
+        r["project_id"] = project_id
+        r["project_name"] = project_names.get(project_id, "")
+
+    total_matches = sum(r["match_count"] for r in results)
+    return {"results": results, "total_matches": total_matches}
+
+
 @router.post("/{project_id}/search")
 def search_project(
     project_id: str,
@@ -2026,9 +2149,8 @@ def search_project(
 ):
     """
     全局搜索：在项目的所有字段和内容块中搜索内容。
-    返回每个匹配的字段/块名称、匹配片段（含上下文）、位置信息。
+    返回每个匹配的字段/块名称、匹配片段（含上下文）、位置信息；有全文索引时按相关度排序。
     """
-    from core.models import ProjectField, ContentBlock
     import re
 
     project = db.query(Project).filter_by(id=project_id).first()
@@ -2042,48 +2164,8 @@ def search_project(
     flags = 0 if request.case_sensitive else re.IGNORECASE
     pattern = re.compile(re.escape(query), flags)
 
-    results = []
-
-    # 搜索 ProjectField
-    fields = db.query(ProjectField).filter(
-        ProjectField.project_id == project_id,
-    ).all()
-    for f in fields:
-        if not f.content:
-            continue
-        matches = list(pattern.finditer(f.content))
-        if matches:
-            snippets = _build_search_snippets(f.content, matches, query)
-            results.append({
-                "type": "field",
-                "id": f.id,
-                "name": f.name,
-                "phase": f.phase or "",
-                "match_count": len(matches),
-                "snippets": snippets,
-            })
-
-    # 搜索 ContentBlock
-    blocks = db.query(ContentBlock).filter(
-        ContentBlock.project_id == project_id,
-        ContentBlock.deleted_at == None,
-    ).all()
-    for b in blocks:
-        if not b.content:
-            continue
-        matches = list(pattern.finditer(b.content))
-        if matches:
-            snippets = _build_search_snippets(b.content, matches, query)
-            results.append({
-                "type": "block",
-                "id": b.id,
-                "name": b.name,
-                "phase": "",
-                "parent_id": b.parent_id,
-                "match_count": len(matches),
-                "snippets": snippets,
-            })
-
+    candidates, _ = _load_search_candidates(db, query, project_ids=[project_id])
+    results = _search_results(candidates, pattern, query)
     total_matches = sum(r["match_count"] for r in results)
 
     return {"results": results, "total_matches": total_matches}
@@ -2097,10 +2179,9 @@ def replace_in_project(
 ):
     """
     全局替换：在项目的指定字段/块中替换内容。
-    支持指定替换哪些匹配项（targets），也支持全部替换。
+    支持指定替换哪些匹配项（targets），也支持全部替换（只处理全文索引给出的候选行）。
     """
     from core.models import ProjectField, ContentBlock
-    from core.models.content_version import ContentVersion
     import re
 
     project = db.query(Project).filter_by(id=project_id).first()
@@ -2149,35 +2230,17 @@ def replace_in_project(
                     "count": count,
                 })
     else:
-        # 全量替换：在项目所有字段和块中替换
-        fields = db.query(ProjectField).filter(
-            ProjectField.project_id == project_id,
-        ).all()
-        for f in fields:
-            if not f.content:
+        # 全量替换：在项目所有（可能匹配的）字段和块中替换
+        for item_type, item, _ in _load_search_candidates(db, query, project_ids=[project_id])[0]:
+            if not item.content:
                 continue
-            old_content = f.content
-            new_content, count = _replace_content(old_content, pattern, replacement, None)
-            if count > 0:
-                _save_search_replace_version(db, f.id, old_content, f.name)
-                f.content = new_content
-                replaced_count += count
-                affected_items.append({"type": "field", "id": f.id, "name": f.name, "count": count})
-
-        blocks = db.query(ContentBlock).filter(
-            ContentBlock.project_id == project_id,
-            ContentBlock.deleted_at == None,
-        ).all()
-        for b in blocks:
-            if not b.content:
-                continue
-            old_content = b.content
+            old_content = item.content
             new_content, count = _replace_content(old_content, pattern, replacement, None)
             if count > 0:
-                _save_search_replace_version(db, b.id, old_content, b.name)
-                b.content = new_content
+                _save_search_replace_version(db, item.id, old_content, item.name)
+                item.content = new_content
                 replaced_count += count
-                affected_items.append({"type": "block", "id": b.id, "name": b.name, "count": count})
+                affected_items.append({"type": item_type, "id": item.id, "name": item.name, "count": count})
 
     db.commit()
     return {
@@ -2239,19 +2302,8 @@ def _replace_content(content: str, pattern, replacement: str, indices: Optional[
 
 def _save_search_replace_version(db, item_id: str, old_content: str, item_name: str):
     """保存替换前的版本"""
-    from core.models.content_version import ContentVersion
-    max_ver = db.query(ContentVersion).filter(
-        ContentVersion.block_id == item_id,
-    ).count()
-    ver = ContentVersion(
-        id=generate_uuid(),
-        block_id=item_id,
-        version_number=max_ver + 1,
-        content=old_content,
-        source="search_replace",
-        source_detail=f"search_replace:{item_name}",
-    )
-    db.add(ver)
+    from core.version_service import save_content_version
+    save_content_version(db, item_id, old_content, "search_replace", f"search_replace:{item_name}")
 
 
 # ============== Helpers ==============
@@ -1,6 +1,6 @@
 # backend/api/settings.py
 # 功能: 后台设置API
-# 主要路由: 系统提示词、创作者特质、字段模板、渠道、模拟器、Agent设置管理
+# 主要路由: 系统提示词、创作者特质、字段模板、渠道、模拟器、Agent设置管理、生成日志（列表不含正文，/logs/{id} 详情、/logs/export?include_prompts 按需还原正文；写后队列计数 /logs/sink-stats）
 # 数据结构: 完整的CRUD操作
 
 """
@@ -11,9 +11,13 @@
 from typing import Optional
 from fastapi import APIRouter, Depends, HTTPException
 from pydantic import BaseModel
-from sqlalchemy.orm import Session
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import Session, defer
 
-from core.database import get_db
+from core import async_read_service
+from core.database import get_async_db, get_db
+from core.generation_log_sink import generation_log_sink
+from core.prompt_blob_store import load_prompt_bodies
 from core.localization import DEFAULT_LOCALE, normalize_locale
 from core.models import (
     CreatorProfile,
@@ -893,10 +897,12 @@ class LogResponse(BaseModel):
     phase: str
     operation: str
     model: str
-    prompt_input: str  # 输入内容
-    prompt_output: str  # 输出内容
+    prompt_input: str = ""  # 输入内容（列表接口不返回，见 /logs/{log_id}）
+    prompt_output: str = ""  # 输出内容（同上）
     tokens_in: int
     tokens_out: int
+    cache_read_tokens: int = 0
+    cache_creation_tokens: int = 0
     duration_ms: int
     cost: float
     status: str
@@ -907,21 +913,27 @@ class LogResponse(BaseModel):
 
 
 @router.get("/logs", response_model=list[LogResponse])
-def list_logs(
+async def list_logs(
     project_id: Optional[str] = None,
     skip: int = 0,
     limit: int = 100,
-    db: Session = Depends(get_db),
+    db: AsyncSession = Depends(get_async_db),
 ):
     """获取生成日志"""
-    query = db.query(GenerationLog)
-    if project_id:
-        query = query.filter(GenerationLog.project_id == project_id)
-    
-    logs = query.order_by(GenerationLog.created_at.desc()).offset(skip).limit(limit).all()
+    # 写后队列中尚未落库的日志先写出，保证能看到刚结束的调用
+    await generation_log_sink.flush()
+    logs = await async_read_service.list_generation_logs(
+        db, project_id=project_id, skip=skip, limit=limit,
+    )
     return [_to_log_response(log) for log in logs]
 
 
+@router.get("/logs/sink-stats")
+def get_log_sink_stats():
+    """GenerationLog 写后队列的计数（已写入 / 丢弃 / 失败 / 背压次数）与当前积压"""
+    return generation_log_sink.stats()
+
+
 @router.get("/logs/export")
 def export_logs(
     project_id: Optional[str] = None,
@@ -937,11 +949,20 @@ def export_logs(
         include_prompts: 是否包含完整的输入输出（prompt_input/prompt_output）
         format: 导出格式 "json" 或 "csv"
     """
+    generation_log_sink.drain()
     query = db.query(GenerationLog)
     if project_id:
         query = query.filter(GenerationLog.project_id == project_id)
+    if not include_prompts:
+        query = query.options(
+            defer(GenerationLog.prompt_input),
+            defer(GenerationLog.prompt_output),
+            defer(GenerationLog.prompt_refs),
+        )
     
     logs = query.order_by(GenerationLog.created_at.desc()).all()
+    # 正文按需从 prompt_blobs 批量还原
+    prompts = load_prompt_bodies(db, logs) if include_prompts else {}
     
     log_data = []
     for log in logs:
@@ -954,6 +975,8 @@ def export_logs(
             "model": log.model,
             "tokens_in": log.tokens_in,
             "tokens_out": log.tokens_out,
+            "cache_read_tokens": log.cache_read_tokens or 0,
+            "cache_creation_tokens": log.cache_creation_tokens or 0,
             "duration_ms": log.duration_ms,
             "cost": log.cost,
             "status": log.status,
@@ -962,8 +985,7 @@ def export_logs(
         }
         
         if include_prompts:
-            item["prompt_input"] = log.prompt_input
-            item["prompt_output"] = log.prompt_output
+            item["prompt_input"], item["prompt_output"] = prompts[log.id]
         
         log_data.append(item)
     
@@ -994,6 +1016,16 @@ def export_logs(
     }
 
 
+@router.get("/logs/{log_id}", response_model=LogResponse)
+def get_log(log_id: str, db: Session = Depends(get_db)):
+    """获取单条生成日志（含完整输入输出）"""
+    generation_log_sink.drain()
+    log = db.query(GenerationLog).filter(GenerationLog.id == log_id).first()
+    if not log:
+        raise HTTPException(status_code=404, detail="Not found")
+    return _to_log_response(log, prompts=load_prompt_bodies(db, [log])[log.id])
+
+
 # ============== Helpers ==============
 
 def _ensure_eval_prompt_presets(db: Session) -> None:
@@ -1217,7 +1249,9 @@ def _to_simulator_response(s: Simulator) -> SimulatorResponse:
     )
 
 
-def _to_log_response(log: GenerationLog) -> LogResponse:
+def _to_log_response(log: GenerationLog, prompts: Optional[tuple[str, str]] = None) -> LogResponse:
+    """prompts 为 (prompt_input, prompt_output)；不给出时不返回正文（列表接口不加载正文列）"""
+    prompt_input, prompt_output = prompts or ("", "")
     return LogResponse(
         id=log.id,
         project_id=log.project_id,
@@ -1225,10 +1259,12 @@ def _to_log_response(log: GenerationLog) -> LogResponse:
         phase=log.phase or "",
         operation=log.operation or "",
         model=log.model or "",
-        prompt_input=log.prompt_input or "",
-        prompt_output=log.prompt_output or "",
+        prompt_input=prompt_input,
+        prompt_output=prompt_output,
         tokens_in=log.tokens_in or 0,
         tokens_out=log.tokens_out or 0,
+        cache_read_tokens=log.cache_read_tokens or 0,
+        cache_creation_tokens=log.cache_creation_tokens or 0,
         duration_ms=log.duration_ms or 0,
         cost=log.cost or 0.0,
         status=log.status or "",
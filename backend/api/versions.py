@@ -1,11 +1,13 @@
 # backend/api/versions.py
 # 功能: 版本历史 API（统一服务于 ContentBlock 和 ProjectField）
-# 主要路由: /api/versions/{entity_id} (list), /api/versions/{entity_id}/rollback/{version_id} (rollback)
+# 主要路由: /api/versions/{entity_id} (list), /api/versions/{entity_id}/{version_id} (单个版本),
+#   /api/versions/{entity_id}/rollback/{version_id} (rollback)
 
 """
 版本历史 API
 支持查看历史版本列表和回滚到指定版本
 entity_id 可以是 ContentBlock.id 或 ProjectField.id
+版本以快照 + 增量存储，内容由 core.version_service 按需还原
 """
 
 from typing import Optional, List
@@ -18,7 +20,8 @@ from core.database import get_db
 from core.dependency_regeneration_service import finalize_block_content_change, schedule_project_auto_trigger
 from core.localization import DEFAULT_LOCALE, normalize_locale
 from core.locale_text import rt
-from core.models import ContentVersion, ContentBlock, Project, ProjectField, generate_uuid
+from core.models import ContentVersion, ContentBlock, Project, ProjectField
+from core.version_service import list_versions_with_content, load_version_content, save_content_version
 
 logger = logging.getLogger("versions")
 
@@ -59,6 +62,17 @@ class RollbackResponse(BaseModel):
     message: str
 
 
+def _to_version_item(version: ContentVersion, content: str) -> VersionItem:
+    return VersionItem(
+        id=version.id,
+        version_number=version.version_number,
+        content=content,
+        source=version.source,
+        source_detail=version.source_detail,
+        created_at=version.created_at.isoformat() if version.created_at else "",
+    )
+
+
 # ============== Endpoints ==============
 
 @router.get("/{entity_id}", response_model=VersionListResponse)
@@ -89,29 +103,30 @@ def list_versions(entity_id: str, db: Session = Depends(get_db)):
         else:
             raise HTTPException(status_code=404, detail="Entity not found")
 
-    versions = db.query(ContentVersion).filter(
-        ContentVersion.block_id == entity_id,
-    ).order_by(ContentVersion.version_number.desc()).all()
+    # 一次读取全部版本，从快照起回放增量还原内容
+    versions = list_versions_with_content(db, entity_id)
 
     return VersionListResponse(
         entity_id=entity_id,
         entity_name=entity_name,
         entity_type=entity_type,
         current_content=current_content,
-        versions=[
-            VersionItem(
-                id=v.id,
-                version_number=v.version_number,
-                content=v.content,
-                source=v.source,
-                source_detail=v.source_detail,
-                created_at=v.created_at.isoformat() if v.created_at else "",
-            )
-            for v in versions
-        ],
+        versions=[_to_version_item(v, content) for v, content in reversed(versions)],
     )
 
 
+@router.get("/{entity_id}/{version_id}", response_model=VersionItem)
+def get_version(entity_id: str, version_id: str, db: Session = Depends(get_db)):
+    """获取单个历史版本（按需还原完整内容）"""
+    version = db.query(ContentVersion).filter(
+        ContentVersion.id == version_id,
+        ContentVersion.block_id == entity_id,
+    ).first()
+    if not version:
+        raise HTTPException(status_code=404, detail=rt(DEFAULT_LOCALE, "version.not_found"))
+    return _to_version_item(version, load_version_content(db, version))
+
+
 @router.post("/{entity_id}/rollback/{version_id}", response_model=RollbackResponse)
 def rollback_version(
     entity_id: str,
@@ -147,25 +162,18 @@ def rollback_version(
 
     entity = block or field
     old_content = entity.content or ""
+    target_number = target_version.version_number
+    # 先还原目标内容（留档时的保留策略可能删除最旧的版本）
+    target_content = load_version_content(db, target_version)
 
     # 保存当前内容为新版本（在回滚前留档）
-    if old_content.strip():
-        max_ver = db.query(ContentVersion.version_number).filter(
-            ContentVersion.block_id == entity_id,
-        ).order_by(ContentVersion.version_number.desc()).first()
-        next_ver = (max_ver[0] + 1) if max_ver else 1
-        snapshot = ContentVersion(
-            id=generate_uuid(),
-            block_id=entity_id,
-            version_number=next_ver,
-            content=old_content,
-            source="rollback_snapshot",
-            source_detail=f"before_rollback_to_v{target_version.version_number}",
-        )
-        db.add(snapshot)
+    save_content_version(
+        db, entity_id, old_content, "rollback_snapshot",
+        source_detail=f"before_rollback_to_v{target_number}",
+    )
 
     # 执行回滚
-    entity.content = target_version.content
+    entity.content = target_content
     if hasattr(entity, 'status'):
         # 遵守 need_review 契约：回滚后的状态与正常生成完成后一致
         # need_review=True → in_progress（需人工确认），need_review=False → completed
@@ -178,7 +186,7 @@ def rollback_version(
     db.refresh(entity)
 
     entity_name = entity.name if hasattr(entity, 'name') else entity_id
-    logger.info(f"[版本] 回滚 {entity_name} 到 v{target_version.version_number}")
+    logger.info(f"[版本] 回滚 {entity_name} 到 v{target_number}")
 
     if block:
         schedule_project_auto_trigger(block.project_id, background_tasks=background_tasks)
@@ -186,6 +194,6 @@ def rollback_version(
     return RollbackResponse(
         success=True,
         entity_id=entity_id,
-        restored_version=target_version.version_number,
-        message=rt(locale, "version.rollback.success", version=target_version.version_number),
+        restored_version=target_number,
+        message=rt(locale, "version.rollback.success", version=target_number),
     )
@@ -1,7 +1,7 @@
 # backend/core/agent_tools.py
 # 功能: LangGraph Agent 的工具定义层
 # 主要导出: AGENT_TOOLS (list[BaseTool]) — 注册到 Agent 的全部 @tool
-#           PENDING_SUGGESTIONS (dict) — 未确认的 SuggestionCard 内存缓存
+#           PENDING_SUGGESTIONS (SuggestionStore) — 未确认的 SuggestionCard（LRU 缓存 + 写穿透到 DB）
 #           PRODUCE_TOOLS (set) — 直接写 DB 的工具名集合（前端据此刷新）
 # 安全机制:
 #   - _is_structured_handler(): 阻止纯文本工具覆写结构化内容块（含父块继承）
@@ -41,6 +41,7 @@ from core.dependency_regeneration_service import finalize_block_content_change,
 from core.localization import DEFAULT_LOCALE, normalize_locale
 from core.locale_text import rt
 from core.llm_compat import normalize_content, get_stop_reason, resolve_model
+from core.suggestion_store import SuggestionStore
 
 logger = logging.getLogger("agent_tools")
 
@@ -176,9 +177,9 @@ def _is_explicit_rewrite_intent(instruction: str) -> bool:
 
 
 # ============== Suggestion Card 缓存 ==============
-# M1: 内存字典缓存未确认的 SuggestionCard（M5 迁移到 DB）
+# 未确认的 SuggestionCard：按项目索引的 LRU 缓存 + 写穿透到 pending_suggestions 表（见 core.suggestion_store）
 # key = suggestion_id (UUID), value = SuggestionCard dict
-PENDING_SUGGESTIONS: dict[str, dict] = {}
+PENDING_SUGGESTIONS = SuggestionStore()
 
 
 # ============== 0. propose_edit ==============
@@ -283,6 +284,7 @@ async def propose_edit(
             "original_content": original_content,
             "modified_content": modified_content,
             "status": "pending",
+            "project_id": project_id,
             "source_mode": (
                 config.get("configurable", {}).get("mode_id")
                 or (
@@ -293,7 +295,7 @@ async def propose_edit(
             ),
         }
 
-        # 缓存到内存字典
+        # 缓存（写穿透到数据库，重启后仍可确认）
         PENDING_SUGGESTIONS[suggestion_id] = card
         logger.info(f"[propose_edit] 缓存建议 {suggestion_id[:8]}... 目标={target_label}, "
                      f"edits={len(edits)}, applied={len(applied)}, failed={len(failed)}")
@@ -463,6 +465,7 @@ async def _rewrite_field_impl(
             "original_content": current_content,
             "modified_content": new_content,
             "status": "pending",
+            "project_id": project_id,
             "source_mode": (
                 config.get("configurable", {}).get("mode_id")
                 or (
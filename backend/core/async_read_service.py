@@ -0,0 +1,231 @@
+# backend/core/async_read_service.py
+# 功能: 请求路径热读查询的异步实现（AsyncSession + aiosqlite），不阻塞事件循环
+# 主要函数: get_block_tree_watermark(), load_project_blocks(), get_blocks_by_ids(), recover_stuck_blocks(),
+#           get_project_conversation(), list_chat_messages(), list_eval_task_report_rows(),
+#           list_generation_logs()
+# 数据结构: 返回 ORM 实例列表（已完整加载列，调用方不得再触发关系懒加载）
+
+"""
+异步热读服务
+
+只覆盖前端高频轮询 / 打开面板即触发的纯读路径：
+- 内容块树（单条查询加载全部块 + 聚合水位线用于 ETag，避免 AsyncSession 下的关系懒加载；
+  大纲视图只加载结构列）与按 ID 批量取块
+- 对话历史 / 会话消息
+- Eval V2 报告概览
+- 生成日志列表
+
+写路径仍走同步 Session（core.database.get_db），两者共享同一数据库文件（WAL）。
+"""
+
+from __future__ import annotations
+
+import logging
+from datetime import datetime, timedelta
+from typing import Optional
+
+from sqlalchemy import case, func, or_, select
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import defer, load_only
+
+from core.models import ChatMessage, ContentBlock, Conversation, EvalTaskV2, GenerationLog
+
+logger = logging.getLogger("async_read_service")
+
+# in_progress 且无内容超过该秒数视为卡住（与同步版 get_project_blocks 保持一致）
+STUCK_BLOCK_SECONDS = 300
+
+
+def stuck_block_cutoff(now: Optional[datetime] = None) -> datetime:
+    """updated_at 早于该时间点、且 in_progress 无内容的块视为卡住。"""
+    return (now or datetime.utcnow()) - timedelta(seconds=STUCK_BLOCK_SECONDS)
+
+
+def _stuck_block_condition(cutoff: datetime):
+    return (
+        (ContentBlock.status == "in_progress")
+        & ((ContentBlock.content.is_(None)) | (ContentBlock.content == ""))
+        & (func.coalesce(ContentBlock.updated_at, ContentBlock.created_at) < cutoff)
+    )
+
+
+async def get_block_tree_watermark(db: AsyncSession, project_id: str) -> tuple[str, int, int]:
+    """
+    单条聚合查询：返回 (max_updated_at, 未删除块数, 卡住块数)。
+    前两项组成内容块树的 ETag（软删除会刷新 updated_at，硬删除会改变计数）；
+    卡住块数 > 0 时调用方才需要执行 recover_stuck_blocks。
+    """
+    cutoff = stuck_block_cutoff()
+    result = await db.execute(
+        select(
+            func.max(ContentBlock.updated_at),
+            func.count(ContentBlock.id),
+            func.coalesce(func.sum(case((_stuck_block_condition(cutoff), 1), else_=0)), 0),
+        ).where(
+            ContentBlock.project_id == project_id,
+            ContentBlock.deleted_at.is_(None),
+        )
+    )
+    max_updated_at, total, stuck = result.one()
+    if isinstance(max_updated_at, datetime):
+        max_updated_at = max_updated_at.isoformat()
+    return str(max_updated_at or ""), int(total or 0), int(stuck or 0)
+
+
+async def recover_stuck_blocks(db: AsyncSession, project_id: str) -> int:
+    """
+    自动修复卡住的块：in_progress 但无内容且超过 5 分钟 → 重置为 pending。
+    刚开始生成的块也是 in_progress + 无内容，不能立即重置。
+    返回被重置的块数量。
+    """
+    result = await db.execute(
+        select(ContentBlock).where(
+            ContentBlock.project_id == project_id,
+            ContentBlock.deleted_at.is_(None),
+            _stuck_block_condition(stuck_block_cutoff()),
+        )
+    )
+    stuck_blocks = result.scalars().all()
+    if not stuck_blocks:
+        return 0
+
+    now = datetime.utcnow()
+    for sb in stuck_blocks:
+        updated = sb.updated_at or sb.created_at
+        logger.info(
+            "[RECOVERY] 重置卡住的块: %s (in_progress → pending, 卡住 %.0fs)",
+            sb.name, (now - updated).total_seconds(),
+        )
+        sb.status = "pending"
+    await db.commit()
+    return len(stuck_blocks)
+
+
+# 大纲视图只需结构字段 + content（用于计算长度与 hash），不加载 ai_prompt/constraints/pre_* 等大列
+_OUTLINE_COLUMNS = (
+    ContentBlock.id,
+    ContentBlock.project_id,
+    ContentBlock.parent_id,
+    ContentBlock.name,
+    ContentBlock.block_type,
+    ContentBlock.depth,
+    ContentBlock.order_index,
+    ContentBlock.content,
+    ContentBlock.status,
+    ContentBlock.depends_on,
+    ContentBlock.special_handler,
+    ContentBlock.need_review,
+    ContentBlock.auto_generate,
+    ContentBlock.needs_regeneration,
+    ContentBlock.is_collapsed,
+    ContentBlock.created_at,
+    ContentBlock.updated_at,
+)
+
+
+async def load_project_blocks(
+    db: AsyncSession,
+    project_id: str,
+    *,
+    outline: bool = False,
+) -> list[ContentBlock]:
+    """
+    一次查询加载项目中所有未删除的内容块（按 parent_id、order_index 排序）。
+    树形组装由调用方在内存中按 parent_id 完成，不触发任何关系懒加载。
+    outline=True 时只加载大纲字段，调用方不得访问其余列。
+    """
+    stmt = select(ContentBlock).where(
+        ContentBlock.project_id == project_id,
+        ContentBlock.deleted_at.is_(None),
+    )
+    if outline:
+        stmt = stmt.options(load_only(*_OUTLINE_COLUMNS, raiseload=True))
+    result = await db.execute(stmt.order_by(ContentBlock.parent_id, ContentBlock.order_index))
+    return list(result.scalars().all())
+
+
+async def get_blocks_by_ids(db: AsyncSession, block_ids: list[str]) -> list[ContentBlock]:
+    """批量读取未删除的内容块（顺序不保证，调用方按需重排）。"""
+    if not block_ids:
+        return []
+    result = await db.execute(
+        select(ContentBlock).where(
+            ContentBlock.id.in_(block_ids),
+            ContentBlock.deleted_at.is_(None),
+        )
+    )
+    return list(result.scalars().all())
+
+
+async def get_project_conversation(
+    db: AsyncSession,
+    *,
+    conversation_id: str,
+    project_id: str,
+) -> Optional[Conversation]:
+    """按项目归属读取会话；不属于该项目时返回 None。"""
+    result = await db.execute(
+        select(Conversation).where(
+            Conversation.id == conversation_id,
+            Conversation.project_id == project_id,
+        )
+    )
+    return result.scalars().first()
+
+
+async def list_chat_messages(
+    db: AsyncSession,
+    *,
+    project_id: str,
+    limit: int,
+    conversation_id: Optional[str] = None,
+    mode: Optional[str] = None,
+    mode_id: Optional[str] = None,
+) -> list[ChatMessage]:
+    """读取项目对话历史（可按会话、mode_id 或 mode 过滤），按时间正序。"""
+    stmt = select(ChatMessage).where(ChatMessage.project_id == project_id)
+
+    if conversation_id:
+        stmt = stmt.where(ChatMessage.conversation_id == conversation_id)
+
+    if mode_id:
+        mode_id_expr = func.json_extract(ChatMessage.message_metadata, "$.mode_id")
+        stmt = stmt.where(mode_id_expr == mode_id)
+    elif mode:
+        # message_metadata 是 JSON 字段，用 json_extract 按 mode 过滤（SQLite 兼容）
+        mode_expr = func.json_extract(ChatMessage.message_metadata, "$.mode")
+        stmt = stmt.where(or_(mode_expr == mode, mode_expr.is_(None)))
+
+    result = await db.execute(stmt.order_by(ChatMessage.created_at.asc()).limit(limit))
+    return list(result.scalars().all())
+
+
+async def list_eval_task_report_rows(db: AsyncSession, project_id: str) -> list[EvalTaskV2]:
+    """Eval V2 报告概览：项目下所有 Task，按最近更新倒序。"""
+    result = await db.execute(
+        select(EvalTaskV2)
+        .where(EvalTaskV2.project_id == project_id)
+        .order_by(EvalTaskV2.updated_at.desc())
+    )
+    return list(result.scalars().all())
+
+
+async def list_generation_logs(
+    db: AsyncSession,
+    *,
+    project_id: Optional[str] = None,
+    skip: int = 0,
+    limit: int = 100,
+) -> list[GenerationLog]:
+    """生成日志分页列表，按创建时间倒序（不加载 prompt 正文列，正文见日志详情）。"""
+    stmt = select(GenerationLog).options(
+        defer(GenerationLog.prompt_input, raiseload=True),
+        defer(GenerationLog.prompt_output, raiseload=True),
+        defer(GenerationLog.prompt_refs, raiseload=True),
+    )
+    if project_id:
+        stmt = stmt.where(GenerationLog.project_id == project_id)
+    result = await db.execute(
+        stmt.order_by(GenerationLog.created_at.desc()).offset(skip).limit(limit)
+    )
+    return list(result.scalars().all())
@@ -1,6 +1,6 @@
 # backend/core/block_generation_service.py
 # 功能: 统一内容块生成与依赖解析底层服务，供块 API 和项目级调度器复用
-# 主要函数: get_ready_block_ids, generate_block_content_sync
+# 主要函数: list_ready_block_ids, is_block_run_candidate, is_dependency_satisfied, generate_block_content_sync
 # 数据结构: ContentBlock / Project / GenerationLog
 
 """
@@ -22,7 +22,8 @@ from sqlalchemy.orm import Session
 from core.llm import ainvoke_with_retry, get_chat_model, parse_llm_error
 from core.llm_compat import normalize_content, resolve_model
 from core.dependency_regeneration_service import finalize_block_content_change
-from core.models import ContentBlock, GenerationLog, Project, generate_uuid
+from core.generation_log_sink import generation_log_sink
+from core.models import ContentBlock, GenerationLog, Project
 from core.pre_question_utils import iter_answered_pre_question_items, list_missing_required_pre_questions
 from core.prompt_engine import GoldenContext
 from core.locale_text import markdown_instructions, rt
@@ -187,6 +188,37 @@ def build_generation_system_prompt(
 """
 
 
+def is_block_run_candidate(block: ContentBlock, *, mode: str) -> bool:
+    """
+    块本身是否需要在该模式下运行（不看依赖）：
+    field 块、空块首次生成或 `needs_regeneration=True`，且必答前置问题已回答；
+    auto_trigger 模式额外要求 auto_generate=True。
+    """
+    if block.block_type != "field":
+        return False
+    if mode == "auto_trigger" and not getattr(block, "auto_generate", False):
+        return False
+    has_content = bool(block.content and block.content.strip())
+    is_initial_candidate = block.status in ("pending", "failed") and not has_content
+    is_regeneration_candidate = bool(getattr(block, "needs_regeneration", False))
+    if not is_initial_candidate and not is_regeneration_candidate:
+        return False
+    if list_missing_required_pre_questions(block.pre_questions or [], block.pre_answers or {}):
+        return False
+    return True
+
+
+def is_dependency_satisfied(dep: Optional[ContentBlock]) -> bool:
+    """依赖块可被下游使用：已完成、有内容，且自身不处于待重新生成状态。"""
+    return bool(
+        dep is not None
+        and dep.content
+        and dep.content.strip()
+        and dep.status == "completed"
+        and not getattr(dep, "needs_regeneration", False)
+    )
+
+
 def list_ready_block_ids(
     *,
     project_id: str,
@@ -208,42 +240,13 @@ def list_ready_block_ids(
     ).all()
     blocks_by_id = {block.id: block for block in all_blocks}
 
-    eligible_ids: list[str] = []
-    for block in all_blocks:
-        if block.id in exclude_ids:
-            continue
-        if block.block_type != "field":
-            continue
-        if mode == "auto_trigger" and not getattr(block, "auto_generate", False):
-            continue
-        has_content = bool(block.content and block.content.strip())
-        is_initial_candidate = block.status in ("pending", "failed") and not has_content
-        is_regeneration_candidate = bool(getattr(block, "needs_regeneration", False))
-        if not is_initial_candidate and not is_regeneration_candidate:
-            continue
-
-        deps = block.depends_on or []
-        if deps:
-            all_deps_ready = True
-            for dep_id in deps:
-                dep = blocks_by_id.get(dep_id)
-                if (
-                    not dep
-                    or not dep.content
-                    or not dep.content.strip()
-                    or dep.status != "completed"
-                ):
-                    all_deps_ready = False
-                    break
-            if not all_deps_ready:
-                continue
-
-        if list_missing_required_pre_questions(block.pre_questions or [], block.pre_answers or {}):
-            continue
-
-        eligible_ids.append(block.id)
-
-    return eligible_ids
+    return [
+        block.id
+        for block in all_blocks
+        if block.id not in exclude_ids
+        and is_block_run_candidate(block, mode=mode)
+        and all(is_dependency_satisfied(blocks_by_id.get(dep_id)) for dep_id in block.depends_on or [])
+    ]
 
 
 def ensure_required_pre_questions_answered(block: ContentBlock, *, locale: str = DEFAULT_LOCALE) -> None:
@@ -324,25 +327,24 @@ async def generate_block_content_sync(
         finalize_block_content_change(block=block, db=db)
 
         usage = getattr(response, "usage_metadata", {}) or {}
-        db.add(GenerationLog(
-            id=generate_uuid(),
-            project_id=block.project_id,
-            field_id=block.id,
-            phase=block.parent_id or "content_block",
-            operation=f"block_generate_{block.name}",
-            model=effective_model,
-            tokens_in=usage.get("input_tokens", 0),
-            tokens_out=usage.get("output_tokens", 0),
-            duration_ms=0,
-            prompt_input=system_prompt,
-            prompt_output=generated_content,
-            cost=GenerationLog.calculate_cost(
+        generation_log_sink.submit({
+            "project_id": block.project_id,
+            "field_id": block.id,
+            "phase": block.parent_id or "content_block",
+            "operation": f"block_generate_{block.name}",
+            "model": effective_model,
+            "tokens_in": usage.get("input_tokens", 0),
+            "tokens_out": usage.get("output_tokens", 0),
+            "duration_ms": 0,
+            "prompt_input": system_prompt,
+            "prompt_output": generated_content,
+            "cost": GenerationLog.calculate_cost(
                 effective_model,
                 usage.get("input_tokens", 0),
                 usage.get("output_tokens", 0),
             ),
-            status="success",
-        ))
+            "status": "success",
+        }, db=db)
         db.commit()
 
         if block.parent_id:
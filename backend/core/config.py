@@ -43,18 +43,60 @@ class Settings(BaseSettings):
     # LLM 超时（秒）— 思考模型（Gemini 3.1 等）建议 300+
     llm_timeout: int = 300
 
+    # LLM 客户端缓存 / 连接池
+    llm_client_cache_size: int = 64        # 每个事件循环最多缓存的模型实例数（LRU）
+    llm_http_max_connections: int = 100    # 共享 httpx 连接池最大连接数（每 provider+base_url）
+    llm_http_max_keepalive: int = 20       # 其中保持长连接的数量
+
+    # LLM 全局调度（按 provider+model 分桶，0 = 不限制）
+    llm_rate_limit_enabled: bool = True
+    llm_max_concurrency: int = 16          # 每个模型同时在途请求数（Eval/后台任务只能占其中一部分）
+    llm_requests_per_minute: int = 0       # 每个模型每分钟请求数
+    llm_tokens_per_minute: int = 0         # 每个模型每分钟 token 数（输入估算预扣 + 输出事后补扣）
+    llm_rate_limit_overrides: str = ""     # JSON: {"anthropic": {"rpm": 50}, "gpt-4o-mini": {"max_concurrency": 32}}
+
     # Tavily Search API (DeepResearch)
     tavily_api_key: str = ""
+    research_search_timeout: float = 30.0     # 单个搜索查询超时（秒），超时的查询按无结果处理
+    research_search_cache_ttl: int = 3600     # (query, depth) 搜索结果缓存秒数，0 = 不缓存
+    research_search_cache_size: int = 256     # 缓存最多保留的查询数（LRU）
 
     # Database
     database_url: str = "sqlite:///./data/content_production.db"
+    db_pool_size: int = 10          # 写引擎连接池常驻连接数（文件型 SQLite / 其他数据库）
+    db_max_overflow: int = 20       # 峰值时允许额外创建的连接数
+    db_pool_timeout: float = 30.0   # 取连接的最长等待秒数
+    db_busy_timeout_ms: int = 15000  # SQLite busy_timeout：写锁竞争时等待而不是立刻 "database is locked"
+    db_synchronous: str = "NORMAL"  # SQLite synchronous（WAL 下 NORMAL 即可保证崩溃一致性）
 
     # Server
     backend_port: int = 8000
     debug: bool = True
 
+    # 项目运行队列（auto_trigger 等后台运行）
+    project_run_workers: int = 2    # 同时运行的项目数（项目内串行，项目间按入队顺序轮转）
+
+    # 内容块摘要队列（保存后去抖、合并、批量生成）
+    digest_debounce_seconds: float = 2.0   # 块最后一次保存后等待多久再生成摘要
+    digest_max_wait_seconds: float = 10.0  # 持续编辑时最长延迟
+    digest_batch_size: int = 8             # 一次小模型请求最多概括的块数
+
+    # GenerationLog 写后队列（LLM 调用日志批量落库）
+    generation_log_batch_size: int = 50            # 凑满多少条立即写一批
+    generation_log_flush_interval_ms: int = 500    # 不满一批时最长等待
+    generation_log_max_queue: int = 5000           # 队列上限（溢出时丢弃最旧 / 调用方同步写出）
+
+    # 内容版本存储（定期全文快照 + 相对上一版本的压缩增量）
+    content_version_snapshot_interval: int = 20    # 每隔多少个版本存一次全文快照（限制还原时回放的增量数）
+    content_version_max_per_block: int = 0         # 每个块最多保留的版本数（0 = 不限；超出时删除最旧的版本）
+
+    # 未确认的修改建议卡片（内存 LRU + 写穿透到 pending_suggestions 表）
+    suggestion_ttl_hours: int = 72                 # 卡片保留时长，过期后不再展示、不能确认
+    suggestion_cache_size: int = 512               # 进程内最多缓存的卡片数（LRU，淘汰后仍可从数据库读取）
+
     # Eval V2
     eval_max_parallel_trials: int = 8
+    eval_progress_buffer_size: int = 5000          # 进度事件保留条数（SSE 断线续传的回放窗口）
 
     model_config = {
         "env_file": ".env",
@@ -1,17 +1,26 @@
 # backend/core/database.py
 # 功能: 数据库连接管理与轻量兼容迁移
-# 主要函数: get_engine(), get_session_maker(), init_db(), ensure_compat_schema()
-# 数据结构: Base (SQLAlchemy declarative base)
+# 主要函数: get_engine(), get_read_engine(), get_session_maker(), get_read_session_maker(),
+#           get_async_engine(), get_async_session_maker(), to_async_database_url(),
+#           init_db(), ensure_compat_schema(), dispose_engines(), get_db(), get_read_db(), get_async_db()
+# 数据结构: Base (SQLAlchemy declarative base), _ENGINES / _SESSION_MAKERS (按 URL+角色缓存的进程级单例)
 
 """
 数据库连接管理模块
-使用 SQLAlchemy 2.0 异步模式
+使用 SQLAlchemy 2.0 同步 Session；引擎为进程级单例（按 database_url 缓存）：
+- 写引擎：QueuePool 连接池 + WAL，连接建立时统一设置 busy_timeout / synchronous
+- 只读引擎：同一数据库文件的独立连接池，连接级 PRAGMA query_only=ON，
+  WAL 下读不阻塞写，适合列表/树/报告等纯读路径
+- 异步引擎：sqlite+aiosqlite 驱动的 AsyncEngine，供 async def 路由的热读路径使用，
+  查询期间不阻塞事件循环（SSE 流不被慢查询拖住）
 """
 
+import threading
 from pathlib import Path
 
-from sqlalchemy import create_engine, text
+from sqlalchemy import create_engine, event, text
 from sqlalchemy.engine import make_url
+from sqlalchemy.ext.asyncio import AsyncSession, async_sessionmaker, create_async_engine
 from sqlalchemy.orm import sessionmaker, DeclarativeBase
 from sqlalchemy.pool import StaticPool
 
@@ -23,6 +32,12 @@ class Base(DeclarativeBase):
     pass
 
 
+# (database_url, role) -> Engine / sessionmaker；role 为 "write" | "read" | "async"
+_ENGINES: dict[tuple[str, str], object] = {}
+_SESSION_MAKERS: dict[tuple[str, str], object] = {}
+_ENGINE_LOCK = threading.Lock()
+
+
 def _ensure_sqlite_parent_dir(database_url: str) -> None:
     """为文件型 SQLite URL 预先创建父目录，避免隔离工作目录下首次启动直接失败。"""
     try:
@@ -40,28 +55,201 @@ def _ensure_sqlite_parent_dir(database_url: str) -> None:
     Path(database).expanduser().parent.mkdir(parents=True, exist_ok=True)
 
 
+def _is_sqlite_memory_url(database_url: str) -> bool:
+    """内存库只能共享单连接（StaticPool），不能走连接池与 WAL。"""
+    try:
+        url = make_url(database_url)
+    except Exception:
+        return False
+    database = url.database or ""
+    return url.drivername.startswith("sqlite") and (not database or database == ":memory:")
+
+
+def _install_sqlite_pragmas(engine, *, read_only: bool, use_wal: bool) -> None:
+    """连接建立时设置 SQLite PRAGMA（每个新连接只执行一次）。"""
+
+    @event.listens_for(engine, "connect")
+    def _on_connect(dbapi_connection, connection_record):  # noqa: ARG001
+        cursor = dbapi_connection.cursor()
+        try:
+            cursor.execute(f"PRAGMA busy_timeout = {int(settings.db_busy_timeout_ms)}")
+            if use_wal:
+                cursor.execute("PRAGMA journal_mode = WAL")
+                cursor.execute(f"PRAGMA synchronous = {settings.db_synchronous}")
+            if read_only:
+                cursor.execute("PRAGMA query_only = ON")
+        finally:
+            cursor.close()
+
+
+def _create_engine_for(database_url: str, *, read_only: bool):
+    """按 URL 与角色创建引擎（仅在缓存未命中时调用）。"""
+    _ensure_sqlite_parent_dir(database_url)
+    is_sqlite = database_url.startswith("sqlite")
+
+    if is_sqlite and _is_sqlite_memory_url(database_url):
+        # 内存库：读写共享同一连接，否则读引擎看到的是另一个空库
+        engine = create_engine(
+            database_url,
+            connect_args={"check_same_thread": False},
+            poolclass=StaticPool,
+            echo=settings.debug,
+        )
+        _install_sqlite_pragmas(engine, read_only=False, use_wal=False)
+        return engine
+
+    kwargs = {
+        "pool_size": max(1, settings.db_pool_size),
+        "max_overflow": max(0, settings.db_max_overflow),
+        "pool_timeout": settings.db_pool_timeout,
+        "pool_pre_ping": True,
+        "echo": settings.debug,  # 调试模式打印SQL
+    }
+    if is_sqlite:
+        kwargs["connect_args"] = {
+            "check_same_thread": False,
+            "timeout": max(1.0, settings.db_busy_timeout_ms / 1000.0),
+        }
+    engine = create_engine(database_url, **kwargs)
+    if is_sqlite:
+        _install_sqlite_pragmas(engine, read_only=read_only, use_wal=True)
+    return engine
+
+
+def _get_cached_engine(role: str):
+    database_url = settings.database_url
+    key = (database_url, role)
+    engine = _ENGINES.get(key)
+    if engine is not None:
+        return engine
+    with _ENGINE_LOCK:
+        engine = _ENGINES.get(key)
+        if engine is not None:
+            return engine
+        if role == "read" and _is_sqlite_memory_url(database_url):
+            # 内存库读写必须共享同一连接：读角色直接复用写引擎
+            write_key = (database_url, "write")
+            engine = _ENGINES.get(write_key)
+            if engine is None:
+                engine = _create_engine_for(database_url, read_only=False)
+                _ENGINES[write_key] = engine
+        else:
+            engine = _create_engine_for(database_url, read_only=(role == "read"))
+        _ENGINES[key] = engine
+    return engine
+
+
 def get_engine():
     """
-    获取数据库引擎
-    SQLite使用StaticPool确保单连接（适合本地单用户）
+    获取数据库写引擎（进程级单例，按 settings.database_url 缓存）。
+    文件型 SQLite 使用连接池 + WAL，后台线程与并发请求各自持有连接，
+    由 busy_timeout 吸收短暂写锁竞争，而不是共享同一个 sqlite3 句柄。
+    """
+    return _get_cached_engine("write")
+
+
+def get_read_engine():
+    """获取只读引擎（PRAGMA query_only=ON）。内存库退化为写引擎。"""
+    return _get_cached_engine("read")
+
+
+def _get_cached_session_maker(role: str) -> sessionmaker:
+    key = (settings.database_url, role)
+    maker = _SESSION_MAKERS.get(key)
+    if maker is None:
+        engine = get_read_engine() if role == "read" else get_engine()
+        maker = sessionmaker(autocommit=False, autoflush=False, bind=engine)
+        _SESSION_MAKERS[key] = maker
+    return maker
+
+
+def to_async_database_url(database_url: str) -> str:
+    """把同步 URL 换成异步驱动 URL（sqlite:// → sqlite+aiosqlite://），其他驱动原样返回。"""
+    url = make_url(database_url)
+    if url.drivername in ("sqlite", "sqlite+pysqlite"):
+        url = url.set(drivername="sqlite+aiosqlite")
+    return url.render_as_string(hide_password=False)
+
+
+def get_async_engine():
+    """
+    获取异步引擎（进程级单例，按 settings.database_url 缓存）。
+    与同步写引擎指向同一数据库文件，PRAGMA 设置一致（WAL 下与同步连接互不阻塞读）。
     """
-    # SQLite特殊配置
-    connect_args = {"check_same_thread": False}
-    _ensure_sqlite_parent_dir(settings.database_url)
-
-    engine = create_engine(
-        settings.database_url,
-        connect_args=connect_args,
-        poolclass=StaticPool,
-        echo=settings.debug,  # 调试模式打印SQL
-    )
+    database_url = settings.database_url
+    key = (database_url, "async")
+    engine = _ENGINES.get(key)
+    if engine is not None:
+        return engine
+    with _ENGINE_LOCK:
+        engine = _ENGINES.get(key)
+        if engine is None:
+            _ensure_sqlite_parent_dir(database_url)
+            kwargs = {"echo": settings.debug}
+            if _is_sqlite_memory_url(database_url):
+                kwargs["poolclass"] = StaticPool
+            else:
+                kwargs.update(
+                    pool_size=max(1, settings.db_pool_size),
+                    max_overflow=max(0, settings.db_max_overflow),
+                    pool_timeout=settings.db_pool_timeout,
+                )
+            engine = create_async_engine(to_async_database_url(database_url), **kwargs)
+            if database_url.startswith("sqlite"):
+                _install_sqlite_pragmas(
+                    engine.sync_engine,
+                    read_only=False,
+                    use_wal=not _is_sqlite_memory_url(database_url),
+                )
+            _ENGINES[key] = engine
     return engine
 
 
+def get_async_session_maker() -> async_sessionmaker:
+    """获取 AsyncSession 工厂（expire_on_commit=False：提交后仍可读属性，避免隐式懒加载）。"""
+    key = (settings.database_url, "async")
+    maker = _SESSION_MAKERS.get(key)
+    if maker is None:
+        maker = async_sessionmaker(
+            bind=get_async_engine(),
+            class_=AsyncSession,
+            autoflush=False,
+            expire_on_commit=False,
+        )
+        _SESSION_MAKERS[key] = maker
+    return maker
+
+
+def dispose_engines() -> None:
+    """释放所有缓存引擎的连接池（关闭应用 / 测试切换数据库时调用）。"""
+    with _ENGINE_LOCK:
+        engines = list({id(e): e for e in _ENGINES.values()}.values())
+        _ENGINES.clear()
+        _SESSION_MAKERS.clear()
+    for engine in engines:
+        if hasattr(engine, "sync_engine"):
+            # AsyncEngine：同步释放底层连接池（aiosqlite 连接在各自线程内关闭）
+            engine.sync_engine.dispose()
+        else:
+            engine.dispose()
+
+
+async def dispose_async_engines() -> None:
+    """在事件循环内优雅关闭异步引擎（应用 shutdown 时调用），随后释放同步引擎。"""
+    async_engines = [e for e in _ENGINES.values() if hasattr(e, "sync_engine")]
+    for engine in async_engines:
+        await engine.dispose()
+    dispose_engines()
+
+
 def get_session_maker():
-    """获取Session工厂"""
-    engine = get_engine()
-    return sessionmaker(autocommit=False, autoflush=False, bind=engine)
+    """获取Session工厂（绑定写引擎，按 URL 缓存）"""
+    return _get_cached_session_maker("write")
+
+
+def get_read_session_maker():
+    """获取只读Session工厂：用于纯读路径，写操作会被 SQLite 拒绝。"""
+    return _get_cached_session_maker("read")
 
 
 def init_db():
@@ -85,6 +273,11 @@ def ensure_compat_schema(engine) -> None:
     _ensure_phase_template_columns(engine)
     _ensure_localized_asset_columns(engine)
     _ensure_eval_task_v2_columns(engine)
+    _ensure_generation_log_columns(engine)
+    _ensure_prompt_blob_columns(engine)
+    _ensure_content_version_columns(engine)
+    _ensure_project_run_job_columns(engine)
+    _ensure_search_index(engine)
     _backfill_compat_defaults(engine)
 
 
@@ -191,10 +384,19 @@ def _ensure_content_block_columns(engine) -> None:
         "needs_regeneration": "BOOLEAN DEFAULT 0",
         "model_override": "VARCHAR(100)",
         "digest": "TEXT",
+        "digest_source_hash": "VARCHAR(64)",
         "guidance_input": "TEXT DEFAULT ''",
         "guidance_output": "TEXT DEFAULT ''",
     }
     _add_missing_columns(engine, "content_blocks", new_columns)
+    with engine.begin() as conn:
+        # 内容块树：单查询加载 + 水位线聚合（max updated_at）都按项目过滤未删除块
+        conn.execute(
+            text(
+                "CREATE INDEX IF NOT EXISTS idx_content_blocks_project_deleted_updated "
+                "ON content_blocks(project_id, deleted_at, updated_at)"
+            )
+        )
 
 
 def _ensure_project_columns(engine) -> None:
@@ -388,11 +590,64 @@ def _ensure_eval_task_v2_columns(engine) -> None:
     """
     兼容旧库：为 eval_tasks_v2 补齐运行时状态追踪列。
     cancel_requested 用于跨重启的取消标记（内存态 stop_requested 重启后丢失）。
+    eval_trial_results_v2.cache_hit 标记复用自结果缓存的 Trial，cached_grader_ids 记录复用缓存评分的 Grader。
     """
     new_columns = {
         "cancel_requested": "BOOLEAN DEFAULT 0",
     }
     _add_missing_columns(engine, "eval_tasks_v2", new_columns)
+    _add_missing_columns(engine, "eval_trial_results_v2", {
+        "cache_hit": "BOOLEAN DEFAULT 0",
+        "cached_grader_ids": "JSON DEFAULT '[]'",
+    })
+
+
+def _ensure_generation_log_columns(engine) -> None:
+    """兼容旧库：为 generation_logs 补齐 prompt 缓存命中/写入 token 列与 prompt 正文引用列。"""
+    new_columns = {
+        "cache_read_tokens": "INTEGER DEFAULT 0",
+        "cache_creation_tokens": "INTEGER DEFAULT 0",
+        "prompt_refs": "JSON",
+    }
+    _add_missing_columns(engine, "generation_logs", new_columns)
+
+
+def _ensure_prompt_blob_columns(engine) -> None:
+    """兼容旧库：为 prompt_blobs 补齐引用计数列（旧行为空，启动时由 purge_unreferenced_blobs 全量重算）。"""
+    _add_missing_columns(engine, "prompt_blobs", {"ref_count": "INTEGER"})
+
+
+def _ensure_content_version_columns(engine) -> None:
+    """兼容旧库：为 content_versions 补齐增量存储列（旧行均为全文快照）。"""
+    new_columns = {
+        "storage": "VARCHAR(10) DEFAULT 'full'",
+        "delta": "BLOB",
+    }
+    _add_missing_columns(engine, "content_versions", new_columns)
+    with engine.begin() as conn:
+        conn.execute(
+            text(
+                "CREATE INDEX IF NOT EXISTS idx_content_versions_block_version "
+                "ON content_versions(block_id, version_number)"
+            )
+        )
+
+
+def _ensure_project_run_job_columns(engine) -> None:
+    """兼容旧库：为 project_run_jobs 补齐持有者 / 心跳列（旧的 running 记录心跳为空，按已过期处理）。"""
+    new_columns = {
+        "inline": "BOOLEAN DEFAULT 0",
+        "owner_id": "VARCHAR(100)",
+        "heartbeat_at": "DATETIME",
+    }
+    _add_missing_columns(engine, "project_run_jobs", new_columns)
+
+
+def _ensure_search_index(engine) -> None:
+    """项目全局搜索的 FTS5 索引与同步触发器（见 core.search_index_service）。"""
+    from core.search_index_service import ensure_search_index
+
+    ensure_search_index(engine)
 
 
 def _add_missing_columns(engine, table: str, columns: dict[str, str]) -> None:
@@ -416,3 +671,20 @@ def get_db():
         db.close()
 
 
+def get_read_db():
+    """FastAPI依赖: 获取只读数据库Session（列表/树/报告等纯读接口使用）"""
+    SessionLocal = get_read_session_maker()
+    db = SessionLocal()
+    try:
+        yield db
+    finally:
+        db.close()
+
+
+async def get_async_db():
+    """FastAPI依赖: 获取 AsyncSession（async def 路由的热读路径使用）"""
+    AsyncSessionLocal = get_async_session_maker()
+    async with AsyncSessionLocal() as db:
+        yield db
+
+
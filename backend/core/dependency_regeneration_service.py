@@ -1,37 +1,29 @@
 # backend/core/dependency_regeneration_service.py
 # 功能: 统一处理内容块依赖失效传播与项目级自动重生成调度
-# 主要函数: finalize_block_content_change, invalidate_downstream_blocks,
-#   schedule_project_auto_trigger, enqueue_project_auto_trigger
-# 数据结构: DependencyUpdateSummary（受影响下游块摘要）、ContentBlock 依赖反向图
+# 主要函数: finalize_block_content_change, invalidate_downstream_blocks, get_project_dependency_index,
+#   invalidate_dependency_index, schedule_project_auto_trigger, enqueue_project_auto_trigger
+# 数据结构: DependencyUpdateSummary（受影响下游块摘要）、_ProjectDependencyIndex（按项目缓存的依赖反向图，
+#   只缓存已提交数据，按逐行 (id, updated_at) 版本比对增量同步）
+# 调度: auto_trigger 运行写入持久化队列（core.project_run_queue），由主事件循环上的 worker 执行
 
 from __future__ import annotations
 
-import asyncio
 import logging
 import threading
+import weakref
+from collections import OrderedDict, deque
 from dataclasses import dataclass, field
+from datetime import datetime
 
 from fastapi import BackgroundTasks
+from sqlalchemy.engine import Engine
 from sqlalchemy.orm import Session
+from sqlalchemy.pool import SingletonThreadPool, StaticPool
 
 from core.models import ContentBlock
 
 logger = logging.getLogger("dependency_regeneration")
 
-_PROJECT_AUTORUN_STATE_LOCK = threading.Lock()
-_PROJECT_AUTORUN_RUNNING: set[str] = set()
-_PROJECT_AUTORUN_PENDING: set[str] = set()
-
-
-def _launch_auto_trigger_thread(project_id: str) -> None:
-    thread = threading.Thread(
-        target=enqueue_project_auto_trigger,
-        args=(project_id,),
-        daemon=True,
-        name=f"auto-trigger-{project_id[:8]}",
-    )
-    thread.start()
-
 
 @dataclass
 class DependencyUpdateSummary:
@@ -45,12 +37,222 @@ class DependencyUpdateSummary:
     manual_attention_block_names: list[str] = field(default_factory=list)
 
 
-def _list_active_project_field_blocks(*, project_id: str, db: Session) -> list[ContentBlock]:
-    return db.query(ContentBlock).filter(
-        ContentBlock.project_id == project_id,
-        ContentBlock.deleted_at == None,  # noqa: E711
-        ContentBlock.block_type == "field",
-    ).all()
+# 每个数据库引擎最多缓存的项目反向依赖索引数
+_INDEX_CACHE_MAX_PROJECTS = 256
+# 单条 IN 查询携带的 id 上限（低于 SQLite 变量数限制）
+_ID_CHUNK_SIZE = 500
+
+
+@dataclass
+class _ProjectDependencyIndex:
+    """
+    单个项目的 depends_on 反向索引（只含未删除的 field 块），只反映已提交的数据。
+
+    versions 记录建索引/最近一次同步时项目内全部块（含软删除与非 field 块）的 id → updated_at，
+    与库中逐行比对即可找出新增、修改、删除的块，不依赖 max(updated_at) 单调前进。
+    """
+
+    deps_by_id: dict[str, tuple[str, ...]] = field(default_factory=dict)
+    dependents: dict[str, set[str]] = field(default_factory=dict)
+    versions: dict[str, datetime | None] = field(default_factory=dict)
+
+    def apply(self, block_id: str, *, active: bool, depends_on) -> None:
+        for dep_id in self.deps_by_id.pop(block_id, ()):
+            children = self.dependents.get(dep_id)
+            if children is not None:
+                children.discard(block_id)
+                if not children:
+                    del self.dependents[dep_id]
+        if not active:
+            return
+        deps = tuple(dict.fromkeys(depends_on or []))
+        self.deps_by_id[block_id] = deps
+        for dep_id in deps:
+            self.dependents.setdefault(dep_id, set()).add(block_id)
+
+
+_index_lock = threading.Lock()
+_index_cache: "weakref.WeakKeyDictionary[Engine, OrderedDict[str, _ProjectDependencyIndex]]" = weakref.WeakKeyDictionary()
+
+
+def _engine_of(db: Session) -> Engine:
+    bind = db.get_bind()
+    return getattr(bind, "engine", bind)
+
+
+def _shares_connection(engine: Engine) -> bool:
+    """内存库（StaticPool / SingletonThreadPool）所有会话共用一个连接，无法另开只见已提交数据的会话。"""
+    return isinstance(engine.pool, (StaticPool, SingletonThreadPool))
+
+
+def _is_active_field(row) -> bool:
+    return row.deleted_at is None and row.block_type == "field"
+
+
+def _row_versions(*, project_id: str, db: Session) -> dict[str, datetime | None]:
+    rows = db.query(ContentBlock.id, ContentBlock.updated_at).filter(ContentBlock.project_id == project_id)
+    return {row.id: row.updated_at for row in rows}
+
+
+def _dependency_rows(*, ids: list[str], db: Session):
+    for start in range(0, len(ids), _ID_CHUNK_SIZE):
+        yield from db.query(
+            ContentBlock.id, ContentBlock.depends_on, ContentBlock.deleted_at, ContentBlock.block_type,
+        ).filter(ContentBlock.id.in_(ids[start:start + _ID_CHUNK_SIZE])).all()
+
+
+def _changed_ids(versions: dict[str, datetime | None], baseline: dict[str, datetime | None]) -> tuple[list[str], list[str]]:
+    """versions 相对 baseline 新增/修改的 id 与消失的 id。"""
+    changed = [block_id for block_id, updated_at in versions.items()
+               if block_id not in baseline or baseline[block_id] != updated_at]
+    removed = [block_id for block_id in baseline if block_id not in versions]
+    return changed, removed
+
+
+def _build_dependency_index(*, project_id: str, db: Session) -> _ProjectDependencyIndex:
+    index = _ProjectDependencyIndex()
+    rows = db.query(
+        ContentBlock.id, ContentBlock.depends_on, ContentBlock.deleted_at,
+        ContentBlock.block_type, ContentBlock.updated_at,
+    ).filter(ContentBlock.project_id == project_id).all()
+    for row in rows:
+        index.versions[row.id] = row.updated_at
+        if _is_active_field(row):
+            index.apply(row.id, active=True, depends_on=row.depends_on)
+    return index
+
+
+def _sync_dependency_index(
+    index: _ProjectDependencyIndex,
+    *,
+    versions: dict[str, datetime | None],
+    db: Session,
+) -> None:
+    """按逐行版本差异修补缓存索引（只读取变化行的小列）。"""
+    with _index_lock:
+        changed, removed = _changed_ids(versions, index.versions)
+    if not changed and not removed:
+        return
+    rows = list(_dependency_rows(ids=changed, db=db))
+    with _index_lock:
+        for block_id in removed:
+            index.apply(block_id, active=False, depends_on=())
+        seen = set()
+        for row in rows:
+            seen.add(row.id)
+            index.apply(row.id, active=_is_active_field(row), depends_on=row.depends_on)
+        for block_id in changed:
+            # 比对与读取之间被硬删除的行
+            if block_id not in seen:
+                index.apply(block_id, active=False, depends_on=())
+        index.versions = versions
+
+
+def get_project_dependency_index(*, project_id: str, db: Session) -> _ProjectDependencyIndex:
+    """
+    取项目的反向依赖索引（按数据库引擎 + project_id 缓存）。
+
+    索引只从另开的独立会话读取，缓存中只有已提交的数据；调用方会话里 flush 未提交的修改
+    由 _pending_dependency_overrides 在遍历时覆盖。每次调用读一次项目内全部块的 (id, updated_at)：
+    - 与缓存的逐行版本一致 → 直接复用
+    - 少量行新增 / 修改 / 消失（内容保存、depends_on 修改、软删除、硬删除、迟提交的旧时间戳写入）
+      → 只读取这些行修补
+    - 无缓存 → 只读 id / depends_on 等小列构建
+    depends_on 的所有写入方（architecture_writer、结构编译、模板应用、导入）都经由 ORM 写入并刷新 updated_at，
+    因此无需在各写入点显式通知；进程外的修改同样会被逐行版本比对发现。
+    内存库所有会话共用一个连接，无法隔离未提交数据，此时每次从调用方会话现建、不缓存。
+    """
+    engine = _engine_of(db)
+    if _shares_connection(engine):
+        return _build_dependency_index(project_id=project_id, db=db)
+
+    committed = Session(bind=engine, autoflush=False)
+    try:
+        versions = _row_versions(project_id=project_id, db=committed)
+        with _index_lock:
+            projects = _index_cache.setdefault(engine, OrderedDict())
+            index = projects.get(project_id)
+            if index is not None:
+                projects.move_to_end(project_id)
+        if index is not None:
+            _sync_dependency_index(index, versions=versions, db=committed)
+            return index
+
+        index = _build_dependency_index(project_id=project_id, db=committed)
+    finally:
+        committed.close()
+    with _index_lock:
+        projects = _index_cache.setdefault(engine, OrderedDict())
+        projects[project_id] = index
+        projects.move_to_end(project_id)
+        while len(projects) > _INDEX_CACHE_MAX_PROJECTS:
+            projects.popitem(last=False)
+    return index
+
+
+def invalidate_dependency_index(project_id: str | None = None) -> None:
+    """丢弃缓存的反向依赖索引（project_id 为空时清空全部）。用于绕过 ORM 直接改库的场景。"""
+    with _index_lock:
+        for projects in list(_index_cache.values()):
+            if project_id is None:
+                projects.clear()
+            else:
+                projects.pop(project_id, None)
+
+
+def _pending_dependency_overrides(
+    *,
+    project_id: str,
+    db: Session,
+    index: _ProjectDependencyIndex,
+) -> dict[str, tuple[bool, tuple[str, ...]]]:
+    """
+    当前会话所见与缓存索引不一致的块，遍历时覆盖缓存索引中的对应条目：
+    - 已 flush 未提交（或会话快照与缓存不同）的行：按会话中的 (id, updated_at) 与索引版本比对后读取
+    - 尚未 flush 的新增 / 修改 / 删除：直接取会话中的对象
+    """
+    overrides: dict[str, tuple[bool, tuple[str, ...]]] = {}
+    if not _shares_connection(_engine_of(db)):
+        versions = _row_versions(project_id=project_id, db=db)
+        with _index_lock:
+            changed, removed = _changed_ids(versions, index.versions)
+        for block_id in removed:
+            overrides[block_id] = (False, ())
+        for row in _dependency_rows(ids=changed, db=db):
+            overrides[row.id] = (_is_active_field(row), tuple(row.depends_on or []))
+    for obj in (*db.new, *db.dirty):
+        if isinstance(obj, ContentBlock) and obj.project_id == project_id and obj.id:
+            overrides[obj.id] = (_is_active_field(obj), tuple(obj.depends_on or []))
+    for obj in db.deleted:
+        if isinstance(obj, ContentBlock) and obj.project_id == project_id and obj.id:
+            overrides[obj.id] = (False, ())
+    return overrides
+
+
+def _collect_downstream_ids(*, source_id: str, index: _ProjectDependencyIndex, overrides) -> list[str]:
+    """BFS 收集 source 的全部传递下游（按层序，不含 source 自身）。"""
+    extra_dependents: dict[str, list[str]] = {}
+    for block_id, (active, deps) in overrides.items():
+        if active:
+            for dep_id in deps:
+                extra_dependents.setdefault(dep_id, []).append(block_id)
+
+    ordered: list[str] = []
+    visited: set[str] = {source_id}
+    queue = deque([source_id])
+    # index.dependents 的集合由其他线程在同一把锁下增量修补，遍历期间必须持锁（纯内存 BFS，耗时可忽略）
+    with _index_lock:
+        while queue:
+            current_id = queue.popleft()
+            children = [cid for cid in index.dependents.get(current_id, ()) if cid not in overrides]
+            children.extend(extra_dependents.get(current_id, ()))
+            for child_id in sorted(children):
+                if child_id in visited:
+                    continue
+                visited.add(child_id)
+                ordered.append(child_id)
+                queue.append(child_id)
+    return ordered
 
 
 def _has_content(block: ContentBlock) -> bool:
@@ -65,32 +267,35 @@ def invalidate_downstream_blocks(*, source_block: ContentBlock, db: Session) ->
     - 只处理同项目、未删除的 field 类型块
     - 仅当下游块当前已有内容时，才标记为 `needs_regeneration=True`
     - 递归传播到所有传递下游，确保 A -> B -> C 的链路能完整失效
+
+    下游子图由缓存的反向依赖索引求出（见 get_project_dependency_index），
+    只加载受影响的块，并以一条批量 UPDATE 写入失效标记。
     """
 
     summary = DependencyUpdateSummary()
     if getattr(source_block, "block_type", None) != "field":
         return summary
 
-    all_fields = _list_active_project_field_blocks(project_id=source_block.project_id, db=db)
-    dependents_by_dep_id: dict[str, list[ContentBlock]] = {}
-    for block in all_fields:
-        for dep_id in block.depends_on or []:
-            dependents_by_dep_id.setdefault(dep_id, []).append(block)
-
-    queue = list(dependents_by_dep_id.get(source_block.id, []))
-    visited: set[str] = set()
+    project_id = source_block.project_id
+    index = get_project_dependency_index(project_id=project_id, db=db)
+    overrides = _pending_dependency_overrides(project_id=project_id, db=db, index=index)
+    downstream_ids = _collect_downstream_ids(source_id=source_block.id, index=index, overrides=overrides)
+    if not downstream_ids:
+        return summary
 
-    while queue:
-        current = queue.pop(0)
-        if current.id in visited:
-            continue
-        visited.add(current.id)
-        queue.extend(dependents_by_dep_id.get(current.id, []))
+    # 会话中已加载的块直接取身份映射中的对象（保留未 flush 的内容修改）
+    blocks_by_id = {
+        block.id: block
+        for block in db.query(ContentBlock).filter(ContentBlock.id.in_(downstream_ids)).all()
+    }
 
-        if not _has_content(current):
+    affected_ids: list[str] = []
+    for block_id in downstream_ids:
+        current = blocks_by_id.get(block_id)
+        if current is None or not _is_active_field(current) or not _has_content(current):
             continue
 
-        current.needs_regeneration = True
+        affected_ids.append(current.id)
         summary.affected_block_ids.append(current.id)
         summary.affected_block_names.append(current.name)
 
@@ -103,12 +308,17 @@ def invalidate_downstream_blocks(*, source_block: ContentBlock, db: Session) ->
             summary.manual_attention_block_ids.append(current.id)
             summary.manual_attention_block_names.append(current.name)
 
+    if affected_ids:
+        db.query(ContentBlock).filter(ContentBlock.id.in_(affected_ids)).update(
+            {ContentBlock.needs_regeneration: True},
+            synchronize_session="evaluate",
+        )
     return summary
 
 
 def finalize_block_content_change(*, block: ContentBlock, db: Session) -> DependencyUpdateSummary:
     """
-    在某个内容块完成一次有效内容变更后，清除自身失效标记并传播下游失效。
+    在某个内容块完成一次有效内容变更后，清除自身失效标记、传播下游失效，并排队刷新摘要。
 
     适用于：
     - 手动保存内容
@@ -118,43 +328,40 @@ def finalize_block_content_change(*, block: ContentBlock, db: Session) -> Depend
     """
 
     block.needs_regeneration = False
-    return invalidate_downstream_blocks(source_block=block, db=db)
+    summary = invalidate_downstream_blocks(source_block=block, db=db)
+    _schedule_digest(block)
+    return summary
+
+
+def _schedule_digest(block: ContentBlock) -> None:
+    """内容变更后排队刷新摘要（去抖 + 批量，见 core.digest_service.DigestQueue）。"""
+    if getattr(block, "block_type", None) != "field" or not (getattr(block, "content", "") or "").strip():
+        return
+    try:
+        from core.digest_service import trigger_digest_update
+
+        trigger_digest_update(block.id, "block", block.content)
+    except Exception:  # pragma: no cover - 摘要是辅助信息，失败不影响保存
+        logger.exception("[dependency-regeneration] schedule digest failed for block %s", block.id)
 
 
 def enqueue_project_auto_trigger(project_id: str) -> None:
     """
-    串行执行指定项目的 auto_trigger 运行，并合并并发重复请求。
+    把指定项目的 auto_trigger 运行写入持久化队列，并合并重复请求。
 
-    同一项目在一次运行期间如果再次收到调度请求，只会被折叠为
-    “当前轮跑完后再补跑一轮”，避免重复并发生成同一批块。
+    同一项目已有排队任务时直接复用；正在运行时会新增一条排队任务，
+    即“当前轮跑完后再补跑一轮”，避免重复并发生成同一批块。
     """
 
     if not project_id:
         return
 
-    with _PROJECT_AUTORUN_STATE_LOCK:
-        if project_id in _PROJECT_AUTORUN_RUNNING:
-            _PROJECT_AUTORUN_PENDING.add(project_id)
-            return
-        _PROJECT_AUTORUN_RUNNING.add(project_id)
-
-    while True:
-        try:
-            from core.project_run_service import run_project_blocks
-
-            asyncio.run(run_project_blocks(
-                project_id=project_id,
-                mode="auto_trigger",
-            ))
-        except Exception:  # pragma: no cover - 调度异常记录即可，不应打崩请求线程
-            logger.exception("[dependency-regeneration] auto trigger run failed for project %s", project_id)
+    from core.project_run_queue import project_run_queue
 
-        with _PROJECT_AUTORUN_STATE_LOCK:
-            if project_id in _PROJECT_AUTORUN_PENDING:
-                _PROJECT_AUTORUN_PENDING.discard(project_id)
-                continue
-            _PROJECT_AUTORUN_RUNNING.discard(project_id)
-            break
+    try:
+        project_run_queue.enqueue(project_id, mode="auto_trigger")
+    except Exception:  # pragma: no cover - 调度异常记录即可，不应打崩请求
+        logger.exception("[dependency-regeneration] enqueue auto trigger failed for project %s", project_id)
 
 
 def schedule_project_auto_trigger(
@@ -162,11 +369,11 @@ def schedule_project_auto_trigger(
     *,
     background_tasks: BackgroundTasks | None = None,
 ) -> None:
-    """为当前项目安排一次 auto_trigger 运行。"""
+    """为当前项目安排一次 auto_trigger 运行（有 background_tasks 时在响应返回后入队）。"""
 
     if not project_id:
         return
     if background_tasks is not None:
-        background_tasks.add_task(_launch_auto_trigger_thread, project_id)
+        background_tasks.add_task(enqueue_project_auto_trigger, project_id)
         return
-    _launch_auto_trigger_thread(project_id)
+    enqueue_project_auto_trigger(project_id)
@@ -1,23 +1,34 @@
 # backend/core/digest_service.py
 # 功能: 内容块摘要服务 + 项目内容索引构建
-# 主要函数: generate_digest(), update_digest_async(), build_field_index()
+# 主要函数: generate_digest(), generate_digest_batch(), trigger_digest_update(), build_field_index()
+# 主要类: DigestQueue（digest_queue 全局实例：保存后去抖合并、按内容指纹跳过、多块一次请求、批量写回、启动补齐）
 # 优化: build_field_index 添加 30s TTL 缓存，避免每次 agent_node 执行都查 DB
 
 """
 内容块摘要服务。
-在内容块更新后异步生成一句话摘要。
+在内容块更新后异步生成一句话摘要（经 digest_queue 去抖、合并后批量生成）。
 构建全量内容块索引注入 system prompt。
 """
 import asyncio
+import hashlib
+import json
 import logging
+import threading
 import time
+from collections import OrderedDict
+from typing import Awaitable, Callable, Optional
+
+from sqlalchemy import func, update
+from sqlalchemy.orm import Session
 
 from core.content_block_reference import build_block_path, build_blocks_by_id, list_active_project_blocks
-from core.llm import llm_mini
+from core.llm import ainvoke_with_retry, llm_mini
 from core.llm_compat import normalize_content
+from core.llm_rate_limiter import PRIORITY_BACKGROUND
 from langchain_core.messages import HumanMessage
 from core.models.content_block import ContentBlock
-from core.database import get_db
+from core.config import settings
+from core.database import get_db, get_session_maker
 
 logger = logging.getLogger("digest")
 
@@ -37,49 +48,329 @@ async def generate_digest(content: str) -> str:
         ),
     ]
     try:
-        response = await llm_mini.ainvoke(messages)
+        response = await ainvoke_with_retry(llm_mini, messages, priority=PRIORITY_BACKGROUND)
         return normalize_content(response.content).strip()[:200]
     except Exception as e:
         logger.warning(f"[Digest] 生成摘要失败: {e}")
         return ""
 
 
-def trigger_digest_update(entity_id: str, entity_type: str, content: str):
+def content_hash(content: str | None) -> str:
+    """摘要对应内容的指纹（与 ContentBlock.digest_source_hash 比较）。"""
+    return hashlib.sha256((content or "").strip().encode("utf-8")).hexdigest()
+
+
+async def generate_digest_batch(items: list[tuple[str, str]]) -> dict[str, str]:
+    """
+    一次小模型请求概括多个内容块。
+
+    输入: items - [(block_id, content), ...]
+    输出: {block_id: 摘要}；批量结果缺失的块退回单块 generate_digest
+    """
+    if not items:
+        return {}
+    if len(items) == 1:
+        block_id, content = items[0]
+        return {block_id: await generate_digest(content)}
+
+    sections = "\n\n".join(
+        f"[{idx}]\n{content[:3000]}" for idx, (_, content) in enumerate(items, start=1)
+    )
+    messages = [
+        HumanMessage(
+            content=(
+                "下面有多段编号内容。请分别用一句话概括每段的核心主题和要点（每条不超过50字）。\n"
+                '只输出一个 JSON 对象，键为编号，值为摘要，例如 {"1": "……", "2": "……"}。\n\n'
+                f"{sections}"
+            )
+        ),
+    ]
+    digests: dict[str, str] = {}
+    try:
+        response = await ainvoke_with_retry(llm_mini, messages, priority=PRIORITY_BACKGROUND)
+        text = normalize_content(response.content).strip()
+        start, end = text.find("{"), text.rfind("}")
+        parsed = json.loads(text[start:end + 1]) if start >= 0 and end > start else {}
+        for idx, (block_id, _) in enumerate(items, start=1):
+            value = parsed.get(str(idx)) if isinstance(parsed, dict) else None
+            if isinstance(value, str) and value.strip():
+                digests[block_id] = value.strip()[:200]
+    except Exception as e:
+        logger.warning(f"[Digest] 批量生成摘要失败，改为逐块生成: {e}")
+
+    for block_id, content in items:
+        if block_id not in digests:
+            digests[block_id] = await generate_digest(content)
+    return digests
+
+
+DigestGenerator = Callable[[list[tuple[str, str]]], Awaitable[dict[str, str]]]
+
+
+class DigestQueue:
+    """
+    内容块摘要的去抖合并队列。
+
+    - submit 只记录块 ID（同一块多次保存只保留一条），任意线程可调用
+    - 块最后一次提交后静默 debounce 秒（或首次提交起已达 max_wait 秒）才处理，
+      处理时读取库中最新内容，因此总是概括最新版本
+    - 内容指纹与 digest_source_hash 相同的块直接跳过
+    - 每 batch_size 个块合并成一次小模型请求，结果在一个事务中批量写回；
+      写回前再次核对指纹，生成期间内容又被修改的块不写（等待下一次提交）
+    - 队列只在内存中：进程退出时未处理的块由下次启动的 backfill() 补交
+    """
+
+    def __init__(
+        self,
+        session_factory: Optional[Callable[[], Session]] = None,
+        *,
+        generator: Optional[DigestGenerator] = None,
+        debounce_seconds: Optional[float] = None,
+        max_wait_seconds: Optional[float] = None,
+        batch_size: Optional[int] = None,
+    ):
+        self._session_factory = session_factory
+        self._generator = generator or generate_digest_batch
+        self._debounce = debounce_seconds
+        self._max_wait = max_wait_seconds
+        self._batch_size = batch_size
+        self._lock = threading.Lock()
+        # block_id -> (首次提交时间, 最近提交时间)，按最近提交排序
+        self._pending: "OrderedDict[str, tuple[float, float]]" = OrderedDict()
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self._wake_event: Optional[asyncio.Event] = None
+        self._task: Optional[asyncio.Task] = None
+        self._backfill_task: Optional[asyncio.Task] = None
+        self._stopping = False
+
+    def _session(self) -> Session:
+        factory = self._session_factory or get_session_maker()
+        return factory()
+
+    @property
+    def debounce_seconds(self) -> float:
+        return float(self._debounce if self._debounce is not None else settings.digest_debounce_seconds)
+
+    @property
+    def max_wait_seconds(self) -> float:
+        return float(self._max_wait if self._max_wait is not None else settings.digest_max_wait_seconds)
+
+    @property
+    def batch_size(self) -> int:
+        return max(1, int(self._batch_size or settings.digest_batch_size or 1))
+
+    @property
+    def pending_count(self) -> int:
+        return len(self._pending)
+
+    # ---------- 生产端 ----------
+
+    def submit(self, block_id: str) -> None:
+        if not block_id:
+            return
+        now = time.monotonic()
+        with self._lock:
+            first, _ = self._pending.pop(block_id, (now, now))
+            self._pending[block_id] = (first, now)
+        loop, event = self._loop, self._wake_event
+        if loop is not None and event is not None:
+            try:
+                loop.call_soon_threadsafe(event.set)
+            except RuntimeError:
+                pass
+
+    def backfill(self) -> int:
+        """
+        提交库中有内容但摘要缺失 / 过期的块，返回提交数（同步扫描库，启动时经 start_backfill() 在线程中执行）。
+
+        覆盖队列上线前已有的内容与上次进程退出时未处理完的块。
+        先只读 id / digest / digest_source_hash 小列筛出候选，再按 id 分批读取候选的正文核对：
+        有摘要但没有 digest_source_hash 的旧数据无法判断是否过期，不读正文、不重新生成（内容再次保存时自然更新）。
+        """
+        db = self._session()
+        try:
+            candidates: dict[str, Optional[str]] = {}
+            for row in db.query(
+                ContentBlock.id, ContentBlock.digest, ContentBlock.digest_source_hash,
+            ).filter(
+                ContentBlock.deleted_at == None,  # noqa: E711
+                ContentBlock.content != None,  # noqa: E711
+                func.length(ContentBlock.content) >= 10,
+            ).yield_per(500):
+                if not row.digest:
+                    candidates[row.id] = None
+                elif row.digest_source_hash:
+                    candidates[row.id] = row.digest_source_hash
+            stale = []
+            ids = list(candidates)
+            for start in range(0, len(ids), 500):
+                for row in db.query(ContentBlock.id, ContentBlock.content).filter(
+                    ContentBlock.id.in_(ids[start:start + 500]),
+                ):
+                    if len(row.content.strip()) < 10:
+                        continue
+                    source_hash = candidates[row.id]
+                    if source_hash is None or source_hash != content_hash(row.content):
+                        stale.append(row.id)
+        finally:
+            db.close()
+        for block_id in stale:
+            self.submit(block_id)
+        if stale:
+            logger.info(f"[Digest] 启动补齐：{len(stale)} 个内容块的摘要缺失或过期")
+        return len(stale)
+
+    def start_backfill(self) -> asyncio.Task:
+        """在后台线程中执行 backfill()，不阻塞启动与事件循环；返回可等待的任务。"""
+
+        async def _run_backfill() -> int:
+            try:
+                return await asyncio.to_thread(self.backfill)
+            except Exception:
+                logger.exception("[Digest] 启动补齐失败")
+                return 0
+
+        self._backfill_task = asyncio.create_task(_run_backfill(), name="digest-backfill")
+        return self._backfill_task
+
+    # ---------- 消费端 ----------
+
+    def _take_due(self, *, force: bool = False) -> tuple[list[str], Optional[float]]:
+        """取出到期的块（最多 batch_size 个），并返回下一个块到期还需等待的秒数。"""
+        now = time.monotonic()
+        due: list[str] = []
+        next_wait: Optional[float] = None
+        with self._lock:
+            for block_id, (first, last) in list(self._pending.items()):
+                ready_at = min(last + self.debounce_seconds, first + self.max_wait_seconds)
+                if force or ready_at <= now:
+                    due.append(block_id)
+                    del self._pending[block_id]
+                    if len(due) >= self.batch_size:
+                        break
+                else:
+                    wait = ready_at - now
+                    next_wait = wait if next_wait is None else min(next_wait, wait)
+        return due, next_wait
+
+    async def _process(self, block_ids: list[str]) -> int:
+        db = self._session()
+        try:
+            rows = db.query(
+                ContentBlock.id, ContentBlock.content, ContentBlock.digest_source_hash,
+            ).filter(
+                ContentBlock.id.in_(block_ids),
+                ContentBlock.deleted_at == None,  # noqa: E711
+            ).all()
+        finally:
+            db.close()
+
+        items: list[tuple[str, str]] = []
+        hashes: dict[str, str] = {}
+        for row in rows:
+            content = (row.content or "").strip()
+            if len(content) < 10:
+                continue
+            fingerprint = content_hash(content)
+            if fingerprint == row.digest_source_hash:
+                continue
+            items.append((row.id, content))
+            hashes[row.id] = fingerprint
+        if not items:
+            return 0
+
+        digests = await self._generator(items)
+        digests = {bid: d for bid, d in (digests or {}).items() if d and bid in hashes}
+        if not digests:
+            return 0
+
+        db = self._session()
+        try:
+            current = db.query(ContentBlock.id, ContentBlock.project_id, ContentBlock.content).filter(
+                ContentBlock.id.in_(list(digests)),
+            ).all()
+            fresh = [row for row in current if content_hash(row.content) == hashes[row.id]]
+            if fresh:
+                db.execute(update(ContentBlock), [
+                    {"id": row.id, "digest": digests[row.id], "digest_source_hash": hashes[row.id]}
+                    for row in fresh
+                ])
+                db.commit()
+            for project_id in {row.project_id for row in fresh}:
+                invalidate_field_index_cache(project_id)
+            logger.info(f"[Digest] 批量写回 {len(fresh)}/{len(items)} 个摘要")
+            return len(fresh)
+        finally:
+            db.close()
+
+    async def flush(self) -> int:
+        """立即处理所有排队的块（忽略去抖时间），返回写回的摘要数。"""
+        written = 0
+        while True:
+            due, _ = self._take_due(force=True)
+            if not due:
+                return written
+            written += await self._process(due)
+
+    async def _run(self) -> None:
+        event = self._wake_event
+        assert event is not None
+        while not self._stopping:
+            try:
+                due, next_wait = self._take_due()
+                if due:
+                    await self._process(due)
+                    continue
+                event.clear()
+                try:
+                    await asyncio.wait_for(event.wait(), timeout=next_wait)
+                except asyncio.TimeoutError:
+                    pass
+            except asyncio.CancelledError:
+                raise
+            except Exception:  # pragma: no cover - 单批失败不能让队列停摆
+                logger.exception("[Digest] 批量摘要处理失败")
+                await asyncio.sleep(1.0)
+
+    async def start(self) -> None:
+        """在当前事件循环启动后台处理任务（重复调用无副作用）。"""
+        if self._task is not None:
+            return
+        self._stopping = False
+        self._loop = asyncio.get_running_loop()
+        self._wake_event = asyncio.Event()
+        self._task = asyncio.create_task(self._run(), name="digest-queue")
+
+    async def stop(self) -> None:
+        task, self._task = self._task, None
+        backfill, self._backfill_task = self._backfill_task, None
+        self._stopping = True
+        if self._wake_event is not None:
+            self._wake_event.set()
+        if backfill is not None:
+            # 线程中的扫描无法中断，等它结束后再收尾（提交的块随队列一起丢弃，下次启动再补）
+            await asyncio.gather(backfill, return_exceptions=True)
+        if task is not None:
+            task.cancel()
+            await asyncio.gather(task, return_exceptions=True)
+        self._loop = None
+        self._wake_event = None
+
+
+digest_queue = DigestQueue()
+
+
+def trigger_digest_update(entity_id: str, entity_type: str = "block", content: str | None = None):
     """
     非阻塞地触发摘要更新。在内容块保存后调用。
 
     输入:
         entity_id   - ContentBlock.id
         entity_type - "block"（保留参数兼容，但统一走 ContentBlock）
-        content     - 内容块内容
-    输出: 无（后台执行）
+        content     - 保留参数兼容；实际概括处理时库中的最新内容
+    输出: 无（进入 digest_queue，去抖后批量生成）
     """
-    async def _do_update():
-        try:
-            digest = await generate_digest(content)
-            if not digest:
-                return
-            db = next(get_db())
-            try:
-                # P0-1: 统一走 ContentBlock（ProjectField 路径已移除）
-                entity = db.query(ContentBlock).filter_by(id=entity_id).first()
-                if entity:
-                    entity.digest = digest
-                    db.commit()
-                    logger.info(f"[Digest] {entity_type} {entity_id[:8]}: {digest[:50]}")
-            finally:
-                db.close()
-        except Exception as e:
-            logger.warning(f"[Digest] 更新失败: {e}")
-
-    try:
-        loop = asyncio.get_event_loop()
-        if loop.is_running():
-            asyncio.ensure_future(_do_update())
-        else:
-            asyncio.run(_do_update())
-    except RuntimeError:
-        pass
+    digest_queue.submit(entity_id)
 
 
 # ---- build_field_index 的简易 TTL 缓存 ----
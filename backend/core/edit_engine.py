@@ -1,11 +1,13 @@
 # backend/core/edit_engine.py
 """
 编辑引擎 - 将 LLM 输出的 edits 确定性地应用到原始内容上
-主要函数: apply_edits(), generate_revision_markdown()
+主要函数: apply_edits(), generate_revision_markdown(), diff_lines()
 辅助函数: _find_anchor() — 三级 fallback 锚点定位（exact → normalized → fuzzy）
+         _fuzzy_locate() — 模糊定位（q-gram 候选过滤 + Myers 位并行编辑距离）
 """
 import difflib
 import logging
+import time
 from typing import Optional
 
 logger = logging.getLogger("edit_engine")
@@ -63,6 +65,153 @@ def _normalize(text: str) -> tuple[str, list[int]]:
     return "".join(normalized), positions
 
 
+# ---- 模糊匹配: q-gram 候选过滤 + Myers 位并行编辑距离 ----
+
+_FUZZY_THRESHOLD = 0.85  # SequenceMatcher.ratio() 必须超过此值
+_QGRAM = 3
+_FUZZY_SLACK = 1  # 边界候选：编辑距离不超过最小值 + 1 的起止位置都用 ratio 打分
+_FUZZY_MAX_CANDIDATES = 32  # 最多考察的结束位置数（高度重复的文本中可能有很多）
+_FUZZY_MAX_SCORED = 8  # 按编辑距离排序后最多做 SequenceMatcher 打分的边界数
+_FUZZY_RATIO_MAX_CHARS = 400  # 超过该长度的 anchor 不做 SequenceMatcher（autojunk=False 时近似平方复杂度），改用编辑距离估算
+_FUZZY_TIME_BUDGET_SECONDS = 1.0  # 模糊定位的总耗时上限，超出按未找到处理
+
+
+def _myers_distances(pattern: str, text: str, anchored: bool = False):
+    """Myers / Hyyrö 位并行编辑距离，逐列产出 (j, distance)。
+
+    anchored=False: distance = min 编辑距离(pattern, text 中以第 j 个字符结尾的任意子串)
+    anchored=True:  distance = 编辑距离(pattern, text[:j])
+    每个字符只做常数次整数位运算（Python 大整数支持任意长度 pattern）。
+    """
+    m = len(pattern)
+    peq: dict[str, int] = {}
+    for i, ch in enumerate(pattern):
+        peq[ch] = peq.get(ch, 0) | (1 << i)
+    mask = (1 << m) - 1
+    high = 1 << (m - 1)
+    top = 1 if anchored else 0
+    pv, mv, score = mask, 0, m
+    for j, ch in enumerate(text, 1):
+        eq = peq.get(ch, 0)
+        xv = eq | mv
+        xh = (((eq & pv) + pv) ^ pv) | eq
+        ph = mv | ~(xh | pv)
+        mh = pv & xh
+        if ph & high:
+            score += 1
+        elif mh & high:
+            score -= 1
+        ph = (ph << 1) | top
+        mh <<= 1
+        pv = (mh | ~(xv | ph)) & mask
+        mv = ph & xv & mask
+        yield j, score
+
+
+def _candidate_regions(text: str, pattern: str, max_dist: int) -> list[tuple[int, int]]:
+    """q-gram 过滤：编辑距离 ≤ max_dist 的匹配至少共享 (m - q + 1) - max_dist * q 个 q-gram。
+
+    返回可能包含匹配的 text 区间（已合并）；过滤条件不成立（pattern 太短）时返回整段。
+    """
+    m, n, q = len(pattern), len(text), _QGRAM
+    need = (m - q + 1) - max_dist * q
+    if need <= 0 or n < m:
+        return [(0, n)]
+    grams = {pattern[i:i + q] for i in range(m - q + 1)}
+    hits = [i for i in range(n - q + 1) if text[i:i + q] in grams]
+
+    span = m + max_dist  # 匹配的最大长度
+    regions: list[tuple[int, int]] = []
+    lo = 0
+    for hi, pos in enumerate(hits):
+        while hits[lo] <= pos - (span - q + 1):
+            lo += 1
+        if hi - lo + 1 < need:
+            continue
+        start = max(0, pos + q - span - max_dist)
+        end = min(n, pos + span + max_dist)
+        if regions and start <= regions[-1][1]:
+            regions[-1] = (regions[-1][0], max(regions[-1][1], end))
+        else:
+            regions.append((start, end))
+    return regions
+
+
+def _distance_ratio(m: int, w: int, dist: int) -> float:
+    """由编辑距离估算 SequenceMatcher 式的相似度 2M / (m + w)：公共子序列 M ≥ max(m, w) - dist。"""
+    return 2 * max(0, max(m, w) - dist) / (m + w) if m + w else 0.0
+
+
+def _match_ratio(a: str, b: str) -> float:
+    """SequenceMatcher 相似度。关闭 autojunk：长于 200 字的串里高频字符（中文虚词、重复用语）
+    会被当作 junk 丢弃，重复度高的文本 ratio 会塌到接近 0。"""
+    return difflib.SequenceMatcher(None, a, b, autojunk=False).ratio()
+
+
+def _fuzzy_locate(text: str, pattern: str) -> Optional[tuple[int, int, float]]:
+    """在 text 中定位与 pattern 最相近的子串，返回 (start, end, ratio)；没有超过阈值的返回 None。
+
+    1. q-gram 过滤出候选区间
+    2. 候选区间内用 Myers 算法求各结束位置的最小编辑距离，保留接近最小值的结束位置
+    3. 对每个结束位置反向做锚定的 Myers，得到各起点到该结束位置的精确编辑距离
+    4. 全部边界按 (编辑距离, 长度, 位置) 排序，只对前 _FUZZY_MAX_SCORED 个用 SequenceMatcher.ratio() 打分取最高
+       （同分取更短、更靠前的窗口）；anchor 超过 _FUZZY_RATIO_MAX_CHARS 时只取排序第一的边界，
+       相似度由编辑距离估算（长串上的 ratio() 开销近似平方）
+    总耗时超过 _FUZZY_TIME_BUDGET_SECONDS 时放弃，返回 None。
+    """
+    m, n = len(pattern), len(text)
+    if not m or not text:
+        return None
+    deadline = time.monotonic() + _FUZZY_TIME_BUDGET_SECONDS
+    # ratio > 0.85 时，(m + w)(1 - ratio) 的上界约为 0.33m 个增删，按替换计约 0.15m~0.3m
+    max_dist = max(1, int(m * (1 - _FUZZY_THRESHOLD) * 2))
+    min_window = max(1, int(m * 0.8))
+    max_window = min(n, int(m * 1.2))
+
+    ends: list[tuple[int, int]] = []
+    for region_start, region_end in _candidate_regions(text, pattern, max_dist):
+        for j, dist in _myers_distances(pattern, text[region_start:region_end]):
+            if dist <= max_dist:
+                ends.append((dist, region_start + j))
+        if time.monotonic() > deadline:
+            logger.warning("[edit_engine] 模糊匹配超时，放弃: anchor='%s'", pattern[:50])
+            return None
+    if not ends:
+        return None
+    best_dist = min(dist for dist, _ in ends)
+    ends = sorted(e for e in ends if e[0] <= best_dist + _FUZZY_SLACK)[:_FUZZY_MAX_CANDIDATES]
+
+    boundaries: list[tuple[int, int, int, int]] = []  # (编辑距离, 长度, start, end)
+    for _, end in ends:
+        window_start = max(0, end - max_window)
+        for j, dist in _myers_distances(pattern[::-1], text[window_start:end][::-1], anchored=True):
+            if j >= min_window and dist <= max_dist:
+                boundaries.append((dist, j, end - j, end))
+        if time.monotonic() > deadline:
+            logger.warning("[edit_engine] 模糊匹配超时，放弃: anchor='%s'", pattern[:50])
+            return None
+    if not boundaries:
+        return None
+    boundaries.sort()
+
+    if m > _FUZZY_RATIO_MAX_CHARS:
+        dist, length, start, end = boundaries[0]
+        ratio = _distance_ratio(m, length, dist)
+        return (start, end, ratio) if ratio > _FUZZY_THRESHOLD else None
+
+    best: Optional[tuple[float, int, int]] = None  # (ratio, start, end)
+    for _, _, start, end in boundaries[:_FUZZY_MAX_SCORED]:
+        if time.monotonic() > deadline:
+            break
+        ratio = _match_ratio(pattern, text[start:end])
+        if best is None or (ratio, start - end, -start) > (best[0], best[1] - best[2], -best[1]):
+            best = (ratio, start, end)
+
+    if best is None or best[0] <= _FUZZY_THRESHOLD:
+        return None
+    return best[1], best[2], best[0]
+
+
 def _find_anchor(
     original: str, anchor: str,
 ) -> tuple[int, int, str]:
@@ -103,45 +252,17 @@ def _find_anchor(
             )
             return start_orig, end_orig, "normalized"
 
-    # ---- Level 3: 模糊匹配（滑窗 + SequenceMatcher） ----
-    # 只对合理长度的 anchor 启用（过长的 anchor 模糊匹配意义不大且性能差）
-    if len(anchor) > 500 or len(original) > 50000:
-        return -1, -1, "none"
-
-    best_ratio = 0.85  # 最低阈值
-    best_start = -1
-    best_end = -1
-    anchor_len = len(anchor)
-
-    # 搜索窗口: anchor 长度的 80%~120%
-    min_window = max(1, int(anchor_len * 0.8))
-    max_window = min(len(original), int(anchor_len * 1.2))
-
-    # 优化: 先用归一化文本做粗筛，再映射回原文
-    norm_anchor_for_fuzzy = norm_anchor if norm_anchor else anchor
-
-    for window_size in range(min_window, max_window + 1):
-        for start in range(len(norm_orig) - window_size + 1):
-            candidate = norm_orig[start:start + window_size]
-            # 快速预筛: 长度比差太大就跳过
-            ratio = difflib.SequenceMatcher(
-                None, norm_anchor_for_fuzzy, candidate,
-            ).ratio()
-            if ratio > best_ratio:
-                best_ratio = ratio
-                # 映射回原文坐标
-                best_start = orig_positions[start]
-                norm_end_idx = start + window_size
-                if norm_end_idx < len(orig_positions):
-                    best_end = orig_positions[norm_end_idx]
-                else:
-                    best_end = len(original)
-
-    if best_start >= 0:
+    # ---- Level 3: 模糊匹配（q-gram 过滤 + Myers 编辑距离，见 _fuzzy_locate） ----
+    located = _fuzzy_locate(norm_orig, norm_anchor if norm_anchor else anchor)
+    if located is not None:
+        norm_start, norm_end, ratio = located
+        # 映射回原文坐标
+        best_start = orig_positions[norm_start]
+        best_end = orig_positions[norm_end] if norm_end < len(orig_positions) else len(original)
         matched_text = original[best_start:best_end]
         logger.warning(
             "[edit_engine] 模糊匹配: anchor='%s' → ratio=%.3f, matched='%s'",
-            anchor[:50], best_ratio, matched_text[:50],
+            anchor[:50], ratio, matched_text[:50],
         )
         return best_start, best_end, "fuzzy"
 
@@ -161,7 +282,7 @@ def apply_edits(
     锚点定位使用三级 fallback:
     1. 精确 str.find()
     2. 归一化匹配（空白折叠 + 标点统一）
-    3. 模糊匹配（difflib.SequenceMatcher, 阈值 0.85）
+    3. 模糊匹配（q-gram 过滤 + Myers 编辑距离定位，SequenceMatcher 阈值 0.85）
 
     输入:
         original  - 原始内容字符串
@@ -278,6 +399,19 @@ def apply_edits(
     return result, changes
 
 
+def diff_lines(old: str, new: str) -> tuple[list[str], list[str], list[tuple[str, int, int, int, int]]]:
+    """
+    按行比较两段文本（保留行尾换行符，拼接后可逐字节还原）。
+
+    输出: (old_lines, new_lines, opcodes)，opcodes 同 difflib.SequenceMatcher.get_opcodes()
+    修订标记（generate_revision_markdown）与版本增量（core.version_service）共用
+    """
+    old_lines = old.splitlines(keepends=True)
+    new_lines = new.splitlines(keepends=True)
+    matcher = difflib.SequenceMatcher(None, old_lines, new_lines)
+    return old_lines, new_lines, matcher.get_opcodes()
+
+
 def generate_revision_markdown(old: str, new: str, context: int = 3) -> str:
     """
     生成带修订标记的 markdown。删除用 <del>，新增用 <ins>。
@@ -286,10 +420,7 @@ def generate_revision_markdown(old: str, new: str, context: int = 3) -> str:
     输入: old - 修改前文本, new - 修改后文本
     输出: 带 <del>/<ins> 标签的字符串
     """
-    old_lines = old.splitlines(keepends=True)
-    new_lines = new.splitlines(keepends=True)
-    matcher = difflib.SequenceMatcher(None, old_lines, new_lines)
-    opcodes = matcher.get_opcodes()
+    old_lines, new_lines, opcodes = diff_lines(old, new)
 
     result = []
     prev_was_change = False  # 上一个 opcode 是否是变更块
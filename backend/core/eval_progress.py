@@ -0,0 +1,152 @@
+# backend/core/eval_progress.py
+# 功能: Eval V2 执行进度事件总线 — 执行循环发布事件，SSE 端点按游标订阅与断线续传（替代轮询运行态）
+# 主要类: EvalProgressBus（全局实例 eval_progress_bus）
+# 主要函数: publish(), events_since(), wait_for_events(), parse_event_id(), format_sse()
+# 数据结构:
+#   事件: {epoch, seq, type, task_id, project_id, batch_id, ts, ...}
+#     type: run_started / trial_started / trial_finished / grader_finished / paused / stopped / finished
+#   seq 全局单调递增（跨 Task），即续传游标；epoch 为本进程总线的随机标识
+#   SSE 的 id 为 "<epoch>:<seq>"；环形缓冲保留最近 eval_progress_buffer_size 条
+
+"""
+Eval V2 进度事件
+
+原来前端每秒轮询 /api/eval/tasks/{project_id}（每次都序列化全部 Task 与结果），大批量执行时
+SQLite 报表接口压力大、界面更新也有 1s 延迟。现在：
+- api/eval 的调度循环在 Trial 派发 / 收尾、Grader 评分完成、Task 暂停 / 终止 / 结束时 publish()
+- SSE 端点用 wait_for_events(cursor, ...) 等待新事件；游标即最后收到的 seq，
+  断线后带 Last-Event-ID（或 ?cursor=）重连即可补齐缓冲区内的事件
+- 游标早于缓冲区最早事件、或大于当前最新 seq 时返回 gap=True，由调用方推送一次完整快照让客户端重新同步
+- 服务重启后 seq 从 0 重新计数，旧游标在新 seq 追上后会“看起来有效”：事件 id 带上 epoch，
+  parse_event_id() 遇到其他 epoch 的 id 视为无游标，同样改推快照
+- 事件只在本进程内存中（与 _TASK_RUNTIME_STATE 相同的作用域）
+"""
+
+from __future__ import annotations
+
+import asyncio
+import json
+import threading
+import time
+import uuid
+from collections import deque
+from typing import Any, Optional
+
+from core.config import settings
+
+
+class EvalProgressBus:
+    """进度事件的环形缓冲 + 等待者通知（publish 可在任意线程调用）。"""
+
+    def __init__(self, max_events: Optional[int] = None):
+        self._max_events = max_events
+        self._lock = threading.Lock()
+        self._events: deque[dict] = deque()
+        self._seq = 0
+        self.epoch = uuid.uuid4().hex[:12]
+        self._waiters: set[tuple[asyncio.AbstractEventLoop, asyncio.Event]] = set()
+
+    @property
+    def max_events(self) -> int:
+        return max(1, int(self._max_events or settings.eval_progress_buffer_size or 1))
+
+    @property
+    def last_seq(self) -> int:
+        with self._lock:
+            return self._seq
+
+    def publish(self, event_type: str, *, task_id: str, project_id: str = "", batch_id: str = "", **data: Any) -> dict:
+        with self._lock:
+            self._seq += 1
+            event = {
+                "epoch": self.epoch,
+                "seq": self._seq,
+                "type": event_type,
+                "task_id": task_id,
+                "project_id": project_id or "",
+                "batch_id": batch_id or "",
+                "ts": time.time(),
+                **data,
+            }
+            self._events.append(event)
+            while len(self._events) > self.max_events:
+                self._events.popleft()
+            waiters = list(self._waiters)
+        for loop, waiter in waiters:
+            try:
+                loop.call_soon_threadsafe(waiter.set)
+            except RuntimeError:
+                pass  # 订阅方的事件循环已关闭
+        return event
+
+    def parse_event_id(self, value: Optional[str]) -> Optional[int]:
+        """
+        把 SSE 事件 id（"<epoch>:<seq>"，或不带 epoch 的纯数字游标）解析为本总线的 seq。
+        epoch 不是本进程的（服务重启前发出的 id）或格式不对时返回 None，由调用方按无游标推送快照。
+        """
+        value = (value or "").strip()
+        epoch, sep, seq = value.rpartition(":")
+        if sep and epoch != self.epoch:
+            return None
+        return int(seq) if seq.isdigit() else None
+
+    def events_since(
+        self,
+        cursor: int,
+        *,
+        task_id: Optional[str] = None,
+        project_id: Optional[str] = None,
+        batch_id: Optional[str] = None,
+    ) -> tuple[list[dict], bool, int]:
+        """
+        返回 (events, gap, last_seq)：seq > cursor 且匹配过滤条件的事件、gap（cursor 之后有事件已被挤出缓冲区，
+        或 cursor 超过当前最新 seq——来自重启前的进程）、当前最新 seq。三者在同一把锁内取得：没有匹配事件时调用方可把游标直接推进到 last_seq
+        （否则只关注某个项目的流在其他项目刷满缓冲区后会一直处于 gap）。
+        """
+        with self._lock:
+            gap = cursor > self._seq or (bool(self._events) and cursor < self._events[0]["seq"] - 1)
+            events = [
+                e for e in self._events
+                if e["seq"] > cursor
+                and (task_id is None or e["task_id"] == task_id)
+                and (project_id is None or e["project_id"] == project_id)
+                and (batch_id is None or e["batch_id"] == batch_id)
+            ]
+            return events, gap, self._seq
+
+    async def wait_for_events(self, cursor: int, timeout: float, **filters: Any) -> tuple[list[dict], bool, int]:
+        """等到有匹配的新事件（或 gap）为止，最多 timeout 秒；超时返回空列表。返回值同 events_since。"""
+        waiter = asyncio.Event()
+        entry = (asyncio.get_running_loop(), waiter)
+        with self._lock:
+            self._waiters.add(entry)
+        try:
+            deadline = time.monotonic() + max(0.0, timeout)
+            while True:
+                waiter.clear()
+                events, gap, last_seq = self.events_since(cursor, **filters)
+                remaining = deadline - time.monotonic()
+                if events or gap or remaining <= 0:
+                    return events, gap, last_seq
+                # 期间只有不匹配的事件：推进游标，避免它们被挤出缓冲区后误报 gap
+                cursor = last_seq
+                try:
+                    await asyncio.wait_for(waiter.wait(), timeout=remaining)
+                except asyncio.TimeoutError:
+                    pass
+        finally:
+            with self._lock:
+                self._waiters.discard(entry)
+
+    def clear(self) -> None:
+        with self._lock:
+            self._events.clear()
+
+
+def format_sse(event: dict) -> str:
+    """SSE 帧：id 为 "<epoch>:<seq>"（浏览器 EventSource 重连时自动带 Last-Event-ID）。"""
+    event_id = f"{event['epoch']}:{event['seq']}" if event.get("epoch") else str(event["seq"])
+    return f"id: {event_id}\ndata: {json.dumps(event, ensure_ascii=False, default=str)}\n\n"
+
+
+eval_progress_bus = EvalProgressBus()
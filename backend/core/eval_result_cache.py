@@ -0,0 +1,166 @@
+# backend/core/eval_result_cache.py
+# 功能: Eval V2 的持久化结果缓存 — 输入未变的 Trial 结果与 Grader 评分直接复用，不再重复调用 LLM
+# 主要函数: trial_cache_key(), grader_cache_key(), get_cached_result(), store_result(), clear_project_cache()
+# 数据结构:
+#   EvalResultCacheV2(cache_key, kind="trial"|"grader", project_id, payload)
+#   trial payload: {process, grader_results, dimension_scores, overall_score}（只缓存 status=completed 的 Trial）
+#   grader payload: {grader_id, grader_name, scores, comments, feedback}
+
+"""
+Eval V2 结果缓存
+
+Task 的 content_hash / is_task_stale 已经能判断内容是否变化，但 _execute_task_v2 每次执行仍把
+所有 TrialConfig × repeat 和所有 Grader 从头跑一遍；改了一个块再「全部执行」要为整套评估重新付费。
+
+缓存键覆盖所有会影响结果的输入（compute_result_cache_key）：
+- Trial：评估内容、形态与 form_config、probe、引用的画像、Grader 配置、创作者画像、项目意图、
+  locale、各步骤的模型与温度、repeat_index、EVAL_CACHE_VERSION
+- Grader：Grader 提示词 / 维度 / 类型、评估内容、过程 transcript、模型与温度、repeat_index、EVAL_CACHE_VERSION
+模型与温度取自 get_chat_model 实际解析出的配置（core.llm.resolve_chat_model_config + eval_engine.EVAL_TEMPERATURES），
+而不是日志用的 get_model_name()。
+Grader 权重不进入 Trial 键：命中后按当前权重重新计算加权分。
+改了某个 Grader 时，Trial 键变化，但其余 Grader 仍从 Grader 缓存命中。
+
+force=True 时跳过读取、照常执行并覆盖缓存。
+"""
+
+from __future__ import annotations
+
+from typing import Any, Optional
+
+from sqlalchemy import insert
+from sqlalchemy.orm import Session
+
+from core.models.base import generate_uuid, utcnow_naive
+from core.tools.eval_v2_service import compute_result_cache_key
+
+# 评估引擎的内置提示词 / 温度等改动时递增，使旧缓存全部失效
+EVAL_CACHE_VERSION = 1
+
+
+def _trial_model_config() -> dict:
+    """Trial 各步骤实际使用的模型与温度（Trial 结果同时包含 Grader 评分，因此覆盖全部步骤温度）。"""
+    from core.llm import resolve_chat_model_config
+    from core.tools.eval_engine import EVAL_TEMPERATURES
+
+    return {
+        step: resolve_chat_model_config(temperature=temperature)
+        for step, temperature in sorted(EVAL_TEMPERATURES.items())
+    }
+
+
+def _grader_model_config() -> dict:
+    from core.llm import resolve_chat_model_config
+    from core.tools.eval_engine import EVAL_TEMPERATURES
+
+    return resolve_chat_model_config(temperature=EVAL_TEMPERATURES["grader"])
+
+
+def grader_spec(grader: Any, locale: str) -> dict:
+    """Grader 中影响评分结果的配置。"""
+    return {
+        "id": grader.id,
+        "name": grader.name,
+        "type": grader.grader_type,
+        "prompt_template": grader.prompt_template or "",
+        "dimensions": grader.dimensions or [],
+        "locale": locale,
+    }
+
+
+def trial_cache_key(
+    *,
+    content_text: str,
+    content_blocks: list,
+    form_type: str,
+    form_config: dict,
+    probe: str,
+    personas: dict,
+    graders: list,
+    creator_profile: str,
+    intent: str,
+    locale: str,
+    repeat_index: int,
+) -> str:
+    return compute_result_cache_key("trial", {
+        "version": EVAL_CACHE_VERSION,
+        "model": _trial_model_config(),
+        "content_text": content_text,
+        "content_blocks": content_blocks,
+        "form_type": form_type,
+        "form_config": form_config or {},
+        "probe": probe or "",
+        "personas": personas,
+        "graders": graders,
+        "creator_profile": creator_profile or "",
+        "intent": intent or "",
+        "locale": locale,
+        "repeat_index": repeat_index,
+    })
+
+
+def grader_cache_key(*, spec: dict, content: str, process_transcript: str, repeat_index: int) -> str:
+    return compute_result_cache_key("grader", {
+        "version": EVAL_CACHE_VERSION,
+        "model": _grader_model_config(),
+        "grader": spec,
+        "content": content,
+        "process_transcript": process_transcript,
+        "repeat_index": repeat_index,
+    })
+
+
+def get_cached_result(db: Session, cache_key: str) -> Optional[dict]:
+    """读取缓存（只读，不占用写锁）。"""
+    from core.models import EvalResultCacheV2
+
+    payload = db.query(EvalResultCacheV2.payload).filter(EvalResultCacheV2.cache_key == cache_key).scalar()
+    return dict(payload) if payload is not None else None
+
+
+def store_result(db: Session, cache_key: str, kind: str, project_id: str, payload: dict) -> None:
+    """
+    写入或覆盖缓存（由调用方立即提交，避免在后续 LLM 调用期间持有 SQLite 写锁；并发写同一键时后写者覆盖）。
+    """
+    from core.models import EvalResultCacheV2
+
+    now = utcnow_naive()
+    bind = db.get_bind()
+    if bind.dialect.name == "sqlite":
+        from sqlalchemy.dialects.sqlite import insert as sqlite_insert
+
+        stmt = sqlite_insert(EvalResultCacheV2).values(
+            id=generate_uuid(),
+            cache_key=cache_key,
+            kind=kind,
+            project_id=project_id or "",
+            payload=payload,
+            created_at=now,
+            updated_at=now,
+        )
+        db.execute(stmt.on_conflict_do_update(
+            index_elements=["cache_key"],
+            set_={"payload": stmt.excluded.payload, "updated_at": now},
+        ))
+        return
+    row = db.query(EvalResultCacheV2).filter(EvalResultCacheV2.cache_key == cache_key).first()
+    if row is not None:
+        row.payload = payload
+        row.updated_at = now
+    else:
+        db.execute(insert(EvalResultCacheV2), [{
+            "id": generate_uuid(),
+            "cache_key": cache_key,
+            "kind": kind,
+            "project_id": project_id or "",
+            "payload": payload,
+        }])
+
+
+def clear_project_cache(db: Session, project_id: str) -> int:
+    """删除项目的全部缓存（由调用方提交），返回删除条数。"""
+    from core.models import EvalResultCacheV2
+
+    return db.query(EvalResultCacheV2).filter(
+        EvalResultCacheV2.project_id == project_id,
+    ).delete(synchronize_session=False)
@@ -0,0 +1,258 @@
+# backend/core/generation_log_sink.py
+# 功能: GenerationLog 的写后（write-behind）批量写入队列 — LLM 调用回调只入队，后台按条数 / 时间批量插入
+# 主要类: GenerationLogSink（generation_log_sink 全局实例：有界队列、后台 flusher、溢出策略与计数）
+# 主要函数: submit(), flush(), drain(), stats(), start(), stop()
+# 数据结构: 队列元素为 GenerationLog 列值 dict（id 在入队时生成）
+
+"""
+GenerationLog 写后队列
+
+原实现每次 LLM 调用结束都在回调里新开 Session、插入一行并 commit，
+这发生在 /api/agent/stream 的事件循环上，SQLite 的 fsync 直接算进流式输出的延迟。
+
+现在：
+- submit() 只把行数据放进内存队列（任意线程可调用，不触碰数据库）
+- 后台 flusher 每凑满 batch_size 条或每 flush_interval_ms 毫秒，在线程池中一次批量 INSERT + commit
+  （prompt 正文经 core.prompt_blob_store 去重后存入 prompt_blobs）
+- 队列有上限 max_queue：在事件循环线程上溢出时丢弃最旧的一条（不阻塞流式输出）；
+  在其他线程上溢出时由调用方同步写出当前队列（背压）；两者都计入 stats()
+- 未启动（脚本 / 测试 / 未运行事件循环）时 submit() 直接同步写入，行为与原实现一致
+- stop() 会把剩余队列全部写出；读日志的接口先 drain() 保证能看到刚产生的日志
+"""
+
+from __future__ import annotations
+
+import asyncio
+import logging
+import threading
+from collections import deque
+from typing import Any, Callable, Optional
+
+from sqlalchemy import insert
+from sqlalchemy.orm import Session
+
+from core.config import settings
+from core.database import get_session_maker
+from core.prompt_blob_store import externalize_log_rows
+
+logger = logging.getLogger("generation_log_sink")
+
+
+class GenerationLogSink:
+    """GenerationLog 的有界写后队列（见模块说明）。"""
+
+    def __init__(
+        self,
+        session_factory: Optional[Callable[[], Session]] = None,
+        *,
+        batch_size: Optional[int] = None,
+        flush_interval_ms: Optional[int] = None,
+        max_queue: Optional[int] = None,
+    ):
+        self._session_factory = session_factory
+        self._batch_size = batch_size
+        self._flush_interval_ms = flush_interval_ms
+        self._max_queue = max_queue
+        self._lock = threading.Lock()
+        # 同一时刻只有一个线程在写库（保证批次按入队顺序落库）
+        self._write_lock = threading.Lock()
+        self._queue: "deque[dict[str, Any]]" = deque()
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self._loop_thread_id: Optional[int] = None
+        self._wake_event: Optional[asyncio.Event] = None
+        self._task: Optional[asyncio.Task] = None
+        self._stopping = False
+        self._counters = {
+            "submitted": 0,
+            "written": 0,
+            "dropped": 0,
+            "failed": 0,
+            "batches": 0,
+            "backpressure_flushes": 0,
+        }
+
+    def _session(self) -> Session:
+        factory = self._session_factory or get_session_maker()
+        return factory()
+
+    @property
+    def batch_size(self) -> int:
+        return max(1, int(self._batch_size or settings.generation_log_batch_size or 1))
+
+    @property
+    def flush_interval_seconds(self) -> float:
+        interval = self._flush_interval_ms
+        if interval is None:
+            interval = settings.generation_log_flush_interval_ms
+        return max(0.0, float(interval)) / 1000
+
+    @property
+    def max_queue(self) -> int:
+        return max(1, int(self._max_queue or settings.generation_log_max_queue or 1))
+
+    @property
+    def running(self) -> bool:
+        return self._task is not None and not self._task.done()
+
+    @property
+    def pending_count(self) -> int:
+        return len(self._queue)
+
+    def stats(self) -> dict[str, Any]:
+        """队列计数（累计值）与当前积压。"""
+        with self._lock:
+            return {
+                **self._counters,
+                "pending": len(self._queue),
+                "max_queue": self.max_queue,
+                "running": self.running,
+            }
+
+    # ---------- 生产端 ----------
+
+    def submit(self, row: dict[str, Any], *, db: Optional[Session] = None) -> None:
+        """
+        入队一条 GenerationLog（列名 → 值）。
+
+        未运行 flusher 时同步写入：给出 db 则加入该 Session（随调用方的事务提交），否则新开 Session 写入。
+        队列溢出时按所在线程丢弃最旧一条或同步写出（见模块说明）。
+        """
+        from core.models.base import generate_uuid
+
+        row = dict(row)
+        row.setdefault("id", generate_uuid())
+        with self._lock:
+            self._counters["submitted"] += 1
+        if not self.running:
+            if db is None:
+                self._write([row])
+            else:
+                from core.models.generation_log import GenerationLog
+                externalize_log_rows(db, [row])
+                db.add(GenerationLog(**row))
+            return
+
+        backpressure = False
+        with self._lock:
+            if len(self._queue) >= self.max_queue:
+                if threading.get_ident() == self._loop_thread_id:
+                    self._queue.popleft()
+                    self._counters["dropped"] += 1
+                    if self._counters["dropped"] % 100 == 1:
+                        logger.warning(
+                            "[generation_log] 队列已满（%d），丢弃最旧的日志；累计丢弃 %d 条",
+                            self.max_queue, self._counters["dropped"],
+                        )
+                else:
+                    backpressure = True
+                    self._counters["backpressure_flushes"] += 1
+            self._queue.append(row)
+            full_batch = len(self._queue) >= self.batch_size
+
+        if backpressure:
+            self.drain()
+        elif full_batch:
+            self._wake()
+
+    def _wake(self) -> None:
+        loop, event = self._loop, self._wake_event
+        if loop is not None and event is not None:
+            try:
+                loop.call_soon_threadsafe(event.set)
+            except RuntimeError:
+                pass
+
+    # ---------- 写入 ----------
+
+    def _take(self) -> list[dict[str, Any]]:
+        with self._lock:
+            count = min(self.batch_size, len(self._queue))
+            return [self._queue.popleft() for _ in range(count)]
+
+    def _write(self, rows: list[dict[str, Any]]) -> int:
+        """一次批量 INSERT 写入多行；失败只记日志（日志丢失不能影响主流程）。"""
+        if not rows:
+            return 0
+        from core.models.generation_log import GenerationLog
+
+        db = self._session()
+        try:
+            # prompt 正文去重存入 prompt_blobs，与日志行同一事务提交
+            externalize_log_rows(db, rows)
+            db.execute(insert(GenerationLog), rows)
+            db.commit()
+        except Exception as e:
+            db.rollback()
+            with self._lock:
+                self._counters["failed"] += len(rows)
+            logger.warning("[generation_log] 批量写入 %d 条日志失败: %s", len(rows), e)
+            return 0
+        finally:
+            db.close()
+        with self._lock:
+            self._counters["written"] += len(rows)
+            self._counters["batches"] += 1
+        return len(rows)
+
+    def drain(self) -> int:
+        """同步写出当前队列中的全部日志（可在任意非事件循环线程调用），返回写入条数。"""
+        written = 0
+        with self._write_lock:
+            while True:
+                rows = self._take()
+                if not rows:
+                    return written
+                written += self._write(rows)
+
+    async def flush(self) -> int:
+        """在线程池中写出当前队列中的全部日志，返回写入条数。"""
+        if not self._queue:
+            return 0
+        return await asyncio.to_thread(self.drain)
+
+    # ---------- 后台 flusher ----------
+
+    async def _run(self) -> None:
+        event = self._wake_event
+        assert event is not None
+        while not self._stopping:
+            try:
+                event.clear()
+                if len(self._queue) < self.batch_size:
+                    try:
+                        await asyncio.wait_for(event.wait(), timeout=self.flush_interval_seconds)
+                    except asyncio.TimeoutError:
+                        pass
+                await self.flush()
+            except asyncio.CancelledError:
+                raise
+            except Exception:  # pragma: no cover - 单批失败不能让队列停摆
+                logger.exception("[generation_log] 后台写入失败")
+                await asyncio.sleep(1.0)
+
+    async def start(self) -> None:
+        """在当前事件循环启动后台 flusher（重复调用无副作用）。"""
+        if self._task is not None:
+            return
+        self._stopping = False
+        self._loop = asyncio.get_running_loop()
+        self._loop_thread_id = threading.get_ident()
+        self._wake_event = asyncio.Event()
+        self._task = asyncio.create_task(self._run(), name="generation-log-sink")
+
+    async def stop(self) -> None:
+        """停止 flusher 并写出剩余日志。"""
+        task, self._task = self._task, None
+        self._stopping = True
+        if self._wake_event is not None:
+            self._wake_event.set()
+        if task is not None:
+            task.cancel()
+            await asyncio.gather(task, return_exceptions=True)
+        self._loop = None
+        self._loop_thread_id = None
+        self._wake_event = None
+        await asyncio.to_thread(self.drain)
+
+
+generation_log_sink = GenerationLogSink()
@@ -1,8 +1,12 @@
 # backend/core/llm.py
 # 功能: 统一的 LLM 实例管理，支持 OpenAI、Anthropic 和 Google Gemini
-# 主要导出: llm (主模型), llm_mini (轻量模型), get_chat_model()
+# 主要导出: llm (主模型), llm_mini (轻量模型), get_chat_model(), resolve_chat_model_config(), clear_chat_model_cache(),
+#           close_http_clients()
 # 设计: 通过 LLM_PROVIDER 环境变量切换全局默认 provider；
 #        传入具体 model 名时，自动根据前缀判断 provider（claude-* → Anthropic，gemini-* → Google，其余 → OpenAI）
+#        get_chat_model() 按 (provider, model, temperature, streaming, timeout, 凭据) 缓存实例（按事件循环隔离的 LRU），
+#        OpenAI 系实例共享每个事件循环一个连接池化的 httpx.AsyncClient；
+#        llm_compat.invalidate_model_cache() 会同时清空该缓存；应用 shutdown 时 close_http_clients() 关闭连接池
 #
 # 支持的 provider:
 # 1. openai  — ChatOpenAI（支持 OpenAI 直连和 OpenRouter）
@@ -30,7 +34,10 @@
     response = await llm_with_tools.ainvoke(messages)
 """
 
-from typing import Callable
+import threading
+import weakref
+from collections import OrderedDict
+from typing import Any, Callable
 
 from langchain_core.language_models.chat_models import BaseChatModel
 from core.config import settings
@@ -65,6 +72,118 @@ def _infer_provider(model: str) -> str:
     return "openai"
 
 
+# ============== 客户端缓存 ==============
+#
+# 实例按事件循环隔离：httpx.AsyncClient 的连接绑定创建它的事件循环，
+# 后台线程里 asyncio.run() 起的新循环不能复用主循环的连接。
+# 循环被回收后，WeakKeyDictionary 中对应的缓存自动消失。
+
+_CACHE_LOCK = threading.Lock()
+_NO_LOOP = object()  # 非事件循环上下文（同步调用 / import 期）的缓存分区
+_LOOP_MODEL_CACHES: "weakref.WeakKeyDictionary[Any, OrderedDict]" = weakref.WeakKeyDictionary()
+_NO_LOOP_MODEL_CACHE: "OrderedDict[tuple, BaseChatModel]" = OrderedDict()
+_LOOP_HTTP_CLIENTS: "weakref.WeakKeyDictionary[Any, dict]" = weakref.WeakKeyDictionary()
+_SYNC_HTTP_CLIENTS: dict = {}
+
+
+def _current_loop():
+    try:
+        import asyncio
+        return asyncio.get_running_loop()
+    except RuntimeError:
+        return _NO_LOOP
+
+
+def _model_cache_for(loop) -> "OrderedDict[tuple, BaseChatModel]":
+    if loop is _NO_LOOP:
+        return _NO_LOOP_MODEL_CACHE
+    cache = _LOOP_MODEL_CACHES.get(loop)
+    if cache is None:
+        cache = OrderedDict()
+        _LOOP_MODEL_CACHES[loop] = cache
+    return cache
+
+
+def _http_limits():
+    import httpx
+    return httpx.Limits(
+        max_connections=max(1, settings.llm_http_max_connections),
+        max_keepalive_connections=max(0, settings.llm_http_max_keepalive),
+    )
+
+
+def _shared_openai_http_clients(base_url: str | None, timeout: float, loop) -> tuple[Any, Any]:
+    """
+    返回 (httpx.Client, httpx.AsyncClient)：同步客户端进程级共享，
+    异步客户端按事件循环共享；同一 provider+base_url 只维持一个连接池。
+    loop 为 _NO_LOOP 时不返回异步客户端。
+    """
+    import httpx
+
+    key = ("openai", base_url or "", timeout)
+    with _CACHE_LOCK:
+        sync_client = _SYNC_HTTP_CLIENTS.get(key)
+        if sync_client is None:
+            sync_client = httpx.Client(timeout=timeout, limits=_http_limits())
+            _SYNC_HTTP_CLIENTS[key] = sync_client
+        if loop is _NO_LOOP:
+            # 无运行中的循环：不预绑定异步客户端，交给 SDK 在首次异步调用时按需创建
+            return sync_client, None
+        loop_clients = _LOOP_HTTP_CLIENTS.get(loop)
+        if loop_clients is None:
+            loop_clients = {}
+            _LOOP_HTTP_CLIENTS[loop] = loop_clients
+        async_client = loop_clients.get(key)
+        if async_client is None:
+            async_client = httpx.AsyncClient(timeout=timeout, limits=_http_limits())
+            loop_clients[key] = async_client
+    return sync_client, async_client
+
+
+def _freeze_kwargs(kwargs: dict) -> tuple | None:
+    """把额外参数转为可哈希缓存键；含不可哈希值（如 callbacks 列表）时返回 None 表示不缓存。"""
+    items = []
+    for k in sorted(kwargs):
+        v = kwargs[k]
+        try:
+            hash(v)
+        except TypeError:
+            return None
+        items.append((k, v))
+    return tuple(items)
+
+
+def clear_chat_model_cache() -> None:
+    """
+    清空模型实例缓存（模型默认值 / 凭据变化时由 llm_compat.invalidate_model_cache 调用）。
+    共享的 httpx 连接池保留：它们与模型无关，只与 provider + base_url 相关。
+    """
+    with _CACHE_LOCK:
+        _NO_LOOP_MODEL_CACHE.clear()
+        for cache in list(_LOOP_MODEL_CACHES.values()):
+            cache.clear()
+
+
+async def close_http_clients() -> None:
+    """
+    关闭当前事件循环的共享 httpx.AsyncClient（应用 shutdown 时在主事件循环上调用）。
+
+    绑定这些客户端的模型实例同时清出缓存，之后再调用 get_chat_model() 会按需重建连接池。
+    其他事件循环（后台线程 asyncio.run）的 AsyncClient 随循环回收，无法在这里 await；
+    进程级共享的同步 httpx.Client 不受影响。
+    """
+    loop = _current_loop()
+    if loop is _NO_LOOP:
+        return
+    with _CACHE_LOCK:
+        clients = list((_LOOP_HTTP_CLIENTS.pop(loop, None) or {}).values())
+        cache = _LOOP_MODEL_CACHES.get(loop)
+        if cache is not None:
+            cache.clear()
+    for client in clients:
+        await client.aclose()
+
+
 def get_chat_model(
     model: str = None,
     temperature: float = 0.7,
@@ -72,7 +191,11 @@ def get_chat_model(
     **kwargs,
 ) -> BaseChatModel:
     """
-    获取 LLM 实例。
+    获取 LLM 实例（带缓存）。
+
+    同一事件循环内，相同 (provider, model, temperature, streaming, timeout, 凭据, kwargs)
+    返回同一实例，复用其底层连接；kwargs 含不可哈希值（如 callbacks）时不缓存。
+    返回的实例是共享的，调用方不得修改其属性（需要变体请用 bind / with_config）。
 
     provider 判断逻辑：
       1. 传入了 model 参数 → 根据模型名前缀自动判断（claude-* → Anthropic，gemini-* → Google，其余 → OpenAI）
@@ -87,19 +210,102 @@ def get_chat_model(
     Returns:
         BaseChatModel 实例（ChatOpenAI、ChatAnthropic 或 ChatGoogleGenerativeAI）
     """
-    if model:
-        provider = _infer_provider(model)
-    else:
-        provider = (settings.llm_provider or "openai").lower().strip()
+    provider = _resolve_provider(model)
 
     # 统一超时配置（从 .env 读取，默认 300s，思考模型友好）
     timeout = float(settings.llm_timeout or 300)
 
+    loop = _current_loop()
+    frozen_kwargs = _freeze_kwargs(kwargs)
+    if frozen_kwargs is None:
+        return _build_chat_model(provider, model, temperature, streaming, timeout, kwargs, loop)
+
+    cache_key = (
+        provider,
+        model or "",
+        float(temperature),
+        bool(streaming),
+        timeout,
+        _provider_credentials_key(provider),
+        frozen_kwargs,
+    )
+    with _CACHE_LOCK:
+        cache = _model_cache_for(loop)
+        cached = cache.get(cache_key)
+        if cached is not None:
+            cache.move_to_end(cache_key)
+            return cached
+
+    instance = _build_chat_model(provider, model, temperature, streaming, timeout, kwargs, loop)
+    with _CACHE_LOCK:
+        cache = _model_cache_for(loop)
+        cached = cache.get(cache_key)
+        if cached is not None:
+            return cached
+        cache[cache_key] = instance
+        while len(cache) > max(1, settings.llm_client_cache_size):
+            cache.popitem(last=False)
+    return instance
+
+
+def _resolve_provider(model: str | None) -> str:
+    """传入 model 时按前缀推断 provider，否则沿用全局 LLM_PROVIDER。"""
+    if model:
+        return _infer_provider(model)
+    return (settings.llm_provider or "openai").lower().strip()
+
+
+def _default_model(provider: str) -> str:
+    """未传 model 时各 provider 实际使用的模型名。"""
+    if provider == "anthropic":
+        return settings.anthropic_model or "claude-opus-4-6"
+    if provider == "google":
+        return settings.google_model or "gemini-3.1-pro-preview"
+    return settings.openai_model or "gpt-4o"
+
+
+def resolve_chat_model_config(model: str | None = None, temperature: float = 0.7) -> dict[str, Any]:
+    """get_chat_model(model, temperature) 实际会使用的 provider / 模型名 / 温度（不构造实例，不需要凭据）。"""
+    provider = _resolve_provider(model)
+    return {
+        "provider": provider,
+        "model": model or _default_model(provider),
+        "temperature": float(temperature),
+    }
+
+
+def _provider_credentials_key(provider: str) -> tuple:
+    """凭据 / 端点 / 默认模型也进入缓存键：运行时改配置后不会拿到旧实例。"""
+    if provider == "anthropic":
+        return (settings.anthropic_api_key, settings.anthropic_model)
+    if provider == "google":
+        return (settings.google_api_key, settings.google_model, settings.google_thinking_budget)
+    return (
+        settings.openai_api_key,
+        settings.openai_api_base,
+        settings.openai_org_id,
+        settings.openai_model,
+    )
+
+
+def _build_chat_model(
+    provider: str,
+    model: str | None,
+    temperature: float,
+    streaming: bool,
+    timeout: float,
+    kwargs: dict,
+    loop=_NO_LOOP,
+) -> BaseChatModel:
+    """
+    按 provider 构造新的模型实例（不经过缓存）。
+    loop 决定 OpenAI 系实例绑定哪个事件循环的共享 AsyncClient（_NO_LOOP 则交给 SDK 默认）。
+    """
     if provider == "anthropic":
         from langchain_anthropic import ChatAnthropic
 
         return ChatAnthropic(
-            model=model or settings.anthropic_model or "claude-opus-4-6",
+            model=model or _default_model(provider),
             api_key=settings.anthropic_api_key,
             temperature=temperature,
             streaming=streaming,
@@ -122,7 +328,7 @@ def get_chat_model(
             thinking_kwargs["thinking_budget"] = thinking_budget
 
         return ChatGoogleGenerativeAI(
-            model=model or settings.google_model or "gemini-3.1-pro-preview",
+            model=model or _default_model(provider),
             google_api_key=settings.google_api_key,
             temperature=temperature,
             streaming=streaming,
@@ -136,8 +342,17 @@ def get_chat_model(
         # 默认: OpenAI（也支持 OpenRouter 等 OpenAI 兼容 API）
         from langchain_openai import ChatOpenAI
 
+        client_kwargs = {}
+        if "http_client" not in kwargs and "http_async_client" not in kwargs:
+            sync_client, async_client = _shared_openai_http_clients(
+                settings.openai_api_base or None, timeout, loop,
+            )
+            client_kwargs["http_client"] = sync_client
+            if async_client is not None:
+                client_kwargs["http_async_client"] = async_client
+
         return ChatOpenAI(
-            model=model or settings.openai_model or "gpt-4o",
+            model=model or _default_model(provider),
             api_key=settings.openai_api_key,
             base_url=settings.openai_api_base or None,
             organization=settings.openai_org_id or None,
@@ -146,6 +361,7 @@ def get_chat_model(
             timeout=timeout,
             max_retries=3,
             max_tokens=16384,
+            **client_kwargs,
             **kwargs,
         )
 
@@ -194,6 +410,18 @@ def _is_retryable(error: Exception) -> bool:
     return False
 
 
+_RATE_LIMITED_PATTERNS = ("rate_limit", "rate limit", "too many requests", "overloaded", "resource_exhausted")
+
+
+def _is_rate_limited(error: Exception) -> bool:
+    """判断异常是否为限流 / 过载（需要整个模型分桶一起退避，而不只是当前调用）。"""
+    status = getattr(error, "status_code", None) or getattr(error, "status", None)
+    if status in (429, 529):
+        return True
+    err_str = str(error).lower()
+    return any(pattern in err_str for pattern in _RATE_LIMITED_PATTERNS)
+
+
 def parse_llm_error(error: Exception) -> str:
     """
     将 LLM API 原始异常转为用户友好的中文错误信息。
@@ -320,12 +548,14 @@ async def ainvoke_with_retry(
     *,
     max_retries: int = 3,
     base_delay: float = 5.0,
+    priority: int | None = None,
     **kwargs,
 ):
     """
     带指数退避重试的 ainvoke 调用。
 
-    对瞬态错误（overloaded / rate_limit / 503 等）自动重试，
+    每次请求前先向 core.llm_rate_limiter 申请额度（按 provider+model 分桶、按优先级排队），
+    对瞬态错误（overloaded / rate_limit / 503 等）自动重试，限流类错误会让整个分桶一起冷却，
     对 Gemini thinking_budget 参数错误，去掉该参数后重试一次，
     对其他错误直接抛出（parse_llm_error 友好化）。
 
@@ -334,14 +564,23 @@ async def ainvoke_with_retry(
         messages: 消息列表
         max_retries: 最大重试次数（不含首次调用）
         base_delay: 初始退避延迟（秒），每次翻倍
+        priority: 调度优先级（PRIORITY_*），默认取当前上下文的 llm_priority
         **kwargs: 传给 ainvoke 的额外参数（如 config）
     """
+    from core.llm_rate_limiter import estimate_message_tokens, limiter_key_for_model, rate_limiter, usage_tokens
+
+    limiter_key = limiter_key_for_model(chat_model)
+    estimated_tokens = estimate_message_tokens(messages)
     _thinking_budget_fallback_done = False
     last_error = None
     for attempt in range(1 + max_retries):
+        lease = await rate_limiter.acquire(limiter_key, priority=priority, estimated_tokens=estimated_tokens)
         try:
-            return await chat_model.ainvoke(messages, **kwargs)
+            response = await chat_model.ainvoke(messages, **kwargs)
+            lease.release(usage_tokens(response))
+            return response
         except Exception as e:
+            lease.release()
             last_error = e
             # Gemini thinking_budget 参数不兼容：去掉参数重试一次
             if not _thinking_budget_fallback_done and _is_thinking_budget_error(e):
@@ -357,9 +596,13 @@ async def ainvoke_with_retry(
                     "[llm_retry] 瞬态错误 (attempt %d/%d): %s — 等待 %.1fs 后重试",
                     attempt + 1, 1 + max_retries, type(e).__name__, delay,
                 )
+                if _is_rate_limited(e):
+                    rate_limiter.penalize(limiter_key, delay)
                 await asyncio.sleep(delay)
             else:
                 raise
+        finally:
+            lease.release()
 
     # 不会执行到这里，但作为防御
     raise last_error  # type: ignore
@@ -371,23 +614,36 @@ async def astream_with_retry(
     *,
     max_retries: int = 3,
     base_delay: float = 5.0,
+    priority: int | None = None,
 ):
     """
     带指数退避重试的 astream 调用。
 
+    与 ainvoke_with_retry 一样先申请调度额度，整个流式输出期间占用一个并发位。
     仅在流尚未产出任何 chunk 时重试（出错 → 重新发起整个请求）。
     一旦已产出 chunk 就不再重试（避免内容重复）。
 
     Yields:
         LLM chunk（与 chat_model.astream 一致）
     """
+    from core.llm_rate_limiter import estimate_message_tokens, limiter_key_for_model, rate_limiter, usage_tokens
+
+    limiter_key = limiter_key_for_model(chat_model)
+    estimated_tokens = estimate_message_tokens(messages)
     last_error = None
     for attempt in range(1 + max_retries):
+        lease = await rate_limiter.acquire(limiter_key, priority=priority, estimated_tokens=estimated_tokens)
+        streamed_tokens = None
         try:
             async for chunk in chat_model.astream(messages):
+                chunk_tokens = usage_tokens(chunk)
+                if chunk_tokens:
+                    streamed_tokens = (streamed_tokens or 0) + chunk_tokens
                 yield chunk
+            lease.release(streamed_tokens)
             return  # 流正常结束
         except Exception as e:
+            lease.release()
             last_error = e
             if attempt < max_retries and _is_retryable(e):
                 delay = base_delay * (2 ** attempt)
@@ -395,9 +651,14 @@ async def astream_with_retry(
                     "[llm_retry] 流式瞬态错误 (attempt %d/%d): %s — 等待 %.1fs 后重试",
                     attempt + 1, 1 + max_retries, type(e).__name__, delay,
                 )
+                if _is_rate_limited(e):
+                    rate_limiter.penalize(limiter_key, delay)
                 await asyncio.sleep(delay)
             else:
                 raise
+        finally:
+            # 调用方提前关闭生成器（GeneratorExit）时同样归还并发位
+            lease.release()
 
     raise last_error  # type: ignore
 
@@ -406,24 +667,30 @@ async def astream_with_retry(
 
 _provider = (settings.llm_provider or "openai").lower().strip()
 
+def _build_unbound_model(model: str | None, temperature: float) -> BaseChatModel:
+    """
+    构造进程级全局实例（llm / llm_mini）。它们会被多个事件循环（含后台线程的
+    asyncio.run）共用，因此不绑定任何循环的共享 AsyncClient，也不进入按循环缓存。
+    """
+    return _build_chat_model(
+        _resolve_provider(model),
+        model,
+        temperature,
+        True,
+        float(settings.llm_timeout or 300),
+        {},
+    )
+
+
 def _build_mini_model() -> BaseChatModel:
     if _provider == "anthropic":
-        return get_chat_model(
-            model=settings.anthropic_mini_model or "claude-sonnet-4-6",
-            temperature=0.3,
-        )
+        return _build_unbound_model(settings.anthropic_mini_model or "claude-sonnet-4-6", 0.3)
     if _provider == "google":
-        return get_chat_model(
-            model=settings.google_mini_model or "gemini-3-flash-preview",
-            temperature=0.3,
-        )
-    return get_chat_model(
-        model=settings.openai_mini_model or "gpt-4o-mini",
-        temperature=0.3,
-    )
+        return _build_unbound_model(settings.google_mini_model or "gemini-3-flash-preview", 0.3)
+    return _build_unbound_model(settings.openai_mini_model or "gpt-4o-mini", 0.3)
 
 # 主模型：用于 Agent 决策、内容生成、修改等
-llm = LazyChatModel(lambda: get_chat_model())
+llm = LazyChatModel(lambda: _build_unbound_model(None, 0.7))
 
 # 轻量模型：用于摘要、分类等简单任务（成本更低）
 llm_mini = LazyChatModel(_build_mini_model)
@@ -1,6 +1,7 @@
 # backend/core/llm_compat.py
 # 功能: LLM Provider 兼容性工具函数 + 模型选择覆盖链
-# 主要导出: normalize_content, get_stop_reason, get_model_name, sanitize_messages, resolve_model
+# 主要导出: normalize_content, get_stop_reason, get_model_name, sanitize_messages, resolve_model,
+#   apply_prompt_cache_breakpoints
 # 设计: 屏蔽 OpenAI / Anthropic / Google 返回值差异，让下游代码无需感知 Provider；
 #        resolve_model() 实现 "内容块覆盖 → 用户全局默认 → .env" 三级回退链
 
@@ -205,6 +206,70 @@ def _repair_tool_pairs(messages: List[BaseMessage]) -> List[BaseMessage]:
     return repaired
 
 
+# ============== Prompt caching 断点 ==============
+
+# Anthropic 每次请求最多 4 个缓存断点；这里最多使用 3 个（system 两段 + 最新消息）
+PROMPT_CACHE_CONTROL = {"type": "ephemeral"}
+
+
+def _with_cache_control(content: Any) -> Any:
+    """返回在最后一个内容块上标记 cache_control 的 content 副本；无法标记时原样返回。"""
+    if isinstance(content, str):
+        if not content:
+            return content
+        return [{"type": "text", "text": content, "cache_control": PROMPT_CACHE_CONTROL}]
+    if isinstance(content, list) and content and isinstance(content[-1], dict):
+        return [*content[:-1], {**content[-1], "cache_control": PROMPT_CACHE_CONTROL}]
+    return content
+
+
+def apply_prompt_cache_breakpoints(
+    messages: List[BaseMessage],
+    *,
+    system_segments: Any,
+    provider: str,
+) -> List[BaseMessage]:
+    """
+    为支持显式缓存断点的 provider 标记 prompt caching 断点。
+
+    Args:
+        messages: sanitize_messages 之后的消息列表（首条为 SystemMessage）
+        system_segments: 分段 system prompt（需提供 cacheable 前缀段列表与 text()），
+                         如 core.orchestrator.SystemPromptSegments
+        provider: "anthropic" / "openai" / "google"
+
+    对 Anthropic:
+      - 首条 SystemMessage 改为多个 text 块，在每个可缓存段（stable / project）末尾打断点
+        （Anthropic 缓存前缀顺序为 tools → system → messages，第一个断点同时覆盖工具定义）
+      - 在最后一条 Human / Tool 消息上打断点，工具循环的下一跳可复用整段历史
+    其他 provider: 原样返回（OpenAI / Gemini 对稳定前缀自动缓存）。
+    不修改传入的消息对象。
+    """
+    if provider != "anthropic" or not messages or not isinstance(messages[0], SystemMessage):
+        return messages
+
+    blocks: list[dict] = [
+        {"type": "text", "text": segment, "cache_control": PROMPT_CACHE_CONTROL}
+        for segment in system_segments.cacheable
+    ]
+    prefix = "\n\n".join(system_segments.cacheable)
+    system_text = normalize_content(messages[0].content)
+    if not blocks or not system_text.startswith(prefix):
+        # system 已被改写（如合并了历史中的 SystemMessage），不再对应分段
+        return messages
+    rest = system_text[len(prefix):].lstrip("\n")
+    if rest:
+        blocks.append({"type": "text", "text": rest})
+
+    result = [SystemMessage(content=blocks)] + list(messages[1:])
+    last = result[-1]
+    if len(result) > 1 and last.type in ("human", "tool"):
+        content = _with_cache_control(last.content)
+        if content is not last.content:
+            result[-1] = last.model_copy(update={"content": content})
+    return result
+
+
 # ============== Provider 推断 ==============
 
 def _infer_provider(model: str) -> str:
@@ -238,10 +303,10 @@ def _get_agent_settings_model(use_mini: bool = False) -> Optional[str]:
 
     # 缓存过期或不存在，查 DB
     try:
-        from core.database import get_session_maker
+        from core.database import get_read_session_maker
         from core.models.agent_settings import AgentSettings
 
-        SessionLocal = get_session_maker()
+        SessionLocal = get_read_session_maker()
         db = SessionLocal()
         try:
             row = db.query(AgentSettings).filter(AgentSettings.name == "default").first()
@@ -275,10 +340,14 @@ def invalidate_model_cache() -> None:
     """
     使模型缓存立即失效。
     在 AgentSettings 更新 default_model / default_mini_model 时调用。
+    同时清空 core.llm 的模型实例缓存，下一次 get_chat_model() 按新配置重建。
     """
     global _agent_settings_cache
     _agent_settings_cache = {}
 
+    from core.llm import clear_chat_model_cache
+    clear_chat_model_cache()
+
 
 def resolve_model(
     model_override: Optional[str] = None,
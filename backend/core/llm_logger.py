@@ -1,10 +1,11 @@
 # backend/core/llm_logger.py
-# 功能: LangChain 回调处理器，自动记录每次 LLM 调用到 GenerationLog
+# 功能: LangChain 回调处理器，自动记录每次 LLM 调用到 GenerationLog（经 generation_log_sink 批量写入）
 # 设计: 作为全局 callback 注入 LLM 实例，无需在每个调用点手动记录
 # 关键: 这是调试日志记录的根本解决方案
 # 数据结构:
 #   prompt_input: JSON 数组，每项 {"role": str, "content": str, "tool_calls"?: list}
 #   prompt_output: 完整的 LLM 输出文本（含 tool_calls JSON）
+#   cache_read_tokens / cache_creation_tokens: provider 端 prompt 缓存命中 / 写入的输入 token
 
 """
 LLM 调用日志回调
@@ -13,7 +14,7 @@ LLM 调用日志回调
 都会自动创建一条 GenerationLog 记录，包含：
 - 输入: 完整的 messages 数组（JSON 格式，不截断）
 - 输出: 完整的 LLM 响应内容
-- token 数（优先使用 API 返回值，否则估算）
+- token 数（优先使用 API 返回值，否则估算；含 prompt 缓存命中 / 写入 token）
 - 耗时
 - 成本
 - 操作类型
@@ -84,9 +85,52 @@ def _serialize_messages(messages: List[List[BaseMessage]]) -> str:
     return json.dumps(result, ensure_ascii=False)
 
 
+def _extract_usage(response: LLMResult) -> Dict[str, int]:
+    """
+    提取 token 使用量（含 prompt 缓存命中 / 写入）。
+
+    优先读 AIMessage.usage_metadata（LangChain 统一格式，流式调用也有）；
+    否则回退到 llm_output：OpenAI 的 token_usage（prompt_tokens_details.cached_tokens）
+    或 Anthropic 的 usage（cache_read_input_tokens / cache_creation_input_tokens，input_tokens 不含缓存部分）。
+    tokens_in 始终为输入总量（含缓存部分）。
+    """
+    usage = {"tokens_in": 0, "tokens_out": 0, "cache_read_tokens": 0, "cache_creation_tokens": 0}
+
+    message = None
+    if response.generations and response.generations[0]:
+        message = getattr(response.generations[0][0], "message", None)
+    metadata = getattr(message, "usage_metadata", None) or {}
+    if metadata:
+        details = metadata.get("input_token_details") or {}
+        usage["tokens_in"] = int(metadata.get("input_tokens") or 0)
+        usage["tokens_out"] = int(metadata.get("output_tokens") or 0)
+        usage["cache_read_tokens"] = int(details.get("cache_read") or 0)
+        usage["cache_creation_tokens"] = int(details.get("cache_creation") or 0)
+        return usage
+
+    llm_output = response.llm_output or {}
+    token_usage = llm_output.get("token_usage") or {}
+    if token_usage:
+        details = token_usage.get("prompt_tokens_details") or {}
+        usage["tokens_in"] = int(token_usage.get("prompt_tokens") or 0)
+        usage["tokens_out"] = int(token_usage.get("completion_tokens") or 0)
+        usage["cache_read_tokens"] = int(details.get("cached_tokens") or 0)
+        return usage
+
+    anthropic_usage = llm_output.get("usage") or {}
+    if isinstance(anthropic_usage, dict) and anthropic_usage:
+        cache_read = int(anthropic_usage.get("cache_read_input_tokens") or 0)
+        cache_creation = int(anthropic_usage.get("cache_creation_input_tokens") or 0)
+        usage["tokens_in"] = int(anthropic_usage.get("input_tokens") or 0) + cache_read + cache_creation
+        usage["tokens_out"] = int(anthropic_usage.get("output_tokens") or 0)
+        usage["cache_read_tokens"] = cache_read
+        usage["cache_creation_tokens"] = cache_creation
+    return usage
+
+
 class GenerationLogCallback(AsyncCallbackHandler):
     """
-    异步回调：每次 LLM 调用结束后写入 GenerationLog。
+    异步回调：每次 LLM 调用结束后把 GenerationLog 交给写后队列（不在回调中访问数据库）。
     
     使用方式：
         llm = get_chat_model(callbacks=[GenerationLogCallback(project_id="xxx")])
@@ -143,8 +187,6 @@ class GenerationLogCallback(AsyncCallbackHandler):
             # 提取输出（不截断）
             output_text = ""
             model_name = "unknown"
-            tokens_in = 0
-            tokens_out = 0
 
             if response.generations:
                 gen = response.generations[0]
@@ -170,11 +212,15 @@ class GenerationLogCallback(AsyncCallbackHandler):
                                 output_text = f"[tool_calls] {tc_json}"
 
             # 提取 token 使用量（如果 LLM 提供了）
+            usage = _extract_usage(response)
+            tokens_in = usage["tokens_in"]
+            tokens_out = usage["tokens_out"]
             if response.llm_output:
-                usage = response.llm_output.get("token_usage", {})
-                tokens_in = usage.get("prompt_tokens", 0)
-                tokens_out = usage.get("completion_tokens", 0)
-                model_name = response.llm_output.get("model_name", "unknown")
+                model_name = (
+                    response.llm_output.get("model_name")
+                    or response.llm_output.get("model")
+                    or "unknown"
+                )
 
             # 如果没有 token 信息，估算
             if not tokens_in:
@@ -182,37 +228,35 @@ class GenerationLogCallback(AsyncCallbackHandler):
             if not tokens_out:
                 tokens_out = len(output_text) // 4
 
-            # 写入数据库（不截断 — Text 字段无长度限制）
-            from core.database import get_db
+            # 入队写后队列（不截断 — Text 字段无长度限制；批量落库，不在回调里 commit）
+            from core.generation_log_sink import generation_log_sink
             from core.models.generation_log import GenerationLog
-            from core.models.base import generate_uuid
-
-            db = next(get_db())
-            try:
-                gen_log = GenerationLog(
-                    id=generate_uuid(),
-                    project_id=self.project_id,
-                    field_id=self.field_id,
-                    phase=self.phase,
-                    operation=self.operation or "llm_call",
-                    model=model_name,
-                    tokens_in=tokens_in,
-                    tokens_out=tokens_out,
-                    duration_ms=duration_ms,
-                    prompt_input=input_text,
-                    prompt_output=output_text or "",
-                    cost=GenerationLog.calculate_cost(model_name, tokens_in, tokens_out),
-                    status="success",
-                )
-                db.add(gen_log)
-                db.commit()
-                logger.debug(
-                    "[llm_logger] logged: op=%s, model=%s, in=%d, out=%d, %dms, input_len=%d, output_len=%d",
-                    gen_log.operation, model_name, tokens_in, tokens_out, duration_ms,
-                    len(input_text), len(output_text),
-                )
-            finally:
-                db.close()
+
+            operation = self.operation or "llm_call"
+            generation_log_sink.submit({
+                "project_id": self.project_id,
+                "field_id": self.field_id,
+                "phase": self.phase,
+                "operation": operation,
+                "model": model_name,
+                "tokens_in": tokens_in,
+                "tokens_out": tokens_out,
+                "cache_read_tokens": usage["cache_read_tokens"],
+                "cache_creation_tokens": usage["cache_creation_tokens"],
+                "duration_ms": duration_ms,
+                "prompt_input": input_text,
+                "prompt_output": output_text or "",
+                "cost": GenerationLog.calculate_cost(model_name, tokens_in, tokens_out),
+                "status": "success",
+                "error_message": "",
+            })
+            logger.debug(
+                "[llm_logger] logged: op=%s, model=%s, in=%d (cache read=%d, write=%d), out=%d, %dms, "
+                "input_len=%d, output_len=%d",
+                operation, model_name, tokens_in, usage["cache_read_tokens"],
+                usage["cache_creation_tokens"], tokens_out, duration_ms,
+                len(input_text), len(output_text),
+            )
 
         except Exception as e:
             logger.warning("[llm_logger] failed to log GenerationLog: %s", e)
@@ -238,31 +282,24 @@ class GenerationLogCallback(AsyncCallbackHandler):
         duration_ms = int((time.time() - start_time) * 1000)
 
         try:
-            from core.database import get_db
-            from core.models.generation_log import GenerationLog
-            from core.models.base import generate_uuid
-
-            db = next(get_db())
-            try:
-                gen_log = GenerationLog(
-                    id=generate_uuid(),
-                    project_id=self.project_id,
-                    field_id=self.field_id,
-                    phase=self.phase,
-                    operation=self.operation or "llm_call",
-                    model="unknown",
-                    tokens_in=len(input_text) // 4,
-                    tokens_out=0,
-                    duration_ms=duration_ms,
-                    prompt_input=input_text,
-                    prompt_output="",
-                    cost=0.0,
-                    status="failed",
-                    error_message=str(error)[:1000],
-                )
-                db.add(gen_log)
-                db.commit()
-            finally:
-                db.close()
+            from core.generation_log_sink import generation_log_sink
+
+            generation_log_sink.submit({
+                "project_id": self.project_id,
+                "field_id": self.field_id,
+                "phase": self.phase,
+                "operation": self.operation or "llm_call",
+                "model": "unknown",
+                "tokens_in": len(input_text) // 4,
+                "tokens_out": 0,
+                "cache_read_tokens": 0,
+                "cache_creation_tokens": 0,
+                "duration_ms": duration_ms,
+                "prompt_input": input_text,
+                "prompt_output": "",
+                "cost": 0.0,
+                "status": "failed",
+                "error_message": str(error)[:1000],
+            })
         except Exception as e:
             logger.warning("[llm_logger] failed to log error: %s", e)
@@ -0,0 +1,441 @@
+# backend/core/llm_rate_limiter.py
+# 功能: 进程级 LLM 并发/速率调度器，按 provider+model 分桶（并发上限 + 每分钟请求数 + 每分钟 token 数），
+#       按优先级排队：实时对话 > 内容块生成 > Eval > 摘要/记忆等后台任务
+# 主要导出: rate_limiter (全局实例), LLMRateLimiter, RateLimits, llm_priority(), run_with_llm_priority(),
+#           iterate_with_llm_priority(),
+#           current_llm_priority(), estimate_message_tokens(), limiter_key_for_model(),
+#           PRIORITY_INTERACTIVE / PRIORITY_BLOCK / PRIORITY_EVAL / PRIORITY_BACKGROUND
+# 数据结构: 每个 (provider, model) 一个 _ModelLimiter（令牌桶 + 等待者小顶堆 + 429 冷却截止时间）
+#
+# 所有走 core.llm.ainvoke_with_retry / astream_with_retry 的调用都会先 acquire 再发请求。
+# 优先级通过 ContextVar 向下传递（asyncio.create_task 会复制上下文），调用方也可显式传 priority。
+
+"""
+LLM 调度器
+
+设计要点:
+- 严格优先级：同一模型只有堆顶等待者可以拿到额度，低优先级不会插队到高优先级前面
+- 低优先级只能占用部分并发（Eval 75%、后台 50%），保证大批量 Eval 跑满时实时对话仍有空位
+- token 预算按输入估算预扣，调用结束后按 usage_metadata 补扣输出 token（允许短暂透支）
+- 收到 429 时对整个模型分桶设置冷却期，所有调用方一起退避，而不是各自重试撞墙
+- 状态用 threading.Lock 保护、唤醒走 loop.call_soon_threadsafe，
+  后台线程里 asyncio.run() 起的事件循环也共享同一份额度
+
+配置（均可在 .env 覆盖，0 表示不限制）:
+    LLM_RATE_LIMIT_ENABLED=true
+    LLM_MAX_CONCURRENCY=16
+    LLM_REQUESTS_PER_MINUTE=0
+    LLM_TOKENS_PER_MINUTE=0
+    LLM_RATE_LIMIT_OVERRIDES={"anthropic": {"rpm": 50, "tpm": 80000}, "gpt-4o-mini": {"max_concurrency": 32}}
+"""
+
+from __future__ import annotations
+
+import asyncio
+import functools
+import heapq
+import itertools
+import json
+import logging
+import math
+import threading
+import time
+from contextlib import contextmanager
+from contextvars import ContextVar
+from dataclasses import dataclass
+from typing import Any, Callable, Iterator, Optional
+
+from core.config import settings
+
+logger = logging.getLogger("llm_rate_limiter")
+
+# ============== 优先级 ==============
+
+PRIORITY_INTERACTIVE = 0   # 实时对话（Agent 聊天）
+PRIORITY_BLOCK = 1         # 内容块生成（默认）
+PRIORITY_EVAL = 2          # Eval 试验 / 评分
+PRIORITY_BACKGROUND = 3    # 摘要、记忆提炼等后台任务
+
+PRIORITY_NAMES = {
+    PRIORITY_INTERACTIVE: "interactive",
+    PRIORITY_BLOCK: "block",
+    PRIORITY_EVAL: "eval",
+    PRIORITY_BACKGROUND: "background",
+}
+
+# 各优先级最多可占用的并发比例（向上取整，至少 1）
+_PRIORITY_CONCURRENCY_SHARE = {
+    PRIORITY_INTERACTIVE: 1.0,
+    PRIORITY_BLOCK: 1.0,
+    PRIORITY_EVAL: 0.75,
+    PRIORITY_BACKGROUND: 0.5,
+}
+
+# 等待者最长休眠间隔：即使错过唤醒也会定期自检，避免永久挂起
+_MAX_WAIT_SLICE = 5.0
+
+_CURRENT_PRIORITY: ContextVar[int] = ContextVar("llm_priority", default=PRIORITY_BLOCK)
+
+
+def current_llm_priority() -> int:
+    """当前上下文的 LLM 调用优先级（未设置时为 PRIORITY_BLOCK）。"""
+    return _CURRENT_PRIORITY.get()
+
+
+@contextmanager
+def llm_priority(priority: int) -> Iterator[None]:
+    """在 with 块内（含其中创建的 asyncio task）以指定优先级发起 LLM 调用。"""
+    token = _CURRENT_PRIORITY.set(priority)
+    try:
+        yield
+    finally:
+        try:
+            _CURRENT_PRIORITY.reset(token)
+        except ValueError:
+            # 异步生成器可能在另一个 Context 中被关闭，此时原 Context 已随之丢弃
+            pass
+
+
+def run_with_llm_priority(priority: int) -> Callable:
+    """协程函数装饰器：整个调用期间使用指定优先级（保留签名，可用于 FastAPI 路由）。"""
+    def decorator(func):
+        @functools.wraps(func)
+        async def wrapper(*args, **kwargs):
+            with llm_priority(priority):
+                return await func(*args, **kwargs)
+        return wrapper
+    return decorator
+
+
+async def iterate_with_llm_priority(priority: int, iterable):
+    """
+    包装异步迭代器：每次取下一项时都处于指定优先级上下文中。
+    用于 LangGraph astream_events 这类在迭代过程中才创建子任务的流（子任务会复制该上下文）。
+    """
+    iterator = iterable.__aiter__()
+    try:
+        while True:
+            with llm_priority(priority):
+                try:
+                    item = await iterator.__anext__()
+                except StopAsyncIteration:
+                    return
+            yield item
+    finally:
+        aclose = getattr(iterator, "aclose", None)
+        if aclose is not None:
+            await aclose()
+
+
+# ============== 限额配置 ==============
+
+@dataclass(frozen=True)
+class RateLimits:
+    max_concurrency: int = 0      # 同时在途请求数，0 = 不限
+    rpm: int = 0                  # 每分钟请求数，0 = 不限
+    tpm: int = 0                  # 每分钟 token 数，0 = 不限
+
+
+def _parse_overrides(raw: str) -> dict[str, dict]:
+    if not raw:
+        return {}
+    try:
+        parsed = json.loads(raw)
+    except (TypeError, ValueError):
+        logger.warning("[rate_limit] LLM_RATE_LIMIT_OVERRIDES 不是合法 JSON，已忽略")
+        return {}
+    return parsed if isinstance(parsed, dict) else {}
+
+
+def limits_from_settings(provider: str, model: str) -> RateLimits:
+    """默认限额 ← provider 覆盖 ← model 覆盖。"""
+    values = {
+        "max_concurrency": int(settings.llm_max_concurrency or 0),
+        "rpm": int(settings.llm_requests_per_minute or 0),
+        "tpm": int(settings.llm_tokens_per_minute or 0),
+    }
+    overrides = _parse_overrides(settings.llm_rate_limit_overrides)
+    for name in (provider, model):
+        patch = overrides.get(name)
+        if isinstance(patch, dict):
+            for field in values:
+                if field in patch:
+                    values[field] = int(patch[field] or 0)
+    return RateLimits(**values)
+
+
+# ============== 识别模型 / 估算 token ==============
+
+def limiter_key_for_model(chat_model: Any) -> tuple[str, str]:
+    """从模型实例（含 LazyChatModel、bind_tools 后的 RunnableBinding）提取 (provider, model)。"""
+    model = chat_model
+    for _ in range(4):
+        getter = getattr(type(model), "_get_instance", None)
+        if getter is not None:
+            model = model._get_instance()
+            continue
+        bound = getattr(model, "bound", None)
+        if bound is not None:
+            model = bound
+            continue
+        break
+
+    class_name = type(model).__name__
+    if "Anthropic" in class_name:
+        provider = "anthropic"
+    elif "Google" in class_name or "Gemini" in class_name:
+        provider = "google"
+    else:
+        provider = "openai"
+    name = getattr(model, "model_name", None) or getattr(model, "model", None) or ""
+    return provider, str(name)
+
+
+def estimate_message_tokens(messages: Any) -> int:
+    """粗略估算输入 token（中英混排按 ~3 字符/token），只用于预扣额度。"""
+    if isinstance(messages, str):
+        return max(1, len(messages) // 3)
+    total = 0
+    for message in messages or []:
+        content = getattr(message, "content", message)
+        if isinstance(content, list):
+            content = " ".join(
+                part.get("text", "") if isinstance(part, dict) else str(part)
+                for part in content
+            )
+        total += len(str(content or "")) // 3 + 4
+    return max(1, total)
+
+
+def usage_tokens(response: Any) -> Optional[int]:
+    """从响应 / 流式 chunk 的 usage_metadata 读取总 token；没有则返回 None。"""
+    usage = getattr(response, "usage_metadata", None) or {}
+    if not usage:
+        return None
+    total = usage.get("total_tokens")
+    if total is None:
+        total = int(usage.get("input_tokens", 0) or 0) + int(usage.get("output_tokens", 0) or 0)
+    return int(total or 0)
+
+
+# ============== 令牌桶 / 分桶调度 ==============
+
+class _TokenBucket:
+    """每分钟容量为 capacity 的令牌桶；允许扣成负数（事后按真实用量补扣）。"""
+
+    def __init__(self, capacity: int, now: float):
+        self.capacity = float(capacity)
+        self.rate = self.capacity / 60.0
+        self.level = self.capacity
+        self.updated = now
+
+    def _refill(self, now: float) -> None:
+        if now > self.updated:
+            self.level = min(self.capacity, self.level + (now - self.updated) * self.rate)
+            self.updated = now
+
+    def wait_time(self, amount: float, now: float) -> float:
+        self._refill(now)
+        # 单次请求超过整桶容量时按整桶计，否则永远等不到
+        needed = min(amount, self.capacity)
+        if self.level >= needed:
+            return 0.0
+        return (needed - self.level) / self.rate
+
+    def take(self, amount: float, now: float) -> None:
+        self._refill(now)
+        self.level -= amount
+
+
+class _Waiter:
+    __slots__ = ("priority", "loop", "event")
+
+    def __init__(self, priority: int, loop: asyncio.AbstractEventLoop):
+        self.priority = priority
+        self.loop = loop
+        self.event = asyncio.Event()
+
+    def wake(self) -> None:
+        try:
+            self.loop.call_soon_threadsafe(self.event.set)
+        except RuntimeError:
+            # 所属事件循环已关闭，等待者随之消失
+            pass
+
+
+class _ModelLimiter:
+    def __init__(self, limits: RateLimits, now: float):
+        self.limits = limits
+        self.in_flight = 0
+        self.cooldown_until = 0.0
+        self.waiters: list[tuple[int, int, _Waiter]] = []
+        self.requests = _TokenBucket(limits.rpm, now) if limits.rpm > 0 else None
+        self.tokens = _TokenBucket(limits.tpm, now) if limits.tpm > 0 else None
+
+    def concurrency_cap(self, priority: int) -> float:
+        if self.limits.max_concurrency <= 0:
+            return math.inf
+        share = _PRIORITY_CONCURRENCY_SHARE.get(priority, 1.0)
+        return max(1, math.ceil(self.limits.max_concurrency * share))
+
+    def wait_time(self, priority: int, tokens: int, now: float) -> float:
+        """0 表示可以立即放行；inf 表示需等待其他请求释放并发。"""
+        delay = max(0.0, self.cooldown_until - now)
+        if self.requests is not None:
+            delay = max(delay, self.requests.wait_time(1, now))
+        if self.tokens is not None:
+            delay = max(delay, self.tokens.wait_time(tokens, now))
+        if delay > 0:
+            return delay
+        if self.in_flight >= self.concurrency_cap(priority):
+            return math.inf
+        return 0.0
+
+    def grant(self, tokens: int, now: float) -> None:
+        self.in_flight += 1
+        if self.requests is not None:
+            self.requests.take(1, now)
+        if self.tokens is not None:
+            self.tokens.take(tokens, now)
+
+    def wake_head(self) -> None:
+        if self.waiters:
+            self.waiters[0][2].wake()
+
+
+class LLMLease:
+    """一次已放行的调用；调用结束后必须 release（可多次调用，只生效一次）。"""
+
+    __slots__ = ("_limiter", "key", "priority", "estimated_tokens", "_released")
+
+    def __init__(self, limiter: Optional["LLMRateLimiter"], key: tuple[str, str], priority: int, estimated_tokens: int):
+        self._limiter = limiter
+        self.key = key
+        self.priority = priority
+        self.estimated_tokens = estimated_tokens
+        self._released = False
+
+    def release(self, actual_tokens: Optional[int] = None) -> None:
+        if self._released:
+            return
+        self._released = True
+        if self._limiter is not None:
+            self._limiter._release(self, actual_tokens)
+
+
+class LLMRateLimiter:
+    """
+    进程级调度器。limits_resolver(provider, model) 返回该分桶的 RateLimits，
+    默认读取 settings；分桶在首次使用时按当时的配置创建，reset() 后重新读取。
+    """
+
+    def __init__(self, limits_resolver: Optional[Callable[[str, str], RateLimits]] = None):
+        self._resolve_limits = limits_resolver or limits_from_settings
+        self._lock = threading.Lock()
+        self._models: dict[tuple[str, str], _ModelLimiter] = {}
+        self._seq = itertools.count()
+
+    def _model_limiter(self, key: tuple[str, str], now: float) -> _ModelLimiter:
+        limiter = self._models.get(key)
+        if limiter is None:
+            limiter = _ModelLimiter(self._resolve_limits(*key), now)
+            self._models[key] = limiter
+        return limiter
+
+    async def acquire(
+        self,
+        key: tuple[str, str],
+        *,
+        priority: Optional[int] = None,
+        estimated_tokens: int = 0,
+    ) -> LLMLease:
+        """按优先级排队直到该模型分桶放行，返回需要 release 的 LLMLease。"""
+        priority = current_llm_priority() if priority is None else priority
+        if not settings.llm_rate_limit_enabled:
+            return LLMLease(None, key, priority, estimated_tokens)
+
+        waiter = _Waiter(priority, asyncio.get_running_loop())
+        entry = (priority, next(self._seq), waiter)
+        queued_at = time.monotonic()
+        with self._lock:
+            model_limiter = self._model_limiter(key, queued_at)
+            heapq.heappush(model_limiter.waiters, entry)
+
+        granted = False
+        try:
+            while True:
+                with self._lock:
+                    now = time.monotonic()
+                    if model_limiter.waiters[0] is entry:
+                        delay = model_limiter.wait_time(priority, estimated_tokens, now)
+                        if delay == 0:
+                            heapq.heappop(model_limiter.waiters)
+                            model_limiter.grant(estimated_tokens, now)
+                            granted = True
+                            # 下一个等待者也许同样可以放行（并发未满、额度充足）
+                            model_limiter.wake_head()
+                            break
+                    else:
+                        delay = math.inf
+                    waiter.event.clear()
+                try:
+                    await asyncio.wait_for(waiter.event.wait(), timeout=min(delay, _MAX_WAIT_SLICE))
+                except asyncio.TimeoutError:
+                    pass
+        finally:
+            if not granted:
+                with self._lock:
+                    try:
+                        model_limiter.waiters.remove(entry)
+                        heapq.heapify(model_limiter.waiters)
+                    except ValueError:
+                        pass
+                    model_limiter.wake_head()
+
+        waited = time.monotonic() - queued_at
+        if waited > 1.0:
+            logger.info(
+                "[rate_limit] %s/%s 排队 %.1fs 后放行 (priority=%s)",
+                key[0], key[1], waited, PRIORITY_NAMES.get(priority, priority),
+            )
+        return LLMLease(self, key, priority, estimated_tokens)
+
+    def _release(self, lease: LLMLease, actual_tokens: Optional[int]) -> None:
+        with self._lock:
+            model_limiter = self._models.get(lease.key)
+            if model_limiter is None:
+                return
+            model_limiter.in_flight = max(0, model_limiter.in_flight - 1)
+            if model_limiter.tokens is not None and actual_tokens is not None:
+                extra = actual_tokens - lease.estimated_tokens
+                if extra > 0:
+                    model_limiter.tokens.take(extra, time.monotonic())
+            model_limiter.wake_head()
+
+    def penalize(self, key: tuple[str, str], seconds: float) -> None:
+        """收到 429 / 过载后，让该模型分桶的所有调用方在 seconds 秒内暂停放行。"""
+        with self._lock:
+            model_limiter = self._model_limiter(key, time.monotonic())
+            model_limiter.cooldown_until = max(model_limiter.cooldown_until, time.monotonic() + seconds)
+        logger.warning("[rate_limit] %s/%s 触发限流，冷却 %.1fs", key[0], key[1], seconds)
+
+    def snapshot(self) -> dict[str, dict]:
+        """各分桶当前状态（在途数、排队数、冷却剩余秒数），用于诊断。"""
+        now = time.monotonic()
+        with self._lock:
+            return {
+                f"{provider}/{model}": {
+                    "in_flight": limiter.in_flight,
+                    "waiting": len(limiter.waiters),
+                    "cooldown_seconds": round(max(0.0, limiter.cooldown_until - now), 2),
+                }
+                for (provider, model), limiter in self._models.items()
+            }
+
+    def reset(self) -> None:
+        """丢弃所有分桶（配置变更后调用；在途 lease 的 release 会被忽略）。"""
+        with self._lock:
+            self._models.clear()
+
+
+rate_limiter = LLMRateLimiter()
@@ -0,0 +1,254 @@
+# backend/core/memory_index.py
+# 功能: 记忆检索的本地索引 — 中日文字符 n-gram + 英文词的 BM25，可选接入本地 embedding 后端做混合打分
+# 主要函数: tokenize(), set_embedding_backend()
+# 主要类: BM25Index（单个语料的增量倒排索引）, MemoryIndexRegistry（按项目缓存，memory_index 全局实例）
+# 数据结构: 倒排表 term -> {doc_id: tf}；文档以 stamp（updated_at）判断是否需要重建
+
+"""
+记忆本地检索索引
+
+替代“每轮对话把全部记忆发给 llm_mini 让它挑 top-N”的预筛选：
+- 中文 / 日文没有空格分词，按字符 unigram + bigram 切分；拉丁字母与数字按整词切分
+- 每个项目一个索引（项目记忆 + 全局记忆），save_memories / consolidate_memories 时增量更新，
+  加载记忆时再用 sync() 与库中行对账（兜底覆盖 /api/memories 等其他写入方）
+- 查询为纯内存计算，几百条记忆在毫秒级完成
+
+可选的 embedding 后端只需实现 embed(texts) -> list[list[float]]（本地模型，不发网络请求），
+通过 set_embedding_backend() 注册后与 BM25 按权重混合。
+"""
+
+from __future__ import annotations
+
+import math
+import re
+import threading
+from collections import Counter, OrderedDict
+from typing import Any, Iterable, Optional, Protocol, Sequence
+
+# BM25 参数（常用默认值）
+BM25_K1 = 1.5
+BM25_B = 0.75
+# 最多缓存的项目索引数
+_MAX_CACHED_PROJECTS = 128
+
+# 中日韩文字（汉字、假名、谚文）连续片段 / 拉丁字母数字词
+_CJK_RUN = re.compile(r"[\u3040-\u30ff\u3400-\u4dbf\u4e00-\u9fff\uac00-\ud7af\uf900-\ufaff]+")
+_WORD = re.compile(r"[a-z0-9_]+")
+
+
+def tokenize(text: str) -> list[str]:
+    """把文本切成检索词：CJK 片段取单字 + 相邻二字，其他部分取英文 / 数字整词。"""
+    lowered = (text or "").lower()
+    terms: list[str] = []
+    for run in _CJK_RUN.findall(lowered):
+        terms.extend(run)
+        terms.extend(run[i:i + 2] for i in range(len(run) - 1))
+    terms.extend(_WORD.findall(_CJK_RUN.sub(" ", lowered)))
+    return terms
+
+
+class EmbeddingBackend(Protocol):
+    def embed(self, texts: Sequence[str]) -> list[list[float]]:
+        ...
+
+
+def _cosine(a: Sequence[float], b: Sequence[float]) -> float:
+    dot = sum(x * y for x, y in zip(a, b))
+    norm = math.sqrt(sum(x * x for x in a)) * math.sqrt(sum(y * y for y in b))
+    return dot / norm if norm else 0.0
+
+
+class BM25Index:
+    """单个语料的 BM25 倒排索引，支持按文档增删（不需要整体重建）。"""
+
+    def __init__(self):
+        self._postings: dict[str, dict[str, int]] = {}
+        self._doc_terms: dict[str, tuple[str, ...]] = {}
+        self._lengths: dict[str, int] = {}
+        self._stamps: dict[str, Any] = {}
+        self._vectors: dict[str, list[float]] = {}
+        self._total_length = 0
+
+    def __len__(self) -> int:
+        return len(self._lengths)
+
+    def __contains__(self, doc_id: str) -> bool:
+        return doc_id in self._lengths
+
+    @classmethod
+    def from_texts(cls, texts: Iterable[tuple[str, str]]) -> "BM25Index":
+        index = cls()
+        for doc_id, text in texts:
+            index.add(doc_id, text)
+        return index
+
+    def stamp(self, doc_id: str) -> Any:
+        return self._stamps.get(doc_id)
+
+    def add(self, doc_id: str, text: str, *, stamp: Any = None, vector: Optional[list[float]] = None) -> None:
+        if doc_id in self._lengths:
+            self.remove(doc_id)
+        counts = Counter(tokenize(text))
+        for term, tf in counts.items():
+            self._postings.setdefault(term, {})[doc_id] = tf
+        self._doc_terms[doc_id] = tuple(counts)
+        length = sum(counts.values())
+        self._lengths[doc_id] = length
+        self._total_length += length
+        self._stamps[doc_id] = stamp
+        if vector is not None:
+            self._vectors[doc_id] = vector
+
+    def remove(self, doc_id: str) -> None:
+        length = self._lengths.pop(doc_id, None)
+        if length is None:
+            return
+        self._total_length -= length
+        self._stamps.pop(doc_id, None)
+        self._vectors.pop(doc_id, None)
+        for term in self._doc_terms.pop(doc_id, ()):
+            docs = self._postings.get(term)
+            if docs is None:
+                continue
+            docs.pop(doc_id, None)
+            if not docs:
+                del self._postings[term]
+
+    def doc_ids(self) -> list[str]:
+        return list(self._lengths)
+
+    def scores(self, query: str) -> dict[str, float]:
+        """对查询返回 {doc_id: BM25 分数}，只含至少命中一个检索词的文档。"""
+        total = len(self._lengths)
+        if not total:
+            return {}
+        avg_length = self._total_length / total or 1.0
+        scores: dict[str, float] = {}
+        for term, qtf in Counter(tokenize(query)).items():
+            docs = self._postings.get(term)
+            if not docs:
+                continue
+            idf = math.log(1 + (total - len(docs) + 0.5) / (len(docs) + 0.5))
+            for doc_id, tf in docs.items():
+                norm = tf + BM25_K1 * (1 - BM25_B + BM25_B * self._lengths[doc_id] / avg_length)
+                scores[doc_id] = scores.get(doc_id, 0.0) + qtf * idf * tf * (BM25_K1 + 1) / norm
+        return scores
+
+    def vector_scores(self, query_vector: Sequence[float]) -> dict[str, float]:
+        return {doc_id: _cosine(query_vector, vector) for doc_id, vector in self._vectors.items()}
+
+
+class MemoryIndexRegistry:
+    """
+    按 project_id 缓存记忆索引（项目记忆 + 全局记忆同一语料）。
+
+    relevance() 返回 0~1 的相关度（BM25 按最高分归一化；注册了 embedding 后端时与余弦相似度加权混合）。
+    """
+
+    def __init__(self, max_projects: int = _MAX_CACHED_PROJECTS):
+        self._lock = threading.RLock()
+        self._indexes: "OrderedDict[Optional[str], BM25Index]" = OrderedDict()
+        self._max_projects = max_projects
+        self._backend: Optional[EmbeddingBackend] = None
+        self._embedding_weight = 0.5
+
+    def set_embedding_backend(self, backend: Optional[EmbeddingBackend], *, weight: float = 0.5) -> None:
+        with self._lock:
+            self._backend = backend
+            self._embedding_weight = min(1.0, max(0.0, weight))
+            # 已有索引没有向量，清空后按需重建
+            self._indexes.clear()
+
+    def _get(self, project_id: Optional[str]) -> BM25Index:
+        index = self._indexes.get(project_id)
+        if index is None:
+            index = BM25Index()
+            self._indexes[project_id] = index
+            while len(self._indexes) > self._max_projects:
+                self._indexes.popitem(last=False)
+        else:
+            self._indexes.move_to_end(project_id)
+        return index
+
+    def _embed(self, texts: list[str]) -> list[Optional[list[float]]]:
+        if self._backend is None or not texts:
+            return [None] * len(texts)
+        return list(self._backend.embed(texts))
+
+    def upsert(self, project_id: Optional[str], docs: Iterable[tuple[str, str, Any]]) -> None:
+        """增量写入 / 更新文档：docs 为 (memory_id, 检索文本, stamp)。"""
+        docs = list(docs)
+        with self._lock:
+            index = self._indexes.get(project_id)
+            if index is None:
+                # 尚未建索引的项目等首次加载时 sync() 全量建立
+                return
+            vectors = self._embed([text for _, text, _ in docs])
+            for (doc_id, text, stamp), vector in zip(docs, vectors):
+                index.add(doc_id, text, stamp=stamp, vector=vector)
+
+    def remove(self, project_id: Optional[str], doc_ids: Iterable[str]) -> None:
+        with self._lock:
+            index = self._indexes.get(project_id)
+            if index is None:
+                return
+            for doc_id in doc_ids:
+                index.remove(doc_id)
+
+    def drop(self, project_id: Optional[str] = None, *, all_projects: bool = False) -> None:
+        with self._lock:
+            if all_projects:
+                self._indexes.clear()
+            else:
+                self._indexes.pop(project_id, None)
+
+    def sync(self, project_id: Optional[str], docs: Iterable[tuple[str, str, Any]]) -> BM25Index:
+        """
+        与库中当前行对账：新增 / stamp 变化的文档重建，库中已不存在的文档移除。
+        索引已是最新时只做一次字典比对。
+        """
+        docs = list(docs)
+        with self._lock:
+            index = self._get(project_id)
+            live = {doc_id for doc_id, _, _ in docs}
+            for doc_id in [d for d in index.doc_ids() if d not in live]:
+                index.remove(doc_id)
+            changed = [(d, text, stamp) for d, text, stamp in docs if d not in index or index.stamp(d) != stamp]
+            if changed:
+                vectors = self._embed([text for _, text, _ in changed])
+                for (doc_id, text, stamp), vector in zip(changed, vectors):
+                    index.add(doc_id, text, stamp=stamp, vector=vector)
+            return index
+
+    def relevance(self, project_id: Optional[str], query: str) -> dict[str, float]:
+        with self._lock:
+            index = self._indexes.get(project_id)
+            if index is None or not (query or "").strip():
+                return {}
+            raw = index.scores(query)
+            top = max(raw.values(), default=0.0)
+            scores = {doc_id: value / top for doc_id, value in raw.items()} if top > 0 else {}
+            if self._backend is not None:
+                query_vector = self._backend.embed([query])[0]
+                weight = self._embedding_weight
+                for doc_id, similarity in index.vector_scores(query_vector).items():
+                    scores[doc_id] = (1 - weight) * scores.get(doc_id, 0.0) + weight * max(0.0, similarity)
+            return scores
+
+
+def normalized_relevance(texts: Sequence[str], query: str) -> list[float]:
+    """对一组临时文本计算 0~1 相关度（无持久索引的场景，如 select_memory_under_budget 直接传入文本）。"""
+    if not texts or not (query or "").strip():
+        return [0.0] * len(texts)
+    index = BM25Index.from_texts((str(i), text) for i, text in enumerate(texts))
+    raw = index.scores(query)
+    top = max(raw.values(), default=0.0)
+    return [raw.get(str(i), 0.0) / top if top > 0 else 0.0 for i in range(len(texts))]
+
+
+memory_index = MemoryIndexRegistry()
+
+
+def set_embedding_backend(backend: Optional[EmbeddingBackend], *, weight: float = 0.5) -> None:
+    """注册本地 embedding 后端（传 None 退回纯 BM25）。"""
+    memory_index.set_embedding_backend(backend, weight=weight)
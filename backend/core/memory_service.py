@@ -4,14 +4,16 @@
 #   extract_memories() — 从一轮对话中提炼 MemoryItem（异步，用 llm_mini）
 #   save_memories() — 去重后存入 DB，过多时自动触发合并
 #   consolidate_memories() — LLM 合并相似记忆（记忆 > CONSOLIDATE_THRESHOLD 时触发）
-#   load_memory_context() — 加载项目记忆文本（> FILTER_THRESHOLD 时 LLM 预筛选）
+#   load_memory_context() — 加载项目记忆文本
+#   load_memory_context_async() — 按预算区间选择记忆（> FILTER_THRESHOLD 时本地索引预筛选 top-N）
+#   filter_memories_by_relevance() — 本地 BM25（core.memory_index，中日文字符 n-gram）预筛选，不调用 LLM
 # 数据结构:
 #   MemoryItem: project_id, content, source_mode_id, source_mode, source_phase, related_blocks
 # 设计:
 #   - 提炼用 llm_mini（低成本）
 #   - 入库前做文本去重（简单包含关系判断）
 #   - 记忆 > 50 条时自动合并相似条目（consolidate_memories）
-#   - 记忆 > 100 条时注入前 LLM 预筛选 top-N（load_memory_context）
+#   - 记忆 > 100 条时注入前按本地检索索引预筛选 top-N（load_memory_context_async）
 #   - 全量注入：load_memory_context 返回拼接文本，传入 AgentState.memory_context
 
 """
@@ -35,7 +37,7 @@ logger = logging.getLogger("memory_service")
 # ============== 阈值 ==============
 
 CONSOLIDATE_THRESHOLD = 50   # 记忆超过此数时触发 LLM 合并
-FILTER_THRESHOLD = 100       # 记忆超过此数时注入前 LLM 预筛选
+FILTER_THRESHOLD = 100       # 记忆超过此数时注入前本地索引预筛选
 FILTER_TOP_N = 30            # 预筛选保留的条数
 
 # Token 预算（first-principles 版本）
@@ -98,8 +100,9 @@ async def extract_memories(
     prompt = EXTRACT_PROMPT.format(mode=mode, conversation=conversation)
 
     try:
-        from core.llm import llm_mini
-        response = await llm_mini.ainvoke([HumanMessage(content=prompt)])
+        from core.llm import ainvoke_with_retry, llm_mini
+        from core.llm_rate_limiter import PRIORITY_BACKGROUND
+        response = await ainvoke_with_retry(llm_mini, [HumanMessage(content=prompt)], priority=PRIORITY_BACKGROUND)
         raw = normalize_content(response.content).strip()
 
         # 尝试提取 JSON（兼容 markdown code block 包裹）
@@ -154,6 +157,16 @@ def _is_duplicate(new_content: str, existing_contents: list[str]) -> bool:
     return False
 
 
+def _memory_index_text(memory) -> str:
+    """记忆在检索索引中的文本：内容 + 来源角色/阶段 + 相关内容块名。"""
+    related = " ".join(memory.related_blocks or [])
+    return f"{memory.content} {memory.source_mode or ''} {memory.source_phase or ''} {related}"
+
+
+def _memory_index_docs(memories) -> list[tuple[str, str, object]]:
+    return [(m.id, _memory_index_text(m), m.updated_at) for m in memories]
+
+
 # ============== 记忆存储 ==============
 
 async def save_memories(
@@ -184,6 +197,7 @@ async def save_memories(
         existing_contents = [m.content for m in existing]
 
         saved = 0
+        new_items = []
         for item in extracted:
             content = item.get("content", "").strip()
             if not content:
@@ -201,11 +215,14 @@ async def save_memories(
                 related_blocks=item.get("related_blocks", []),
             )
             db.add(mem)
+            new_items.append(mem)
             existing_contents.append(content)  # 本批次内也要检查
             saved += 1
 
         if saved:
             db.commit()
+            from core.memory_index import memory_index
+            memory_index.upsert(project_id, _memory_index_docs(new_items))
             logger.info("[memory] 保存了 %d 条新记忆 (project=%s, mode=%s)", saved, project_id, mode)
 
             # 检查是否需要触发合并
@@ -292,8 +309,9 @@ async def load_memory_context_async(
     query_ctx: str = "",
 ) -> str:
     """
-    异步版 load_memory_context — 超过 FILTER_THRESHOLD 时调用 LLM 预筛选。
+    异步版 load_memory_context — 按预算区间选择记忆，超过 FILTER_THRESHOLD 时本地索引预筛选。
     同时加载项目记忆和全局记忆（project_id IS NULL）。
+    相关度来自 core.memory_index（项目级缓存索引，加载时与库中行对账），不调用 LLM。
 
     调用方（api/agent.py stream_chat）应优先使用此函数。
     """
@@ -323,13 +341,21 @@ async def load_memory_context_async(
         zone = (budget or {}).get("zone", "A")
         memory_token_cap = (budget or {}).get("memory_token_cap", 12_000)
 
+        def _relevance() -> list[float]:
+            from core.memory_index import memory_index
+            memory_index.sync(project_id, _memory_index_docs(memories))
+            scores = memory_index.relevance(project_id, _relevance_query(query_ctx, mode, phase))
+            return [scores.get(m.id, 0.0) for m in memories]
+
         if zone == "A":
             # 未超限不干预：保持完整上下文连续性
             selected_lines = all_lines
         elif zone == "B":
             # 轻量收敛：仅在条目很多时做 top-N 预筛选
             if len(memories) > FILTER_THRESHOLD:
-                selected_indices = await filter_memories_by_relevance(all_lines, mode, phase)
+                selected_indices = await filter_memories_by_relevance(
+                    all_lines, mode, phase, query_ctx=query_ctx, relevance=_relevance(),
+                )
                 selected_lines = [all_lines[i] for i in selected_indices if i < len(all_lines)]
             else:
                 selected_lines = all_lines
@@ -339,6 +365,7 @@ async def load_memory_context_async(
                 memories=all_lines,
                 budget_tokens=memory_token_cap,
                 query_ctx=query_ctx,
+                relevance=_relevance(),
             )
 
         logger.info(
@@ -377,16 +404,25 @@ def compute_context_budget(model_name: str = "") -> dict:
 
 
 def _count_tokens(text: str) -> int:
-    import tiktoken
-    enc = tiktoken.get_encoding("cl100k_base")
-    return len(enc.encode(text or "", disallowed_special=()))
-
-
-def _memory_utility_score(text: str, query_ctx: str, recency_rank: int, total: int) -> float:
-    query_tokens = set((query_ctx or "").lower().split())
-    text_tokens = set((text or "").lower().split())
-    overlap = len(query_tokens.intersection(text_tokens))
-    relevance = min(1.0, overlap / max(1, len(query_tokens))) if query_tokens else 0.2
+    # 编码器只加载一次、按文本备忘（core.token_service）；tiktoken 不可用时退回近似计数
+    from core.token_service import count_text_tokens
+    return count_text_tokens(text or "")
+
+
+def _memory_utility_score(
+    text: str,
+    query_ctx: str,
+    recency_rank: int,
+    total: int,
+    relevance: Optional[float] = None,
+) -> float:
+    if relevance is None:
+        # 未给出索引相关度时按检索词重合率估算（中日文按字符 n-gram，而非空格分词）
+        from core.memory_index import tokenize
+        query_tokens = set(tokenize(query_ctx))
+        text_tokens = set(tokenize(text))
+        overlap = len(query_tokens.intersection(text_tokens))
+        relevance = min(1.0, overlap / max(1, len(query_tokens))) if query_tokens else 0.2
     recency = 1.0 - (recency_rank / max(1, total))
     constraint_strength = 1.0 if any(k in text for k in ["必须", "禁止", "不要", "约束", "偏好"]) else 0.2
     cross_mode_value = 0.8 if "[全局]" in text or "(consolidated" in text else 0.3
@@ -397,18 +433,29 @@ def select_memory_under_budget(
     memories: list[tuple[int, str]],
     budget_tokens: int,
     query_ctx: str = "",
+    relevance: Optional[list[float]] = None,
 ) -> list[tuple[int, str]]:
     """
     在 token 约束下最大化 memory utility。
     采用贪心近似：按 utility/token 排序选择。
+    relevance 为与 memories 对齐的 0~1 相关度（来自记忆索引）；缺省时对传入文本临时做 BM25。
     """
     if not memories:
         return []
+    if relevance is None and (query_ctx or "").strip():
+        from core.memory_index import normalized_relevance
+        relevance = normalized_relevance([text for _, text in memories], query_ctx)
     scored = []
     total = len(memories)
     for rank, (idx, text) in enumerate(memories):
         token_cost = max(1, _count_tokens(text))
-        utility = _memory_utility_score(text, query_ctx=query_ctx, recency_rank=rank, total=total)
+        utility = _memory_utility_score(
+            text,
+            query_ctx=query_ctx,
+            recency_rank=rank,
+            total=total,
+            relevance=relevance[rank] if relevance is not None else None,
+        )
         scored.append((utility / token_cost, idx, text, token_cost))
     scored.sort(key=lambda x: x[0], reverse=True)
 
@@ -479,8 +526,9 @@ async def consolidate_memories(project_id: str) -> int:
             memories="\n".join(mem_lines),
         )
 
-        from core.llm import llm_mini
-        response = await llm_mini.ainvoke([HumanMessage(content=prompt)])
+        from core.llm import ainvoke_with_retry, llm_mini
+        from core.llm_rate_limiter import PRIORITY_BACKGROUND
+        response = await ainvoke_with_retry(llm_mini, [HumanMessage(content=prompt)], priority=PRIORITY_BACKGROUND)
         raw = normalize_content(response.content).strip()
 
         # 解析 JSON
@@ -505,6 +553,7 @@ async def consolidate_memories(project_id: str) -> int:
         db.flush()
 
         new_count = 0
+        new_items = []
         for item in result:
             if isinstance(item, dict) and item.get("content", "").strip():
                 mem = MemoryItem(
@@ -515,9 +564,13 @@ async def consolidate_memories(project_id: str) -> int:
                     related_blocks=item.get("related_blocks", []) or [],
                 )
                 db.add(mem)
+                new_items.append(mem)
                 new_count += 1
 
         db.commit()
+        from core.memory_index import memory_index
+        memory_index.remove(project_id, [old.id for old in old_memories])
+        memory_index.upsert(project_id, _memory_index_docs(new_items))
         logger.info("[memory] 合并完成: %d → %d 条 (project=%s)", count, new_count, project_id)
         return new_count
 
@@ -535,81 +588,47 @@ async def consolidate_memories(project_id: str) -> int:
 
 # ============== 记忆预筛选（M3-4） ==============
 
-FILTER_PROMPT = """以下是一个项目的 {count} 条记忆。
-当前 Agent 模式是「{mode}」，当前阶段是「{phase}」。
-
-请从中选出对当前模式和阶段最有用的 {top_n} 条记忆。
-优先选择：
-1. 明确的用户偏好和要求
-2. 与当前阶段直接相关的决策
-3. 通用的创作约束和反馈
-
-记忆列表：
-{memories}
-
-返回选中的记忆编号数组，如 [1, 3, 5, 7, ...]（编号从1开始）。
-只输出 JSON 数组，不要其他文字。"""
+def _relevance_query(query_ctx: str, mode: str, phase: str) -> str:
+    """检索查询：当前消息 + 模式 + 阶段（消息为空时仍能按模式/阶段召回）。"""
+    return " ".join(part for part in (query_ctx, mode, phase) if part)
 
 
 async def filter_memories_by_relevance(
     memories_text_lines: list[tuple[int, str]],
     mode: str,
     phase: str,
+    query_ctx: str = "",
+    relevance: Optional[list[float]] = None,
 ) -> list[int]:
     """
-    LLM 预筛选：从大量记忆中选出与当前模式/阶段最相关的 top-N。
+    本地预筛选：从大量记忆中选出与当前消息/模式/阶段最相关的 top-N（不调用 LLM）。
+
+    打分沿用 _memory_utility_score：检索相关度 + 时间新近 + 约束/偏好类 + 全局/合并记忆。
 
     Args:
         memories_text_lines: [(index, "memory text"), ...] 全部记忆
         mode: 当前模式名
         phase: 当前阶段名
+        query_ctx: 当前用户消息
+        relevance: 与记忆对齐的 0~1 相关度（来自 core.memory_index）；缺省时对传入文本临时做 BM25
 
     Returns:
-        选中的记忆索引列表（0-based）
+        选中的记忆索引列表（0-based，保持原有时间顺序）
     """
     count = len(memories_text_lines)
     if count <= FILTER_THRESHOLD:
         return list(range(count))  # 不超阈值，全部返回
 
-    # 构建记忆列表
-    mem_lines = []
-    for idx, (_, text) in enumerate(memories_text_lines, 1):
-        mem_lines.append(f"{idx}. {text}")
-
-    prompt = FILTER_PROMPT.format(
-        count=count,
-        mode=mode,
-        phase=phase or "未指定",
-        top_n=FILTER_TOP_N,
-        memories="\n".join(mem_lines),
+    texts = [text for _, text in memories_text_lines]
+    if relevance is None:
+        from core.memory_index import normalized_relevance
+        relevance = normalized_relevance(texts, _relevance_query(query_ctx, mode, phase))
+
+    scored = sorted(
+        (
+            (_memory_utility_score(text, query_ctx, recency_rank=count - 1 - pos, total=count, relevance=relevance[pos]), pos)
+            for pos, text in enumerate(texts)
+        ),
+        key=lambda item: (-item[0], -item[1]),
     )
-
-    try:
-        from core.llm import llm_mini
-        response = await llm_mini.ainvoke([HumanMessage(content=prompt)])
-        raw = normalize_content(response.content).strip()
-
-        if raw.startswith("```"):
-            lines = raw.split("\n")
-            json_lines = [l for l in lines if not l.startswith("```")]
-            raw = "\n".join(json_lines).strip()
-
-        result = json.loads(raw)
-        if not isinstance(result, list):
-            return list(range(count))
-
-        # 转为 0-based 索引并校验范围
-        selected = []
-        for num in result:
-            if isinstance(num, int) and 1 <= num <= count:
-                selected.append(num - 1)
-
-        if not selected:
-            return list(range(count))
-
-        return selected
-
-    except Exception as e:
-        logger.warning("[memory] filter_memories 失败，回退全量: %s", e)
-        return list(range(count))
-
+    return sorted(pos for _, pos in scored[:FILTER_TOP_N])
@@ -21,6 +21,7 @@ from core.models.channel import Channel
 from core.models.simulator import Simulator, INTERACTION_TYPES
 from core.models.simulation_record import SimulationRecord
 from core.models.generation_log import GenerationLog
+from core.models.prompt_blob import PromptBlob
 from core.models.system_prompt import SystemPrompt
 from core.models.agent_settings import AgentSettings
 from core.models.chat_history import ChatMessage
@@ -28,7 +29,7 @@ from core.models.conversation import Conversation
 from core.models.content_block import ContentBlock, BLOCK_TYPES, SPECIAL_HANDLERS, BLOCK_STATUS
 from core.models.block_history import BlockHistory, HISTORY_ACTIONS
 from core.models.phase_template import PhaseTemplate, DEFAULT_PHASE_TEMPLATE
-from core.models.content_version import ContentVersion, VERSION_SOURCES
+from core.models.content_version import ContentVersion, ContentVersionHead, VERSION_SOURCES
 from core.models.eval_run import EvalRun, EVAL_ROLES, EVAL_RUN_STATUS
 from core.models.eval_task import EvalTask, SIMULATOR_TYPES, INTERACTION_MODES, GRADER_TYPES, EVAL_TASK_STATUS
 from core.models.eval_trial import EvalTrial, EVAL_TRIAL_STATUS
@@ -37,13 +38,16 @@ from core.models.eval_v2 import (
     EvalTrialConfigV2,
     EvalTrialResultV2,
     TaskAnalysisV2,
+    EvalResultCacheV2,
     EVAL_V2_TASK_STATUS,
     EVAL_V2_FORM_TYPES,
 )
 from core.models.eval_suggestion_state import EvalSuggestionState
+from core.models.pending_suggestion import PendingSuggestion
 from core.models.grader import Grader, GRADER_TYPE_CHOICES, PRESET_GRADERS
 from core.models.agent_mode import AgentMode
 from core.models.memory_item import MemoryItem
+from core.models.project_run_job import ProjectRunJob, PROJECT_RUN_JOB_STATUS
 
 __all__ = [
     # 基础
@@ -55,6 +59,7 @@ __all__ = [
     "AgentSettings",
     "ChatMessage",
     "Conversation",
+    "PendingSuggestion",
     
     # 创作者
     "CreatorProfile",
@@ -95,6 +100,7 @@ __all__ = [
     "EvalTrialConfigV2",
     "EvalTrialResultV2",
     "TaskAnalysisV2",
+    "EvalResultCacheV2",
     "EvalSuggestionState",
     "EVAL_V2_TASK_STATUS",
     "EVAL_V2_FORM_TYPES",
@@ -106,6 +112,7 @@ __all__ = [
     
     # 日志
     "GenerationLog",
+    "PromptBlob",
     
     # 统一内容块（新架构）
     "ContentBlock",
@@ -123,6 +130,7 @@ __all__ = [
     
     # 内容版本历史（重新生成/Agent修改保留旧版本）
     "ContentVersion",
+    "ContentVersionHead",
     "VERSION_SOURCES",
     
     # Agent 模式
@@ -130,4 +138,8 @@ __all__ = [
     
     # 项目记忆（Memory System M2）
     "MemoryItem",
+
+    # 项目运行任务队列（auto_trigger 持久化调度）
+    "ProjectRunJob",
+    "PROJECT_RUN_JOB_STATUS",
 ]
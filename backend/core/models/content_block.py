@@ -140,6 +140,8 @@ class ContentBlock(BaseModel):
 
     # 内容摘要（digest_service 自动生成，用于内容块索引）
     digest: Mapped[Optional[str]] = mapped_column(Text, nullable=True)
+    # 生成当前 digest 时内容的 sha256（内容未变则跳过重新生成，也防止旧摘要覆盖新内容）
+    digest_source_hash: Mapped[Optional[str]] = mapped_column(String(64), nullable=True)
 
     # 软删除：deleted_at 有值表示已删除
     deleted_at: Mapped[Optional[datetime]] = mapped_column(
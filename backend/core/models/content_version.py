@@ -1,17 +1,19 @@
 # backend/core/models/content_version.py
 # 功能: 内容版本历史模型，记录字段每次生成/修改前的内容快照
-# 主要类: ContentVersion
-# 数据结构: block_id + version_number + content + source(手动/AI生成/Agent修改)
+# 主要类: ContentVersion, ContentVersionHead
+# 数据结构: block_id + version_number + storage(full/delta) + content|delta + source(手动/AI生成/Agent修改)
+#   ContentVersionHead: 每个 block 一行 — 最新版本号、最近快照版本号、版本数、最新版本全文
 
 """
 ContentVersion 模型
 记录 ContentBlock 的内容历史版本
 每次「重新生成」或「Agent 修改」前，自动保存当前内容为一个版本
+版本按「定期全文快照 + 相对上一版本的压缩增量」存储，读写见 core.version_service
 """
 
 from typing import Optional
 
-from sqlalchemy import String, Text, Integer, JSON
+from sqlalchemy import String, Text, Integer, JSON, LargeBinary
 from sqlalchemy.orm import Mapped, mapped_column
 
 from core.models.base import BaseModel
@@ -37,7 +39,9 @@ class ContentVersion(BaseModel):
     Attributes:
         block_id: 关联的 ContentBlock 的 ID
         version_number: 版本号（从 1 开始递增）
-        content: 该版本的完整内容
+        content: 该版本的完整内容（storage="delta" 时为空）
+        storage: full（全文快照）/ delta（相对上一版本的增量，存于 delta）
+        delta: zlib 压缩的行级增量（见 core.version_service）
         source: 产生该版本的来源（manual/ai_generate/ai_regenerate/agent）
         source_detail: 来源补充说明（如 Agent 消息摘要）
     """
@@ -55,6 +59,14 @@ class ContentVersion(BaseModel):
         Text, default=""
     )
 
+    storage: Mapped[str] = mapped_column(
+        String(10), default="full"
+    )
+
+    delta: Mapped[Optional[bytes]] = mapped_column(
+        LargeBinary, nullable=True
+    )
+
     source: Mapped[str] = mapped_column(
         String(50), default="manual"
     )
@@ -65,3 +77,32 @@ class ContentVersion(BaseModel):
 
     def __repr__(self):
         return f"<ContentVersion block={self.block_id[:8]}... v{self.version_number} ({self.source})>"
+
+
+class ContentVersionHead(BaseModel):
+    """
+    每个 block 的版本计数器
+
+    保存新版本时直接取 last_version + 1，并以 head_content 为基准计算增量，
+    不再查询 MAX(version_number) 或回放增量链。
+
+    Attributes:
+        block_id: 关联的 ContentBlock / ProjectField 的 ID
+        last_version: 最新版本号
+        last_snapshot: 最近一个全文快照的版本号
+        version_count: 当前保留的版本数
+        head_content: 最新版本的完整内容
+    """
+    __tablename__ = "content_version_heads"
+
+    block_id: Mapped[str] = mapped_column(
+        String(36), nullable=False, unique=True, index=True
+    )
+
+    last_version: Mapped[int] = mapped_column(Integer, default=0)
+
+    last_snapshot: Mapped[int] = mapped_column(Integer, default=0)
+
+    version_count: Mapped[int] = mapped_column(Integer, default=0)
+
+    head_content: Mapped[str] = mapped_column(Text, default="")
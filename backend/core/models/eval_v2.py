@@ -1,11 +1,12 @@
 # backend/core/models/eval_v2.py
 # 功能: Eval V2 核心数据模型（Task 容器 + TrialConfig + TrialResult + TaskAnalysis）
-# 主要类: EvalTaskV2, EvalTrialConfigV2, EvalTrialResultV2, TaskAnalysisV2
+# 主要类: EvalTaskV2, EvalTrialConfigV2, EvalTrialResultV2, TaskAnalysisV2, EvalResultCacheV2
 # 数据结构:
 #   - EvalTaskV2: 项目级任务容器（不绑定 form_type）
 #   - EvalTrialConfigV2: Task 下可独立配置的最小执行单元（含 form_type/repeat）
 #   - EvalTrialResultV2: TrialConfig 的一次执行结果（含 LLM 调用日志）
 #   - TaskAnalysisV2: 单个 Task 下跨 Trial 的模式分析与建议
+#   - EvalResultCacheV2: 按输入 hash 缓存的 Trial 结果 / Grader 评分（见 core.eval_result_cache）
 
 """
 Eval V2 数据模型（并行新链路）
@@ -163,6 +164,10 @@ class EvalTrialResultV2(BaseModel):
 
     status: Mapped[str] = mapped_column(String(20), default="pending")
     error: Mapped[str] = mapped_column(Text, default="")
+    # 结果复用自缓存（未重新调用 LLM，tokens/cost 记 0）
+    cache_hit: Mapped[bool] = mapped_column(Boolean, default=False)
+    # 未整体命中时，评分复用自缓存的 Grader ID（不写进 grader_results，避免被固化到结果 / 缓存中）
+    cached_grader_ids: Mapped[list] = mapped_column(JSON, default=list)
 
     task: Mapped["EvalTaskV2"] = relationship("EvalTaskV2", back_populates="trial_results")
     trial_config: Mapped["EvalTrialConfigV2"] = relationship(
@@ -193,3 +198,18 @@ class TaskAnalysisV2(BaseModel):
 
     task: Mapped["EvalTaskV2"] = relationship("EvalTaskV2", back_populates="analyses")
 
+
+
+class EvalResultCacheV2(BaseModel):
+    """
+    Eval V2 结果缓存
+    cache_key 为全部输入（内容、形态配置、画像、Grader 配置、模型、repeat_index）的 hash，
+    输入不变时直接复用上次的 Trial 结果或 Grader 评分。
+    """
+
+    __tablename__ = "eval_result_cache_v2"
+
+    cache_key: Mapped[str] = mapped_column(String(64), nullable=False, unique=True, index=True)
+    kind: Mapped[str] = mapped_column(String(16), default="trial")  # trial / grader
+    project_id: Mapped[str] = mapped_column(String(36), default="", index=True)
+    payload: Mapped[dict] = mapped_column(JSON, default=dict)
@@ -1,7 +1,7 @@
 # backend/core/models/generation_log.py
 # 功能: 生成日志模型，记录每次LLM调用
 # 主要类: GenerationLog
-# 数据结构: 存储输入输出、token数、耗时、成本；calculate_cost 支持 OpenAI/Anthropic/Google 定价
+# 数据结构: 存储输入输出（新记录正文去重存于 PromptBlob，本表只存引用）、token数（含 prompt 缓存命中/写入）、耗时、成本；calculate_cost 支持 OpenAI/Anthropic/Google 定价
 
 """
 生成日志模型
@@ -10,7 +10,7 @@
 
 from typing import Optional, TYPE_CHECKING
 
-from sqlalchemy import String, Text, Integer, Float, ForeignKey
+from sqlalchemy import String, Text, Integer, Float, ForeignKey, JSON
 from sqlalchemy.orm import Mapped, mapped_column, relationship
 
 from core.models.base import BaseModel
@@ -30,11 +30,14 @@ class GenerationLog(BaseModel):
         operation: 操作类型（如generate_field, evaluate, simulate等）
         
         model: 使用的模型
-        prompt_input: 完整输入（系统提示+用户输入）
-        prompt_output: 完整输出
+        prompt_input: 完整输入（系统提示+用户输入）；正文已存入 PromptBlob 的行为空
+        prompt_output: 完整输出；正文已存入 PromptBlob 的行为空
+        prompt_refs: 正文引用（见 core.prompt_blob_store），为空表示正文直接存在上面两列
         
         tokens_in: 输入token数
         tokens_out: 输出token数
+        cache_read_tokens: 输入中命中 provider 端 prompt 缓存的token数
+        cache_creation_tokens: 输入中本次写入 provider 端 prompt 缓存的token数
         duration_ms: 耗时（毫秒）
         cost: 成本（美元）
         
@@ -53,9 +56,12 @@ class GenerationLog(BaseModel):
     model: Mapped[str] = mapped_column(String(50), default="gpt-5.1")
     prompt_input: Mapped[str] = mapped_column(Text, default="")
     prompt_output: Mapped[str] = mapped_column(Text, default="")
+    prompt_refs: Mapped[Optional[dict]] = mapped_column(JSON, nullable=True)
 
     tokens_in: Mapped[int] = mapped_column(Integer, default=0)
     tokens_out: Mapped[int] = mapped_column(Integer, default=0)
+    cache_read_tokens: Mapped[int] = mapped_column(Integer, default=0)
+    cache_creation_tokens: Mapped[int] = mapped_column(Integer, default=0)
     duration_ms: Mapped[int] = mapped_column(Integer, default=0)
     cost: Mapped[float] = mapped_column(Float, default=0.0)
 
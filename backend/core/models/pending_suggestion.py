@@ -0,0 +1,43 @@
+# backend/core/models/pending_suggestion.py
+# 功能: 未确认 SuggestionCard 的持久化副本（core.suggestion_store 的写穿透目标）
+# 主要类: PendingSuggestion
+# 数据结构: id = card_id；(project_id, source_mode, status) 联合索引；card 为完整卡片 JSON；expires_at 过期时间
+
+"""
+PendingSuggestion 模型
+由 core.suggestion_store.SuggestionStore 写入与读取：
+- 进程重启 / 多 worker 时 confirm-suggestion 仍能取到卡片的 edits / modified_content
+- 过期（suggestion_ttl_hours）的行在读取时视为不存在，并被定期清理
+"""
+
+from datetime import datetime
+
+from sqlalchemy import JSON, DateTime, Index, String
+from sqlalchemy.orm import Mapped, mapped_column
+
+from core.models.base import BaseModel
+
+
+class PendingSuggestion(BaseModel):
+    """
+    未确认的修改建议卡片
+
+    Attributes:
+        project_id: 所属项目（卡片缺少项目信息时为空字符串）
+        source_mode: 产生卡片的 Agent mode
+        status: 卡片状态（pending / ...）
+        group_id: SuggestionGroup ID（单卡为 None）
+        card: 完整卡片 dict
+        expires_at: 过期时间（UTC，无时区）
+    """
+    __tablename__ = "pending_suggestions"
+    __table_args__ = (
+        Index("idx_pending_suggestions_scope", "project_id", "source_mode", "status"),
+    )
+
+    project_id: Mapped[str] = mapped_column(String(36), default="", nullable=False)
+    source_mode: Mapped[str] = mapped_column(String(50), default="assistant", nullable=False)
+    status: Mapped[str] = mapped_column(String(20), default="pending", nullable=False)
+    group_id: Mapped[str | None] = mapped_column(String(36), nullable=True, index=True)
+    card: Mapped[dict] = mapped_column(JSON, default=dict)
+    expires_at: Mapped[datetime] = mapped_column(DateTime, nullable=False, index=True)
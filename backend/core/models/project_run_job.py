@@ -0,0 +1,67 @@
+# backend/core/models/project_run_job.py
+# 功能: 项目级运行任务（auto_trigger / start_all_ready）的持久化队列表
+# 主要类: ProjectRunJob
+# 数据结构: project_id + mode + status(queued/running/succeeded/failed) + attempts + 持有者心跳 + 运行摘要
+
+"""
+ProjectRunJob 模型
+由 core.project_run_queue 写入与消费：
+- 同一项目同一模式最多只有一条 queued 记录（重复请求合并）
+- 同一项目同时最多一条 running 记录（项目内串行）
+- running 记录由持有进程定期刷新心跳；心跳过期（持有进程已退出）的 worker 任务重新放回 queued，
+  请求路径（inline）发起的任务判定失败
+"""
+
+from datetime import datetime
+from typing import Optional
+
+from sqlalchemy import String, Text, Integer, Boolean, DateTime, JSON, ForeignKey, Index
+from sqlalchemy.orm import Mapped, mapped_column
+
+from core.models.base import BaseModel
+
+
+# 任务状态
+PROJECT_RUN_JOB_STATUS = {
+    "queued": "排队中",
+    "running": "运行中",
+    "succeeded": "已完成",
+    "failed": "失败",
+}
+
+
+class ProjectRunJob(BaseModel):
+    """
+    项目运行任务
+
+    Attributes:
+        project_id: 所属项目
+        mode: 运行模式（auto_trigger / start_all_ready）
+        status: queued / running / succeeded / failed
+        attempts: 已被领取执行的次数（重启恢复时累加，超过上限判定失败）
+        inline: 是否由请求路径（/run、/run-stream）直接执行（中断后不自动重跑）
+        owner_id: 当前持有该 running 任务的进程标识
+        heartbeat_at: 持有进程最近一次刷新心跳的时间（过期即视为持有进程已退出）
+        started_at: 最近一次开始执行时间
+        finished_at: 结束时间
+        last_error: 失败原因
+        summary: run_project_blocks 的执行摘要（started_count / completed_count / failed_count）
+    """
+    __tablename__ = "project_run_jobs"
+    __table_args__ = (
+        Index("idx_project_run_jobs_status_created", "status", "created_at"),
+    )
+
+    project_id: Mapped[str] = mapped_column(
+        String(36), ForeignKey("projects.id"), nullable=False, index=True
+    )
+    mode: Mapped[str] = mapped_column(String(30), default="auto_trigger")
+    status: Mapped[str] = mapped_column(String(20), default="queued")
+    attempts: Mapped[int] = mapped_column(Integer, default=0)
+    inline: Mapped[bool] = mapped_column(Boolean, default=False)
+    owner_id: Mapped[Optional[str]] = mapped_column(String(100), nullable=True)
+    heartbeat_at: Mapped[Optional[datetime]] = mapped_column(DateTime, nullable=True)
+    started_at: Mapped[Optional[datetime]] = mapped_column(DateTime, nullable=True)
+    finished_at: Mapped[Optional[datetime]] = mapped_column(DateTime, nullable=True)
+    last_error: Mapped[str] = mapped_column(Text, default="")
+    summary: Mapped[dict] = mapped_column(JSON, default=dict)
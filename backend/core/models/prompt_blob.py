@@ -0,0 +1,38 @@
+# backend/core/models/prompt_blob.py
+# 功能: 生成日志 prompt 正文的内容寻址存储（按 sha256 去重、zlib 压缩）
+# 主要类: PromptBlob
+# 数据结构: content_hash（sha256 十六进制，唯一）+ data（压缩后的 UTF-8 文本）+ size（原文字节数）
+#   + ref_count（引用该 blob 的日志引用次数）
+
+"""
+PromptBlob 模型
+由 core.prompt_blob_store 写入与读取：
+- GenerationLog.prompt_refs 按 hash 引用这里的正文
+- 同一段文本（相同的 system prompt、相同的历史消息）只存一份
+- ref_count 随日志写入/删除增减，归零即可删除，无需扫描全部日志
+"""
+
+from typing import Optional
+
+from sqlalchemy import Integer, LargeBinary, String
+from sqlalchemy.orm import Mapped, mapped_column
+
+from core.models.base import BaseModel
+
+
+class PromptBlob(BaseModel):
+    """
+    Prompt 正文块
+
+    Attributes:
+        content_hash: 原文 UTF-8 字节的 sha256（十六进制）
+        data: zlib 压缩后的原文
+        size: 原文字节数
+        ref_count: 引用次数（同一日志多次引用计多次）；旧库补列后为空，启动时全量重算
+    """
+    __tablename__ = "prompt_blobs"
+
+    content_hash: Mapped[str] = mapped_column(String(64), nullable=False, unique=True, index=True)
+    data: Mapped[bytes] = mapped_column(LargeBinary, nullable=False)
+    size: Mapped[int] = mapped_column(Integer, default=0)
+    ref_count: Mapped[Optional[int]] = mapped_column(Integer, nullable=True, default=0)
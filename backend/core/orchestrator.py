@@ -1,13 +1,13 @@
 # backend/core/orchestrator.py
 # 功能: LangGraph Agent 核心编排器（重写版）
 # 架构: Custom StateGraph + Tool Calling + AsyncSqliteSaver
-# 主要导出: get_agent_graph(), AgentState, build_system_prompt
+# 主要导出: get_agent_graph(), AgentState, build_system_prompt, build_system_prompt_segments
 # 设计原则:
 #   1. LLM 通过 bind_tools 自动选择工具（不再手动 if/elif 路由）
-#   2. State 保留 7 个字段（messages + 3 上下文 + 3 模式/记忆）
+#   2. State 保留 9 个字段（messages + 3 上下文 + 3 模式/记忆 + 2 token 累计）
 #   3. 所有 DB 操作在 @tool 函数内完成，不通过 State 传递
 #   4. Checkpointer (AsyncSqliteSaver) 跨请求/跨重启保持对话状态（含 ToolMessage）
-#   5. trim_messages 管理 context window，防止超限
+#   5. trim_messages 管理 context window，防止超限（token 计数见 core.token_service，按消息备忘 + 增量累计）
 #   6. Graph 延迟编译（get_agent_graph() 异步首次初始化 checkpointer）
 
 """
@@ -32,7 +32,7 @@ import operator
 from datetime import datetime
 from core.localization import DEFAULT_LOCALE, normalize_locale
 from core.locale_text import rt
-from typing import TypedDict, Annotated, Optional, List, Dict
+from typing import TypedDict, Annotated, NamedTuple, Optional, List, Dict
 
 from langgraph.graph import StateGraph, END
 from langgraph.prebuilt import ToolNode
@@ -42,7 +42,9 @@ from langchain_core.messages import (
 from langchain_core.runnables import RunnableConfig
 
 from core.llm import llm
-from core.llm_compat import normalize_content, sanitize_messages
+from core.llm_compat import apply_prompt_cache_breakpoints, normalize_content, sanitize_messages
+from core.llm_rate_limiter import limiter_key_for_model
+from core.token_service import count_message_tokens, count_messages_tokens, update_running_total
 from core.agent_tools import AGENT_TOOLS
 
 logger = logging.getLogger("orchestrator")
@@ -68,6 +70,10 @@ class AgentState(TypedDict):
     - mode_prompt: 当前模式的 system_prompt（身份段），替换 build_system_prompt 的开头
     - memory_context: 全量 MemoryItem 拼接文本（记忆层，M2 阶段启用）
 
+    Token 预算字段（agent_node 维护，core.token_service.update_running_total）：
+    - token_total: messages 的近似 token 累计值
+    - token_counted: 已计入 token_total 的消息条数（只对之后新增的消息计数）
+
     设计原则：
     - DB 操作在 @tool 函数内完成，不通过 State 传递
     - field_updated / is_producing 等信息从 tool_end 事件推断
@@ -80,188 +86,68 @@ class AgentState(TypedDict):
     mode: str               # 当前模式名（如 "assistant", "critic", "strategist"）
     mode_prompt: str         # 当前模式的 system_prompt（身份段）
     memory_context: str      # 全量 MemoryItem 拼接（记忆层，M2 启用）
+    token_total: int         # messages 近似 token 累计（增量维护）
+    token_counted: int       # 已计入 token_total 的消息条数
 
 
-# ============== System Prompt 缓存 ==============
+# ============== System Prompt 分段与缓存 ==============
 
-# 手动字典缓存：key = (project_id, current_handler, locale, mode_prompt_hash, memory_hash, minute_bucket)
-# minute_bucket 确保时间锚点每分钟刷新一次；其他参数变更时 key 自动失效。
-# 缓存最多保留 64 条（避免内存无限增长）。
+# system prompt 按变化频率分三段，依次拼接（前缀越稳定，provider 端 prompt caching 越容易命中）：
+# - stable:   身份 + 输出/修改/消歧规则 + 行动指南 + 意图指南（只随 handler / locale / mode 变化）
+# - project:  创作者信息 + 内容块索引 + 记忆（随项目内容变化；内容块索引自带 TTL 缓存）
+# - volatile: 时间锚点 + 活跃建议卡片（每次调用都可能不同，必须放在最后）
+# 进程内只缓存 stable 段：key = (current_handler, locale, mode_prompt_hash)，最多保留 64 条。
 import hashlib as _hashlib
 
 _SYSTEM_PROMPT_CACHE: dict = {}
 _SYSTEM_PROMPT_CACHE_MAX = 64
 
 
-def _sp_cache_key(project_id: str, current_handler: str, locale: str,
-                   mode_prompt: str, memory_context: str, creator_profile: str) -> tuple:
-    """构建 system prompt 缓存键。"""
-    # 对长字符串取 hash 节省内存
-    mode_hash = _hashlib.md5((mode_prompt or "").encode()).hexdigest()[:8]
-    mem_hash = _hashlib.md5((memory_context or "").encode()).hexdigest()[:8]
-    profile_hash = _hashlib.md5((creator_profile or "").encode()).hexdigest()[:8]
-    # 按分钟分桶：同一分钟内时间锚点相同，跨分钟自动 key 失效
-    minute_bucket = datetime.now().strftime("%Y%m%d%H%M")
-    return (project_id, current_handler, locale, mode_hash, mem_hash, profile_hash, minute_bucket)
+class SystemPromptSegments(NamedTuple):
+    """按变化频率切分的 system prompt（stable → project → volatile）。"""
+    stable: str
+    project: str
+    volatile: str
 
+    @property
+    def cacheable(self) -> list[str]:
+        """可以打缓存断点的前缀段（不含 volatile）。"""
+        return [segment for segment in (self.stable, self.project) if segment]
 
-def invalidate_system_prompt_cache(project_id: str) -> None:
-    """项目状态变更时主动清除相关 system prompt 缓存条目。"""
-    keys_to_del = [k for k in _SYSTEM_PROMPT_CACHE if k[0] == project_id]
-    for k in keys_to_del:
-        _SYSTEM_PROMPT_CACHE.pop(k, None)
+    def text(self) -> str:
+        return "\n\n".join(segment for segment in self if segment)
 
 
-# ============== System Prompt 构建 ==============
-
-def build_system_prompt(state: AgentState) -> str:
-    """
-    构建 system prompt — Agent 行为的「宪法」。
+def _sp_cache_key(current_handler: str, locale: str, mode_prompt: str) -> tuple:
+    """构建 stable 段缓存键。"""
+    # 对长字符串取 hash 节省内存
+    mode_hash = _hashlib.md5((mode_prompt or "").encode()).hexdigest()[:8]
+    return (current_handler, locale, mode_hash)
 
-    设计原则（以终为始）：
-    - 取代原 route_intent() 中的 5000 字意图分类 prompt
-    - 取代原 chat_node() 中的能力介绍 prompt
-    - 取代原硬编码规则（@ 引用路由、意图阶段检测）
-    - 与 @tool docstrings 互补：
-      system prompt 提供上下文和规则，docstrings 提供工具级说明
 
-    模式系统：
-    - mode_prompt 有值时替换身份段（开头），否则使用默认身份
-    - memory_context 有值时注入「项目记忆」段落
+def invalidate_system_prompt_cache(project_id: str) -> None:
     """
-    creator_profile = state.get("creator_profile", "")
-    current_handler = state.get("current_handler", state.get("current_phase", "general"))
-    project_id = state.get("project_id", "")
-    project_locale = normalize_locale(state.get("project_locale", DEFAULT_LOCALE))
-    mode_prompt = state.get("mode_prompt", "")
-    memory_context = state.get("memory_context", "")
-
-    # 缓存 fast-path：同一分钟内、参数不变时直接返回缓存结果
-    _cache_key = _sp_cache_key(project_id, current_handler, project_locale,
-                                mode_prompt, memory_context, creator_profile)
-    if _cache_key in _SYSTEM_PROMPT_CACHE:
-        return _SYSTEM_PROMPT_CACHE[_cache_key]
-    now = datetime.now().astimezone()
-    current_time_context = rt(
-        project_locale,
-        "orchestrator.time_context",
-        timestamp=now.strftime('%Y-%m-%d %H:%M:%S %Z%z'),
-        weekday=now.strftime('%A'),
-    )
-
-    # ---- 动态段落 1: 内容块索引（简化前缀，6.8 节） ----
-    field_index_section = ""
-    if project_id:
-        try:
-            from core.digest_service import build_field_index
-            fi = build_field_index(project_id)
-            if fi:
-                field_index_section = fi
-        except ImportError:
-            # digest_service 尚未创建（M7），静默跳过
-            pass
-        except Exception as e:
-            logger.warning(f"build_field_index failed: {e}")
-
-    # ---- 动态段落 2: 运行时上下文 ----
-    runtime_context = (
-        f"現在の能力コンテキスト: {current_handler}"
-        if project_locale == "ja-JP" else
-        f"当前能力上下文: {current_handler}"
-    )
-
-    # ---- 动态段落 3: 意图分析阶段专用指南 ----
-    intent_guide = ""
-    if current_handler == "intent":
-        intent_guide = rt(project_locale, "orchestrator.intent_guide")
-
-    # ---- 身份段：来自模式配置 ----
-    if mode_prompt:
-        identity = mode_prompt
-    else:
-        identity = rt(project_locale, "orchestrator.default_identity")
-
-    # ---- 动态段落 4: 活跃建议卡片（Layer 3, M1.5: 按 mode 过滤） ----
-    active_suggestions_section = ""
-    current_mode = state.get("mode", "assistant")
+    项目状态变更时使 system prompt 中的项目相关内容失效。
+    stable 段与项目无关不需清除；project 段每次重新拼接，只需清除内容块索引缓存。
+    """
+    if not project_id:
+        return
     try:
-        from core.agent_tools import PENDING_SUGGESTIONS
-        if PENDING_SUGGESTIONS:
-            items = []
-            for sid, card in PENDING_SUGGESTIONS.items():
-                # M1.5: 只展示当前 mode 产生的 pending 卡片，避免跨模式认知污染
-                if card.get("source_mode", "assistant") != current_mode:
-                    continue
-                # 只展示 pending 状态的卡片（undone/superseded/accepted/rejected 不应出现）
-                if card.get("status", "pending") != "pending":
-                    continue
-                target = card.get("target_field", "?")
-                summary = card.get("summary", "")
-                items.append(f"  - #{sid[:8]}: 目标字段「{target}」，摘要: {summary}")
-            if items:
-                if project_locale == "ja-JP":
-                    ja_items = []
-                    for sid, card in PENDING_SUGGESTIONS.items():
-                        if card.get("source_mode", "assistant") != current_mode:
-                            continue
-                        if card.get("status", "pending") != "pending":
-                            continue
-                        target = card.get("target_field", "?")
-                        summary = card.get("summary", "")
-                        ja_items.append(f"  - #{sid[:8]}: 対象フィールド「{target}」、概要: {summary}")
-                    if ja_items:
-                        active_suggestions_section = "<active_suggestions>\n現在、未処理の修正提案カードがあります（ユーザー未対応）:\n" + "\n".join(ja_items) + "\n注意: ユーザーが詳細確認や修正依頼を続ける可能性があります。\n</active_suggestions>"
-                else:
-                    active_suggestions_section = "<active_suggestions>\n当前有未决的修改建议卡片（用户尚未操作）:\n" + "\n".join(items) + "\n注意: 用户可能会追问这些建议的细节或要求调整。\n</active_suggestions>"
-    except Exception as e:
-        logger.warning(f"build active_suggestions failed: {e}")
-
-    # ---- 记忆段：全量注入（M2 启用后生效） ----
-    memory_section = ""
-    if memory_context:
-        memory_section = (
-            f"""<memory>
-## プロジェクト記憶
-以下はモードや段階をまたいで蓄積された重要情報です。
-
-使用ルール:
-- 内容修正時は、記憶上の嗜好や制約と矛盾しないか確認する。
-- NEVER: 返信本文で記憶内容をそのまま復唱しない。
-- 記憶が古い可能性もある。現在のユーザー指示と矛盾する場合は現在の指示を優先する。
-{memory_context}
-</memory>"""
-            if project_locale == "ja-JP" else
-            f"""<memory>
-## 项目记忆
-以下是跨模式、跨阶段积累的关键信息。
+        from core.digest_service import invalidate_field_index_cache
+        invalidate_field_index_cache(project_id)
+    except ImportError:
+        pass
 
-使用规则:
-- 做内容修改时，检查是否与记忆中的偏好或约束冲突。
-- NEVER 在回复中复述记忆内容。
-- 记忆可能过时。如果用户当前指令与记忆矛盾，以当前指令为准。
-{memory_context}
-</memory>"""
-        )
 
-    def _cache_and_return(prompt: str) -> str:
-        """将 prompt 存入缓存（LRU 淘汰超出上限的旧条目）后返回。"""
-        if len(_SYSTEM_PROMPT_CACHE) >= _SYSTEM_PROMPT_CACHE_MAX:
-            # 淘汰最旧的条目（dict 保序，Python 3.7+）
-            oldest_key = next(iter(_SYSTEM_PROMPT_CACHE))
-            _SYSTEM_PROMPT_CACHE.pop(oldest_key, None)
-        _SYSTEM_PROMPT_CACHE[_cache_key] = prompt
-        return prompt
+# ============== System Prompt 构建 ==============
 
-    if project_locale == "ja-JP":
-        return _cache_and_return(f"""<identity>
+def _build_stable_prompt(locale: str, identity: str, intent_guide: str) -> str:
+    """stable 段：与项目内容、时间都无关，同一 handler / locale / mode 下逐字节相同。"""
+    if locale == "ja-JP":
+        body = f"""<identity>
 {identity}
 </identity>
 
-<current_time_anchor>
-## 現在時刻アンカー
-{current_time_context}
-</current_time_anchor>
-
 <output_rules>
 ALWAYS:
 - 標準的なビジネス日本語で回答する。
@@ -324,36 +210,12 @@ NEVER:
 - 「続ける」「次へ」だけでは自動で段階遷移しない。どのノードを処理するか確認する。
 - 構造変更は `manage_architecture`、局所修文は `propose_edit`、全文改稿は `rewrite_field`。
 - 内容ブロック名が曖昧な場合は推測せず、先に索引や `read_field` で確認する。
-</disambiguation>
-
-<project_context>
-## クリエイター情報
-{creator_profile or '（クリエイター情報なし）'}
-
-## 現在のプロジェクト文脈
-{runtime_context}
-
-<field_index>
-ALWAYS: 以下は要約索引です。完全な内容が必要なら `read_field` を使う。
-{field_index_section}
-</field_index>
-
-{memory_section}
-</project_context>
-
-{active_suggestions_section}
-
-{intent_guide}""")
-
-    return _cache_and_return(f"""<identity>
+</disambiguation>"""
+    else:
+        body = f"""<identity>
 {identity}
 </identity>
 
-<current_time_anchor>
-## 当前时间锚点
-{current_time_context}
-</current_time_anchor>
-
 <output_rules>
 ALWAYS: 输出格式规则
 - 用主谓宾结构完整的句子、段落和正常的标点符号进行输出。
@@ -559,24 +421,6 @@ DEFAULT: 不确定内容块是否为空时，先 read_field 确认。
 - 参考 @用户画像 修改 @场景库 -> propose_edit(target_field="场景库")，先 read_field 两个块
 </disambiguation>
 
-<project_context>
-## 创作者信息
-{creator_profile or '（暂无创作者信息）'}
-
-## 当前项目上下文
-当前能力上下文: {current_handler}
-{runtime_context}
-
-<field_index>
-ALWAYS: 以下为摘要索引。需要完整内容时用 read_field 读取。
-{field_index_section}
-</field_index>
-
-{memory_section}
-</project_context>
-
-{active_suggestions_section}
-
 <interaction_rules>
 意图判断策略：
 1. 意图清晰 + 非修改操作 -> 立即行动，不做多余确认。
@@ -596,10 +440,189 @@ NEVER 空泛地问"你想做什么？"——至少给出你的判断。
    - 如果你不小心在文本中输出了方案 → 立刻调用 propose_edit 把该方案作为 edits 提交
 
 CRITICAL: 不要在讨论中输出"当前建议文案是：..."这样的完整内容版本。直接用 propose_edit 让用户在卡片中预览。
-</interaction_rules>
+</interaction_rules>"""
+    return f"{body}\n\n{intent_guide}" if intent_guide else body
 
-{intent_guide}
-""")
+
+def _build_field_index_section(project_id: str) -> str:
+    """内容块索引（简化前缀，6.8 节）。"""
+    if not project_id:
+        return ""
+    try:
+        from core.digest_service import build_field_index
+        return build_field_index(project_id) or ""
+    except ImportError:
+        # digest_service 尚未创建（M7），静默跳过
+        return ""
+    except Exception as e:
+        logger.warning(f"build_field_index failed: {e}")
+        return ""
+
+
+def _build_memory_section(locale: str, memory_context: str) -> str:
+    """记忆段：全量注入（M2 启用后生效）。"""
+    if not memory_context:
+        return ""
+    if locale == "ja-JP":
+        return f"""<memory>
+## プロジェクト記憶
+以下はモードや段階をまたいで蓄積された重要情報です。
+
+使用ルール:
+- 内容修正時は、記憶上の嗜好や制約と矛盾しないか確認する。
+- NEVER: 返信本文で記憶内容をそのまま復唱しない。
+- 記憶が古い可能性もある。現在のユーザー指示と矛盾する場合は現在の指示を優先する。
+{memory_context}
+</memory>"""
+    return f"""<memory>
+## 项目记忆
+以下是跨模式、跨阶段积累的关键信息。
+
+使用规则:
+- 做内容修改时，检查是否与记忆中的偏好或约束冲突。
+- NEVER 在回复中复述记忆内容。
+- 记忆可能过时。如果用户当前指令与记忆矛盾，以当前指令为准。
+{memory_context}
+</memory>"""
+
+
+def _build_project_prompt(
+    locale: str, project_id: str, current_handler: str, creator_profile: str, memory_context: str,
+) -> str:
+    """project 段：创作者信息 + 运行时上下文 + 内容块索引 + 记忆。"""
+    field_index_section = _build_field_index_section(project_id)
+    memory_section = _build_memory_section(locale, memory_context)
+    if locale == "ja-JP":
+        runtime_context = f"現在の能力コンテキスト: {current_handler}"
+        return f"""<project_context>
+## クリエイター情報
+{creator_profile or '（クリエイター情報なし）'}
+
+## 現在のプロジェクト文脈
+{runtime_context}
+
+<field_index>
+ALWAYS: 以下は要約索引です。完全な内容が必要なら `read_field` を使う。
+{field_index_section}
+</field_index>
+
+{memory_section}
+</project_context>"""
+    runtime_context = f"当前能力上下文: {current_handler}"
+    return f"""<project_context>
+## 创作者信息
+{creator_profile or '（暂无创作者信息）'}
+
+## 当前项目上下文
+当前能力上下文: {current_handler}
+{runtime_context}
+
+<field_index>
+ALWAYS: 以下为摘要索引。需要完整内容时用 read_field 读取。
+{field_index_section}
+</field_index>
+
+{memory_section}
+</project_context>"""
+
+
+def _build_active_suggestions_section(locale: str, project_id: str, current_mode: str) -> str:
+    """活跃建议卡片（Layer 3, M1.5: 只取当前项目、当前 mode 的 pending 卡片）。"""
+    try:
+        from core.agent_tools import PENDING_SUGGESTIONS
+        ja = locale == "ja-JP"
+        items = []
+        # 按 (project_id, mode, status) 查询，避免跨项目 / 跨模式认知污染
+        # （undone/superseded/accepted/rejected 不应出现）
+        for sid, card in PENDING_SUGGESTIONS.list_pending(project_id, current_mode):
+            target = card.get("target_field", "?")
+            summary = card.get("summary", "")
+            if ja:
+                items.append(f"  - #{sid[:8]}: 対象フィールド「{target}」、概要: {summary}")
+            else:
+                items.append(f"  - #{sid[:8]}: 目标字段「{target}」，摘要: {summary}")
+    except Exception as e:
+        logger.warning(f"build active_suggestions failed: {e}")
+        return ""
+    if not items:
+        return ""
+    if locale == "ja-JP":
+        return "<active_suggestions>\n現在、未処理の修正提案カードがあります（ユーザー未対応）:\n" + "\n".join(items) + "\n注意: ユーザーが詳細確認や修正依頼を続ける可能性があります。\n</active_suggestions>"
+    return "<active_suggestions>\n当前有未决的修改建议卡片（用户尚未操作）:\n" + "\n".join(items) + "\n注意: 用户可能会追问这些建议的细节或要求调整。\n</active_suggestions>"
+
+
+def _build_volatile_prompt(locale: str, project_id: str, current_mode: str) -> str:
+    """volatile 段：时间锚点 + 活跃建议卡片。"""
+    now = datetime.now().astimezone()
+    current_time_context = rt(
+        locale,
+        "orchestrator.time_context",
+        timestamp=now.strftime('%Y-%m-%d %H:%M:%S %Z%z'),
+        weekday=now.strftime('%A'),
+    )
+    title = "## 現在時刻アンカー" if locale == "ja-JP" else "## 当前时间锚点"
+    time_anchor = f"<current_time_anchor>\n{title}\n{current_time_context}\n</current_time_anchor>"
+    active_suggestions_section = _build_active_suggestions_section(locale, project_id, current_mode)
+    if active_suggestions_section:
+        return f"{time_anchor}\n\n{active_suggestions_section}"
+    return time_anchor
+
+
+def build_system_prompt_segments(state: AgentState) -> SystemPromptSegments:
+    """
+    构建分段的 system prompt（见 build_system_prompt）。
+
+    stable 段进程内缓存；project / volatile 段每次重新拼接（内容块索引有自己的 TTL 缓存）。
+    project 段在项目内容不变时逐字节相同，工具循环中的多次调用可以共享 provider 端缓存。
+    """
+    creator_profile = state.get("creator_profile", "")
+    current_handler = state.get("current_handler", state.get("current_phase", "general"))
+    project_id = state.get("project_id", "")
+    project_locale = normalize_locale(state.get("project_locale", DEFAULT_LOCALE))
+    mode_prompt = state.get("mode_prompt", "")
+    memory_context = state.get("memory_context", "")
+
+    cache_key = _sp_cache_key(current_handler, project_locale, mode_prompt)
+    stable = _SYSTEM_PROMPT_CACHE.get(cache_key)
+    if stable is None:
+        # ---- 身份段：来自模式配置 ----
+        identity = mode_prompt or rt(project_locale, "orchestrator.default_identity")
+        # ---- 意图分析阶段专用指南 ----
+        intent_guide = rt(project_locale, "orchestrator.intent_guide") if current_handler == "intent" else ""
+        stable = _build_stable_prompt(project_locale, identity, intent_guide)
+        if len(_SYSTEM_PROMPT_CACHE) >= _SYSTEM_PROMPT_CACHE_MAX:
+            # 淘汰最旧的条目（dict 保序，Python 3.7+）
+            _SYSTEM_PROMPT_CACHE.pop(next(iter(_SYSTEM_PROMPT_CACHE)), None)
+        _SYSTEM_PROMPT_CACHE[cache_key] = stable
+
+    return SystemPromptSegments(
+        stable=stable,
+        project=_build_project_prompt(
+            project_locale, project_id, current_handler, creator_profile, memory_context,
+        ),
+        volatile=_build_volatile_prompt(project_locale, project_id, state.get("mode", "assistant")),
+    )
+
+
+def build_system_prompt(state: AgentState) -> str:
+    """
+    构建 system prompt — Agent 行为的「宪法」。
+
+    设计原则（以终为始）：
+    - 取代原 route_intent() 中的 5000 字意图分类 prompt
+    - 取代原 chat_node() 中的能力介绍 prompt
+    - 取代原硬编码规则（@ 引用路由、意图阶段检测）
+    - 与 @tool docstrings 互补：
+      system prompt 提供上下文和规则，docstrings 提供工具级说明
+
+    模式系统：
+    - mode_prompt 有值时替换身份段（开头），否则使用默认身份
+    - memory_context 有值时注入「项目记忆」段落
+
+    段落顺序按变化频率排列（stable → project → volatile），
+    时间锚点与建议卡片放在最后，不会打断前面的缓存前缀。
+    """
+    return build_system_prompt_segments(state).text()
 
 
 # ============== Token 计数（兼容 OpenRouter 模型名） ==============
@@ -608,27 +631,14 @@ def _count_tokens_approx(messages: list) -> int:
     """
     近似 token 计数，兼容任意模型名（OpenRouter、Anthropic、Google 等），无需外部依赖。
 
-    估算策略（混合中英文）：
+    估算策略（混合中英文，见 core.token_service.approx_text_tokens）：
     - 中文字符（CJK 基本区）：每字约 1.5 token
     - 其他字符（英文/数字/标点）：每 4 字符约 1 token
     - 每条消息固定 overhead：4 tokens
 
-    精度足够用于 trim_messages 裁剪决策。
+    按消息备忘，trim_messages 对同一批消息的反复调用只做字典查找。
     """
-    total = 0
-    for msg in messages:
-        content = msg.get("content", "") if isinstance(msg, dict) else getattr(msg, "content", "") or ""
-        if isinstance(content, list):
-            # 多模态消息（list of dicts，如含 image_url）
-            content = " ".join(
-                part.get("text", "") for part in content if isinstance(part, dict)
-            )
-        content = normalize_content(content) if content else ""
-        # 混合估算：中文字符 * 1.5 + 非中文字符 / 4
-        cn = sum(1 for c in content if '\u4e00' <= c <= '\u9fff')
-        other = len(content) - cn
-        total += int(cn * 1.5 + other / 4) + 4  # 4 per message overhead
-    return total
+    return count_messages_tokens(messages)
 
 
 def _resolve_budget_zone(total_tokens: int, soft_cap: int) -> str:
@@ -671,7 +681,7 @@ async def agent_node(state: AgentState, config: RunnableConfig) -> dict:
     Agent 决策节点。
 
     流程：
-    1. 构建 system prompt（每次重新生成，反映最新项目状态）
+    1. 构建分段 system prompt（stable 段缓存，project / volatile 段反映最新项目状态）
     2. trim_messages 裁剪历史（防止 context window 溢出）
     3. bind_tools 的 LLM 自主决定：直接回复 or 调用工具
 
@@ -683,25 +693,21 @@ async def agent_node(state: AgentState, config: RunnableConfig) -> dict:
 
     logger.debug("[agent_node] 开始执行, messages=%d", len(state["messages"]))
 
-    # 工具执行后使 field_index 和 system_prompt 缓存失效（工具可能修改了内容块）
+    # 工具执行后使 system prompt 的项目段失效（工具可能修改了内容块）
     if state["messages"] and isinstance(state["messages"][-1], ToolMessage):
-        project_id = state.get("project_id", "")
-        try:
-            from core.digest_service import invalidate_field_index_cache
-            if project_id:
-                invalidate_field_index_cache(project_id)
-        except ImportError:
-            pass
-        if project_id:
-            invalidate_system_prompt_cache(project_id)
-
-    system_prompt = build_system_prompt(state)
+        invalidate_system_prompt_cache(state.get("project_id", ""))
+
+    prompt_segments = build_system_prompt_segments(state)
 
     # Token 预算管理：按 Zone A/B/C/D 执行逐级治理
     from core.memory_service import compute_context_budget
     budget = compute_context_budget(getattr(llm, "model_name", ""))
     soft_cap = budget["soft_cap"]
-    token_total = _count_tokens_approx(state["messages"])
+    token_total, token_counted = update_running_total(
+        state["messages"],
+        total=state.get("token_total") or 0,
+        counted=state.get("token_counted") or 0,
+    )
     zone = _resolve_budget_zone(token_total, soft_cap)
     compressed_messages = _compress_if_needed(state["messages"], zone)
 
@@ -730,15 +736,25 @@ async def agent_node(state: AgentState, config: RunnableConfig) -> dict:
     logger.debug("[agent_node] trimmed messages=%d (from %d)", len(trimmed), len(state["messages"]))
 
     # 将 system prompt 作为第一条消息注入
-    messages_with_system = [SystemMessage(content=system_prompt)] + trimmed
+    messages_with_system = [SystemMessage(content=prompt_segments.text())] + trimmed
     # 防御性清理：合并多余 SystemMessage（防止 Checkpointer 恢复旧消息导致 Anthropic 报错）
     messages_with_system = sanitize_messages(messages_with_system)
+    # 显式缓存断点（Anthropic）：stable / project 段末尾 + 最新一条消息；
+    # 其他 provider 的前缀缓存是自动的，稳定的段落顺序即可命中
+    messages_with_system = apply_prompt_cache_breakpoints(
+        messages_with_system,
+        system_segments=prompt_segments,
+        provider=limiter_key_for_model(llm)[0],
+    )
 
     # LLM 调用（bind_tools 让 LLM 自动决定是否调用工具）
     # ⚠️ 必须传 config，否则 astream_events 的 callback 链断裂，无法流式输出
     from core.llm import ainvoke_with_retry
+    from core.llm_rate_limiter import PRIORITY_INTERACTIVE
     llm_with_tools = llm.bind_tools(AGENT_TOOLS)
-    response = await ainvoke_with_retry(llm_with_tools, messages_with_system, config=config)
+    response = await ainvoke_with_retry(
+        llm_with_tools, messages_with_system, config=config, priority=PRIORITY_INTERACTIVE,
+    )
 
     has_tool_calls = hasattr(response, "tool_calls") and response.tool_calls
     _content = normalize_content(response.content)
@@ -750,7 +766,11 @@ async def agent_node(state: AgentState, config: RunnableConfig) -> dict:
         content_preview,
     )
 
-    return {"messages": [response]}
+    return {
+        "messages": [response],
+        "token_total": token_total + count_message_tokens(response),
+        "token_counted": token_counted + 1,
+    }
 
 
 def should_continue(state: AgentState) -> str:
@@ -0,0 +1,501 @@
+# backend/core/project_run_queue.py
+# 功能: 项目级运行任务的持久化队列 + 进程内异步 worker 池（替代每次请求起 daemon 线程 + asyncio.run）
+# 主要导出: project_run_queue (全局实例), ProjectRunQueue
+# 数据结构: project_run_jobs 表（ProjectRunJob）；worker 与心跳为主事件循环上的 asyncio.Task
+#
+# 语义:
+# - enqueue 同一项目同一模式只保留一条 queued 记录（运行中再次请求 → 当前轮跑完后补跑一轮）
+# - 同一项目串行、不同项目按入队顺序公平轮转，全局并发由 PROJECT_RUN_WORKERS 控制
+# - 领取是条件 UPDATE（status='queued' 且项目无 running 任务），多 worker / 多进程不会重复领取
+# - /run、/run-stream 经 run_inline 在请求协程中执行，但同样登记 running 记录，与 worker 互斥
+# - running 记录带持有进程 owner_id，持有进程定期刷新 heartbeat_at；只有心跳过期（持有进程已退出）的
+#   记录才会被回收：worker 任务放回 queued（超过重试上限判定失败），inline 任务判定失败（由用户重新发起）
+
+"""
+项目运行任务队列
+
+原实现为每个调度请求启动一个 daemon 线程并在其中 asyncio.run(run_project_blocks(...))：
+任务只存在于内存、重启即丢，项目间没有公平性，且每个线程都要重建自己的 LLM 客户端。
+现在所有任务先落库，再由应用启动时创建的 worker 在主事件循环中执行，
+与请求路径共享 LLM 客户端缓存与全局调度器（core.llm_rate_limiter）。
+
+用法:
+    from core.project_run_queue import project_run_queue
+    project_run_queue.enqueue(project_id)            # 任意线程可调用，只写库 + 唤醒 worker
+    await project_run_queue.start()                  # 应用启动时
+    await project_run_queue.stop()                   # 应用关闭时（运行中的任务心跳过期后被回收）
+    await project_run_queue.run_inline(project_id, mode, run)  # 请求路径：同步执行但遵守项目串行
+"""
+
+from __future__ import annotations
+
+import asyncio
+import logging
+import os
+import socket
+import threading
+import uuid
+from datetime import timedelta
+from typing import Any, Awaitable, Callable, Optional
+
+from sqlalchemy import func, insert, literal, or_, select
+from sqlalchemy.orm import Session
+
+from core.config import settings
+from core.database import get_session_maker
+from core.models import ProjectRunJob
+from core.models.base import generate_uuid, utcnow_naive
+
+logger = logging.getLogger("project_run_queue")
+
+# 被领取执行的次数达到该值后，重启恢复时不再重试（避免某个任务反复把进程拖垮）
+MAX_JOB_ATTEMPTS = 3
+# 每个项目保留的已结束任务数（用于状态查询）
+FINISHED_JOBS_KEPT_PER_PROJECT = 20
+# 空闲 worker 的兜底轮询间隔（其他进程写入的任务没有唤醒信号）
+_IDLE_POLL_SECONDS = 30.0
+# 每次领取最多尝试的候选数（前面的候选被其他 worker 抢走时顺延）
+_CLAIM_CANDIDATES = 8
+# 请求路径等待同项目运行结束的轮询间隔
+_INLINE_CLAIM_POLL_SECONDS = 0.5
+# 持有进程刷新 running 任务心跳的间隔（同时检查其他进程遗留的过期任务）
+HEARTBEAT_INTERVAL_SECONDS = 15.0
+# 心跳超过该时长未刷新的 running 任务视为持有进程已退出
+STALE_HEARTBEAT_SECONDS = 90.0
+
+ProjectRunner = Callable[..., Awaitable[dict[str, Any]]]
+
+
+async def _default_runner(*, project_id: str, mode: str) -> dict[str, Any]:
+    from core.project_run_service import run_project_blocks
+
+    return await run_project_blocks(project_id=project_id, mode=mode)
+
+
+def _default_owner_id() -> str:
+    return f"{socket.gethostname()}:{os.getpid()}:{uuid.uuid4().hex[:8]}"
+
+
+def _run_summary(result: Any) -> dict[str, Any]:
+    result = result if isinstance(result, dict) else {}
+    return {
+        "started_count": result.get("started_count", 0),
+        "completed_count": result.get("completed_count", 0),
+        "failed_count": result.get("failed_count", len(result.get("failed_items", []) or [])),
+    }
+
+
+def _job_to_dict(job: ProjectRunJob) -> dict[str, Any]:
+    return {
+        "id": job.id,
+        "project_id": job.project_id,
+        "mode": job.mode,
+        "status": job.status,
+        "attempts": job.attempts or 0,
+        "inline": bool(job.inline),
+        "owner_id": job.owner_id or "",
+        "heartbeat_at": job.heartbeat_at.isoformat() if job.heartbeat_at else None,
+        "created_at": job.created_at.isoformat() if job.created_at else None,
+        "started_at": job.started_at.isoformat() if job.started_at else None,
+        "finished_at": job.finished_at.isoformat() if job.finished_at else None,
+        "last_error": job.last_error or "",
+        "summary": job.summary or {},
+    }
+
+
+class ProjectRunQueue:
+    """
+    持久化项目运行队列。
+
+    session_factory 为空时每次使用 core.database.get_session_maker()（跟随当前 DATABASE_URL），
+    runner 默认调用 core.project_run_service.run_project_blocks，
+    owner_id 为空时按 主机名:PID:随机后缀 生成（每个进程 / 实例唯一）。
+    """
+
+    def __init__(
+        self,
+        session_factory: Optional[Callable[[], Session]] = None,
+        *,
+        runner: Optional[ProjectRunner] = None,
+        workers: Optional[int] = None,
+        owner_id: Optional[str] = None,
+    ):
+        self._session_factory = session_factory
+        self.owner_id = owner_id or _default_owner_id()
+        self._runner = runner or _default_runner
+        self._workers = workers
+        self._enqueue_lock = threading.Lock()
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self._wake_event: Optional[asyncio.Event] = None
+        self._tasks: list[asyncio.Task] = []
+        self._heartbeat_task: Optional[asyncio.Task] = None
+        self._stopping = False
+
+    def _session(self) -> Session:
+        factory = self._session_factory or get_session_maker()
+        return factory()
+
+    @property
+    def running(self) -> bool:
+        return bool(self._tasks)
+
+    # ---------- 生产端 ----------
+
+    def enqueue(self, project_id: str, mode: str = "auto_trigger") -> Optional[str]:
+        """
+        写入一条 queued 任务并唤醒 worker，返回任务 ID。
+        该项目同模式已有排队任务时直接复用（合并重复请求）。
+        """
+        if not project_id:
+            return None
+
+        with self._enqueue_lock:
+            db = self._session()
+            try:
+                existing = db.query(ProjectRunJob).filter(
+                    ProjectRunJob.project_id == project_id,
+                    ProjectRunJob.mode == mode,
+                    ProjectRunJob.status == "queued",
+                ).first()
+                if existing:
+                    job_id = existing.id
+                else:
+                    job = ProjectRunJob(project_id=project_id, mode=mode, status="queued")
+                    db.add(job)
+                    db.commit()
+                    job_id = job.id
+            finally:
+                db.close()
+
+        self.wake()
+        return job_id
+
+    def wake(self) -> None:
+        """唤醒空闲 worker（线程安全；队列未启动时无操作，任务留在库中等待下次启动）。"""
+        loop, event = self._loop, self._wake_event
+        if loop is None or event is None:
+            return
+        try:
+            loop.call_soon_threadsafe(event.set)
+        except RuntimeError:
+            # 事件循环已关闭（进程退出中）
+            pass
+
+    # ---------- 消费端 ----------
+
+    def recover_interrupted(self) -> int:
+        """
+        回收心跳过期的 running 任务（持有进程已崩溃 / 重启 / 被停止）。返回处理条数。
+
+        worker 任务放回 queued，重试次数耗尽的判定失败；inline 任务（/run、/run-stream）由用户发起，
+        不自动重跑，直接判定失败。心跳仍在刷新的任务属于存活进程，不会被回收。
+        每条回收都是带“心跳仍过期”条件的 UPDATE，持有进程恰好恢复心跳时 rowcount 为 0，跳过。
+        """
+        db = self._session()
+        try:
+            cutoff = utcnow_naive() - timedelta(seconds=STALE_HEARTBEAT_SECONDS)
+            stale_filter = (
+                ProjectRunJob.status == "running",
+                or_(ProjectRunJob.heartbeat_at.is_(None), ProjectRunJob.heartbeat_at < cutoff),
+            )
+            stale = db.query(
+                ProjectRunJob.id, ProjectRunJob.attempts, ProjectRunJob.inline,
+            ).filter(*stale_filter).all()
+            recovered = 0
+            for job_id, attempts, inline in stale:
+                values: dict[Any, Any] = {
+                    ProjectRunJob.owner_id: None,
+                    ProjectRunJob.heartbeat_at: None,
+                }
+                if inline:
+                    values.update({
+                        ProjectRunJob.status: "failed",
+                        ProjectRunJob.finished_at: utcnow_naive(),
+                        ProjectRunJob.last_error: "运行被中断（服务重启或崩溃），请重新发起。",
+                    })
+                elif (attempts or 0) >= MAX_JOB_ATTEMPTS:
+                    values.update({
+                        ProjectRunJob.status: "failed",
+                        ProjectRunJob.finished_at: utcnow_naive(),
+                        ProjectRunJob.last_error: "任务多次被中断（服务重启或崩溃），已停止重试。",
+                    })
+                else:
+                    values[ProjectRunJob.status] = "queued"
+                recovered += db.query(ProjectRunJob).filter(
+                    ProjectRunJob.id == job_id, *stale_filter,
+                ).update(values, synchronize_session=False)
+            db.commit()
+            if recovered:
+                logger.info("[project-run-queue] 回收 %d 个心跳过期的项目运行任务", recovered)
+            return recovered
+        finally:
+            db.close()
+
+    def heartbeat(self) -> int:
+        """刷新本实例持有的 running 任务心跳。返回刷新条数。"""
+        db = self._session()
+        try:
+            count = db.query(ProjectRunJob).filter(
+                ProjectRunJob.status == "running",
+                ProjectRunJob.owner_id == self.owner_id,
+            ).update({ProjectRunJob.heartbeat_at: utcnow_naive()}, synchronize_session=False)
+            db.commit()
+            return count
+        finally:
+            db.close()
+
+    def _claim_next(self) -> Optional[tuple[str, str, str]]:
+        """
+        领取最早入队、且所属项目当前没有运行中任务的 queued 任务。
+        领取是一条带 status='queued' 条件的 UPDATE，rowcount 为 0 说明已被其他 worker / 进程抢先，
+        继续尝试下一个候选。
+        """
+        db = self._session()
+        try:
+            busy_projects = select(ProjectRunJob.project_id).where(ProjectRunJob.status == "running")
+            candidates = db.query(ProjectRunJob.id, ProjectRunJob.project_id, ProjectRunJob.mode).filter(
+                ProjectRunJob.status == "queued",
+                ProjectRunJob.project_id.notin_(busy_projects),
+            ).order_by(ProjectRunJob.created_at.asc()).limit(_CLAIM_CANDIDATES).all()
+            for job_id, project_id, mode in candidates:
+                now = utcnow_naive()
+                claimed = db.query(ProjectRunJob).filter(
+                    ProjectRunJob.id == job_id,
+                    ProjectRunJob.status == "queued",
+                    ProjectRunJob.project_id.notin_(busy_projects),
+                ).update({
+                    ProjectRunJob.status: "running",
+                    ProjectRunJob.attempts: func.coalesce(ProjectRunJob.attempts, 0) + 1,
+                    ProjectRunJob.started_at: now,
+                    ProjectRunJob.owner_id: self.owner_id,
+                    ProjectRunJob.heartbeat_at: now,
+                    ProjectRunJob.last_error: "",
+                }, synchronize_session=False)
+                db.commit()
+                if claimed == 1:
+                    return job_id, project_id, mode
+            return None
+        finally:
+            db.close()
+
+    def _claim_inline(self, project_id: str, mode: str) -> Optional[str]:
+        """
+        为请求路径（/run、/run-stream）直接写入一条 running 记录；项目已有运行中任务时返回 None。
+        INSERT ... SELECT ... WHERE NOT EXISTS 是单条语句，与 _claim_next 的条件 UPDATE 互斥。
+        """
+        db = self._session()
+        try:
+            now = utcnow_naive()
+            job_id = generate_uuid()
+            values = {
+                "id": job_id,
+                "project_id": project_id,
+                "mode": mode,
+                "status": "running",
+                "attempts": 1,
+                "inline": True,
+                "owner_id": self.owner_id,
+                "heartbeat_at": now,
+                "created_at": now,
+                "updated_at": now,
+                "started_at": now,
+                "last_error": "",
+            }
+            project_busy = select(ProjectRunJob.id).where(
+                ProjectRunJob.project_id == project_id,
+                ProjectRunJob.status == "running",
+            ).exists()
+            stmt = insert(ProjectRunJob).from_select(
+                list(values),
+                select(*(literal(value) for value in values.values())).where(~project_busy),
+            )
+            inserted = db.execute(stmt).rowcount
+            db.commit()
+            return job_id if inserted == 1 else None
+        finally:
+            db.close()
+
+    def _finish(self, job_id: str, *, ok: bool, summary: dict | None = None, error: str = "") -> None:
+        db = self._session()
+        try:
+            job = db.query(ProjectRunJob).filter(
+                ProjectRunJob.id == job_id,
+                ProjectRunJob.status == "running",
+                ProjectRunJob.owner_id == self.owner_id,
+            ).first()
+            if job is None:
+                # 心跳过期后已被其他进程回收，结果以回收后的记录为准
+                logger.warning("[project-run-queue] 任务 %s 已不归本实例持有，忽略其运行结果", job_id)
+                return
+            job.status = "succeeded" if ok else "failed"
+            job.finished_at = utcnow_naive()
+            job.last_error = error[:2000]
+            job.summary = summary or {}
+            job.owner_id = None
+            job.heartbeat_at = None
+            project_id = job.project_id
+            db.commit()
+
+            expired = db.query(ProjectRunJob.id).filter(
+                ProjectRunJob.project_id == project_id,
+                ProjectRunJob.status.in_(("succeeded", "failed")),
+            ).order_by(ProjectRunJob.created_at.desc()).offset(FINISHED_JOBS_KEPT_PER_PROJECT).all()
+            if expired:
+                db.query(ProjectRunJob).filter(
+                    ProjectRunJob.id.in_([row.id for row in expired])
+                ).delete(synchronize_session=False)
+                db.commit()
+        finally:
+            db.close()
+
+    async def _run_job(self, job_id: str, project_id: str, mode: str) -> None:
+        try:
+            result = await self._runner(project_id=project_id, mode=mode)
+        except Exception as exc:
+            logger.exception("[project-run-queue] project %s (%s) 运行失败", project_id, mode)
+            self._finish(job_id, ok=False, error=str(getattr(exc, "detail", "") or exc))
+        else:
+            self._finish(job_id, ok=True, summary=_run_summary(result))
+        finally:
+            # 同项目的后续任务此时才可领取
+            self.wake()
+
+    async def run_inline(
+        self,
+        project_id: str,
+        mode: str,
+        run: Callable[[], Awaitable[Any]],
+        *,
+        on_queued: Optional[Callable[[], None]] = None,
+    ) -> Any:
+        """
+        在调用方协程中执行一次项目运行，并返回 run() 的结果 / 抛出其异常。
+
+        /run 需要同步返回运行结果、/run-stream 需要逐条转发进度事件，因此不交给 worker 执行；
+        但同样登记为 running 任务，与 worker 共用“同一项目同一时间只运行一轮”的约束：
+        项目已有运行中任务时先调用 on_queued()，再等待其结束。
+        """
+        job_id = self._claim_inline(project_id, mode)
+        if job_id is None and on_queued is not None:
+            on_queued()
+        while job_id is None:
+            await asyncio.sleep(_INLINE_CLAIM_POLL_SECONDS)
+            job_id = self._claim_inline(project_id, mode)
+
+        try:
+            result = await run()
+        except (Exception, asyncio.CancelledError) as exc:
+            error = "运行被取消" if isinstance(exc, asyncio.CancelledError) else str(getattr(exc, "detail", "") or exc)
+            self._finish(job_id, ok=False, error=error)
+            raise
+        else:
+            self._finish(job_id, ok=True, summary=_run_summary(result))
+            return result
+        finally:
+            self.wake()
+
+    async def run_pending(self) -> int:
+        """在当前协程中依次执行所有可领取的任务，直到没有为止。返回执行的任务数。"""
+        count = 0
+        while True:
+            claimed = self._claim_next()
+            if claimed is None:
+                return count
+            await self._run_job(*claimed)
+            count += 1
+
+    async def _worker_loop(self, index: int) -> None:
+        event = self._wake_event
+        assert event is not None
+        # Python 3.11 的 wait_for 在唤醒与取消同时到达时可能吞掉 CancelledError，
+        # 因此除了 cancel 之外还用 _stopping 标志保证 worker 退出
+        while not self._stopping:
+            try:
+                if await self.run_pending():
+                    continue
+                event.clear()
+                # clear 之后再检查一次，避免错过 clear 之前到达的唤醒
+                if await self.run_pending() or self._stopping:
+                    continue
+                try:
+                    await asyncio.wait_for(event.wait(), timeout=_IDLE_POLL_SECONDS)
+                except asyncio.TimeoutError:
+                    pass
+            except asyncio.CancelledError:
+                raise
+            except Exception:  # pragma: no cover - 队列自身异常（如数据库暂不可用）不能让 worker 退出
+                logger.exception("[project-run-queue] worker %d 异常，稍后重试", index)
+                await asyncio.sleep(1.0)
+
+    async def _heartbeat_loop(self) -> None:
+        """定期刷新本实例 running 任务的心跳，并回收其他进程遗留的过期任务。"""
+        while not self._stopping:
+            await asyncio.sleep(HEARTBEAT_INTERVAL_SECONDS)
+            try:
+                self.heartbeat()
+                if self.recover_interrupted():
+                    self.wake()
+            except Exception:  # pragma: no cover - 数据库暂不可用时下一轮重试
+                logger.exception("[project-run-queue] 刷新心跳失败，稍后重试")
+
+    async def start(self) -> None:
+        """回收心跳过期的任务并在当前事件循环启动 worker 与心跳（重复调用无副作用）。"""
+        if self._tasks:
+            return
+        self.recover_interrupted()
+        self._stopping = False
+        self._loop = asyncio.get_running_loop()
+        self._wake_event = asyncio.Event()
+        count = max(1, int(self._workers or settings.project_run_workers or 1))
+        self._tasks = [
+            asyncio.create_task(self._worker_loop(i), name=f"project-run-worker-{i}")
+            for i in range(count)
+        ]
+        self._heartbeat_task = asyncio.create_task(self._heartbeat_loop(), name="project-run-heartbeat")
+        self._wake_event.set()
+        logger.info("[project-run-queue] 已启动 %d 个 worker", count)
+
+    async def stop(self) -> None:
+        """取消 worker 与心跳。运行中的任务保持 running，心跳过期后由本进程下次启动或其他进程回收。"""
+        tasks, self._tasks = self._tasks, []
+        if self._heartbeat_task is not None:
+            tasks.append(self._heartbeat_task)
+            self._heartbeat_task = None
+        self._stopping = True
+        if self._wake_event is not None:
+            self._wake_event.set()
+        for task in tasks:
+            task.cancel()
+        if tasks:
+            await asyncio.gather(*tasks, return_exceptions=True)
+        self._loop = None
+        self._wake_event = None
+
+    # ---------- 查询 ----------
+
+    def status(self, project_id: str, *, db: Optional[Session] = None, limit: int = 10) -> dict[str, Any]:
+        """项目的队列状态：排队数、运行中的任务 + 最近的任务列表（新→旧）。传入 db 时复用该会话。"""
+        owns_session = db is None
+        db = db or self._session()
+        try:
+            jobs = db.query(ProjectRunJob).filter(
+                ProjectRunJob.project_id == project_id,
+            ).order_by(ProjectRunJob.created_at.desc()).limit(max(1, limit)).all()
+            active = db.query(ProjectRunJob).filter(
+                ProjectRunJob.project_id == project_id,
+                ProjectRunJob.status.in_(("queued", "running")),
+            ).all()
+            running = next((job for job in active if job.status == "running"), None)
+            return {
+                "project_id": project_id,
+                "queued_count": sum(1 for job in active if job.status == "queued"),
+                "running": _job_to_dict(running) if running else None,
+                "workers_active": self.running,
+                "jobs": [_job_to_dict(job) for job in jobs],
+            }
+        finally:
+            if owns_session:
+                db.close()
+
+
+project_run_queue = ProjectRunQueue()
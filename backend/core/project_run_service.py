@@ -1,30 +1,51 @@
 # backend/core/project_run_service.py
 # 功能: 项目级调度服务，统一计算 ready 块并按模式执行（auto_trigger / start_all_ready）
 # 主要函数: list_ready_blocks, run_project_blocks
-# 数据结构: 以 project_id 为粒度，返回扫描/执行摘要
+# 数据结构: 以 project_id 为粒度，返回扫描/执行摘要；执行期维护 depends_on DAG（入度 + 关键路径优先级）
 
 """
 项目级调度服务
 
-第一版目标：
 - 让 check-auto-triggers 和“全部开始”共用同一套 ready 判定
-- 由后端统一循环扫描并执行，不再由前端递归 orchestrate
+- 由后端统一调度执行，不再由前端递归 orchestrate
 - 支持并发上限，但保持数据库写入与单块生成边界清晰
+
+调度方式（DAG 流式调度，替代按轮次全量重扫）:
+- 开始时一次性加载项目所有块，构建本次运行的 depends_on DAG
+- 某个块的最后一个依赖完成后立即开始，不必等待同一“轮”中最慢的块
+- 同时就绪的块优先执行关键路径（下游链最长）上的块
+- 块完成后只重新读取它自己和它的直接下游，用于发现因其变化而新失效的块
+- 可选 on_event 回调输出 plan / block_started / block_completed / block_failed / done 进度事件（SSE 接口复用）
+
+返回值中的 rounds 按“波次”分组：第 0 波为开始时即就绪的块，
+第 n 波为其依赖在第 n-1 波中完成的块（与原先按轮次扫描的结果一致）。
 """
 
 from __future__ import annotations
 
 import asyncio
-from typing import Any
+import heapq
+import inspect
+import logging
+from typing import Any, Awaitable, Callable, Optional, Union
 
 from fastapi import HTTPException
 
-from core.block_generation_service import generate_block_content_sync, list_ready_block_ids
+from core.block_generation_service import (
+    generate_block_content_sync,
+    is_block_run_candidate,
+    is_dependency_satisfied,
+    list_ready_block_ids,
+)
 from core.database import get_session_maker
+from core.models import ContentBlock
 
+logger = logging.getLogger("project_run_service")
 
 VALID_PROJECT_RUN_MODES = {"auto_trigger", "start_all_ready"}
 
+ProjectRunEventHandler = Callable[[dict[str, Any]], Union[None, Awaitable[None]]]
+
 
 def list_ready_blocks(*, project_id: str, mode: str, db) -> list[str]:
     if mode not in VALID_PROJECT_RUN_MODES:
@@ -32,82 +53,257 @@ def list_ready_blocks(*, project_id: str, mode: str, db) -> list[str]:
     return list_ready_block_ids(project_id=project_id, db=db, mode=mode)
 
 
+class _ProjectRunPlan:
+    """
+    一次运行的依赖 DAG。
+
+    - blocks: 项目内所有未删除块（完成后按需刷新）
+    - dependents: 反向依赖（dep_id → 依赖它的块 ID），整个运行期只构建一次
+    - waiting_on: 计划内块尚未完成的计划内依赖
+    - 计划外、且不满足的依赖会让块被阻塞（与 list_ready_block_ids 的判定一致）
+    """
+
+    def __init__(self, blocks: list[ContentBlock], mode: str):
+        self.mode = mode
+        self.blocks: dict[str, ContentBlock] = {block.id: block for block in blocks}
+        self.order: dict[str, int] = {block.id: idx for idx, block in enumerate(blocks)}
+        self.dependents: dict[str, list[str]] = {}
+        for block in blocks:
+            for dep_id in block.depends_on or []:
+                self.dependents.setdefault(dep_id, []).append(block.id)
+
+        self.planned: set[str] = set()
+        self.waiting_on: dict[str, set[str]] = {}
+        self.blocked: set[str] = set()
+        self.wave: dict[str, int] = {}
+        self._rank: dict[str, int] = {}
+        self._ready: list[tuple[int, int, str]] = []
+
+        initial = [block.id for block in blocks if is_block_run_candidate(block, mode=mode)]
+        self.planned.update(initial)
+        for block_id in initial:
+            self._link(block_id)
+        for block_id in initial:
+            if self._is_ready(block_id):
+                self.wave[block_id] = 0
+                self._push_ready(block_id)
+
+    # ---------- 构图 ----------
+
+    def _link(self, block_id: str) -> None:
+        waiting: set[str] = set()
+        for dep_id in self.blocks[block_id].depends_on or []:
+            if dep_id in self.planned:
+                waiting.add(dep_id)
+            elif not is_dependency_satisfied(self.blocks.get(dep_id)):
+                self.blocked.add(block_id)
+        self.waiting_on[block_id] = waiting
+
+    def _is_ready(self, block_id: str) -> bool:
+        return block_id not in self.blocked and not self.waiting_on.get(block_id)
+
+    def critical_path_length(self, block_id: str) -> int:
+        """计划内以该块为起点的最长下游链长度（含自身）。环上的块按 1 计。"""
+        cached = self._rank.get(block_id)
+        if cached is not None:
+            return cached
+        self._rank[block_id] = 1  # 防环占位
+        longest = 0
+        for child_id in self.dependents.get(block_id, []):
+            if child_id in self.planned and child_id not in self.blocked:
+                longest = max(longest, self.critical_path_length(child_id))
+        self._rank[block_id] = 1 + longest
+        return self._rank[block_id]
+
+    def _push_ready(self, block_id: str) -> None:
+        heapq.heappush(self._ready, (-self.critical_path_length(block_id), self.order.get(block_id, 0), block_id))
+
+    def ready_ids(self) -> list[str]:
+        return [item[2] for item in sorted(self._ready)]
+
+    def pop_ready(self) -> Optional[str]:
+        return heapq.heappop(self._ready)[2] if self._ready else None
+
+    # ---------- 运行期更新 ----------
+
+    def refresh(self, rows: list[ContentBlock]) -> None:
+        for row in rows:
+            self.blocks[row.id] = row
+
+    def on_finished(self, block_id: str, *, succeeded: bool) -> list[str]:
+        """
+        记录块结束，返回因此新就绪的块（已入就绪堆）。
+        成功且满足依赖条件时解锁计划内下游，并把刚变为待重生成的直接下游纳入计划；
+        失败或仍需人工确认时，计划内下游保持阻塞。
+        """
+        satisfied = succeeded and is_dependency_satisfied(self.blocks.get(block_id))
+        newly_ready: list[str] = []
+        added = False
+        for child_id in self.dependents.get(block_id, []):
+            child = self.blocks.get(child_id)
+            if child is None:
+                continue
+            if child_id not in self.planned:
+                if not satisfied or not is_block_run_candidate(child, mode=self.mode):
+                    continue
+                # 上游刚重新生成，使已有内容的下游失效 → 本次运行内接着处理
+                self.planned.add(child_id)
+                self._link(child_id)
+                added = True
+            else:
+                waiting = self.waiting_on.get(child_id)
+                if not waiting or block_id not in waiting:
+                    continue
+                if not satisfied:
+                    self.blocked.add(child_id)
+                    continue
+                waiting.discard(block_id)
+            if self._is_ready(child_id) and child_id not in self.wave:
+                self.wave[child_id] = self.wave.get(block_id, 0) + 1
+                newly_ready.append(child_id)
+        if added:
+            self._rank.clear()
+        for child_id in newly_ready:
+            self._push_ready(child_id)
+        return newly_ready
+
+
+async def _emit(on_event: Optional[ProjectRunEventHandler], event: dict[str, Any]) -> None:
+    if on_event is None:
+        return
+    try:
+        outcome = on_event(event)
+        if inspect.isawaitable(outcome):
+            await outcome
+    except Exception:  # pragma: no cover - 进度回调异常不能影响调度
+        logger.exception("[project-run] progress handler failed on %s", event.get("type"))
+
+
 async def run_project_blocks(
     *,
     project_id: str,
     mode: str,
     max_concurrency: int = 4,
+    on_event: Optional[ProjectRunEventHandler] = None,
 ) -> dict[str, Any]:
     if mode not in VALID_PROJECT_RUN_MODES:
         raise HTTPException(status_code=400, detail=f"不支持的运行模式: {mode}")
 
     session_factory = get_session_maker()
-    attempted_ids: set[str] = set()
+    scan_db = session_factory()
+    try:
+        all_blocks = scan_db.query(ContentBlock).filter(
+            ContentBlock.project_id == project_id,
+            ContentBlock.deleted_at == None,  # noqa: E711
+        ).all()
+    finally:
+        scan_db.close()
+
+    plan = _ProjectRunPlan(all_blocks, mode)
+    limit = max(1, max_concurrency)
+    started_ids: list[str] = []
     succeeded_ids: list[str] = []
     failed_items: list[dict[str, str]] = []
-    rounds: list[dict[str, Any]] = []
-    semaphore = asyncio.Semaphore(max(1, max_concurrency))
+    running: dict[asyncio.Task, str] = {}
+
+    await _emit(on_event, {
+        "type": "plan",
+        "project_id": project_id,
+        "mode": mode,
+        "planned_ids": sorted(plan.planned, key=lambda bid: plan.order.get(bid, 0)),
+        "ready_ids": plan.ready_ids(),
+        "blocked_ids": sorted(plan.blocked, key=lambda bid: plan.order.get(bid, 0)),
+    })
 
     async def _run_single(block_id: str) -> dict[str, Any]:
-        async with semaphore:
-            db = session_factory()
-            try:
-                result = await generate_block_content_sync(block_id=block_id, db=db)
-                return {"ok": True, "block_id": block_id, "result": result}
-            except HTTPException as exc:
-                return {
-                    "ok": False,
-                    "block_id": block_id,
-                    "error": str(exc.detail),
-                }
-            except Exception as exc:  # pragma: no cover
-                return {
-                    "ok": False,
-                    "block_id": block_id,
-                    "error": str(exc),
-                }
-            finally:
-                db.close()
+        db = session_factory()
+        try:
+            result = await generate_block_content_sync(block_id=block_id, db=db)
+            return {"ok": True, "block_id": block_id, "result": result}
+        except HTTPException as exc:
+            return {"ok": False, "block_id": block_id, "error": str(exc.detail)}
+        except Exception as exc:  # pragma: no cover
+            return {"ok": False, "block_id": block_id, "error": str(exc)}
+        finally:
+            db.close()
 
-    while True:
-        scan_db = session_factory()
+    def _reload(block_id: str) -> None:
+        ids = [block_id, *plan.dependents.get(block_id, [])]
+        db = session_factory()
         try:
-            ready_ids = list_ready_block_ids(
-                project_id=project_id,
-                db=scan_db,
-                mode=mode,
-                exclude_ids=attempted_ids,
-            )
+            plan.refresh(db.query(ContentBlock).filter(
+                ContentBlock.id.in_(ids),
+                ContentBlock.deleted_at == None,  # noqa: E711
+            ).all())
         finally:
-            scan_db.close()
-
-        if not ready_ids:
-            break
-
-        attempted_ids.update(ready_ids)
-        round_results = await asyncio.gather(*[_run_single(block_id) for block_id in ready_ids])
-        round_summary = {
-            "started_ids": ready_ids,
-            "succeeded_ids": [item["block_id"] for item in round_results if item["ok"]],
-            "failed_ids": [item["block_id"] for item in round_results if not item["ok"]],
-        }
-        rounds.append(round_summary)
-
-        for item in round_results:
-            if item["ok"]:
-                succeeded_ids.append(item["block_id"])
-            else:
-                failed_items.append({
-                    "block_id": item["block_id"],
-                    "error": item["error"],
+            db.close()
+
+    async def _start_ready() -> None:
+        while len(running) < limit:
+            block_id = plan.pop_ready()
+            if block_id is None:
+                return
+            started_ids.append(block_id)
+            running[asyncio.create_task(_run_single(block_id))] = block_id
+            block = plan.blocks.get(block_id)
+            await _emit(on_event, {
+                "type": "block_started",
+                "block_id": block_id,
+                "name": getattr(block, "name", ""),
+                "wave": plan.wave.get(block_id, 0),
+                "critical_path": plan.critical_path_length(block_id),
+            })
+
+    await _start_ready()
+    try:
+        while running:
+            done, _ = await asyncio.wait(running.keys(), return_when=asyncio.FIRST_COMPLETED)
+            for task in done:
+                block_id = running.pop(task)
+                item = task.result()
+                _reload(block_id)
+                block = plan.blocks.get(block_id)
+                if item["ok"]:
+                    succeeded_ids.append(block_id)
+                else:
+                    failed_items.append({"block_id": block_id, "error": item["error"]})
+                unlocked = plan.on_finished(block_id, succeeded=item["ok"])
+                await _emit(on_event, {
+                    "type": "block_completed" if item["ok"] else "block_failed",
+                    "block_id": block_id,
+                    "name": getattr(block, "name", ""),
+                    "status": getattr(block, "status", ""),
+                    "error": item.get("error", ""),
+                    "unlocked_ids": unlocked,
                 })
+            await _start_ready()
+    finally:
+        # 调用方取消时，不留下无人等待的生成任务
+        for task in running:
+            task.cancel()
+
+    succeeded_set = set(succeeded_ids)
+    failed_set = {item["block_id"] for item in failed_items}
+    rounds: list[dict[str, Any]] = []
+    for block_id in started_ids:
+        wave = plan.wave.get(block_id, 0)
+        while len(rounds) <= wave:
+            rounds.append({"started_ids": [], "succeeded_ids": [], "failed_ids": []})
+        rounds[wave]["started_ids"].append(block_id)
+        if block_id in succeeded_set:
+            rounds[wave]["succeeded_ids"].append(block_id)
+        elif block_id in failed_set:
+            rounds[wave]["failed_ids"].append(block_id)
+    rounds = [round_summary for round_summary in rounds if round_summary["started_ids"]]
 
-    return {
+    summary = {
         "project_id": project_id,
         "mode": mode,
         "rounds": rounds,
-        "started_count": len(attempted_ids),
+        "started_count": len(started_ids),
         "completed_count": len(succeeded_ids),
         "failed_count": len(failed_items),
         "failed_items": failed_items,
     }
+    await _emit(on_event, {"type": "done", **summary})
+    return summary
@@ -0,0 +1,284 @@
+# backend/core/project_transfer_service.py
+# 功能: 项目导出 / 导入的流式传输层 — 分段查询、逐行 NDJSON（可选 gzip）、增量解析与分批
+# 主要函数: export_section_queries(), serialize_row(), serialize_section_rows(), iter_export_records(), iter_ndjson_chunks(),
+#   gzip_chunks(), iter_ndjson_records(), batched()
+# 数据结构:
+#   NDJSON 记录（每行一个 JSON 对象，按下列顺序）:
+#     {"type": "header", "format": "content-factory-project", "export_version": "2.1", ...}
+#     {"type": "creator_profile", "row": {...}}（可选） / {"type": "project", "row": {...}}
+#     {"type": "ids", "section": "content_blocks", "ids": [...]}   需要预先登记 ID 的分段（每条至多 1000 个）
+#     {"type": "row", "section": "content_blocks", "row": {...}}   每行一条
+#     {"type": "end", "counts": {section: 行数}}
+
+"""
+项目流式导出 / 导入
+
+原 /export 一次性把项目所有数据（含 eval trial 的 llm_calls、可选的完整生成日志）拼成一个 dict 返回，
+/import 也要求整个 JSON 一次解析进内存，长 eval 历史的项目导出时内存暴涨数 GB 并超时。
+
+流式格式：
+- 导出端每个分段用 yield_per 服务端游标逐批读取，逐行写出，内存只与批大小有关
+- 导入端逐行解析（自动识别 gzip），由调用方按固定批大小 flush（见 api/projects.py 的 /import-stream）
+- 分段之间有引用（块的 parent_id / depends_on、消息的 parent_message_id、角色 ID 等），
+  这些分段在行数据之前先输出 ids 记录，导入端据此预先登记新 ID，与一次性 JSON 导入的映射结果一致
+
+JSON 导出（/export）与流式导出共用 export_section_queries()，两者内容一致。
+"""
+
+from __future__ import annotations
+
+import gzip
+import io
+import json
+import zlib
+from datetime import datetime
+from itertools import islice
+from typing import Any, BinaryIO, Iterable, Iterator, Optional
+
+from sqlalchemy import or_, select, union_all
+from sqlalchemy.orm import Query, Session
+
+STREAM_FORMAT = "content-factory-project"
+STREAM_EXPORT_VERSION = "2.1"
+# 服务端游标每批读取的行数
+EXPORT_BATCH_SIZE = 200
+# 单条 ids 记录最多携带的 ID 数
+IDS_PER_RECORD = 1000
+# 输出缓冲：攒够这么多字节再交给响应（减少小块写出）
+_CHUNK_BYTES = 64 * 1024
+
+# 导入端需要先登记 ID 的分段（存在同分段内的前向引用或被前面的分段引用）
+PREREGISTERED_SECTIONS = (
+    "agent_modes", "content_blocks", "project_fields", "conversations", "chat_messages",
+)
+
+# 分段输出顺序（被引用的分段在前）
+EXPORT_SECTIONS = (
+    "agent_modes",
+    "content_blocks",
+    "project_fields",
+    "conversations",
+    "chat_messages",
+    "content_versions",
+    "block_history",
+    "simulation_records",
+    "eval_runs",
+    "eval_tasks",
+    "eval_trials",
+    "memory_items",
+    "graders",
+    "project_structure_drafts",
+    "generation_logs",
+)
+
+
+def serialize_row(obj, exclude: Optional[Iterable[str]] = None) -> dict:
+    """序列化 SQLAlchemy 模型为 dict（datetime 转 ISO 字符串）。"""
+    excluded = set(exclude or [])
+    data = {}
+    for col in obj.__table__.columns:
+        if col.name in excluded:
+            continue
+        val = getattr(obj, col.name)
+        if isinstance(val, datetime):
+            val = val.isoformat()
+        data[col.name] = val
+    return data
+
+
+def serialize_section_rows(db: Session, section: str, objs: Iterable[Any]) -> list[dict]:
+    """
+    序列化一批分段行；生成日志的 prompt 正文从 prompt_blobs 还原、增量版本还原为全文（导出文件自包含）。
+    """
+    rows = [serialize_row(obj) for obj in objs]
+    if section == "content_versions":
+        from core.version_service import materialize_version_rows
+
+        materialize_version_rows(db, rows)
+    elif section == "generation_logs":
+        from core.prompt_blob_store import inline_prompt_bodies
+
+        inline_prompt_bodies(db, rows)
+    return rows
+
+
+def export_section_queries(db: Session, project_id: str, *, include_logs: bool = False) -> dict[str, Query]:
+    """
+    各导出分段的查询（按 EXPORT_SECTIONS 顺序，未执行）。
+
+    关联分段用子查询过滤（不先把父表 ID 读进内存）。
+    """
+    from core.models import (
+        ProjectField, ContentBlock, GenerationLog,
+        SimulationRecord,
+        EvalRun, EvalTask, EvalTrial,
+        MemoryItem, ProjectStructureDraft, AgentMode, Conversation,
+    )
+    from core.models.chat_history import ChatMessage
+    from core.models.content_version import ContentVersion
+    from core.models.block_history import BlockHistory
+    from core.models.grader import Grader
+
+    active_block_ids = select(ContentBlock.id).where(
+        ContentBlock.project_id == project_id,
+        ContentBlock.deleted_at == None,  # noqa: E711 — 不导出已软删除的块
+    )
+    field_ids = select(ProjectField.id).where(ProjectField.project_id == project_id)
+    run_ids = select(EvalRun.id).where(EvalRun.project_id == project_id)
+
+    queries: dict[str, Query] = {
+        # AgentModes（项目级角色）
+        "agent_modes": db.query(AgentMode).filter(
+            AgentMode.project_id == project_id,
+            AgentMode.is_template.is_(False),
+        ).order_by(AgentMode.sort_order, AgentMode.created_at),
+        # ContentBlocks（排除已软删除的）
+        "content_blocks": db.query(ContentBlock).filter(
+            ContentBlock.id.in_(active_block_ids),
+        ).order_by(ContentBlock.order_index),
+        # ProjectFields（旧架构）
+        "project_fields": db.query(ProjectField).filter(ProjectField.project_id == project_id),
+        "conversations": db.query(Conversation).filter(
+            Conversation.project_id == project_id,
+        ).order_by(Conversation.last_message_at.asc(), Conversation.created_at.asc()),
+        "chat_messages": db.query(ChatMessage).filter(
+            ChatMessage.project_id == project_id,
+        ).order_by(ChatMessage.created_at),
+        # ContentVersions（通过 block_id 关联块和字段）
+        "content_versions": db.query(ContentVersion).filter(
+            ContentVersion.block_id.in_(union_all(active_block_ids, field_ids)),
+        ).order_by(ContentVersion.block_id, ContentVersion.version_number),
+        "block_history": db.query(BlockHistory).filter(
+            BlockHistory.project_id == project_id,
+        ).order_by(BlockHistory.created_at),
+        "simulation_records": db.query(SimulationRecord).filter(SimulationRecord.project_id == project_id),
+        "eval_runs": db.query(EvalRun).filter(EvalRun.project_id == project_id),
+        "eval_tasks": db.query(EvalTask).filter(EvalTask.eval_run_id.in_(run_ids)),
+        "eval_trials": db.query(EvalTrial).filter(EvalTrial.eval_run_id.in_(run_ids)),
+        # MemoryItems：全局记忆也导出，导入时按原 project_id 还原
+        "memory_items": db.query(MemoryItem).filter(
+            or_(MemoryItem.project_id == project_id, MemoryItem.project_id.is_(None)),
+        ).order_by(MemoryItem.created_at),
+        # Graders（项目专用评分器）
+        "graders": db.query(Grader).filter(Grader.project_id == project_id),
+        "project_structure_drafts": db.query(ProjectStructureDraft).filter(
+            ProjectStructureDraft.project_id == project_id,
+        ),
+    }
+    # GenerationLogs（可选，可能很大）
+    if include_logs:
+        queries["generation_logs"] = db.query(GenerationLog).filter(
+            GenerationLog.project_id == project_id,
+        ).order_by(GenerationLog.created_at)
+    return queries
+
+
+def iter_export_records(
+    db: Session,
+    project_id: str,
+    *,
+    include_logs: bool = False,
+    batch_size: int = EXPORT_BATCH_SIZE,
+) -> Iterator[dict]:
+    """按流式格式逐条产出导出记录（项目不存在时抛 LookupError）。"""
+    from core.models import CreatorProfile, Project
+
+    project = db.query(Project).filter(Project.id == project_id).first()
+    if project is None:
+        raise LookupError(project_id)
+
+    yield {
+        "type": "header",
+        "format": STREAM_FORMAT,
+        "export_version": STREAM_EXPORT_VERSION,
+        "exported_at": datetime.now().isoformat(),
+        "include_logs": include_logs,
+    }
+    # 创作者特质在项目之前（导入端创建项目时需要它的新 ID）
+    if project.creator_profile_id:
+        profile = db.query(CreatorProfile).filter(CreatorProfile.id == project.creator_profile_id).first()
+        if profile:
+            yield {"type": "creator_profile", "row": serialize_row(profile)}
+    yield {"type": "project", "row": serialize_row(project)}
+    db.expunge_all()
+
+    queries = export_section_queries(db, project_id, include_logs=include_logs)
+    for section in PREREGISTERED_SECTIONS:
+        model = queries[section].column_descriptions[0]["entity"]
+        id_query = queries[section].with_entities(model.id).order_by(None).yield_per(IDS_PER_RECORD)
+        ids = (row[0] for row in id_query)
+        for chunk in batched(ids, IDS_PER_RECORD):
+            yield {"type": "ids", "section": section, "ids": chunk}
+
+    counts: dict[str, int] = {}
+    for section in EXPORT_SECTIONS:
+        query = queries.get(section)
+        if query is None:
+            continue
+        count = 0
+        for objs in batched(query.yield_per(batch_size), batch_size):
+            rows = serialize_section_rows(db, section, objs)
+            # 已写出的对象不再保留在 identity map 中
+            for obj in objs:
+                db.expunge(obj)
+            for row in rows:
+                count += 1
+                yield {"type": "row", "section": section, "row": row}
+        counts[section] = count
+    yield {"type": "end", "counts": counts}
+
+
+def iter_ndjson_chunks(records: Iterable[dict]) -> Iterator[bytes]:
+    """把记录编码为 NDJSON，按约 64KB 合并输出。"""
+    buffer = io.BytesIO()
+    for record in records:
+        buffer.write(json.dumps(record, ensure_ascii=False, default=str).encode("utf-8"))
+        buffer.write(b"\n")
+        if buffer.tell() >= _CHUNK_BYTES:
+            yield buffer.getvalue()
+            buffer = io.BytesIO()
+    if buffer.tell():
+        yield buffer.getvalue()
+
+
+def gzip_chunks(chunks: Iterable[bytes], level: int = 6) -> Iterator[bytes]:
+    """增量 gzip 压缩（输出为标准 .gz 格式）。"""
+    compressor = zlib.compressobj(level, zlib.DEFLATED, 16 + zlib.MAX_WBITS)
+    for chunk in chunks:
+        compressed = compressor.compress(chunk)
+        if compressed:
+            yield compressed
+    yield compressor.flush()
+
+
+def iter_ndjson_records(stream: BinaryIO) -> Iterator[dict]:
+    """
+    逐行解析 NDJSON 导出文件（以 gzip 魔数自动识别压缩）。
+
+    输入需为可 peek 的二进制流（文件 / UploadFile.file / io.BufferedReader）。
+    空行跳过；某行不是 JSON 对象时抛 ValueError（带行号）。
+    """
+    reader = stream if hasattr(stream, "peek") else io.BufferedReader(stream)
+    if reader.peek(2)[:2] == b"\x1f\x8b":
+        reader = gzip.GzipFile(fileobj=reader, mode="rb")
+    for line_no, raw in enumerate(reader, start=1):
+        line = raw.strip()
+        if not line:
+            continue
+        try:
+            record = json.loads(line)
+        except ValueError as exc:
+            raise ValueError(f"第 {line_no} 行不是合法的 JSON: {exc}") from exc
+        if not isinstance(record, dict):
+            raise ValueError(f"第 {line_no} 行不是 JSON 对象")
+        yield record
+
+
+def batched(iterable: Iterable[Any], size: int) -> Iterator[list]:
+    """按固定大小切分迭代器（最后一批可能不足）。"""
+    iterator = iter(iterable)
+    while True:
+        chunk = list(islice(iterator, size))
+        if not chunk:
+            return
+        yield chunk
@@ -0,0 +1,274 @@
+# backend/core/prompt_blob_store.py
+# 功能: 生成日志 prompt 正文的内容寻址存储 — 写入时拆分、去重、压缩，读取时按需还原
+# 主要函数: externalize_log_rows(), load_prompt_bodies(), inline_prompt_bodies(), content_hash(),
+#   project_prompt_hashes(), release_prompt_blobs(), purge_unreferenced_blobs()
+# 数据结构:
+#   GenerationLog.prompt_refs = {
+#       "input_kind": "messages" | "text",
+#       "input": [hash, ...],     # messages: 每条消息一个 blob；text: 整段一个 blob；空输入为 []
+#       "output": hash | None,
+#   }
+#   PromptBlob.ref_count = 全部日志 prompt_refs 中该 hash 出现的次数
+
+"""
+Prompt 正文的内容寻址存储
+
+Agent 的工具循环每轮都把几乎相同的 system prompt 和历史消息重新发一遍，
+原实现把完整 prompt_input / prompt_output 逐行存进 generation_logs，表体积随会话线性膨胀，
+日志列表查询也要拖着这两列。
+
+现在：
+- prompt_input 是 llm_logger 序列化的消息 JSON 数组时，按消息拆开，每条消息一个 blob；
+  相同的 system prompt、相同的历史消息前缀在所有日志间只存一份。其他文本整段一个 blob
+- blob 以原文 sha256 为键，zlib 压缩存于 prompt_blobs；写入用 INSERT ... ON CONFLICT DO NOTHING，
+  与日志行在同一事务中提交
+- 日志行只保存 prompt_refs；正文只在日志详情 / 导出（include_prompts）时批量读取还原
+- prompt_refs 为空的旧记录仍从 prompt_input / prompt_output 列读取
+- blob 带引用计数：写日志时与 blob 同一条 upsert 累加，删除项目时按该项目日志的引用扣减，
+  归零的 blob 随之删除（按 content_hash 唯一索引逐个更新，不扫描其他日志）
+- 启动时 purge_unreferenced_blobs() 按全部日志重算一次计数，兜底旧库补列和绕过计数的删除路径
+"""
+
+from __future__ import annotations
+
+import hashlib
+import json
+import zlib
+from collections import Counter
+from typing import Any, Iterable, Optional
+
+from sqlalchemy import bindparam, insert, select, update
+from sqlalchemy.orm import Session
+
+_COMPRESS_LEVEL = 6
+_JSON_SEPARATOR = ", "
+
+
+def content_hash(text: str) -> str:
+    return hashlib.sha256(text.encode("utf-8")).hexdigest()
+
+
+def _split_prompt_input(text: str) -> tuple[str, list[str]]:
+    """消息 JSON 数组按消息拆分（能逐字节还原时）；否则整段作为一个部分。"""
+    if not text:
+        return "text", []
+    if text.startswith("[{"):
+        try:
+            entries = json.loads(text)
+        except ValueError:
+            entries = None
+        if isinstance(entries, list) and entries:
+            parts = [json.dumps(entry, ensure_ascii=False) for entry in entries]
+            if _join_prompt_input("messages", parts) == text:
+                return "messages", parts
+    return "text", [text]
+
+
+def _join_prompt_input(kind: str, parts: list[str]) -> str:
+    if kind == "messages":
+        return "[" + _JSON_SEPARATOR.join(parts) + "]"
+    return "".join(parts)
+
+
+def _store_blobs(db: Session, texts: dict[str, str], counts: Counter) -> None:
+    """写入尚不存在的 blob（hash → 原文），已存在的只累加引用计数。"""
+    from core.models.prompt_blob import PromptBlob
+    from core.models.base import generate_uuid
+
+    if not texts:
+        return
+    rows = [
+        {
+            "id": generate_uuid(),
+            "content_hash": digest,
+            "data": zlib.compress(text.encode("utf-8"), _COMPRESS_LEVEL),
+            "size": len(text.encode("utf-8")),
+            "ref_count": counts[digest],
+        }
+        for digest, text in texts.items()
+    ]
+    bind = db.get_bind()
+    if bind.dialect.name == "sqlite":
+        from sqlalchemy.dialects.sqlite import insert as sqlite_insert
+
+        stmt = sqlite_insert(PromptBlob)
+        db.execute(
+            stmt.on_conflict_do_update(
+                index_elements=["content_hash"],
+                set_={"ref_count": PromptBlob.ref_count + stmt.excluded.ref_count},
+            ),
+            rows,
+        )
+        return
+    existing = set(db.scalars(select(PromptBlob.content_hash).where(PromptBlob.content_hash.in_(list(texts)))))
+    missing = [row for row in rows if row["content_hash"] not in existing]
+    if missing:
+        db.execute(insert(PromptBlob), missing)
+    _adjust_ref_counts(db, {digest: counts[digest] for digest in existing})
+
+
+def _adjust_ref_counts(db: Session, deltas: dict[str, int]) -> None:
+    from core.models.prompt_blob import PromptBlob
+
+    if not deltas:
+        return
+    blobs = PromptBlob.__table__
+    db.execute(
+        update(blobs)
+        .where(blobs.c.content_hash == bindparam("digest"))
+        .values(ref_count=blobs.c.ref_count + bindparam("delta")),
+        [{"digest": digest, "delta": delta} for digest, delta in deltas.items()],
+    )
+
+
+def externalize_log_rows(db: Session, rows: list[dict[str, Any]]) -> None:
+    """
+    把待写入的 GenerationLog 行（列值 dict）的 prompt 正文移入 prompt_blobs。
+
+    原地修改 rows：设置 prompt_refs，清空 prompt_input / prompt_output。
+    blob 写入使用 db 的当前事务，由调用方与日志行一起提交。
+    """
+    texts: dict[str, str] = {}
+    counts: Counter = Counter()
+    for row in rows:
+        if row.get("prompt_refs"):
+            continue
+        kind, parts = _split_prompt_input(row.get("prompt_input") or "")
+        input_hashes = []
+        for part in parts:
+            digest = content_hash(part)
+            texts.setdefault(digest, part)
+            input_hashes.append(digest)
+        output = row.get("prompt_output") or ""
+        output_hash = None
+        if output:
+            output_hash = content_hash(output)
+            texts.setdefault(output_hash, output)
+        row["prompt_refs"] = {"input_kind": kind, "input": input_hashes, "output": output_hash}
+        row["prompt_input"] = ""
+        row["prompt_output"] = ""
+        counts.update(_referenced_hashes([row["prompt_refs"]]))
+    _store_blobs(db, texts, counts)
+
+
+def _load_blobs(db: Session, hashes: Iterable[str]) -> dict[str, str]:
+    from core.models.prompt_blob import PromptBlob
+
+    wanted = list({h for h in hashes if h})
+    blobs: dict[str, str] = {}
+    # 分批查询，避免超过 SQLite 参数上限
+    for start in range(0, len(wanted), 500):
+        chunk = wanted[start:start + 500]
+        for digest, data in db.execute(
+            select(PromptBlob.content_hash, PromptBlob.data).where(PromptBlob.content_hash.in_(chunk))
+        ):
+            blobs[digest] = zlib.decompress(data).decode("utf-8")
+    return blobs
+
+
+def _resolve(refs: Optional[dict], blobs: dict[str, str], legacy_input: str, legacy_output: str) -> tuple[str, str]:
+    if not refs:
+        return legacy_input or "", legacy_output or ""
+    parts = [blobs.get(digest, "") for digest in refs.get("input") or []]
+    output_hash = refs.get("output")
+    return (
+        _join_prompt_input(refs.get("input_kind") or "text", parts),
+        blobs.get(output_hash, "") if output_hash else "",
+    )
+
+
+def _referenced_hashes(refs_list: Iterable[Optional[dict]]) -> list[str]:
+    hashes: list[str] = []
+    for refs in refs_list:
+        if refs:
+            hashes.extend(refs.get("input") or [])
+            if refs.get("output"):
+                hashes.append(refs["output"])
+    return hashes
+
+
+def load_prompt_bodies(db: Session, logs: Iterable[Any]) -> dict[str, tuple[str, str]]:
+    """批量还原日志的 (prompt_input, prompt_output)，按日志 ID 返回（一次查询取全部 blob）。"""
+    logs = list(logs)
+    blobs = _load_blobs(db, _referenced_hashes(getattr(log, "prompt_refs", None) for log in logs))
+    return {
+        log.id: _resolve(getattr(log, "prompt_refs", None), blobs, log.prompt_input, log.prompt_output)
+        for log in logs
+    }
+
+
+def inline_prompt_bodies(db: Session, rows: list[dict[str, Any]]) -> list[dict[str, Any]]:
+    """
+    已序列化的日志行（dict）就地填回正文并去掉 prompt_refs（项目导出使用，
+    导出文件与旧版本格式一致，可被任何版本导入）。
+    """
+    blobs = _load_blobs(db, _referenced_hashes(row.get("prompt_refs") for row in rows))
+    for row in rows:
+        row["prompt_input"], row["prompt_output"] = _resolve(
+            row.pop("prompt_refs", None), blobs, row.get("prompt_input", ""), row.get("prompt_output", ""),
+        )
+    return rows
+
+
+def project_prompt_hashes(db: Session, project_id: str) -> Counter:
+    """项目下全部日志对各 blob hash 的引用次数（删除日志前收集，删除后交给 release_prompt_blobs）。"""
+    from core.models.generation_log import GenerationLog
+
+    refs = db.scalars(select(GenerationLog.prompt_refs).where(GenerationLog.project_id == project_id))
+    return Counter(_referenced_hashes(refs))
+
+
+def _delete_unreferenced(db: Session, hashes: list[str]) -> int:
+    from core.models.prompt_blob import PromptBlob
+
+    deleted = 0
+    for start in range(0, len(hashes), 500):
+        chunk = hashes[start:start + 500]
+        deleted += db.query(PromptBlob).filter(
+            PromptBlob.content_hash.in_(chunk),
+            PromptBlob.ref_count <= 0,
+        ).delete(synchronize_session=False)
+    return deleted
+
+
+def release_prompt_blobs(db: Session, counts: Counter) -> int:
+    """
+    按被删除日志的引用次数扣减 blob 引用计数，删除归零的 blob，返回删除条数。
+
+    只按 content_hash 唯一索引更新给定的 hash，不扫描其他日志；在 db 的当前事务中执行，由调用方提交。
+    计数为空（旧库尚未重算）的 blob 保留到下次启动重算。
+    """
+    counts = {digest: count for digest, count in counts.items() if digest and count}
+    if not counts:
+        return 0
+    _adjust_ref_counts(db, {digest: -count for digest, count in counts.items()})
+    return _delete_unreferenced(db, list(counts))
+
+
+def purge_unreferenced_blobs(db: Session) -> int:
+    """
+    按全部 GenerationLog.prompt_refs 重算每个 blob 的引用计数，删除不再被引用的 blob，返回删除条数。
+
+    需要流式扫描全部日志，只在启动时（尚无并发写入）调用；在 db 的当前事务中执行，由调用方提交。
+    """
+    from core.models.generation_log import GenerationLog
+    from core.models.prompt_blob import PromptBlob
+
+    db.flush()
+    # prompt_refs 是 JSON 列，无法按 hash 建索引：流式扫描全部日志统计引用
+    counts: Counter = Counter()
+    for refs in db.execute(select(GenerationLog.prompt_refs)).scalars().yield_per(1000):
+        if refs:
+            counts.update(_referenced_hashes([refs]))
+    stale = {
+        digest: counts.get(digest, 0)
+        for digest, ref_count in db.execute(select(PromptBlob.content_hash, PromptBlob.ref_count))
+        if ref_count != counts.get(digest, 0)
+    }
+    if stale:
+        blobs = PromptBlob.__table__
+        db.execute(
+            update(blobs).where(blobs.c.content_hash == bindparam("digest")).values(ref_count=bindparam("count")),
+            [{"digest": digest, "count": count} for digest, count in stale.items()],
+        )
+    return _delete_unreferenced(db, [digest for digest, count in stale.items() if count <= 0])
@@ -0,0 +1,232 @@
+# backend/core/search_index_service.py
+# 功能: 项目全局搜索 / 替换的 SQLite FTS5 全文索引（trigram 分词，中日文可直接子串匹配）
+# 主要函数: ensure_search_index(), rebuild_search_index(), search_index_ready(), find_matching_items()
+# 数据结构:
+#   project_search_fts（FTS5 虚拟表）: content + item_type / item_id / project_id（UNINDEXED）
+#   project_search_rows: (item_type, item_id) → FTS rowid，写触发器据此定位旧条目
+#   content_blocks / project_fields 上的 INSERT / UPDATE / DELETE 触发器保持索引同步
+
+"""
+项目搜索索引
+
+原实现每次搜索 / 替换都把项目所有 ProjectField 与 ContentBlock 读进内存，逐条跑正则。
+现在由 FTS5 索引先给出候选（按 BM25 排序），调用方只加载、校验这些行：
+- trigram 分词按 3 字符滑窗建索引，短语查询即子串匹配，中文 / 日文无需分词
+- 同步由 SQLite 触发器完成，覆盖 ORM、批量 UPDATE 与原生 SQL 等所有写入路径；
+  软删除（deleted_at 非空）的内容块从索引中移除
+- trigram 查询至少需要 3 个字符；更短的查询、非 SQLite 库或 SQLite 不支持 trigram 时
+  find_matching_items() 返回 None，调用方退回全量扫描
+- 索引默认不区分大小写：区分大小写的搜索由调用方对候选行再做一次精确匹配
+"""
+
+from __future__ import annotations
+
+import logging
+import weakref
+from dataclasses import dataclass
+from typing import Optional, Sequence
+
+from sqlalchemy import bindparam, text
+from sqlalchemy.engine import Connection, Engine
+from sqlalchemy.exc import OperationalError
+
+logger = logging.getLogger("search_index")
+
+FTS_TABLE = "project_search_fts"
+ROWS_TABLE = "project_search_rows"
+# trigram 分词的最短可索引查询长度
+MIN_INDEXED_QUERY_CHARS = 3
+
+# 被索引的源表：(表名, item_type, 是否有 deleted_at 软删除列)
+_SOURCES = (
+    ("content_blocks", "block", True),
+    ("project_fields", "field", False),
+)
+
+# engine → 索引是否可用（不可用时不反复探测）
+_ready_by_engine: "weakref.WeakKeyDictionary[Engine, bool]" = weakref.WeakKeyDictionary()
+
+
+@dataclass(frozen=True)
+class SearchHit:
+    item_type: str      # "block" | "field"
+    item_id: str
+    project_id: str
+    score: float        # BM25 相关度（越大越相关）
+
+
+def _live_condition(prefix: str, soft_delete: bool) -> str:
+    return f"{prefix}.deleted_at IS NULL" if soft_delete else "1"
+
+
+def _trigger_statements(table: str, item_type: str, soft_delete: bool) -> list[str]:
+    live = _live_condition("new", soft_delete)
+    insert_new = f"""
+        INSERT INTO {FTS_TABLE}(content, item_type, item_id, project_id)
+            SELECT COALESCE(new.content, ''), '{item_type}', new.id, new.project_id WHERE {live};
+        INSERT OR REPLACE INTO {ROWS_TABLE}(item_type, item_id, fts_rowid)
+            SELECT '{item_type}', new.id, last_insert_rowid() WHERE {live};"""
+    delete_old = f"""
+        DELETE FROM {FTS_TABLE} WHERE rowid = (
+            SELECT fts_rowid FROM {ROWS_TABLE} WHERE item_type = '{item_type}' AND item_id = old.id
+        );
+        DELETE FROM {ROWS_TABLE} WHERE item_type = '{item_type}' AND item_id = old.id;"""
+    update_columns = "content, project_id, deleted_at" if soft_delete else "content, project_id"
+    return [
+        f"CREATE TRIGGER IF NOT EXISTS trg_{table}_search_ai AFTER INSERT ON {table} BEGIN{insert_new}\nEND",
+        f"CREATE TRIGGER IF NOT EXISTS trg_{table}_search_ad AFTER DELETE ON {table} BEGIN{delete_old}\nEND",
+        f"CREATE TRIGGER IF NOT EXISTS trg_{table}_search_au AFTER UPDATE OF {update_columns} ON {table} "
+        f"BEGIN{delete_old}{insert_new}\nEND",
+    ]
+
+
+def _rebuild(conn: Connection) -> None:
+    conn.execute(text(f"DELETE FROM {FTS_TABLE}"))
+    conn.execute(text(f"DELETE FROM {ROWS_TABLE}"))
+    for table, item_type, soft_delete in _SOURCES:
+        conn.execute(text(
+            f"INSERT INTO {FTS_TABLE}(content, item_type, item_id, project_id) "
+            f"SELECT COALESCE(content, ''), '{item_type}', id, project_id FROM {table} "
+            f"WHERE {_live_condition(table, soft_delete)}"
+        ))
+    conn.execute(text(
+        f"INSERT INTO {ROWS_TABLE}(item_type, item_id, fts_rowid) "
+        f"SELECT item_type, item_id, rowid FROM {FTS_TABLE}"
+    ))
+
+
+def _index_missing_rows(conn: Connection) -> bool:
+    """行映射表为空、但源表中有未删除的行：索引建立到一半就中断过（或从未填充），需要全量重建。"""
+    if conn.execute(text(f"SELECT 1 FROM {ROWS_TABLE} LIMIT 1")).first() is not None:
+        return False
+    return any(
+        conn.execute(text(
+            f"SELECT 1 FROM {table} WHERE {_live_condition(table, soft_delete)} LIMIT 1"
+        )).first() is not None
+        for table, _, soft_delete in _SOURCES
+    )
+
+
+def ensure_search_index(engine: Engine) -> bool:
+    """
+    创建 FTS5 表、行映射表与同步触发器（幂等）；索引为空而源表有数据时从现有数据全量建立索引
+    （首次创建，或上次建表后、填充前进程退出）。
+    返回索引是否可用（非 SQLite 或不支持 FTS5 trigram 时为 False）。
+    """
+    if engine.dialect.name != "sqlite":
+        _ready_by_engine[engine] = False
+        return False
+
+    with engine.begin() as conn:
+        exists = conn.execute(
+            text("SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = :name"),
+            {"name": FTS_TABLE},
+        ).first() is not None
+        if not exists:
+            try:
+                conn.execute(text(
+                    f"CREATE VIRTUAL TABLE {FTS_TABLE} USING fts5("
+                    "content, item_type UNINDEXED, item_id UNINDEXED, project_id UNINDEXED, "
+                    "tokenize = 'trigram')"
+                ))
+            except OperationalError as e:
+                # SQLite < 3.34 没有 trigram 分词器，或编译时未启用 FTS5
+                logger.warning("[search_index] FTS5 trigram 不可用，项目搜索使用全量扫描: %s", e)
+                _ready_by_engine[engine] = False
+                return False
+
+        conn.execute(text(
+            f"CREATE TABLE IF NOT EXISTS {ROWS_TABLE} ("
+            "item_type VARCHAR(10) NOT NULL, item_id VARCHAR(36) NOT NULL, fts_rowid INTEGER NOT NULL, "
+            "PRIMARY KEY (item_type, item_id))"
+        ))
+        for table, item_type, soft_delete in _SOURCES:
+            for statement in _trigger_statements(table, item_type, soft_delete):
+                conn.execute(text(statement))
+        if _index_missing_rows(conn):
+            _rebuild(conn)
+            logger.info("[search_index] 已建立项目搜索索引")
+
+    _ready_by_engine[engine] = True
+    return True
+
+
+def rebuild_search_index(engine: Engine) -> None:
+    """按源表全量重建索引（索引损坏或手工修改数据库后使用）。"""
+    if not search_index_ready(engine):
+        return
+    with engine.begin() as conn:
+        _rebuild(conn)
+
+
+def search_index_ready(engine: Engine) -> bool:
+    """索引表是否已建立（结果按 engine 缓存）。"""
+    ready = _ready_by_engine.get(engine)
+    if ready is None:
+        if engine.dialect.name != "sqlite":
+            ready = False
+        else:
+            with engine.connect() as conn:
+                ready = conn.execute(
+                    text("SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = :name"),
+                    {"name": FTS_TABLE},
+                ).first() is not None
+        _ready_by_engine[engine] = ready
+    return ready
+
+
+def _match_expression(query: str) -> str:
+    """把用户输入转为 FTS5 短语（trigram 下即子串匹配），双引号按 FTS5 规则转义。"""
+    return '"' + query.replace('"', '""') + '"'
+
+
+def find_matching_items(
+    db,
+    query: str,
+    *,
+    project_ids: Optional[Sequence[str]] = None,
+    limit: Optional[int] = None,
+    offset: int = 0,
+) -> Optional[list[SearchHit]]:
+    """
+    查询内容中包含 query 的内容块 / 字段，按相关度降序返回。
+
+    输入: db - Session；project_ids 为空表示跨全部项目；limit 为空表示不限制，offset 跳过前若干条（分页取候选）
+    输出: SearchHit 列表；索引不可用或查询短于 3 个字符时返回 None（调用方退回全量扫描）
+    结果不区分大小写，且只代表“可能匹配”，调用方仍需对内容做精确匹配。
+    """
+    if len(query or "") < MIN_INDEXED_QUERY_CHARS:
+        return None
+    engine = db.get_bind()
+    if not search_index_ready(engine):
+        return None
+
+    sql = (
+        f"SELECT item_type, item_id, project_id, bm25({FTS_TABLE}) AS rank FROM {FTS_TABLE} "
+        f"WHERE {FTS_TABLE} MATCH :match"
+    )
+    params: dict = {"match": _match_expression(query)}
+    if project_ids is not None:
+        if not project_ids:
+            return []
+        sql += " AND project_id IN :project_ids"
+        params["project_ids"] = list(project_ids)
+    sql += " ORDER BY rank"
+    if limit is not None:
+        sql += " LIMIT :limit OFFSET :offset"
+        params["limit"] = max(1, int(limit))
+        params["offset"] = max(0, int(offset))
+    statement = text(sql)
+    if project_ids is not None:
+        statement = statement.bindparams(bindparam("project_ids", expanding=True))
+
+    try:
+        rows = db.execute(statement, params).all()
+    except OperationalError as e:
+        logger.warning("[search_index] 查询失败，退回全量扫描: %s", e)
+        return None
+    # bm25() 越小越相关，对外统一为越大越相关
+    return [
+        SearchHit(item_type=row.item_type, item_id=row.item_id, project_id=row.project_id, score=-float(row.rank))
+        for row in rows
+    ]
@@ -0,0 +1,356 @@
+# backend/core/suggestion_store.py
+# 功能: 未确认 SuggestionCard 的存储 — 按项目索引的进程内 LRU 缓存 + 写穿透到 pending_suggestions 表，带 TTL
+# 主要类: SuggestionStore（agent_tools.PENDING_SUGGESTIONS 即其全局实例，兼容原 dict 用法）
+# 主要函数: list_pending(), find_group(), patch(), purge_expired()
+# 数据结构:
+#   内存: OrderedDict[card_id → (expires_at, card)] + project_id → {card_id} 索引
+#   数据库: PendingSuggestion(id=card_id, project_id, source_mode, status, group_id, card, expires_at)
+
+"""
+SuggestionCard 存储
+
+原实现是进程级全局 dict：永不淘汰；build_system_prompt 每次遍历全部项目的全部卡片；
+后端重启后卡片丢失，confirm-suggestion 只能回退到扫描最近的 ChatMessage 元数据。
+
+现在：
+- 仍是 MutableMapping（card_id → card dict），propose_edit / rewrite_field / confirm-suggestion 的写法不变
+- 每次写入 / 删除同步写到 pending_suggestions 表；读取（含 in / len / 遍历）以数据库为准（重启、多 worker 都能取到，
+  已被其他 worker 确认的卡片不会再被应用）；读到的行会刷新内存中同一卡片 dict 的内容（保持引用，内容以数据库为准）
+- list_pending(project_id, mode) 只查该项目的卡片（数据库按 (project_id, source_mode, status) 索引）
+- 内存缓存最多 suggestion_cache_size 张（LRU），卡片 suggestion_ttl_hours 后过期
+- 数据库不可用时退化为纯内存（记录警告，不影响对话流程）
+- 直接修改卡片 dict 的字段不会写回数据库；需要持久化的修改用 patch()
+"""
+
+from __future__ import annotations
+
+import logging
+import threading
+import time
+from collections import OrderedDict
+from collections.abc import MutableMapping
+from datetime import datetime, timedelta
+from typing import Any, Callable, Iterator, Optional
+
+from sqlalchemy import func
+from sqlalchemy.orm import Session
+
+from core.config import settings
+from core.models.base import utcnow_naive
+
+logger = logging.getLogger("suggestion_store")
+
+_PURGE_INTERVAL_SECONDS = 600
+
+
+def _card_project(card: dict) -> str:
+    return card.get("project_id") or ""
+
+
+def _card_mode(card: dict) -> str:
+    return card.get("source_mode") or "assistant"
+
+
+class SuggestionStore(MutableMapping):
+    """card_id → SuggestionCard dict（见模块说明）。"""
+
+    def __init__(
+        self,
+        session_factory: Optional[Callable[[], Session]] = None,
+        *,
+        max_cached: Optional[int] = None,
+        ttl_seconds: Optional[float] = None,
+    ):
+        self._session_factory = session_factory
+        self._max_cached = max_cached
+        self._ttl_seconds = ttl_seconds
+        self._lock = threading.RLock()
+        self._cards: "OrderedDict[str, tuple[datetime, dict]]" = OrderedDict()
+        self._by_project: dict[str, set[str]] = {}
+        self._last_purge = 0.0
+
+    def _session(self) -> Session:
+        from core.database import get_session_maker
+
+        factory = self._session_factory or get_session_maker()
+        return factory()
+
+    @property
+    def max_cached(self) -> int:
+        return max(1, int(self._max_cached or settings.suggestion_cache_size or 1))
+
+    @property
+    def ttl(self) -> timedelta:
+        seconds = self._ttl_seconds if self._ttl_seconds is not None else settings.suggestion_ttl_hours * 3600
+        return timedelta(seconds=max(1, seconds))
+
+    # ---------- 内存缓存 ----------
+
+    def _cache_put(self, card_id: str, card: dict, expires_at: datetime) -> None:
+        with self._lock:
+            self._cache_drop(card_id)
+            self._cards[card_id] = (expires_at, card)
+            self._by_project.setdefault(_card_project(card), set()).add(card_id)
+            while len(self._cards) > self.max_cached:
+                oldest = next(iter(self._cards))
+                self._cache_drop(oldest)
+
+    def _cache_drop(self, card_id: str) -> Optional[dict]:
+        with self._lock:
+            entry = self._cards.pop(card_id, None)
+            if entry is None:
+                return None
+            project_ids = self._by_project.get(_card_project(entry[1]))
+            if project_ids is not None:
+                project_ids.discard(card_id)
+                if not project_ids:
+                    self._by_project.pop(_card_project(entry[1]), None)
+            return entry[1]
+
+    def _cache_get(self, card_id: str) -> Optional[dict]:
+        with self._lock:
+            entry = self._cards.get(card_id)
+            if entry is None:
+                return None
+            if entry[0] <= utcnow_naive():
+                self._cache_drop(card_id)
+                return None
+            self._cards.move_to_end(card_id)
+            return entry[1]
+
+    # ---------- 数据库 ----------
+
+    def _db_write(self, card_id: str, card: dict, expires_at: datetime) -> None:
+        from core.models import PendingSuggestion
+
+        values = {
+            "project_id": _card_project(card),
+            "source_mode": _card_mode(card),
+            "status": card.get("status") or "pending",
+            "group_id": card.get("group_id") or None,
+            "card": card,
+            "expires_at": expires_at,
+        }
+        try:
+            db = self._session()
+            try:
+                row = db.get(PendingSuggestion, card_id)
+                if row is None:
+                    db.add(PendingSuggestion(id=card_id, **values))
+                else:
+                    for key, value in values.items():
+                        setattr(row, key, value)
+                db.commit()
+            finally:
+                db.close()
+        except Exception as e:
+            logger.warning("[suggestion_store] 写入 %s 失败，仅保留在内存: %s", card_id[:8], e)
+        self._maybe_purge()
+
+    def _db_delete(self, card_id: str) -> bool:
+        from core.models import PendingSuggestion
+
+        try:
+            db = self._session()
+            try:
+                deleted = db.query(PendingSuggestion).filter(
+                    PendingSuggestion.id == card_id,
+                ).delete(synchronize_session=False)
+                db.commit()
+                return bool(deleted)
+            finally:
+                db.close()
+        except Exception as e:
+            logger.warning("[suggestion_store] 删除 %s 失败: %s", card_id[:8], e)
+            return False
+
+    def _db_query(self, **filters: Any) -> Optional[list]:
+        """未过期的行；数据库不可用时返回 None。"""
+        from core.models import PendingSuggestion
+
+        try:
+            db = self._session()
+            try:
+                query = db.query(PendingSuggestion).filter(PendingSuggestion.expires_at > utcnow_naive())
+                for column, value in filters.items():
+                    query = query.filter(getattr(PendingSuggestion, column) == value)
+                return query.order_by(PendingSuggestion.created_at).all()
+            finally:
+                db.close()
+        except Exception as e:
+            logger.warning("[suggestion_store] 读取失败，使用内存缓存: %s", e)
+            return None
+
+    def _db_ids(self) -> Optional[list[str]]:
+        """全部未过期卡片的 ID；数据库不可用时返回 None。"""
+        from core.models import PendingSuggestion
+
+        try:
+            db = self._session()
+            try:
+                rows = db.query(PendingSuggestion.id).filter(
+                    PendingSuggestion.expires_at > utcnow_naive(),
+                ).order_by(PendingSuggestion.created_at).all()
+                return [row.id for row in rows]
+            finally:
+                db.close()
+        except Exception as e:
+            logger.warning("[suggestion_store] 读取失败，使用内存缓存: %s", e)
+            return None
+
+    def _db_count(self) -> Optional[int]:
+        """未过期卡片数；数据库不可用时返回 None。"""
+        from core.models import PendingSuggestion
+
+        try:
+            db = self._session()
+            try:
+                return db.query(func.count(PendingSuggestion.id)).filter(
+                    PendingSuggestion.expires_at > utcnow_naive(),
+                ).scalar() or 0
+            finally:
+                db.close()
+        except Exception as e:
+            logger.warning("[suggestion_store] 读取失败，使用内存缓存: %s", e)
+            return None
+
+    def _adopt(self, rows: list) -> list[tuple[str, dict]]:
+        """数据库行 → (card_id, card)；已在内存中的卡片就地刷新为行内容（保持同一 dict 引用）。"""
+        result = []
+        for row in rows:
+            fresh = dict(row.card or {})
+            card = self._cache_get(row.id)
+            if card is None:
+                card = fresh
+            else:
+                card.clear()
+                card.update(fresh)
+            self._cache_put(row.id, card, row.expires_at)
+            result.append((row.id, card))
+        return result
+
+    def purge_expired(self) -> int:
+        """删除已过期的卡片（内存 + 数据库），返回数据库删除条数。"""
+        from core.models import PendingSuggestion
+
+        now = utcnow_naive()
+        with self._lock:
+            for card_id in [cid for cid, (expires_at, _) in self._cards.items() if expires_at <= now]:
+                self._cache_drop(card_id)
+            self._last_purge = time.monotonic()
+        try:
+            db = self._session()
+            try:
+                deleted = db.query(PendingSuggestion).filter(
+                    PendingSuggestion.expires_at <= now,
+                ).delete(synchronize_session=False)
+                db.commit()
+                return deleted
+            finally:
+                db.close()
+        except Exception as e:
+            logger.warning("[suggestion_store] 清理过期卡片失败: %s", e)
+            return 0
+
+    def _maybe_purge(self) -> None:
+        if time.monotonic() - self._last_purge >= _PURGE_INTERVAL_SECONDS:
+            self.purge_expired()
+
+    # ---------- MutableMapping ----------
+
+    def __getitem__(self, card_id: str) -> dict:
+        # 以数据库为准（其他 worker 可能已确认并删除该卡片）；数据库不可用时才只看内存
+        rows = self._db_query(id=card_id)
+        if rows is None:
+            card = self._cache_get(card_id)
+            if card is None:
+                raise KeyError(card_id)
+            return card
+        if not rows:
+            self._cache_drop(card_id)
+            raise KeyError(card_id)
+        return self._adopt(rows)[0][1]
+
+    def __setitem__(self, card_id: str, card: dict) -> None:
+        expires_at = utcnow_naive() + self.ttl
+        self._cache_put(card_id, card, expires_at)
+        self._db_write(card_id, card, expires_at)
+
+    def __delitem__(self, card_id: str) -> None:
+        cached = self._cache_drop(card_id)
+        deleted = self._db_delete(card_id)
+        if cached is None and not deleted:
+            raise KeyError(card_id)
+
+    def pop(self, card_id: str, *default: Any) -> Any:
+        """删除并返回卡片。内存中的卡片对象原样返回，不再按数据库刷新（保留调用方刚改的 status 等字段）。"""
+        rows = self._db_query(id=card_id)
+        cached = self._cache_drop(card_id)
+        present = cached is not None if rows is None else bool(rows)
+        if not present:
+            if default:
+                return default[0]
+            raise KeyError(card_id)
+        self._db_delete(card_id)
+        return cached if cached is not None else dict(rows[0].card or {})
+
+    def __iter__(self) -> Iterator[str]:
+        """遍历全部未过期卡片的 ID（以数据库为准，按创建顺序；数据库不可用时只有本进程缓存）。"""
+        card_ids = self._db_ids()
+        if card_ids is None:
+            with self._lock:
+                card_ids = list(self._cards.keys())
+        return iter(card_ids)
+
+    def __len__(self) -> int:
+        count = self._db_count()
+        if count is None:
+            with self._lock:
+                return len(self._cards)
+        return count
+
+    # ---------- 按项目查询 ----------
+
+    def patch(self, card_id: str, **fields: Any) -> Optional[dict]:
+        """修改卡片字段并写回数据库；卡片不存在时返回 None。"""
+        card = self.get(card_id)
+        if card is None:
+            return None
+        card.update(fields)
+        self[card_id] = card
+        return card
+
+    def list_pending(self, project_id: str, mode: Optional[str] = None) -> list[tuple[str, dict]]:
+        """某项目（可选某 mode）下 status=pending 的卡片，按创建顺序。"""
+        filters: dict[str, Any] = {"project_id": project_id or "", "status": "pending"}
+        if mode is not None:
+            filters["source_mode"] = mode
+        rows = self._db_query(**filters)
+        if rows is not None:
+            return self._adopt(rows)
+        with self._lock:
+            card_ids = list(self._by_project.get(project_id or "", ()))
+        result = []
+        for card_id in card_ids:
+            card = self._cache_get(card_id)
+            if card is None or card.get("status", "pending") != "pending":
+                continue
+            if mode is not None and _card_mode(card) != mode:
+                continue
+            result.append((card_id, card))
+        return result
+
+    def find_group(self, group_id: str, project_id: Optional[str] = None) -> list[tuple[str, dict]]:
+        """SuggestionGroup 下的全部卡片。"""
+        filters: dict[str, Any] = {"group_id": group_id}
+        if project_id is not None:
+            filters["project_id"] = project_id
+        rows = self._db_query(**filters)
+        if rows is not None:
+            return self._adopt(rows)
+        with self._lock:
+            cached = [(cid, card) for cid, (_, card) in self._cards.items() if card.get("group_id") == group_id]
+        return [
+            (cid, card) for cid, card in cached
+            if project_id is None or _card_project(card) == project_id
+        ]
@@ -0,0 +1,174 @@
+# backend/core/token_service.py
+# 功能: 统一的 token 计数服务（orchestrator 上下文预算 / trim_messages、memory 预算选择共用）
+# 主要函数: count_text_tokens(), approx_text_tokens(), count_message_tokens(), count_messages_tokens(),
+#   update_running_total()
+# 数据结构: 进程内 LRU 备忘表（文本摘要 → token 数、(消息 ID, 内容摘要) → token 数，不保留正文）；
+#   tiktoken 编码器进程内只加载一次
+
+"""
+Token 计数服务
+
+原实现的问题：
+- orchestrator 每次 agent_node 都逐字符遍历全部历史消息，trim_messages 又对同一批消息反复调用
+- memory_service 每条记忆都重新 tiktoken.get_encoding（离线环境下每次都尝试下载编码表）
+
+现在：
+- 近似计数（消息历史）：CJK 字符用正则一次取出（C 层完成），按 (消息 ID, 内容长度 + 8 字节摘要) 备忘，
+  备忘表不持有消息正文；str 内容命中时不做归一化，重复调用只是一次摘要 + 字典查找
+- 精确计数（记忆文本）：cl100k_base 编码器只加载一次；加载失败（未安装 / 离线）时退回近似计数
+- update_running_total() 只对新增消息计数，AgentState 中保存累计值，工具循环每轮为 O(新消息)
+"""
+
+from __future__ import annotations
+
+import hashlib
+import logging
+import re
+import threading
+from collections import OrderedDict
+from typing import Any, Optional, Sequence
+
+from core.llm_compat import normalize_content
+
+logger = logging.getLogger("token_service")
+
+# 每条消息的固定开销（角色标记等）
+MESSAGE_OVERHEAD_TOKENS = 4
+# 备忘表容量（条）
+_MEMO_MAX_ENTRIES = 8192
+
+_CJK_CHARS = re.compile(r"[\u4e00-\u9fff]+")
+
+_encoder_lock = threading.Lock()
+_encoder: Any = None
+_encoder_loaded = False
+
+
+class _Memo:
+    """线程安全的定长 LRU 备忘表。"""
+
+    def __init__(self, max_entries: int = _MEMO_MAX_ENTRIES):
+        self._data: "OrderedDict[Any, int]" = OrderedDict()
+        self._lock = threading.Lock()
+        self._max = max_entries
+
+    def get(self, key: Any) -> Optional[int]:
+        with self._lock:
+            value = self._data.get(key)
+            if value is not None:
+                self._data.move_to_end(key)
+            return value
+
+    def put(self, key: Any, value: int) -> None:
+        with self._lock:
+            self._data[key] = value
+            self._data.move_to_end(key)
+            while len(self._data) > self._max:
+                self._data.popitem(last=False)
+
+    def clear(self) -> None:
+        with self._lock:
+            self._data.clear()
+
+    def __len__(self) -> int:
+        return len(self._data)
+
+
+_text_memo = _Memo()
+_message_memo = _Memo()
+
+
+def clear_token_caches() -> None:
+    _text_memo.clear()
+    _message_memo.clear()
+
+
+def get_encoder():
+    """返回 cl100k_base 编码器（进程内只加载一次）；不可用时返回 None。"""
+    global _encoder, _encoder_loaded
+    if _encoder_loaded:
+        return _encoder
+    with _encoder_lock:
+        if not _encoder_loaded:
+            try:
+                import tiktoken
+                _encoder = tiktoken.get_encoding("cl100k_base")
+            except Exception as e:  # 未安装 tiktoken 或离线无法下载编码表
+                logger.warning("[token] tiktoken 编码器不可用，改用近似计数: %s", e)
+                _encoder = None
+            _encoder_loaded = True
+    return _encoder
+
+
+def approx_text_tokens(text: str) -> int:
+    """
+    近似 token 数（混合中英文）：
+    - 中文字符（CJK 基本区）：每字约 1.5 token
+    - 其他字符（英文/数字/标点）：每 4 字符约 1 token
+    """
+    if not text:
+        return 0
+    cn = sum(map(len, _CJK_CHARS.findall(text)))
+    return int(cn * 1.5 + (len(text) - cn) / 4)
+
+
+def _content_key(text: str) -> tuple[int, bytes]:
+    """备忘键：长度 + 8 字节 blake2b 摘要（备忘表中不保留正文）。"""
+    return len(text), hashlib.blake2b(text.encode("utf-8", "surrogatepass"), digest_size=8).digest()
+
+
+def count_text_tokens(text: str) -> int:
+    """cl100k_base 编码的 token 数（按文本摘要备忘）；编码器不可用时返回近似值。"""
+    if not text:
+        return 0
+    key = _content_key(text)
+    cached = _text_memo.get(key)
+    if cached is not None:
+        return cached
+    encoder = get_encoder()
+    if encoder is None:
+        value = approx_text_tokens(text)
+    else:
+        value = len(encoder.encode(text, disallowed_special=()))
+    _text_memo.put(key, value)
+    return value
+
+
+def _message_text(content: Any) -> str:
+    if isinstance(content, list):
+        # 多模态消息（list of dicts，如含 image_url）
+        content = " ".join(part.get("text", "") for part in content if isinstance(part, dict))
+    return normalize_content(content) if content else ""
+
+
+def count_message_tokens(msg: Any) -> int:
+    """单条消息的近似 token 数（含固定开销），按 (消息 ID, 内容摘要) 备忘。"""
+    content = msg.get("content", "") if isinstance(msg, dict) else getattr(msg, "content", "") or ""
+    msg_id = msg.get("id") if isinstance(msg, dict) else getattr(msg, "id", None)
+    # str 内容归一化是恒等操作，直接按原文取摘要；其余形态（多模态列表等）先拼出文本
+    text = content if isinstance(content, str) else _message_text(content)
+    key = (msg_id, _content_key(text))
+    cached = _message_memo.get(key)
+    if cached is not None:
+        return cached
+    value = approx_text_tokens(text) + MESSAGE_OVERHEAD_TOKENS
+    _message_memo.put(key, value)
+    return value
+
+
+def count_messages_tokens(messages: Sequence[Any]) -> int:
+    """消息列表的近似 token 总数（可直接作为 trim_messages 的 token_counter）。"""
+    return sum(count_message_tokens(msg) for msg in messages)
+
+
+def update_running_total(messages: Sequence[Any], *, total: int = 0, counted: int = 0) -> tuple[int, int]:
+    """
+    增量维护消息历史的 token 累计值。
+
+    输入: messages - 完整历史（只追加）；total / counted - 上次的累计值与已计入的消息数
+    输出: (新的累计值, 已计入的消息数)
+    历史被截短或替换（counted 超过当前长度）时整体重算。
+    """
+    if counted < 0 or counted > len(messages):
+        total, counted = 0, 0
+    return total + count_messages_tokens(messages[counted:]), len(messages)
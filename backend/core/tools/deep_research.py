@@ -1,6 +1,6 @@
 # backend/core/tools/deep_research.py
 # 功能: DeepResearch工具，基于 Tavily Search API 的深度调研
-# 主要函数: deep_research(), search_tavily(), plan_search_queries(), synthesize_report()
+# 主要函数: deep_research(), plan_search_queries(), synthesize_report()（搜索见 core.tools.web_search）
 # 数据结构: ResearchReport, ConsumerPersona, PersonaBasicInfo, ConsumerProfileInfo
 
 """
@@ -9,7 +9,7 @@ DeepResearch 工具
 
 流程:
   1. plan_search_queries(): LLM 生成 3-5 个针对性搜索查询词
-  2. search_tavily(): Tavily 搜索（返回 URL + 提取后的正文，一步搞定）
+  2. web_search.search_many(): 全部查询并发搜索（默认 Tavily，返回 URL + 提取后的正文；带 TTL 缓存）
   3. synthesize_report(): LLM 综合分析生成调研报告（含引用）
 
 成本:
@@ -17,19 +17,17 @@ DeepResearch 工具
   - OpenAI: 项目已有的 LLM API
 """
 
-import os
 import asyncio
 from typing import Optional, List
 from pydantic import BaseModel, Field
 import logging
 
-from tavily import TavilyClient
-
 from langchain_core.messages import SystemMessage, HumanMessage
 from langchain_core.runnables import RunnableConfig
 
 from core.llm import llm
 from core.llm_compat import normalize_content
+from core.tools.web_search import search_many
 
 logger = logging.getLogger("deep_research")
 
@@ -74,61 +72,6 @@ class ResearchReport(BaseModel):
     content_length: int = Field(default=0, description="实际使用的内容长度")
 
 
-def _get_tavily_client() -> TavilyClient:
-    """获取 Tavily 客户端（延迟初始化）
-    
-    优先级: pydantic-settings > os.environ > load_dotenv fallback
-    注意: pydantic-settings 不会将 .env 值注入 os.environ，
-    所以不能只依赖 os.getenv("TAVILY_API_KEY")。
-    """
-    from core.config import settings as app_settings
-    api_key = app_settings.tavily_api_key or os.getenv("TAVILY_API_KEY", "")
-    if not api_key:
-        raise ValueError(
-            "TAVILY_API_KEY 未设置！请在 backend/.env 中添加：TAVILY_API_KEY=tvly-你的key\n"
-            "免费注册: https://app.tavily.com/sign-in"
-        )
-    return TavilyClient(api_key=api_key)
-
-
-def search_tavily(query: str, max_results: int = 5) -> List[dict]:
-    """
-    使用 Tavily 搜索（返回 URL + 已提取的正文内容）
-
-    Tavily 的优势：搜索 + 内容提取一步完成，不需要额外的 Jina Reader。
-    
-    Args:
-        query: 搜索查询
-        max_results: 最大结果数
-    
-    Returns:
-        搜索结果列表 [{"title": "...", "url": "...", "content": "...", "score": 0.95}]
-    """
-    try:
-        client = _get_tavily_client()
-        response = client.search(
-            query=query,
-            max_results=max_results,
-            search_depth="advanced",  # 深度搜索，提取更多正文
-            include_answer=False,     # 不需要 Tavily 的 AI 摘要
-        )
-        results = response.get("results", [])
-        logger.info("[Tavily] 搜索 '%s' → %d 条结果", query, len(results))
-        for r in results[:3]:
-            logger.info(
-                "[Tavily] [%.2f] %s (%s)",
-                r.get("score", 0),
-                r.get("title", ""),
-                r.get("url", ""),
-            )
-        return results
-    except Exception as e:
-        import traceback
-        logger.error("[Tavily] 搜索失败 '%s': %s", query, e)
-        traceback.print_exc()
-        return []
-
-
 async def plan_search_queries(
     query: str,
     intent: str,
@@ -282,7 +225,7 @@ async def deep_research(
     
     流程:
     1. LLM 生成搜索词 (plan_search_queries)
-    2. Tavily 搜索 (search_tavily) — 搜索 + 内容提取一步完成
+    2. 并发搜索 (web_search.search_many) — 搜索 + 内容提取一步完成
     3. LLM 综合分析生成报告 (synthesize_report)
     
     Args:
@@ -300,10 +243,9 @@ async def deep_research(
         # 降级：如果 LLM 未能生成查询词，使用意图中的关键信息
         search_queries = [intent[:100]]
     
-    # 2. 执行搜索（Tavily 返回 URL + 已提取的正文）
+    # 2. 并发执行全部搜索（Tavily 返回 URL + 已提取的正文），结果按查询顺序合并
     all_results = []
-    for q in search_queries:
-        results = search_tavily(q, max_results=5)
+    for results in await search_many(search_queries, max_results=5):
         all_results.extend(results)
     
     # 3. 去重（按 URL）
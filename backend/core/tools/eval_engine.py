@@ -35,6 +35,22 @@ from core.config import settings
 from core.models.eval_task import SIMULATOR_TYPES
 
 
+# 各步骤的采样温度（同时进入 core.eval_result_cache 的缓存键：改动后旧结果自动失效）
+EVAL_TEMPERATURES: Dict[str, float] = {
+    "review": 0.6,
+    "exploration": 0.7,
+    "consumer_turn": 0.8,
+    "content_rep_turn": 0.5,
+    "seller_turn": 0.7,
+    "dialogue_grader": 0.5,
+    "experience_plan": 0.7,
+    "experience_per_block": 0.7,
+    "experience_summary": 0.6,
+    "grader": 0.4,
+    "diagnoser": 0.5,
+}
+
+
 # ============== 数据结构 ==============
 
 @dataclass
@@ -399,7 +415,7 @@ async def _run_review(
         response_text, call = await _call_llm(
             system_prompt, user_message,
             step=f"simulator_{simulator_type}_review",
-            temperature=0.6,
+            temperature=EVAL_TEMPERATURES["review"],
         )
         llm_calls.append(call)
         
@@ -627,7 +643,7 @@ async def _run_exploration(
         response_text, call = await _call_llm(
             plan_system, plan_user,
             step=f"explorer_{simulator_type}_exploration",
-            temperature=0.7,
+            temperature=EVAL_TEMPERATURES["exploration"],
         )
         llm_calls.append(call)
         
@@ -874,7 +890,7 @@ async def _run_dialogue(
             user_messages.append(HumanMessage(content=prompt))
             
             user_response_text, user_call = await _call_llm_multi(
-                user_messages, step=f"consumer_turn_{turn+1}", temperature=0.8, locale=locale
+                user_messages, step=f"consumer_turn_{turn+1}", temperature=EVAL_TEMPERATURES["consumer_turn"], locale=locale
             )
             llm_calls.append(user_call)
             
@@ -901,7 +917,7 @@ async def _run_dialogue(
                     content_messages.append(AIMessage(content=log["content"]))
             
             content_response_text, content_call = await _call_llm_multi(
-                content_messages, step=f"content_rep_turn_{turn+1}", temperature=0.5, locale=locale
+                content_messages, step=f"content_rep_turn_{turn+1}", temperature=EVAL_TEMPERATURES["content_rep_turn"], locale=locale
             )
             llm_calls.append(content_call)
             
@@ -963,7 +979,7 @@ JSON 形式で出力してください:
         eval_text, eval_call = await _call_llm(
             eval_system, eval_user,
             step=f"grader_content_{simulator_type}",
-            temperature=0.5,
+            temperature=EVAL_TEMPERATURES["dialogue_grader"],
         )
         llm_calls.append(eval_call)
         
@@ -1137,7 +1153,7 @@ Phase 5 (最后): 总结价值，询问决定
             )))
             
             seller_text, seller_call = await _call_llm_multi(
-                seller_messages, step=f"seller_turn_{turn+1}", temperature=0.7, locale=locale
+                seller_messages, step=f"seller_turn_{turn+1}", temperature=EVAL_TEMPERATURES["seller_turn"], locale=locale
             )
             llm_calls.append(seller_call)
             interaction_log.append({"role": "seller", "name": ("営業担当" if locale == "ja-JP" else "销售顾问"), "content": seller_text, "turn": turn + 1, "phase": _get_sales_phase(turn)})
@@ -1151,7 +1167,7 @@ Phase 5 (最后): 总结价值，询问决定
                     consumer_messages.append(HumanMessage(content=log["content"]))
             
             consumer_text, consumer_call = await _call_llm_multi(
-                consumer_messages, step=f"consumer_turn_{turn+1}", temperature=0.8, locale=locale
+                consumer_messages, step=f"consumer_turn_{turn+1}", temperature=EVAL_TEMPERATURES["consumer_turn"], locale=locale
             )
             llm_calls.append(consumer_call)
             interaction_log.append({"role": "consumer", "name": consumer_name, "content": consumer_text, "turn": turn + 1})
@@ -1209,7 +1225,7 @@ JSON 形式で出力してください:
 }}"""
             ),
             step="grader_content_seller",
-            temperature=0.5,
+            temperature=EVAL_TEMPERATURES["dialogue_grader"],
         )
         llm_calls.append(eval_call)
         
@@ -1353,7 +1369,7 @@ async def run_individual_grader(
         text, call = await _call_llm(
             system_prompt, user_message,
             step=f"grader_{grader_name}",
-            temperature=0.4,
+            temperature=EVAL_TEMPERATURES["grader"],
         )
         result = _parse_json_response(text)
         
@@ -1548,7 +1564,7 @@ JSON を出力してください:
     )
 
     try:
-        text, call = await _call_llm(system_prompt, user_message, step="diagnoser", temperature=0.5)
+        text, call = await _call_llm(system_prompt, user_message, step="diagnoser", temperature=EVAL_TEMPERATURES["diagnoser"])
         result = _parse_json_response(text)
         return result, call
     except Exception as e:
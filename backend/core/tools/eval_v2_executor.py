@@ -25,9 +25,11 @@ from langchain_core.messages import SystemMessage, HumanMessage
 
 from core.config import settings
 from core.localization import DEFAULT_LOCALE, normalize_locale
-from core.llm import get_chat_model
+from core.llm import ainvoke_with_retry, get_chat_model
 from core.llm_compat import normalize_content
+from core.llm_rate_limiter import PRIORITY_EVAL
 from core.locale_text import rt
+from core.tools.eval_engine import EVAL_TEMPERATURES
 
 
 @dataclass
@@ -42,7 +44,11 @@ class ExperienceExecutionResult:
 async def _call_json(system_prompt: str, user_prompt: str, step: str, temperature: float = 0.6) -> tuple[dict, dict]:
     start = time.time()
     model = get_chat_model(temperature=temperature)  # 自动选择 provider 对应的默认模型
-    response = await model.ainvoke([SystemMessage(content=system_prompt), HumanMessage(content=user_prompt)])
+    response = await ainvoke_with_retry(
+        model,
+        [SystemMessage(content=system_prompt), HumanMessage(content=user_prompt)],
+        priority=PRIORITY_EVAL,
+    )
     duration_ms = int((time.time() - start) * 1000)
     usage = getattr(response, "usage_metadata", {}) or {}
     text = normalize_content(response.content)
@@ -133,7 +139,7 @@ async def run_experience_trial(
         probe_section=probe_section,
         block_list=block_list,
     )
-    plan_data, plan_call = await _call_json(plan_system, plan_user, "experience_plan", temperature=0.7)
+    plan_data, plan_call = await _call_json(plan_system, plan_user, "experience_plan", temperature=EVAL_TEMPERATURES["experience_plan"])
     llm_calls.append(plan_call)
     process.append({"type": "plan", "stage": rt(locale, "eval.experience.stage_plan"), "data": plan_data})
 
@@ -163,7 +169,7 @@ async def run_experience_trial(
             block_content=block["content"],
             persona_name=persona_name,
         )
-        per_data, per_call = await _call_json(per_system, per_user, f"experience_per_block_{idx + 1}", temperature=0.7)
+        per_data, per_call = await _call_json(per_system, per_user, f"experience_per_block_{idx + 1}", temperature=EVAL_TEMPERATURES["experience_per_block"])
         llm_calls.append(per_call)
         per_block_results.append({
             "block_id": block["id"],
@@ -199,7 +205,7 @@ async def run_experience_trial(
         all_block_results=all_block_results,
         persona_name=persona_name,
     )
-    summary_data, summary_call = await _call_json(summary_system, summary_user, "experience_summary", temperature=0.6)
+    summary_data, summary_call = await _call_json(summary_system, summary_user, "experience_summary", temperature=EVAL_TEMPERATURES["experience_summary"])
     llm_calls.append(summary_call)
     process.append({"type": "summary", "stage": rt(locale, "eval.experience.stage_summary"), "data": summary_data})
 
@@ -1,6 +1,8 @@
 # backend/core/tools/eval_v2_service.py
 # 功能: Eval V2 执行与聚合的纯函数工具（内容 hash、加权分、Task 聚合、过期检测）
-# 主要函数: compute_content_hash, compute_weighted_grader_score, aggregate_task_scores, is_task_stale
+# 主要函数: compute_content_hash, compute_weighted_grader_score, aggregate_task_scores, is_task_stale,
+#   compute_result_cache_key
+# 主要类: TaskScoreAggregator（Task 聚合分的增量版本）
 # 数据结构:
 #   - grader_results: [{grader_id, scores: {维度: 分数}, ...}]
 #   - aggregate: {overall, dimensions, trial_count}
@@ -16,6 +18,8 @@ Eval V2 纯函数工具层
 from __future__ import annotations
 
 import hashlib
+import json
+from math import isfinite
 from statistics import mean, pstdev
 
 
@@ -67,40 +71,63 @@ def compute_weighted_grader_score(grader_results: list, grader_weights: dict | N
     return overall, dim_scores
 
 
-def aggregate_task_scores(trial_results: list[dict]) -> dict:
-    """
-    聚合 Task 下全部 TrialResult 的统计分（mean/std/min/max）。
-    """
-    valid = [r for r in trial_results if isinstance(r, dict) and isinstance(r.get("overall_score"), (int, float))]
-    trial_scores = [float(r["overall_score"]) for r in valid]
+def _finite_score(value) -> float | None:
+    """数值且有限的分数转 float；NaN / inf / 非数值返回 None（异常 Grader 分数不参与聚合）。"""
+    if not isinstance(value, (int, float)):
+        return None
+    value = float(value)
+    return value if isfinite(value) else None
 
-    if not trial_scores:
-        return {"overall": None, "dimensions": {}, "trial_count": 0}
 
-    overall_stats = {
-        "mean": round(mean(trial_scores), 2),
-        "std": round(pstdev(trial_scores), 2) if len(trial_scores) > 1 else 0.0,
-        "min": round(min(trial_scores), 2),
-        "max": round(max(trial_scores), 2),
+def _score_stats(values: list[float]) -> dict:
+    return {
+        "mean": round(mean(values), 2),
+        "std": round(pstdev(values), 2) if len(values) > 1 else 0.0,
+        "min": round(min(values), 2),
+        "max": round(max(values), 2),
     }
 
-    dim_bucket: dict[str, list[float]] = {}
-    for row in valid:
-        dims = row.get("dimension_scores", {}) or {}
-        for dim, value in dims.items():
-            if isinstance(value, (int, float)):
-                dim_bucket.setdefault(str(dim), []).append(float(value))
-
-    dim_stats = {}
-    for dim, values in dim_bucket.items():
-        dim_stats[dim] = {
-            "mean": round(mean(values), 2),
-            "std": round(pstdev(values), 2) if len(values) > 1 else 0.0,
-            "min": round(min(values), 2),
-            "max": round(max(values), 2),
+
+class TaskScoreAggregator:
+    """
+    Task 聚合分的增量版本：Trial 结果逐条 add()，随时 result()，
+    结果与一次性调用 aggregate_task_scores 相同（执行中无需在结束时重新查询整个 batch）。
+    """
+
+    def __init__(self):
+        self._overall: list[float] = []
+        self._dimensions: dict[str, list[float]] = {}
+
+    def add(self, trial_result: dict) -> None:
+        if not isinstance(trial_result, dict):
+            return
+        overall = _finite_score(trial_result.get("overall_score"))
+        if overall is None:
+            return
+        self._overall.append(overall)
+        for dim, value in (trial_result.get("dimension_scores", {}) or {}).items():
+            score = _finite_score(value)
+            if score is not None:
+                self._dimensions.setdefault(str(dim), []).append(score)
+
+    def result(self) -> dict:
+        if not self._overall:
+            return {"overall": None, "dimensions": {}, "trial_count": 0}
+        return {
+            "overall": _score_stats(self._overall),
+            "dimensions": {dim: _score_stats(values) for dim, values in self._dimensions.items()},
+            "trial_count": len(self._overall),
         }
 
-    return {"overall": overall_stats, "dimensions": dim_stats, "trial_count": len(trial_scores)}
+
+def aggregate_task_scores(trial_results: list[dict]) -> dict:
+    """
+    聚合 Task 下全部 TrialResult 的统计分（mean/std/min/max）。
+    """
+    aggregator = TaskScoreAggregator()
+    for row in trial_results:
+        aggregator.add(row)
+    return aggregator.result()
 
 
 def is_task_stale(saved_hash: str, current_hash: str) -> bool:
@@ -110,3 +137,11 @@ def is_task_stale(saved_hash: str, current_hash: str) -> bool:
     return saved_hash != current_hash
 
 
+def compute_result_cache_key(kind: str, inputs: dict) -> str:
+    """
+    Trial / Grader 结果缓存键：对全部输入做稳定 hash（dict 键排序，与插入顺序无关）。
+
+    inputs 应包含所有会影响结果的因素（内容、配置、画像、Grader 提示词、模型、repeat_index 等）。
+    """
+    payload = json.dumps({"kind": kind, **inputs}, ensure_ascii=False, sort_keys=True, default=str)
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()
@@ -0,0 +1,247 @@
+# backend/core/tools/web_search.py
+# 功能: DeepResearch 的异步搜索层 — 可替换的搜索后端 + 并发扇出（单查询超时）+ (query, depth) TTL 缓存
+# 主要函数: search_many(), search(), get_search_backend(), set_search_backend(), close_search_backend(), clear_search_cache()
+# 主要类: SearchBackend（后端基类）, TavilySearchBackend（Tavily REST，按事件循环共享 httpx 连接池）,
+#   LocalSearchBackend（本地语料替身，测试 / 基准用）
+# 数据结构:
+#   搜索结果: [{"title": "...", "url": "...", "content": "...", "score": 0.95}]
+#   缓存: OrderedDict[(backend.name, query, depth, max_results)] → (过期时间, 结果)
+
+"""
+DeepResearch 异步搜索层
+
+原实现在 async 函数里逐个调用同步的 TavilyClient.search，搜索期间整个事件循环被卡住
+（包括所有正在推送的对话 SSE）。现在：
+- 后端接口是 async 的；TavilySearchBackend 直接请求 Tavily REST API，
+  httpx.AsyncClient 按事件循环共享（与 core.llm 的连接池同一做法），应用关闭时由 close_search_backend() 释放
+- search_many() 把规划出的全部查询并发发出，每个查询单独受 research_search_timeout 限制；
+  超时或失败的查询返回空列表，不影响其余查询
+- 成功且非空的结果按 (后端, query, depth, max_results) 缓存 research_search_cache_ttl 秒
+- set_search_backend() 可替换后端（LocalSearchBackend 用于测试 / 基准，不访问网络）
+"""
+
+from __future__ import annotations
+
+import asyncio
+import logging
+import os
+import threading
+import time
+import weakref
+from abc import ABC, abstractmethod
+from collections import OrderedDict
+from typing import Any, Callable, Optional
+
+from core.config import settings
+
+logger = logging.getLogger("web_search")
+
+TAVILY_API_BASE = "https://api.tavily.com"
+
+
+# ============== 后端 ==============
+
+class SearchBackend(ABC):
+    """搜索后端基类：search() 返回结果列表，失败时抛异常（由 search_many 统一兜底）。"""
+
+    name = "base"
+
+    @abstractmethod
+    async def search(self, query: str, max_results: int = 5, depth: str = "advanced") -> list[dict]:
+        """执行一次搜索，返回 [{"title", "url", "content", "score"}]。"""
+
+    async def aclose(self) -> None:
+        """释放后端持有的连接（应用关闭时调用）；无连接的后端无需覆盖。"""
+
+
+class TavilySearchBackend(SearchBackend):
+    """Tavily Search API（搜索 + 正文提取一步完成）。"""
+
+    name = "tavily"
+
+    def __init__(self, api_key: str = "", api_base: str = TAVILY_API_BASE):
+        self._api_key = api_key
+        self._api_base = api_base.rstrip("/")
+        self._lock = threading.Lock()
+        self._clients: "weakref.WeakKeyDictionary[Any, Any]" = weakref.WeakKeyDictionary()
+
+    def _resolve_api_key(self) -> str:
+        """
+        优先级: 构造参数 > pydantic-settings > os.environ
+        注意: pydantic-settings 不会将 .env 值注入 os.environ，所以不能只依赖 os.getenv("TAVILY_API_KEY")。
+        """
+        api_key = self._api_key or settings.tavily_api_key or os.getenv("TAVILY_API_KEY", "")
+        if not api_key:
+            raise ValueError(
+                "TAVILY_API_KEY 未设置！请在 backend/.env 中添加：TAVILY_API_KEY=tvly-你的key\n"
+                "免费注册: https://app.tavily.com/sign-in"
+            )
+        return api_key
+
+    def _client(self):
+        """当前事件循环的共享 httpx.AsyncClient（连接绑定创建它的循环，不能跨循环复用）。"""
+        import httpx
+
+        loop = asyncio.get_running_loop()
+        with self._lock:
+            client = self._clients.get(loop)
+            if client is None:
+                client = httpx.AsyncClient(
+                    base_url=self._api_base,
+                    timeout=max(1.0, float(settings.research_search_timeout)),
+                    limits=httpx.Limits(max_connections=10, max_keepalive_connections=5),
+                )
+                self._clients[loop] = client
+        return client
+
+    async def aclose(self) -> None:
+        """关闭当前事件循环的共享连接池；其他（后台线程）循环的客户端随循环回收。"""
+        loop = asyncio.get_running_loop()
+        with self._lock:
+            client = self._clients.pop(loop, None)
+        if client is not None:
+            await client.aclose()
+
+    async def search(self, query: str, max_results: int = 5, depth: str = "advanced") -> list[dict]:
+        api_key = self._resolve_api_key()
+        response = await self._client().post(
+            "/search",
+            json={
+                "query": query,
+                "max_results": max_results,
+                "search_depth": depth,     # advanced: 深度搜索，提取更多正文
+                "include_answer": False,   # 不需要 Tavily 的 AI 摘要
+            },
+            headers={"Authorization": f"Bearer {api_key}"},
+        )
+        response.raise_for_status()
+        results = response.json().get("results", [])
+        logger.info("[Tavily] 搜索 '%s' → %d 条结果", query, len(results))
+        for r in results[:3]:
+            logger.info("[Tavily] [%.2f] %s (%s)", r.get("score", 0), r.get("title", ""), r.get("url", ""))
+        return results
+
+
+class LocalSearchBackend(SearchBackend):
+    """
+    本地替身：从给定语料中按关键词匹配返回结果，不访问网络（测试 / 基准用）。
+
+    corpus: [{"title", "url", "content"}]，或 callable(query, max_results, depth) -> 结果列表
+    latency: 每次搜索模拟的耗时（秒）
+    """
+
+    name = "local"
+
+    def __init__(self, corpus: list[dict] | Callable[..., list[dict]] | None = None, latency: float = 0.0):
+        self.corpus = corpus or []
+        self.latency = latency
+        self.calls: list[tuple[str, str]] = []
+
+    async def search(self, query: str, max_results: int = 5, depth: str = "advanced") -> list[dict]:
+        self.calls.append((query, depth))
+        if self.latency:
+            await asyncio.sleep(self.latency)
+        if callable(self.corpus):
+            return list(self.corpus(query, max_results, depth))[:max_results]
+        terms = [t for t in query.lower().split() if t]
+        scored = []
+        for doc in self.corpus:
+            text = f"{doc.get('title', '')} {doc.get('content', '')}".lower()
+            hits = sum(1 for t in terms if t in text)
+            if hits:
+                scored.append({**doc, "score": round(hits / len(terms), 2)})
+        scored.sort(key=lambda d: -d["score"])
+        return scored[:max_results]
+
+
+_backend: Optional[SearchBackend] = None
+
+
+def get_search_backend() -> SearchBackend:
+    global _backend
+    if _backend is None:
+        _backend = TavilySearchBackend()
+    return _backend
+
+
+async def close_search_backend() -> None:
+    """关闭当前后端持有的连接池（应用 shutdown 时调用，之后再搜索会按需重建）。"""
+    if _backend is not None:
+        await _backend.aclose()
+
+
+def set_search_backend(backend: Optional[SearchBackend]) -> None:
+    """替换搜索后端（None 恢复默认 Tavily），同时清空缓存。"""
+    global _backend
+    _backend = backend
+    clear_search_cache()
+
+
+# ============== TTL 缓存 ==============
+
+_CACHE_LOCK = threading.Lock()
+_CACHE: "OrderedDict[tuple, tuple[float, list[dict]]]" = OrderedDict()
+
+
+def _cache_get(key: tuple) -> Optional[list[dict]]:
+    with _CACHE_LOCK:
+        entry = _CACHE.get(key)
+        if entry is None:
+            return None
+        expires_at, results = entry
+        if expires_at < time.monotonic():
+            del _CACHE[key]
+            return None
+        _CACHE.move_to_end(key)
+        return [dict(r) for r in results]
+
+
+def _cache_put(key: tuple, results: list[dict]) -> None:
+    ttl = settings.research_search_cache_ttl
+    max_entries = settings.research_search_cache_size
+    if ttl <= 0 or max_entries <= 0:
+        return
+    with _CACHE_LOCK:
+        _CACHE[key] = (time.monotonic() + ttl, [dict(r) for r in results])
+        _CACHE.move_to_end(key)
+        while len(_CACHE) > max_entries:
+            _CACHE.popitem(last=False)
+
+
+def clear_search_cache() -> None:
+    with _CACHE_LOCK:
+        _CACHE.clear()
+
+
+# ============== 查询 ==============
+
+async def search(query: str, max_results: int = 5, depth: str = "advanced") -> list[dict]:
+    """单个查询：先查缓存，未命中时调用后端（带超时）；失败返回空列表。"""
+    backend = get_search_backend()
+    key = (backend.name, " ".join(query.split()), depth, max_results)
+    cached = _cache_get(key)
+    if cached is not None:
+        logger.info("[Search] 缓存命中 '%s' → %d 条结果", query, len(cached))
+        return cached
+    try:
+        results = await asyncio.wait_for(
+            backend.search(query, max_results=max_results, depth=depth),
+            timeout=max(0.01, float(settings.research_search_timeout)),
+        )
+    except asyncio.TimeoutError:
+        logger.warning("[Search] 搜索超时 '%s'（%ss）", query, settings.research_search_timeout)
+        return []
+    except Exception as e:
+        logger.error("[Search] 搜索失败 '%s': %s", query, e)
+        return []
+    if results:
+        _cache_put(key, results)
+    return results
+
+
+async def search_many(queries: list[str], max_results: int = 5, depth: str = "advanced") -> list[list[dict]]:
+    """并发执行全部查询，按 queries 顺序返回各自的结果（重复查询只请求一次）。"""
+    unique = list(dict.fromkeys(queries))
+    results = await asyncio.gather(*(search(q, max_results=max_results, depth=depth) for q in unique))
+    by_query = dict(zip(unique, results))
+    return [by_query[q] for q in queries]
@@ -1,23 +1,195 @@
 # backend/core/version_service.py
-# 功能: 内容版本保存的唯一入口
-# 主要函数: save_content_version()
-# 数据结构: 无（操作 ContentVersion 模型）
+# 功能: 内容版本保存与还原的唯一入口 — 定期全文快照 + 相对上一版本的压缩增量，每个 block 一个版本计数器
+# 主要函数: save_content_version(), load_version_contents(), list_versions_with_content(), load_version_content(),
+#   compact_versions(), materialize_version_rows(), encode_delta(), apply_delta()
+# 数据结构:
+#   ContentVersion(storage="full", content=全文) / ContentVersion(storage="delta", delta=zlib(JSON 增量))
+#   增量 JSON: [[i1, i2] | "文本", ...] — [i1, i2] 复制上一版本的第 i1..i2 行，字符串为新增内容
+#   ContentVersionHead: block_id → last_version / last_snapshot / version_count / head_content
 #
-# 设计原则: 覆写内容前先调用此函数保存旧版本，全系统只此一处实现
+# 设计原则: 覆写内容前先调用 save_content_version 保存旧版本，全系统只此一处实现
 
 """
 内容版本保存服务。
 
 在 agent_tools、api/agent、api/blocks 三处曾各自实现，现统一到此。
+
+原实现每次保存都先查 MAX(version_number)，再存一份旧内容的全文；
+反复迭代的块会积累数百份几乎相同的全文。现在：
+- 版本号取自 ContentVersionHead 计数器（O(1)），计数器同时保存最新版本全文作为增量基准
+- 每 content_version_snapshot_interval 个版本存一次全文快照，其余版本只存相对上一版本的行级增量
+  （difflib，与 edit_engine.generate_revision_markdown 同一套按行比较）；增量不比全文小一半时也存全文
+- 读取时从最近的快照开始回放增量（最多回放 snapshot_interval - 1 个）
+- content_version_max_per_block > 0 时，超出部分从最旧的版本开始删除（保留的最旧版本先转为全文快照）
+- 没有计数器的 block（旧数据、项目复制 / 导入产生的版本）在首次保存时按现有版本初始化
 """
 
 from __future__ import annotations
 
+import json
 import logging
+import zlib
+from collections import defaultdict
+from typing import Any, Iterable, Optional
+
+from sqlalchemy import func
 from sqlalchemy.orm import Session
 
+from core.config import settings
+from core.edit_engine import diff_lines
+
 logger = logging.getLogger("version_service")
 
+_COMPRESS_LEVEL = 6
+
+
+# ============== 增量编码 ==============
+
+def encode_delta(base: str, content: str) -> bytes:
+    """计算 base → content 的行级增量（zlib 压缩的 JSON）。"""
+    base_lines, new_lines, opcodes = diff_lines(base, content)
+    ops: list[Any] = []
+    for tag, i1, i2, j1, j2 in opcodes:
+        if tag == "equal":
+            ops.append([i1, i2])
+        elif tag in ("replace", "insert"):
+            ops.append("".join(new_lines[j1:j2]))
+    return zlib.compress(json.dumps(ops, ensure_ascii=False).encode("utf-8"), _COMPRESS_LEVEL)
+
+
+def apply_delta(base: str, delta: bytes) -> str:
+    """把 encode_delta 的结果应用到 base 上，逐字节还原新内容。"""
+    base_lines = base.splitlines(keepends=True)
+    parts = []
+    for op in json.loads(zlib.decompress(delta).decode("utf-8")):
+        if isinstance(op, str):
+            parts.append(op)
+        else:
+            parts.extend(base_lines[op[0]:op[1]])
+    return "".join(parts)
+
+
+# ============== 还原 ==============
+
+def _is_delta(version) -> bool:
+    return version.storage == "delta" and version.delta is not None
+
+
+def _replay(versions: Iterable[Any]) -> list[tuple[Any, str]]:
+    """按版本号升序回放；第一条必须是全文快照（否则按空内容为基准）。"""
+    result = []
+    previous = ""
+    for version in versions:
+        text = apply_delta(previous, version.delta) if _is_delta(version) else (version.content or "")
+        result.append((version, text))
+        previous = text
+    return result
+
+
+def _snapshot_at_or_before(db: Session, block_id: str, version_number: int) -> Optional[int]:
+    from core.models import ContentVersion
+
+    return db.query(func.max(ContentVersion.version_number)).filter(
+        ContentVersion.block_id == block_id,
+        ContentVersion.version_number <= version_number,
+        ContentVersion.storage.is_distinct_from("delta"),
+    ).scalar()
+
+
+def load_version_contents(
+    db: Session,
+    block_id: str,
+    version_numbers: Optional[Iterable[int]] = None,
+) -> dict[int, str]:
+    """
+    还原指定版本的完整内容（version_numbers 为 None 时还原全部版本）。
+
+    只读取最近快照到最大目标版本之间的行。
+    """
+    from core.models import ContentVersion
+
+    query = db.query(ContentVersion).filter(ContentVersion.block_id == block_id)
+    wanted = None
+    if version_numbers is not None:
+        wanted = set(version_numbers)
+        if not wanted:
+            return {}
+        start = _snapshot_at_or_before(db, block_id, min(wanted))
+        query = query.filter(ContentVersion.version_number <= max(wanted))
+        if start is not None:
+            query = query.filter(ContentVersion.version_number >= start)
+    replayed = _replay(query.order_by(ContentVersion.version_number).all())
+    return {
+        version.version_number: text
+        for version, text in replayed
+        if wanted is None or version.version_number in wanted
+    }
+
+
+def list_versions_with_content(db: Session, block_id: str) -> list[tuple[Any, str]]:
+    """某个 block 的全部版本及其完整内容（按版本号升序，一次查询）。"""
+    from core.models import ContentVersion
+
+    versions = db.query(ContentVersion).filter(
+        ContentVersion.block_id == block_id,
+    ).order_by(ContentVersion.version_number).all()
+    return _replay(versions)
+
+
+def load_version_content(db: Session, version) -> str:
+    """还原单个版本的完整内容。"""
+    if not _is_delta(version):
+        return version.content or ""
+    return load_version_contents(db, version.block_id, [version.version_number]).get(version.version_number, "")
+
+
+def materialize_version_rows(db: Session, rows: list[dict[str, Any]]) -> list[dict[str, Any]]:
+    """
+    已序列化的版本行（dict）就地还原为全文（项目导出使用，导出文件不含增量，可被任何版本导入）。
+    """
+    pending: dict[str, set[int]] = defaultdict(set)
+    for row in rows:
+        if row.get("storage") == "delta":
+            pending[row["block_id"]].add(row["version_number"])
+    contents = {
+        block_id: load_version_contents(db, block_id, numbers)
+        for block_id, numbers in pending.items()
+    }
+    for row in rows:
+        if row.get("storage") == "delta":
+            row["content"] = contents[row["block_id"]].get(row["version_number"], "")
+        row["storage"] = "full"
+        row.pop("delta", None)
+    return rows
+
+
+# ============== 保存 ==============
+
+def _get_head(db: Session, block_id: str):
+    """取 block 的版本计数器；不存在时按现有版本初始化。"""
+    from core.models import ContentVersion, ContentVersionHead, generate_uuid
+
+    head = db.query(ContentVersionHead).filter(ContentVersionHead.block_id == block_id).first()
+    if head is not None:
+        return head
+
+    last_version, version_count = db.query(
+        func.max(ContentVersion.version_number), func.count(ContentVersion.id),
+    ).filter(ContentVersion.block_id == block_id).one()
+    head = ContentVersionHead(
+        id=generate_uuid(),
+        block_id=block_id,
+        last_version=last_version or 0,
+        last_snapshot=0,
+        version_count=version_count or 0,
+        head_content="",
+    )
+    if last_version:
+        head.last_snapshot = _snapshot_at_or_before(db, block_id, last_version) or 0
+        head.head_content = load_version_contents(db, block_id, [last_version]).get(last_version, "")
+    db.add(head)
+    return head
+
 
 def save_content_version(
     db: Session,
@@ -31,9 +203,9 @@ def save_content_version(
 
     Args:
         db: 数据库会话（调用者控制 commit）
-        entity_id: ContentBlock.id
+        entity_id: ContentBlock.id 或 ProjectField.id
         old_content: 被覆写的旧内容
-        source: 版本来源（manual / ai_generate / ai_regenerate / agent）
+        source: 版本来源（manual / ai_generate / ai_regenerate / agent / rollback_snapshot / search_replace）
         source_detail: 来源补充说明（如具体的修改指令）
 
     Returns:
@@ -45,25 +217,99 @@ def save_content_version(
     try:
         from core.models import ContentVersion, generate_uuid
 
-        max_ver = db.query(ContentVersion.version_number).filter(
-            ContentVersion.block_id == entity_id
-        ).order_by(ContentVersion.version_number.desc()).first()
+        head = _get_head(db, entity_id)
+        next_ver = head.last_version + 1
 
-        next_ver = (max_ver[0] + 1) if max_ver else 1
+        delta = None
+        interval = max(1, settings.content_version_snapshot_interval)
+        if head.last_snapshot and next_ver - head.last_snapshot < interval:
+            delta = encode_delta(head.head_content or "", old_content)
+            if len(delta) * 2 >= len(old_content.encode("utf-8")):
+                delta = None  # 增量不划算，直接存全文
 
         ver = ContentVersion(
             id=generate_uuid(),
             block_id=entity_id,
             version_number=next_ver,
-            content=old_content,
+            content="" if delta is not None else old_content,
+            storage="delta" if delta is not None else "full",
+            delta=delta,
             source=source,
             source_detail=source_detail,
         )
         db.add(ver)
+
+        head.last_version = next_ver
+        head.version_count = (head.version_count or 0) + 1
+        head.head_content = old_content
+        if delta is None:
+            head.last_snapshot = next_ver
+
         db.flush()  # 立即写入以获得 ID，但不 commit（让调用者控制事务）
-        logger.info(f"[版本] 保存 {entity_id[:8]}... v{next_ver} ({source})")
+
+        max_keep = settings.content_version_max_per_block
+        if max_keep > 0 and head.version_count > max_keep:
+            compact_versions(db, entity_id, max_keep)
+
+        logger.info(f"[版本] 保存 {entity_id[:8]}... v{next_ver} ({source}, {ver.storage})")
         return ver.id
     except Exception as e:
         logger.warning(f"[版本] 保存失败(可忽略): {e}")
         return None
 
+
+def compact_versions(db: Session, block_id: str, keep: int) -> int:
+    """
+    只保留最新的 keep 个版本，删除更旧的版本；保留的最旧版本若为增量先转为全文快照。
+
+    Returns:
+        删除的版本数
+    """
+    from core.models import ContentVersion
+
+    if keep <= 0:
+        return 0
+    kept = [
+        number for (number,) in db.query(ContentVersion.version_number).filter(
+            ContentVersion.block_id == block_id,
+        ).order_by(ContentVersion.version_number.desc()).limit(keep)
+    ]
+    if not kept:
+        return 0
+    oldest_kept = min(kept)
+
+    oldest = db.query(ContentVersion).filter(
+        ContentVersion.block_id == block_id,
+        ContentVersion.version_number == oldest_kept,
+    ).first()
+    if oldest is not None and _is_delta(oldest):
+        oldest.content = load_version_content(db, oldest)
+        oldest.storage = "full"
+        oldest.delta = None
+
+    deleted = db.query(ContentVersion).filter(
+        ContentVersion.block_id == block_id,
+        ContentVersion.version_number < oldest_kept,
+    ).delete(synchronize_session=False)
+
+    head = _get_head(db, block_id)
+    head.version_count = len(kept)
+    head.last_snapshot = max(head.last_snapshot or 0, oldest_kept)
+    db.flush()
+    if deleted:
+        logger.info(f"[版本] 压缩 {block_id[:8]}...：删除 {deleted} 个旧版本，保留 v{oldest_kept} 起")
+    return deleted
+
+
+def delete_version_history(db: Session, block_ids: list[str]) -> None:
+    """删除一批 block / field 的全部版本与计数器（调用者控制 commit）。"""
+    from core.models import ContentVersion, ContentVersionHead
+
+    if not block_ids:
+        return
+    db.query(ContentVersion).filter(
+        ContentVersion.block_id.in_(block_ids)
+    ).delete(synchronize_session=False)
+    db.query(ContentVersionHead).filter(
+        ContentVersionHead.block_id.in_(block_ids)
+    ).delete(synchronize_session=False)
@@ -319,24 +319,26 @@ def _dedupe_eval_anchor_blocks_on_startup():
 
 def _heal_stale_running_tasks_on_startup():
     """
-    启动时将所有卡在 running 状态的 EvalTask 重置为 failed。
+    启动时处理所有卡在 running 状态的 EvalTask。
     进程内存态（_TASK_RUNTIME_STATE）在重启后丢失，
     若 DB 仍显示 running 会导致 pause/stop/resume 接口报"任务未运行"。
+    Trial 结果是逐条提交的：当前 batch 已有结果的 Task 置为 paused（可 resume 续跑，跳过已完成的 Trial），
+    其余置为 failed。
     """
     try:
+        from api.eval import _heal_lost_running_task
         from core.database import get_session_maker
         from core.models import EvalTaskV2
         Session = get_session_maker()
         db = Session()
         stale = db.query(EvalTaskV2).filter(EvalTaskV2.status == "running").all()
         for t in stale:
-            t.status = "failed"
-            if not (t.last_error or "").strip():
-                t.last_error = "执行状态丢失（服务重启或任务中断），请重新执行。"
+            _heal_lost_running_task(t, db)
         if stale:
             db.commit()
             logging.getLogger("startup").info(
-                "启动时重置 %d 个 stale running EvalTask 为 failed", len(stale)
+                "启动时处理 %d 个 stale running EvalTask（%d 个可续跑）",
+                len(stale), sum(1 for t in stale if t.status == "paused"),
             )
         db.close()
     except Exception as e:
@@ -345,6 +347,26 @@ def _heal_stale_running_tasks_on_startup():
         )
 
 
+def _purge_orphan_prompt_blobs_on_startup():
+    """
+    启动时按全部生成日志重算 prompt 正文 blob 的引用计数，清理不再被引用的 blob
+    （兜底：删除项目时已按引用计数清理，这里覆盖旧库补列和其他删除路径）。
+    """
+    try:
+        from core.database import get_session_maker
+        from core.prompt_blob_store import purge_unreferenced_blobs
+        db = get_session_maker()()
+        try:
+            removed = purge_unreferenced_blobs(db)
+            if removed:
+                db.commit()
+                logging.getLogger("startup").info("启动时清理 %d 个未被引用的 prompt blob", removed)
+        finally:
+            db.close()
+    except Exception as e:
+        logging.getLogger("startup").warning("启动时清理 prompt blob 失败（不影响运行）: %s", e)
+
+
 def _check_llm_config_on_startup():
     """
     启动时检查 LLM 配置，在日志中给出明确警告。
@@ -485,9 +507,49 @@ def create_app() -> FastAPI:
         _cleanup_legacy_eval_templates_on_startup()
         _dedupe_eval_anchor_blocks_on_startup()
         _heal_stale_running_tasks_on_startup()
+        _purge_orphan_prompt_blobs_on_startup()
         # ===== 启动时校验 LLM 配置，提前暴露 .env 问题 =====
         _check_llm_config_on_startup()
 
+    # 项目运行队列 worker / 摘要队列 / 生成日志队列需要运行在主事件循环上（schema 就绪后再恢复中断任务）
+    @app.on_event("startup")
+    async def on_startup_workers():
+        try:
+            from core.project_run_queue import project_run_queue
+            await project_run_queue.start()
+        except Exception as e:
+            logging.getLogger("startup").warning(
+                "启动项目运行队列失败（自动生成将暂停，不影响其他功能）: %s", e
+            )
+        try:
+            from core.digest_service import digest_queue
+            await digest_queue.start()
+            # 补齐上线前已有 / 上次退出时未处理完的摘要（后台线程扫描，不阻塞启动）
+            digest_queue.start_backfill()
+        except Exception as e:
+            logging.getLogger("startup").warning("启动摘要队列失败（摘要暂不更新）: %s", e)
+        try:
+            from core.generation_log_sink import generation_log_sink
+            await generation_log_sink.start()
+        except Exception as e:
+            logging.getLogger("startup").warning("启动生成日志队列失败（日志改为同步写入）: %s", e)
+
+    @app.on_event("shutdown")
+    async def on_shutdown():
+        from core.project_run_queue import project_run_queue
+        await project_run_queue.stop()
+        from core.digest_service import digest_queue
+        await digest_queue.stop()
+        # 写出队列中剩余的生成日志
+        from core.generation_log_sink import generation_log_sink
+        await generation_log_sink.stop()
+        from core.tools.web_search import close_search_backend
+        await close_search_backend()
+        from core.llm import close_http_clients
+        await close_http_clients()
+        from core.database import dispose_async_engines
+        await dispose_async_engines()
+
     return app
 
 
@@ -244,7 +244,7 @@ class TestStateTransition:
     """状态转换测试 — LangGraph AgentState"""
     
     def test_agent_state_structure(self):
-        """测试 AgentState 结构完整（当前为 7 字段）"""
+        """测试 AgentState 结构完整（当前为 9 字段）"""
         from core.orchestrator import AgentState
         
         required_fields = [
@@ -257,8 +257,8 @@ class TestStateTransition:
         annotations = AgentState.__annotations__
         for field in required_fields:
             assert field in annotations, f"Missing field: {field}"
-        # 当前架构额外包含 mode/mode_prompt/memory_context
-        assert len(annotations) == 7
+        # 当前架构额外包含 mode/mode_prompt/memory_context + token_total/token_counted
+        assert len(annotations) == 9
     
     def test_initial_state_defaults(self):
         """测试初始状态默认值"""
@@ -1,16 +1,17 @@
 # backend/tests/test_agent_project_modes_api.py
 # 功能: 验证项目级 Agent 角色 API 与 mode_id 运行时链路
 # 主要测试: 模板导入、项目角色 CRUD、会话按 mode_id 隔离、chat 接口按 mode_id 运行
-# 数据结构: FastAPI TestClient + 内存数据库中的 Project / AgentMode / Conversation / ChatMessage
+# 数据结构: FastAPI TestClient + 临时 SQLite 文件库（同步 + aiosqlite 异步会话）中的 Project / AgentMode / Conversation / ChatMessage
 
 import pytest
 from fastapi.testclient import TestClient
 from sqlalchemy import create_engine
+from sqlalchemy.ext.asyncio import async_sessionmaker, create_async_engine
 from sqlalchemy.orm import sessionmaker
-from sqlalchemy.pool import StaticPool
+from sqlalchemy.pool import NullPool, StaticPool
 from langchain_core.messages import AIMessage
 
-from core.database import Base, get_db
+from core.database import Base, get_async_db, get_db, to_async_database_url
 from core.models import Project, AgentMode, Conversation, ChatMessage, generate_uuid
 from core.models.content_block import ContentBlock
 import core.memory_service as memory_service
@@ -19,14 +20,18 @@ from main import app
 
 
 @pytest.fixture
-def client_and_session():
+def client_and_session(tmp_path):
+    # 文件库：同步 Session（写路径）与 AsyncSession（历史/消息热读路径）需看到同一份数据
+    db_url = f"sqlite:///{tmp_path / 'modes_api.db'}"
     engine = create_engine(
-        "sqlite:///:memory:",
+        db_url,
         connect_args={"check_same_thread": False},
         poolclass=StaticPool,
     )
     TestingSessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
     Base.metadata.create_all(bind=engine)
+    async_engine = create_async_engine(to_async_database_url(db_url), poolclass=NullPool)
+    AsyncTestingSessionLocal = async_sessionmaker(async_engine, expire_on_commit=False)
 
     def override_get_db():
         db = TestingSessionLocal()
@@ -35,7 +40,12 @@ def client_and_session():
         finally:
             db.close()
 
+    async def override_get_async_db():
+        async with AsyncTestingSessionLocal() as db:
+            yield db
+
     app.dependency_overrides[get_db] = override_get_db
+    app.dependency_overrides[get_async_db] = override_get_async_db
     client = TestClient(app)
     session = TestingSessionLocal()
     try:
@@ -43,6 +53,7 @@ def client_and_session():
     finally:
         session.close()
         app.dependency_overrides.clear()
+        engine.dispose()
 
 
 def _seed_project_and_templates(session, *, locale: str = "zh-CN"):
@@ -0,0 +1,230 @@
+# backend/tests/test_async_read_paths_api.py
+# 功能: 覆盖 AsyncSession 热读路径（内容块树 / 对话历史 / Eval 报告 / 日志列表）的 API 语义
+# 主要测试: 树形组装与软删除过滤、卡住块自动恢复、树 ETag/304 短路、大纲视图与 batch-get、报告与日志分页
+# 数据结构: FastAPI TestClient + 临时 SQLite 文件库（同步写 Session + aiosqlite AsyncSession）
+
+from datetime import datetime, timedelta
+
+import pytest
+from fastapi.testclient import TestClient
+from sqlalchemy import create_engine
+from sqlalchemy.ext.asyncio import async_sessionmaker, create_async_engine
+from sqlalchemy.orm import sessionmaker
+from sqlalchemy.pool import NullPool, StaticPool
+
+from core.database import Base, get_async_db, get_db, to_async_database_url
+from core.models import ContentBlock, EvalTaskV2, GenerationLog, Project, generate_uuid
+from main import app
+
+
+@pytest.fixture
+def client_and_session(tmp_path):
+    db_url = f"sqlite:///{tmp_path / 'async_reads.db'}"
+    engine = create_engine(
+        db_url,
+        connect_args={"check_same_thread": False},
+        poolclass=StaticPool,
+    )
+    TestingSessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
+    Base.metadata.create_all(bind=engine)
+    async_engine = create_async_engine(to_async_database_url(db_url), poolclass=NullPool)
+    AsyncTestingSessionLocal = async_sessionmaker(async_engine, expire_on_commit=False)
+
+    def override_get_db():
+        db = TestingSessionLocal()
+        try:
+            yield db
+        finally:
+            db.close()
+
+    async def override_get_async_db():
+        async with AsyncTestingSessionLocal() as db:
+            yield db
+
+    app.dependency_overrides[get_db] = override_get_db
+    app.dependency_overrides[get_async_db] = override_get_async_db
+    client = TestClient(app)
+    session = TestingSessionLocal()
+    try:
+        yield client, session
+    finally:
+        session.close()
+        app.dependency_overrides.clear()
+        engine.dispose()
+
+
+def _block(project_id: str, name: str, *, parent_id=None, order_index=0, **kwargs) -> ContentBlock:
+    return ContentBlock(
+        id=generate_uuid(),
+        project_id=project_id,
+        parent_id=parent_id,
+        name=name,
+        block_type=kwargs.pop("block_type", "field"),
+        depth=0 if parent_id is None else 1,
+        order_index=order_index,
+        **kwargs,
+    )
+
+
+def test_block_tree_is_assembled_without_deleted_nodes(client_and_session):
+    client, session = client_and_session
+    project = Project(id=generate_uuid(), name="树项目")
+    session.add(project)
+    session.flush()
+
+    group = _block(project.id, "分组", block_type="group")
+    session.add(group)
+    session.flush()
+    second = _block(project.id, "第二", parent_id=group.id, order_index=1, content="B")
+    first = _block(project.id, "第一", parent_id=group.id, order_index=0, content="A")
+    removed = _block(project.id, "已删除", parent_id=group.id, order_index=2, deleted_at=datetime.utcnow())
+    top = _block(project.id, "顶级", order_index=1)
+    session.add_all([second, first, removed, top])
+    session.commit()
+
+    resp = client.get(f"/api/blocks/project/{project.id}")
+    assert resp.status_code == 200
+    body = resp.json()
+    assert body["total_count"] == 4
+    assert [b["name"] for b in body["blocks"]] == ["分组", "顶级"]
+    assert [c["name"] for c in body["blocks"][0]["children"]] == ["第一", "第二"]
+    assert body["blocks"][0]["children"][0]["content"] == "A"
+
+
+def test_block_tree_recovers_blocks_stuck_in_progress(client_and_session):
+    client, session = client_and_session
+    project = Project(id=generate_uuid(), name="卡住项目")
+    session.add(project)
+    session.flush()
+    stale_time = datetime.utcnow() - timedelta(minutes=10)
+    stuck = _block(project.id, "卡住", status="in_progress", content="")
+    fresh = _block(project.id, "生成中", order_index=1, status="in_progress", content="")
+    session.add_all([stuck, fresh])
+    session.commit()
+    session.query(ContentBlock).filter(ContentBlock.id == stuck.id).update(
+        {"updated_at": stale_time}, synchronize_session=False,
+    )
+    session.commit()
+
+    resp = client.get(f"/api/blocks/project/{project.id}")
+    assert resp.status_code == 200
+    statuses = {b["name"]: b["status"] for b in resp.json()["blocks"]}
+    assert statuses == {"卡住": "pending", "生成中": "in_progress"}
+
+
+def test_block_tree_returns_404_for_unknown_project(client_and_session):
+    client, _ = client_and_session
+    assert client.get("/api/blocks/project/missing").status_code == 404
+
+
+def test_eval_report_and_log_listing_use_async_reads(client_and_session):
+    client, session = client_and_session
+    project = Project(id=generate_uuid(), name="报告项目")
+    session.add(project)
+    session.flush()
+    session.add(EvalTaskV2(
+        id=generate_uuid(),
+        project_id=project.id,
+        name="Task A",
+        latest_overall=7.5,
+        latest_scores={"clarity": 7.5},
+    ))
+    for idx in range(3):
+        session.add(GenerationLog(
+            id=generate_uuid(),
+            project_id=project.id,
+            phase="produce_inner",
+            operation=f"op-{idx}",
+            model="mock-model",
+            prompt_input="in",
+            prompt_output="out",
+            created_at=datetime.utcnow() + timedelta(seconds=idx),
+        ))
+    session.commit()
+
+    report = client.get(f"/api/eval/tasks/{project.id}/report")
+    assert report.status_code == 200
+    assert [t["name"] for t in report.json()["tasks"]] == ["Task A"]
+    assert report.json()["tasks"][0]["latest_scores"] == {"clarity": 7.5}
+
+    logs = client.get("/api/settings/logs", params={"project_id": project.id, "skip": 1, "limit": 1})
+    assert logs.status_code == 200
+    assert [row["operation"] for row in logs.json()] == ["op-1"]
+
+
+def test_block_tree_etag_short_circuits_until_blocks_change(client_and_session):
+    client, session = client_and_session
+    project = Project(id=generate_uuid(), name="ETag 项目")
+    session.add(project)
+    session.flush()
+    block = _block(project.id, "正文", content="v1")
+    session.add(block)
+    session.commit()
+
+    first = client.get(f"/api/blocks/project/{project.id}")
+    assert first.status_code == 200
+    etag = first.headers["etag"]
+    assert etag
+
+    cached = client.get(f"/api/blocks/project/{project.id}", headers={"If-None-Match": etag})
+    assert cached.status_code == 304
+    assert cached.headers["etag"] == etag
+
+    block.content = "v2"
+    session.commit()
+
+    changed = client.get(f"/api/blocks/project/{project.id}", headers={"If-None-Match": etag})
+    assert changed.status_code == 200
+    assert changed.headers["etag"] != etag
+    assert changed.json()["blocks"][0]["content"] == "v2"
+
+    session.add(_block(project.id, "新增", order_index=1))
+    session.commit()
+    after_insert = client.get(f"/api/blocks/project/{project.id}", headers={"If-None-Match": changed.headers["etag"]})
+    assert after_insert.status_code == 200
+    assert after_insert.json()["total_count"] == 2
+
+
+def test_block_tree_outline_view_omits_content_and_batch_get_fetches_it(client_and_session):
+    client, session = client_and_session
+    project = Project(id=generate_uuid(), name="大纲项目")
+    session.add(project)
+    session.flush()
+    group = _block(project.id, "分组", block_type="group")
+    session.add(group)
+    session.flush()
+    child = _block(
+        project.id,
+        "正文块",
+        parent_id=group.id,
+        content="长正文" * 100,
+        ai_prompt="很长的提示词",
+        depends_on=[group.id],
+        needs_regeneration=True,
+    )
+    session.add(child)
+    session.commit()
+
+    full = client.get(f"/api/blocks/project/{project.id}")
+    outline = client.get(f"/api/blocks/project/{project.id}", params={"view": "outline"})
+    assert outline.status_code == 200
+    assert outline.headers["etag"] != full.headers["etag"]
+    body = outline.json()
+    assert body["view"] == "outline"
+    assert body["total_count"] == 2
+    node = body["blocks"][0]["children"][0]
+    assert node["id"] == child.id
+    assert node["content_length"] == len(child.content)
+    assert node["depends_on"] == [group.id]
+    assert node["needs_regeneration"] is True
+    assert len(node["content_hash"]) == 32
+    assert "content" not in node and "ai_prompt" not in node
+
+    batch = client.post("/api/blocks/batch-get", json={"block_ids": [child.id, "missing", group.id]})
+    assert batch.status_code == 200
+    payload = batch.json()
+    assert [b["id"] for b in payload["blocks"]] == [child.id, group.id]
+    assert payload["blocks"][0]["content"] == child.content
+    assert payload["missing_ids"] == ["missing"]
+
+    assert client.get(f"/api/blocks/project/{project.id}", params={"view": "bogus"}).status_code == 400
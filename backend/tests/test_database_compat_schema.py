@@ -1,15 +1,17 @@
 # backend/tests/test_database_compat_schema.py
 # 功能: 守卫旧 SQLite 数据库在启动时能自动补齐 locale/stable_key 等兼容列
-# 主要测试: init_db() 对旧 schema 的兼容迁移与 ORM 查询烟雾验证
+# 主要测试: init_db() 对旧 schema 的兼容迁移与 ORM 查询烟雾验证；引擎单例 / WAL / 只读 Session 拆分
 # 数据结构: 临时 SQLite 文件、被删列后的 legacy 表、SQLAlchemy Session
 
 import sqlite3
 from pathlib import Path
 
+import pytest
 from sqlalchemy import text
+from sqlalchemy.exc import OperationalError
 
 from core.config import settings
-from core.database import Base, get_engine, get_session_maker, init_db
+from core.database import Base, get_engine, get_read_session_maker, get_session_maker, init_db
 from core.models import (
     AgentMode,
     Channel,
@@ -133,3 +135,39 @@ def test_init_db_clears_broken_nullable_asset_references(tmp_path, monkeypatch):
         assert field[0] is None
     finally:
         db.close()
+
+
+def test_get_engine_is_process_singleton_with_wal_and_busy_timeout(tmp_path, monkeypatch):
+    db_path = tmp_path / "pooled_content_production.db"
+    monkeypatch.setattr(settings, "database_url", f"sqlite:///{db_path}")
+
+    engine = get_engine()
+    assert get_engine() is engine
+    assert get_session_maker() is get_session_maker()
+
+    with engine.connect() as conn:
+        assert conn.execute(text("PRAGMA journal_mode")).scalar().lower() == "wal"
+        assert conn.execute(text("PRAGMA busy_timeout")).scalar() == settings.db_busy_timeout_ms
+
+
+def test_read_session_rejects_writes_but_sees_committed_rows(tmp_path, monkeypatch):
+    db_path = tmp_path / "read_split_content_production.db"
+    monkeypatch.setattr(settings, "database_url", f"sqlite:///{db_path}")
+    init_db()
+
+    writer = get_session_maker()()
+    try:
+        writer.add(Project(name="written-by-writer"))
+        writer.commit()
+    finally:
+        writer.close()
+
+    reader = get_read_session_maker()()
+    try:
+        assert reader.query(Project).filter(Project.name == "written-by-writer").count() == 1
+        reader.add(Project(name="must-fail"))
+        with pytest.raises(OperationalError):
+            reader.commit()
+    finally:
+        reader.rollback()
+        reader.close()
@@ -0,0 +1,177 @@
+# backend/tests/test_dependency_regeneration_service.py
+# 功能: 覆盖下游失效传播使用的项目反向依赖索引（core.dependency_regeneration_service）
+# 主要测试: 传递下游失效、索引复用与增量同步、硬删除、未 flush / 已 flush 未提交的依赖修改不入缓存、
+#   迟提交的旧时间戳写入、内存库不缓存
+# 数据结构: 临时文件 SQLite（索引需另开连接读取已提交数据）中的 Project / ContentBlock
+
+from datetime import datetime
+
+import pytest
+from sqlalchemy import create_engine
+from sqlalchemy.orm import sessionmaker
+from sqlalchemy.pool import StaticPool
+
+from core import dependency_regeneration_service as dep_service
+from core.database import Base
+from core.dependency_regeneration_service import finalize_block_content_change, invalidate_dependency_index
+from core.models import ContentBlock, Project
+
+
+def _seed(engine):
+    Base.metadata.create_all(bind=engine)
+    session = sessionmaker(autocommit=False, autoflush=False, bind=engine)()
+    session.add(Project(id="p1", name="p1"))
+    for index, (block_id, depends_on) in enumerate([
+        ("a", []),
+        ("b", ["a"]),
+        ("c", ["b"]),
+        ("d", ["a", "c"]),
+        ("other", []),
+    ]):
+        session.add(ContentBlock(
+            id=block_id,
+            project_id="p1",
+            name=block_id.upper(),
+            block_type="field",
+            order_index=index,
+            content=f"{block_id} 内容",
+            status="completed",
+            depends_on=depends_on,
+            auto_generate=block_id == "c",
+            need_review=block_id != "c",
+        ))
+    session.commit()
+    return session
+
+
+@pytest.fixture
+def db(tmp_path):
+    engine = create_engine(f"sqlite:///{tmp_path / 'deps.db'}", connect_args={"check_same_thread": False})
+    session = _seed(engine)
+    yield session
+    session.close()
+    invalidate_dependency_index()
+    engine.dispose()
+
+
+@pytest.fixture
+def memory_db():
+    engine = create_engine(
+        "sqlite:///:memory:",
+        connect_args={"check_same_thread": False},
+        poolclass=StaticPool,
+    )
+    session = _seed(engine)
+    yield session
+    session.close()
+    invalidate_dependency_index()
+    engine.dispose()
+
+
+@pytest.fixture
+def builds(monkeypatch):
+    calls = []
+    original = dep_service._build_dependency_index
+
+    def _counting(**kwargs):
+        calls.append(kwargs["project_id"])
+        return original(**kwargs)
+
+    monkeypatch.setattr(dep_service, "_build_dependency_index", _counting)
+    return calls
+
+
+def _stale_ids(db):
+    return sorted(
+        row.id for row in db.query(ContentBlock.id).filter(ContentBlock.needs_regeneration == True)  # noqa: E712
+    )
+
+
+def test_invalidation_reaches_transitive_downstream_and_reuses_index(db, builds):
+    source = db.get(ContentBlock, "a")
+    source.content = "新内容"
+    summary = finalize_block_content_change(block=source, db=db)
+    db.commit()
+
+    assert summary.affected_block_ids == ["b", "d", "c"]
+    assert summary.auto_regenerate_block_ids == ["c"]
+    assert summary.manual_attention_block_ids == ["b", "d"]
+    assert _stale_ids(db) == ["b", "c", "d"]
+
+    # 内容保存只让少量行的 updated_at 前进 → 增量同步，不重建
+    db.get(ContentBlock, "b").content = "再次修改"
+    finalize_block_content_change(block=db.get(ContentBlock, "b"), db=db)
+    db.commit()
+    assert builds == ["p1"]
+
+
+def test_depends_on_changes_and_hard_deletes_are_picked_up(db, builds):
+    finalize_block_content_change(block=db.get(ContentBlock, "other"), db=db)
+    db.commit()
+    assert _stale_ids(db) == []
+
+    db.get(ContentBlock, "b").depends_on = ["other"]
+    db.commit()
+    summary = finalize_block_content_change(block=db.get(ContentBlock, "other"), db=db)
+    db.commit()
+    assert summary.affected_block_ids == ["b", "c", "d"]
+    assert builds == ["p1"]
+
+    db.delete(db.get(ContentBlock, "d"))
+    db.commit()
+    db.query(ContentBlock).update({"needs_regeneration": False})
+    db.commit()
+    summary = finalize_block_content_change(block=db.get(ContentBlock, "a"), db=db)
+    assert summary.affected_block_ids == []
+    assert builds == ["p1"]
+
+
+def test_unflushed_dependency_edits_in_session_are_respected(db):
+    finalize_block_content_change(block=db.get(ContentBlock, "a"), db=db)
+    db.rollback()
+
+    db.get(ContentBlock, "other").depends_on = ["a"]
+    db.get(ContentBlock, "b").depends_on = []
+    summary = finalize_block_content_change(block=db.get(ContentBlock, "a"), db=db)
+    assert summary.affected_block_ids == ["d", "other"]
+
+
+def test_flushed_uncommitted_edits_apply_to_caller_but_not_cache(db, builds):
+    finalize_block_content_change(block=db.get(ContentBlock, "other"), db=db)
+    db.commit()
+
+    db.get(ContentBlock, "b").depends_on = ["other"]
+    db.flush()
+    summary = finalize_block_content_change(block=db.get(ContentBlock, "other"), db=db)
+    assert summary.affected_block_ids == ["b", "c", "d"]
+    db.rollback()
+
+    summary = finalize_block_content_change(block=db.get(ContentBlock, "other"), db=db)
+    assert summary.affected_block_ids == []
+    summary = finalize_block_content_change(block=db.get(ContentBlock, "a"), db=db)
+    assert summary.affected_block_ids == ["b", "d", "c"]
+    assert builds == ["p1"]
+
+
+def test_late_commit_with_older_updated_at_is_picked_up(db, builds):
+    finalize_block_content_change(block=db.get(ContentBlock, "a"), db=db)
+    db.rollback()
+
+    # 模拟长事务：updated_at 早于索引已见过的最大值，提交却更晚
+    db.query(ContentBlock).filter(ContentBlock.id == "b").update(
+        {ContentBlock.depends_on: [], ContentBlock.updated_at: datetime(2000, 1, 1)},
+        synchronize_session="fetch",
+    )
+    db.commit()
+    summary = finalize_block_content_change(block=db.get(ContentBlock, "a"), db=db)
+    assert summary.affected_block_ids == ["d"]
+    assert builds == ["p1"]
+
+
+def test_shared_connection_engine_builds_without_caching(memory_db, builds):
+    summary = finalize_block_content_change(block=memory_db.get(ContentBlock, "a"), db=memory_db)
+    assert summary.affected_block_ids == ["b", "d", "c"]
+    memory_db.rollback()
+    finalize_block_content_change(block=memory_db.get(ContentBlock, "a"), db=memory_db)
+    assert builds == ["p1", "p1"]
+    assert not any(dep_service._index_cache.values())
@@ -0,0 +1,166 @@
+# backend/tests/test_digest_queue.py
+# 功能: 覆盖内容块摘要队列（core.digest_service.DigestQueue）
+# 主要测试: 重复提交合并、多块一次请求 + 批量写回、内容未变跳过、生成期间内容变化不覆盖、去抖后台处理、
+#   启动补齐缺失 / 过期摘要（后台线程执行、只为需要核对的块读取正文）
+# 数据结构: 内存 SQLite + 伪造摘要生成器（不调用真实模型）
+
+import asyncio
+
+import pytest
+from sqlalchemy import create_engine, event
+from sqlalchemy.orm import sessionmaker
+from sqlalchemy.pool import StaticPool
+
+from core.database import Base
+from core.digest_service import DigestQueue, content_hash
+from core.models import ContentBlock, Project
+
+
+@pytest.fixture
+def session_factory():
+    engine = create_engine(
+        "sqlite:///:memory:",
+        connect_args={"check_same_thread": False},
+        poolclass=StaticPool,
+    )
+    Base.metadata.create_all(bind=engine)
+    SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
+    db = SessionLocal()
+    db.add(Project(id="p1", name="p1"))
+    for idx in range(3):
+        db.add(ContentBlock(
+            id=f"b{idx}",
+            project_id="p1",
+            name=f"块{idx}",
+            block_type="field",
+            order_index=idx,
+            content=f"第 {idx} 块的正文内容，足够长以生成摘要。",
+        ))
+    db.commit()
+    db.close()
+    yield SessionLocal
+    engine.dispose()
+
+
+class RecordingGenerator:
+    def __init__(self, on_call=None):
+        self.calls = []
+        self.on_call = on_call
+
+    async def __call__(self, items):
+        self.calls.append([block_id for block_id, _ in items])
+        if self.on_call:
+            self.on_call()
+        return {block_id: f"摘要:{block_id}" for block_id, _ in items}
+
+
+def _digests(session_factory):
+    db = session_factory()
+    try:
+        return {row.id: row.digest for row in db.query(ContentBlock).order_by(ContentBlock.id)}
+    finally:
+        db.close()
+
+
+def test_repeated_submits_are_coalesced_into_batched_requests(session_factory):
+    generator = RecordingGenerator()
+    queue = DigestQueue(session_factory, generator=generator, batch_size=2)
+    for _ in range(5):
+        for block_id in ("b0", "b1", "b2"):
+            queue.submit(block_id)
+    assert queue.pending_count == 3
+
+    assert asyncio.run(queue.flush()) == 3
+    assert generator.calls == [["b0", "b1"], ["b2"]]
+    assert _digests(session_factory) == {"b0": "摘要:b0", "b1": "摘要:b1", "b2": "摘要:b2"}
+
+    # 内容未变化 → 不再请求模型
+    queue.submit("b0")
+    assert asyncio.run(queue.flush()) == 0
+    assert len(generator.calls) == 2
+
+
+def test_digest_of_outdated_content_is_not_written(session_factory):
+    def _edit_during_generation():
+        db = session_factory()
+        db.query(ContentBlock).filter(ContentBlock.id == "b1").update({"content": "生成期间被再次修改的新内容。"})
+        db.commit()
+        db.close()
+
+    queue = DigestQueue(session_factory, generator=RecordingGenerator(on_call=_edit_during_generation))
+    queue.submit("b0")
+    queue.submit("b1")
+    assert asyncio.run(queue.flush()) == 1
+
+    db = session_factory()
+    b0, b1 = db.get(ContentBlock, "b0"), db.get(ContentBlock, "b1")
+    assert b0.digest == "摘要:b0" and b0.digest_source_hash == content_hash(b0.content)
+    assert b1.digest is None and b1.digest_source_hash is None
+    db.close()
+
+
+def test_background_worker_waits_for_edits_to_settle(session_factory):
+    generator = RecordingGenerator()
+    queue = DigestQueue(session_factory, generator=generator, debounce_seconds=0.05, max_wait_seconds=5)
+
+    async def _run():
+        await queue.start()
+        try:
+            for _ in range(3):
+                queue.submit("b0")
+                await asyncio.sleep(0.02)
+            assert generator.calls == []
+            for _ in range(100):
+                if generator.calls:
+                    break
+                await asyncio.sleep(0.01)
+        finally:
+            await queue.stop()
+
+    asyncio.run(_run())
+    assert generator.calls == [["b0"]]
+    assert queue.pending_count == 0
+
+
+def test_backfill_submits_blocks_with_missing_or_stale_digests(session_factory):
+    db = session_factory()
+    b0, b1, b2 = (db.get(ContentBlock, f"b{idx}") for idx in range(3))
+    b0.digest, b0.digest_source_hash = "最新摘要", content_hash(b0.content)
+    b1.digest, b1.digest_source_hash = "过期摘要", content_hash("旧内容")
+    db.add(ContentBlock(id="b3", project_id="p1", name="空块", block_type="field", order_index=3, content=""))
+    db.add(ContentBlock(id="b4", project_id="p1", name="旧摘要", block_type="field", order_index=4,
+                        content="上线前生成的摘要没有内容指纹。", digest="旧摘要"))
+    db.commit()
+    db.close()
+
+    # 正文只为候选块读取：没有 digest_source_hash 的旧摘要（b4）不读正文
+    content_reads = []
+
+    def _record(conn, cursor, statement, parameters, context, executemany):
+        if "content_blocks.content" in statement and "content_blocks.id IN" in statement:
+            content_reads.extend(parameters)
+
+    engine = session_factory.kw["bind"]
+    event.listen(engine, "before_cursor_execute", _record)
+    generator = RecordingGenerator()
+    queue = DigestQueue(session_factory, generator=generator)
+    try:
+        assert queue.backfill() == 2
+    finally:
+        event.remove(engine, "before_cursor_execute", _record)
+    assert sorted(content_reads) == ["b0", "b1", "b2"]
+
+    async def _run_in_background():
+        background = DigestQueue(session_factory, generator=RecordingGenerator(), debounce_seconds=60)
+        await background.start()
+        try:
+            return await background.start_backfill(), background.pending_count
+        finally:
+            await background.stop()
+
+    assert asyncio.run(_run_in_background()) == (2, 2)
+    assert asyncio.run(queue.flush()) == 2
+    assert generator.calls == [["b1", "b2"]]
+    assert _digests(session_factory) == {
+        "b0": "最新摘要", "b1": "摘要:b1", "b2": "摘要:b2", "b3": None, "b4": "旧摘要",
+    }
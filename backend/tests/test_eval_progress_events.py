@@ -0,0 +1,257 @@
+# backend/tests/test_eval_progress_events.py
+# 功能: 覆盖 Eval V2 进度事件（core.eval_progress 与 api/eval.py 的 SSE 事件流）
+# 主要测试: 缓冲区游标 / 过滤 / gap、等待者被跨线程唤醒、其他项目刷满缓冲区时空闲流不空转、执行循环发布的事件序列、
+#   Grader 评分完成事件、SSE 按游标续传与快照、重启后超前游标与其他 epoch 的事件 id 改推快照
+# 数据结构: 内存 SQLite + Project / Grader / EvalTaskV2 / EvalTrialConfigV2；EvalProgressBus
+
+import asyncio
+import json
+import threading
+
+import pytest
+from fastapi.testclient import TestClient
+from sqlalchemy import create_engine
+from sqlalchemy.orm import sessionmaker
+from sqlalchemy.pool import StaticPool
+
+import api.eval as eval_api
+from core.database import Base, get_db
+from core.eval_progress import EvalProgressBus, eval_progress_bus
+from core.models import EvalTaskV2, EvalTrialConfigV2, Grader, Project, generate_uuid
+from main import app
+
+
+@pytest.fixture
+def client_and_session():
+    engine = create_engine(
+        "sqlite:///:memory:",
+        connect_args={"check_same_thread": False},
+        poolclass=StaticPool,
+    )
+    TestingSessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
+    Base.metadata.create_all(bind=engine)
+
+    def override_get_db():
+        db = TestingSessionLocal()
+        try:
+            yield db
+        finally:
+            db.close()
+
+    app.dependency_overrides[get_db] = override_get_db
+    session = TestingSessionLocal()
+    try:
+        yield TestClient(app), session
+    finally:
+        session.close()
+        app.dependency_overrides.clear()
+
+
+def _seed_task(session, repeat_count=3):
+    project = Project(id=generate_uuid(), name="进度事件", locale="zh-CN")
+    task = EvalTaskV2(id=generate_uuid(), project_id=project.id, name="进度任务", description="", status="pending")
+    session.add_all([project, task])
+    session.flush()
+    session.add(EvalTrialConfigV2(
+        id=generate_uuid(),
+        task_id=task.id,
+        name="trial-A",
+        form_type="assessment",
+        target_block_ids=[],
+        grader_ids=[],
+        repeat_count=repeat_count,
+        order_index=0,
+        form_config={},
+    ))
+    session.commit()
+    return project, task
+
+
+def _parse_sse(body: str) -> list[dict]:
+    events = []
+    for frame in body.split("\n\n"):
+        data = [line[len("data: "):] for line in frame.splitlines() if line.startswith("data: ")]
+        if data:
+            events.append(json.loads("".join(data)))
+    return events
+
+
+def test_bus_cursor_filters_and_gap():
+    bus = EvalProgressBus(max_events=3)
+    first = bus.publish("trial_started", task_id="t1", project_id="p1", batch_id="b1")
+    bus.publish("trial_started", task_id="t2", project_id="p2", batch_id="b2")
+    bus.publish("trial_finished", task_id="t1", project_id="p1", batch_id="b1", overall_score=8.0)
+
+    events, gap, last_seq = bus.events_since(first["seq"], task_id="t1")
+    assert [e["type"] for e in events] == ["trial_finished"] and not gap and last_seq == 3
+    assert [e["task_id"] for e in bus.events_since(0, project_id="p2")[0]] == ["t2"]
+
+    bus.publish("finished", task_id="t1", project_id="p1", batch_id="b1")
+    events, gap, _ = bus.events_since(0)
+    assert gap and [e["seq"] for e in events] == [2, 3, 4]
+    assert bus.events_since(first["seq"])[1] is False
+
+    # 重启后 seq 从 0 重新计数：客户端带来的游标超过 last_seq，同样按 gap 处理
+    restarted = EvalProgressBus()
+    assert restarted.events_since(4) == ([], True, 0)
+    restarted.publish("trial_started", task_id="t1")
+    assert restarted.events_since(4)[1] and not restarted.events_since(1)[1]
+
+    # 事件 id 带 epoch：新进程的 seq 追上旧游标后，旧 id 仍不会被当成有效游标
+    for _ in range(5):
+        restarted.publish("trial_started", task_id="t1")
+    assert restarted.epoch != bus.epoch
+    assert restarted.parse_event_id(f"{bus.epoch}:{first['seq']}") is None
+    assert restarted.parse_event_id(f"{restarted.epoch}:3") == 3
+    assert restarted.parse_event_id("3") == 3 and restarted.parse_event_id("bogus") is None
+
+
+@pytest.mark.asyncio
+async def test_waiter_is_woken_by_publish_from_another_thread():
+    bus = EvalProgressBus()
+    cursor = bus.last_seq
+    threading.Timer(0.05, lambda: bus.publish("trial_started", task_id="other")).start()
+    threading.Timer(0.1, lambda: bus.publish("trial_started", task_id="t1")).start()
+
+    events, gap, _ = await asyncio.wait_for(bus.wait_for_events(cursor, 5.0, task_id="t1"), timeout=2.0)
+    assert [e["task_id"] for e in events] == ["t1"] and not gap
+    assert await bus.wait_for_events(bus.last_seq, 0.01) == ([], False, bus.last_seq)
+
+
+class _ConnectedRequest:
+    async def is_disconnected(self):
+        return False
+
+
+@pytest.mark.asyncio
+async def test_idle_stream_does_not_spin_when_other_projects_overflow_buffer(monkeypatch):
+    bus = EvalProgressBus(max_events=3)
+    monkeypatch.setattr(eval_api, "eval_progress_bus", bus)
+    monkeypatch.setattr(eval_api, "_SSE_HEARTBEAT_SECONDS", 0.1)
+    cursor = bus.last_seq
+    for _ in range(5):
+        bus.publish("trial_finished", task_id="busy", project_id="p-busy")
+
+    stream = eval_api._stream_progress_events(_ConnectedRequest(), cursor, None, project_id="p-idle")
+    resync = _parse_sse(await stream.__anext__())
+    assert [(e["type"], e["seq"]) for e in resync] == [("resync", 5)]
+
+    # 游标已推进：之后是按心跳间隔的 keep-alive，而不是立即重复 resync
+    loop = asyncio.get_running_loop()
+    started = loop.time()
+    assert (await stream.__anext__()).startswith(": keep-alive")
+    assert loop.time() - started >= 0.09
+
+    # 等待期间其他项目继续刷满缓冲区，也不会再触发 gap
+    pending = asyncio.create_task(stream.__anext__())
+    await asyncio.sleep(0.02)
+    for _ in range(5):
+        bus.publish("trial_finished", task_id="busy", project_id="p-busy")
+        await asyncio.sleep(0.005)
+    assert (await pending).startswith(": keep-alive")
+    bus.publish("trial_started", task_id="idle", project_id="p-idle")
+    events = _parse_sse(await stream.__anext__())
+    assert [(e["type"], e["task_id"]) for e in events] == [("trial_started", "idle")]
+    await stream.aclose()
+
+
+@pytest.mark.asyncio
+async def test_execution_publishes_events_and_sse_resumes_from_cursor(client_and_session, monkeypatch):
+    client, session = client_and_session
+    project, task = _seed_task(session)
+
+    async def fake_plan_item(session_factory, task_id, trial_config_id, repeat_index, batch_id):
+        return {
+            "id": generate_uuid(),
+            "task_id": task_id,
+            "trial_config_id": trial_config_id,
+            "project_id": project.id,
+            "batch_id": batch_id,
+            "repeat_index": repeat_index,
+            "form_type": "assessment",
+            "dimension_scores": {"综合": 7 + repeat_index},
+            "overall_score": 7.0 + repeat_index,
+            "status": "completed",
+            "error": "",
+        }
+
+    monkeypatch.setattr("api.eval._run_trial_plan_item_isolated", fake_plan_item)
+    monkeypatch.setattr(eval_api.settings, "eval_max_parallel_trials", 1)
+    eval_api._clear_task_runtime(task.id)
+    cursor = eval_progress_bus.last_seq
+
+    out = await eval_api._execute_task_v2(task.id, session)
+    events, _, _ = eval_progress_bus.events_since(cursor, task_id=task.id)
+    assert [e["type"] for e in events] == (
+        ["run_started"] + ["trial_started", "trial_finished"] * 3 + ["finished"]
+    )
+    finished = [e for e in events if e["type"] == "trial_finished"]
+    assert [(e["completed"], e["total"], e["overall_score"]) for e in finished] == [(1, 3, 7.0), (2, 3, 8.0), (3, 3, 9.0)]
+    assert events[-1]["status"] == "completed" and events[-1]["overall"] == out["overall"] == 8.0
+    assert {e["batch_id"] for e in events} == {out["batch_id"]}
+
+    # 带游标续传：只收到该 seq 之后的事件，并在 finished 后关闭
+    resp = client.get(f"/api/eval/task/{task.id}/events", params={"cursor": finished[0]["seq"]})
+    assert resp.status_code == 200
+    assert resp.headers["content-type"].startswith("text/event-stream")
+    assert f"id: {eval_progress_bus.epoch}:{events[-1]['seq']}" in resp.text
+    replayed = _parse_sse(resp.text)
+    assert [e["seq"] for e in replayed] == [e["seq"] for e in events if e["seq"] > finished[0]["seq"]]
+
+    last_event_id = f"{eval_progress_bus.epoch}:{events[-1]['seq']}"
+    resp = client.get(f"/api/eval/task/{task.id}/events", headers={"Last-Event-ID": last_event_id})
+    assert _parse_sse(resp.text) == []
+
+    # 重启前进程发出的 id（epoch 不同），即使 seq 不超过当前 last_seq 也改推快照
+    stale = _parse_sse(client.get(
+        f"/api/eval/task/{task.id}/events", headers={"Last-Event-ID": f"0ldepoch:{finished[0]['seq']}"},
+    ).text)
+    assert [e["type"] for e in stale] == ["snapshot"]
+
+    # 无游标且未在运行：只推送一次快照
+    snapshot = _parse_sse(client.get(f"/api/eval/task/{task.id}/events").text)
+    assert [e["type"] for e in snapshot] == ["snapshot"]
+    assert snapshot[0]["status"] == "completed"
+    assert snapshot[0]["progress"]["completed"] == 3
+
+    # 游标来自重启前的进程（超过当前 last_seq）：当作无游标，先推送快照
+    ahead_cursor = eval_progress_bus.last_seq + 100
+    ahead = _parse_sse(client.get(f"/api/eval/task/{task.id}/events", params={"cursor": ahead_cursor}).text)
+    assert [e["type"] for e in ahead] == ["snapshot"]
+    assert client.get(f"/api/eval/task/{generate_uuid()}/events").status_code == 404
+
+
+@pytest.mark.asyncio
+async def test_grader_finished_events_carry_trial_scope(client_and_session, monkeypatch):
+    _client, session = client_and_session
+    project = Project(id=generate_uuid(), name="评分事件", locale="zh-CN")
+    graders = [
+        Grader(id=generate_uuid(), name=f"评分器{i}", grader_type="content_only", prompt_template="", dimensions=["综合"])
+        for i in range(2)
+    ]
+    session.add_all([project, *graders])
+    session.commit()
+
+    async def fake_run_individual_grader(**kwargs):
+        return {"grader_name": kwargs["grader_name"], "scores": {"综合": 8}, "comments": {}, "feedback": ""}, None
+
+    monkeypatch.setattr("api.eval.run_individual_grader", fake_run_individual_grader)
+    scope = {"task_id": "t-grader", "project_id": project.id, "batch_id": "b1", "trial_config_id": "c1", "repeat_index": 0}
+    cursor = eval_progress_bus.last_seq
+    token = eval_api._TRIAL_EVENT_SCOPE.set(scope)
+    try:
+        await eval_api._run_selected_graders([g.id for g in graders], "内容", [], [], session, project_id=project.id)
+    finally:
+        eval_api._TRIAL_EVENT_SCOPE.reset(token)
+    # 第二次命中结果缓存，事件带 cached=True
+    token = eval_api._TRIAL_EVENT_SCOPE.set(scope)
+    try:
+        await eval_api._run_selected_graders([g.id for g in graders], "内容", [], [], session, project_id=project.id)
+    finally:
+        eval_api._TRIAL_EVENT_SCOPE.reset(token)
+
+    events, _, _ = eval_progress_bus.events_since(cursor, task_id="t-grader")
+    assert [e["type"] for e in events] == ["grader_finished"] * 4
+    assert [e["cached"] for e in events] == [False, False, True, True]
+    assert {e["grader_id"] for e in events} == {g.id for g in graders}
+    assert all(e["scores"] == {"综合": 8} and e["repeat_index"] == 0 and e["batch_id"] == "b1" for e in events)
@@ -0,0 +1,179 @@
+# backend/tests/test_eval_result_cache.py
+# 功能: 覆盖 Eval V2 结果缓存（core.eval_result_cache 与 api/eval.py 的 Trial / Grader 复用）
+# 主要测试: 输入未变时复用 Trial 结果、内容变更后重新执行、force 全部重跑、
+#   改动单个 Grader 时其余 Grader 评分复用、execute-all 汇总命中数、缓存键随实际模型与温度变化
+# 数据结构: 内存 SQLite + Project / ContentBlock / Grader / EvalTaskV2 / EvalResultCacheV2
+
+import pytest
+from fastapi.testclient import TestClient
+from sqlalchemy import create_engine
+from sqlalchemy.orm import sessionmaker
+from sqlalchemy.pool import StaticPool
+
+from core.database import Base, get_db
+from core.models import ContentBlock, EvalResultCacheV2, EvalTrialResultV2, Grader, Project, generate_uuid
+from main import app
+
+
+@pytest.fixture
+def client_and_session(monkeypatch):
+    engine = create_engine(
+        "sqlite:///:memory:",
+        connect_args={"check_same_thread": False},
+        poolclass=StaticPool,
+    )
+    TestingSessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
+    Base.metadata.create_all(bind=engine)
+
+    def override_get_db():
+        db = TestingSessionLocal()
+        try:
+            yield db
+        finally:
+            db.close()
+
+    calls = []
+
+    async def fake_run_individual_grader(**kwargs):
+        calls.append(kwargs["grader_name"])
+        return (
+            {
+                "grader_name": kwargs["grader_name"],
+                "scores": {dim: 6 + len(calls) % 3 for dim in kwargs["dimensions"]},
+                "comments": {},
+                "feedback": "建议补充案例。",
+            },
+            {"step": "grader_fake", "tokens_in": 10, "tokens_out": 5, "cost": 0.01},
+        )
+
+    monkeypatch.setattr("api.eval.run_individual_grader", fake_run_individual_grader)
+    app.dependency_overrides[get_db] = override_get_db
+    session = TestingSessionLocal()
+    try:
+        yield TestClient(app), session, calls
+    finally:
+        session.close()
+        app.dependency_overrides.clear()
+
+
+def _seed(session):
+    project = Project(id=generate_uuid(), name="缓存测试", locale="zh-CN")
+    session.add(project)
+    session.flush()
+    block = ContentBlock(
+        id=generate_uuid(), project_id=project.id, name="第一章", block_type="field",
+        content="正文第一版", status="completed", order_index=1,
+    )
+    graders = [
+        Grader(
+            id=generate_uuid(), name=name, stable_key=f"cache_{name}", locale="zh-CN",
+            grader_type="content_only", prompt_template="请评分 {content}", dimensions=["结构"],
+            scoring_criteria={}, is_preset=False, project_id=project.id,
+        )
+        for name in ("结构评分", "价值评分")
+    ]
+    session.add_all([block, *graders])
+    session.commit()
+    return project, block, graders
+
+
+def _create_task(client, project, graders, repeat_count=2):
+    resp = client.post(f"/api/eval/tasks/{project.id}", json={
+        "name": "内容质量",
+        "trial_configs": [{
+            "name": "直接判定",
+            "form_type": "assessment",
+            "target_block_ids": [],
+            "grader_ids": [g.id for g in graders],
+            "repeat_count": repeat_count,
+            "order_index": 0,
+            "form_config": {},
+        }],
+    })
+    assert resp.status_code == 200
+    return resp.json()["id"]
+
+
+def test_unchanged_trials_are_reused_until_content_changes_or_forced(client_and_session):
+    client, session, calls = client_and_session
+    project, block, graders = _seed(session)
+    task_id = _create_task(client, project, graders)
+
+    first = client.post(f"/api/eval/task/{task_id}/execute").json()
+    assert len(calls) == 4
+    assert first["cache"] == {"trials": 2, "trial_hits": 0, "grader_runs": 4, "grader_hits": 0}
+
+    second = client.post(f"/api/eval/task/{task_id}/execute").json()
+    assert len(calls) == 4
+    assert second["cache"]["trial_hits"] == 2
+    assert second["overall"] == first["overall"]
+    assert all(t["cache_hit"] and t["cost"] == 0 for t in second["trials"])
+    assert sorted(t["overall_score"] for t in second["trials"]) == sorted(t["overall_score"] for t in first["trials"])
+
+    forced = client.post(f"/api/eval/task/{task_id}/execute", params={"force": True}).json()
+    assert len(calls) == 8 and forced["cache"]["trial_hits"] == 0
+
+    block.content = "正文第二版"
+    session.commit()
+    summary = client.post(f"/api/eval/tasks/{project.id}/execute-all").json()
+    assert len(calls) == 12
+    assert summary["cache"] == {"trials": 2, "trial_hits": 0, "grader_runs": 4, "grader_hits": 0}
+
+
+def test_editing_one_grader_reuses_the_other_graders_verdicts(client_and_session):
+    client, session, calls = client_and_session
+    project, _, graders = _seed(session)
+    task_id = _create_task(client, project, graders, repeat_count=1)
+
+    client.post(f"/api/eval/task/{task_id}/execute")
+    assert calls == ["结构评分", "价值评分"]
+
+    graders[1].prompt_template = "请从价值角度评分 {content}"
+    session.commit()
+    out = client.post(f"/api/eval/task/{task_id}/execute").json()
+    assert calls == ["结构评分", "价值评分", "价值评分"]
+    assert out["cache"] == {"trials": 1, "trial_hits": 0, "grader_runs": 2, "grader_hits": 1}
+    cached_flags = {gr["grader_name"]: bool(gr.get("cached")) for gr in out["trials"][0]["grader_results"]}
+    assert cached_flags == {"结构评分": True, "价值评分": False}
+    assert out["trials"][0]["cached_grader_ids"] == [graders[0].id]
+
+    session.expire_all()
+    trial_caches = session.query(EvalResultCacheV2).filter(EvalResultCacheV2.kind == "trial").all()
+    assert len(trial_caches) == 2
+    # 缓存命中标记只在响应中出现，不写进 Trial 结果行与 Trial 缓存
+    stored = [gr for row in session.query(EvalTrialResultV2) for gr in row.grader_results]
+    stored += [gr for entry in trial_caches for gr in entry.payload["grader_results"]]
+    assert stored and all("cached" not in gr for gr in stored)
+
+    # 整体命中 Trial 缓存的下一次执行：Grader 未被复用，也不应被报告为复用
+    again = client.post(f"/api/eval/task/{task_id}/execute").json()
+    assert again["cache"]["trial_hits"] == 1
+    assert not any(gr["cached"] for gr in again["trials"][0]["grader_results"])
+
+
+def test_cache_keys_follow_resolved_model_and_temperature(monkeypatch):
+    from core.config import settings
+    from core.eval_result_cache import grader_cache_key, trial_cache_key
+    from core.tools import eval_engine
+
+    monkeypatch.setattr(settings, "llm_provider", "openai")
+    monkeypatch.setattr(settings, "openai_model", "model-a")
+
+    def keys():
+        trial = trial_cache_key(
+            content_text="内容", content_blocks=[], form_type="review", form_config={}, probe="",
+            personas={}, graders=[], creator_profile="", intent="", locale="zh-CN", repeat_index=0,
+        )
+        grader = grader_cache_key(spec={"id": "g1"}, content="内容", process_transcript="", repeat_index=0)
+        return trial, grader
+
+    base = keys()
+    assert keys() == base
+
+    monkeypatch.setitem(eval_engine.EVAL_TEMPERATURES, "grader", 0.9)
+    by_temperature = keys()
+    assert by_temperature[0] != base[0] and by_temperature[1] != base[1]
+
+    monkeypatch.setattr(settings, "openai_model", "model-b")
+    by_model = keys()
+    assert by_model[0] != by_temperature[0] and by_model[1] != by_temperature[1]
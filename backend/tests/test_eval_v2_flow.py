@@ -1065,6 +1065,81 @@ async def test_eval_v2_parallel_trials_respect_limit(client_and_session, monkeyp
     assert active["max"] >= 2
 
 
+@pytest.mark.asyncio
+async def test_eval_v2_execute_all_shares_one_pool_and_stops_per_task(client_and_session, monkeypatch):
+    _client, session = client_and_session
+    project, _content_block, _grader = _seed_minimal_eval_context(session)
+    tasks = []
+    for idx in range(2):
+        task = EvalTaskV2(
+            id=generate_uuid(),
+            project_id=project.id,
+            name=f"pool-task-{idx}",
+            description="",
+            order_index=idx,
+            status="pending",
+        )
+        session.add(task)
+        session.flush()
+        session.add(EvalTrialConfigV2(
+            id=generate_uuid(),
+            task_id=task.id,
+            name="trial-A",
+            form_type="assessment",
+            target_block_ids=[],
+            grader_ids=[],
+            repeat_count=3,
+            order_index=0,
+            form_config={},
+        ))
+        tasks.append(task)
+    session.commit()
+    first_id, second_id = tasks[0].id, tasks[1].id
+
+    active = {"n": 0, "max": 0, "tasks": set(), "overlap": False}
+
+    async def fake_plan_item(session_factory, task_id, trial_config_id, repeat_index, batch_id):
+        active["n"] += 1
+        active["max"] = max(active["max"], active["n"])
+        active["tasks"].add(task_id)
+        active["overlap"] = active["overlap"] or len(active["tasks"]) > 1
+        if task_id == second_id:
+            eval_api._set_task_runtime(second_id, {"stop_requested": True})
+        await asyncio.sleep(0.03)
+        active["n"] -= 1
+        active["tasks"].discard(task_id)
+        return {
+            "id": generate_uuid(),
+            "task_id": task_id,
+            "trial_config_id": trial_config_id,
+            "project_id": project.id,
+            "batch_id": batch_id,
+            "repeat_index": repeat_index,
+            "form_type": "assessment",
+            "dimension_scores": {"综合": 8},
+            "overall_score": 8.0,
+            "status": "completed",
+            "error": "",
+        }
+
+    monkeypatch.setattr("api.eval._run_trial_plan_item_isolated", fake_plan_item)
+    monkeypatch.setattr(eval_api.settings, "eval_max_parallel_trials", 4)
+
+    out = await eval_api._execute_project_tasks_v2(tasks, session)
+    assert out["failed"] == []
+    by_task = {item["task_id"]: item for item in out["executed"]}
+    assert by_task[first_id]["status"] == "completed"
+    assert by_task[second_id]["status"] == "stopped"
+    # 第一个 Task 只有 3 个 Trial，第 4 个槽位立即分给第二个 Task
+    assert active["overlap"] and active["max"] == 4
+    counts = {
+        tid: session.query(EvalTrialResultV2).filter(EvalTrialResultV2.task_id == tid).count()
+        for tid in (first_id, second_id)
+    }
+    assert counts == {first_id: 3, second_id: 1}
+    assert not eval_api._get_task_runtime(second_id).get("is_running")
+
+
 @pytest.mark.asyncio
 async def test_eval_v2_pause_and_resume_keeps_same_batch_and_no_duplicate(client_and_session, monkeypatch):
     _client, session = client_and_session
@@ -1146,6 +1221,91 @@ async def test_eval_v2_pause_and_resume_keeps_same_batch_and_no_duplicate(client
     assert len(keys) == 3
 
 
+
+class _SimulatedCrash(BaseException):
+    """模拟执行中进程被杀（不会被调度器当作单个 Trial 失败吞掉）。"""
+
+
+@pytest.mark.asyncio
+async def test_eval_v2_trials_are_committed_as_they_land_and_survive_crash(client_and_session, monkeypatch):
+    client, session = client_and_session
+    project, _content_block, _grader = _seed_minimal_eval_context(session)
+    task = EvalTaskV2(
+        id=generate_uuid(),
+        project_id=project.id,
+        name="中断续跑任务",
+        description="",
+        order_index=0,
+        status="pending",
+    )
+    session.add(task)
+    session.flush()
+    session.add(EvalTrialConfigV2(
+        id=generate_uuid(),
+        task_id=task.id,
+        name="trial-A",
+        form_type="assessment",
+        target_block_ids=[],
+        grader_ids=[],
+        repeat_count=4,
+        order_index=0,
+        form_config={},
+    ))
+    session.commit()
+    task_id = task.id
+
+    executed = []
+    crash_at = {"repeat_index": 2}
+
+    async def fake_plan_item(session_factory, task_id, trial_config_id, repeat_index, batch_id):
+        if repeat_index == crash_at["repeat_index"]:
+            raise _SimulatedCrash()
+        executed.append(repeat_index)
+        return {
+            "id": generate_uuid(),
+            "task_id": task_id,
+            "trial_config_id": trial_config_id,
+            "project_id": project.id,
+            "batch_id": batch_id,
+            "repeat_index": repeat_index,
+            "form_type": "assessment",
+            "dimension_scores": {"综合": 6 + repeat_index},
+            "overall_score": 6.0 + repeat_index,
+            "status": "completed",
+            "error": "",
+        }
+
+    monkeypatch.setattr("api.eval._run_trial_plan_item_isolated", fake_plan_item)
+    monkeypatch.setattr(eval_api.settings, "eval_max_parallel_trials", 1)
+    eval_api._clear_task_runtime(task_id)
+
+    with pytest.raises(_SimulatedCrash):
+        await eval_api._execute_task_v2(task_id, session)
+    # 主 session 从未 commit 这些行：回滚后仍能读到，说明是逐条提交的
+    session.rollback()
+    batch_id = session.get(EvalTaskV2, task_id).latest_batch_id
+    saved = session.query(EvalTrialResultV2).filter(EvalTrialResultV2.batch_id == batch_id).all()
+    assert sorted(r.repeat_index for r in saved) == [0, 1]
+
+    # 模拟重启：运行态丢失，running 的 Task 因已有结果而变为可续跑
+    eval_api._clear_task_runtime(task_id)
+    resp = client.get(f"/api/eval/tasks/{project.id}")
+    row = next(x for x in resp.json()["tasks"] if x["id"] == task_id)
+    assert row["status"] == "paused"
+    session.expire_all()
+
+    crash_at["repeat_index"] = None
+    executed.clear()
+    out = await eval_api._execute_task_v2(task_id, session, resume_batch_id=batch_id)
+    assert sorted(executed) == [2, 3]
+    assert out["task"]["status"] == "completed"
+    assert [t["repeat_index"] for t in out["trials"]] == [0, 1, 2, 3]
+    # 增量聚合覆盖续跑前已保存的行
+    assert out["task"]["latest_scores"]["trial_count"] == 4
+    assert out["overall"] == 7.5
+    assert out["task"]["latest_scores"]["overall"]["std"] == 1.12
+
+
 def test_eval_v2_intent_fallback_does_not_use_project_name(client_and_session):
     _client, session = client_and_session
     project = Project(id=generate_uuid(), name="项目名不能当意图")
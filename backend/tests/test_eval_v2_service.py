@@ -1,6 +1,7 @@
 # backend/tests/test_eval_v2_service.py
 # 功能: 验证 Eval V2 纯函数工具的关键计算逻辑（hash、加权分、任务聚合）
-# 主要函数: test_compute_content_hash_is_order_insensitive, test_weighted_grader_score, test_aggregate_task_scores
+# 主要函数: test_compute_content_hash_is_order_insensitive, test_weighted_grader_score, test_aggregate_task_scores,
+#   test_aggregate_task_scores_skips_non_finite_scores
 # 数据结构:
 #   - grader_results: 多评分器维度分
 #   - trial_results: 多次执行的 overall + dimension_scores
@@ -47,6 +48,20 @@ def test_aggregate_task_scores():
     assert agg["dimensions"]["价值"]["mean"] == 8.0
 
 
+def test_aggregate_task_scores_skips_non_finite_scores():
+    agg = aggregate_task_scores(
+        [
+            {"overall_score": 6.0, "dimension_scores": {"结构": float("nan"), "价值": 7}},
+            {"overall_score": float("inf"), "dimension_scores": {"结构": 9, "价值": 9}},
+            {"overall_score": 8.0, "dimension_scores": {"结构": 8, "价值": float("-inf")}},
+        ]
+    )
+    assert agg["trial_count"] == 2
+    assert agg["overall"] == {"mean": 7.0, "std": 1.0, "min": 6.0, "max": 8.0}
+    assert agg["dimensions"]["结构"] == {"mean": 8.0, "std": 0.0, "min": 8.0, "max": 8.0}
+    assert agg["dimensions"]["价值"]["mean"] == 7.0
+
+
 def test_is_task_stale():
     old_hash = compute_content_hash(["x", "y"])
     same_hash = compute_content_hash(["y", "x"])
@@ -0,0 +1,141 @@
+# backend/tests/test_generation_log_sink.py
+# 功能: 覆盖 GenerationLog 写后队列（core.generation_log_sink.GenerationLogSink）与 llm_logger 回调入队
+# 主要测试: 按条数 / 时间批量写入、停止时写出剩余、事件循环上溢出丢弃最旧、其他线程溢出背压、未启动时同步写入
+# 数据结构: 内存 SQLite + Project / GenerationLog
+
+import asyncio
+import threading
+from uuid import uuid4
+
+import pytest
+from langchain_core.messages import AIMessage, HumanMessage
+from langchain_core.outputs import ChatGeneration, LLMResult
+from sqlalchemy import create_engine
+from sqlalchemy.orm import sessionmaker
+from sqlalchemy.pool import StaticPool
+
+from core import generation_log_sink as sink_module
+from core.database import Base
+from core.generation_log_sink import GenerationLogSink
+from core.llm_logger import GenerationLogCallback
+from core.models import GenerationLog, Project
+from core.prompt_blob_store import load_prompt_bodies
+
+
+@pytest.fixture
+def session_factory():
+    engine = create_engine(
+        "sqlite:///:memory:",
+        connect_args={"check_same_thread": False},
+        poolclass=StaticPool,
+    )
+    Base.metadata.create_all(bind=engine)
+    SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
+    db = SessionLocal()
+    db.add(Project(id="p1", name="p1"))
+    db.commit()
+    db.close()
+    yield SessionLocal
+    engine.dispose()
+
+
+def _row(idx):
+    return {"project_id": "p1", "operation": f"op{idx}", "model": "gpt-5.1", "tokens_in": idx}
+
+
+def _operations(session_factory):
+    db = session_factory()
+    try:
+        return sorted(op for (op,) in db.query(GenerationLog.operation))
+    finally:
+        db.close()
+
+
+def test_batches_by_size_and_interval_and_drains_on_stop(session_factory):
+    sink = GenerationLogSink(session_factory, batch_size=3, flush_interval_ms=200, max_queue=100)
+
+    async def scenario():
+        await sink.start()
+        for idx in range(3):
+            sink.submit(_row(idx))
+        # 在回调里只入队，不写库
+        assert _operations(session_factory) == []
+        await asyncio.sleep(0.05)
+        assert _operations(session_factory) == ["op0", "op1", "op2"]
+
+        sink.submit(_row(3))
+        await asyncio.sleep(0.4)
+        assert _operations(session_factory) == ["op0", "op1", "op2", "op3"]
+
+        sink.submit(_row(4))
+        await sink.stop()
+
+    asyncio.run(scenario())
+    assert _operations(session_factory) == ["op0", "op1", "op2", "op3", "op4"]
+    stats = sink.stats()
+    assert stats["written"] == 5 and stats["pending"] == 0 and stats["dropped"] == 0
+    assert stats["batches"] == 3 and not stats["running"]
+
+
+def test_overflow_drops_oldest_on_loop_and_applies_backpressure_elsewhere(session_factory):
+    sink = GenerationLogSink(session_factory, batch_size=10, flush_interval_ms=60_000, max_queue=2)
+
+    async def scenario():
+        await sink.start()
+        for idx in range(4):
+            sink.submit(_row(idx))
+        assert sink.stats()["dropped"] == 2
+        assert [row["operation"] for row in sink._queue] == ["op2", "op3"]
+
+        worker = threading.Thread(target=sink.submit, args=(_row(4),))
+        worker.start()
+        worker.join()
+        assert sink.stats()["backpressure_flushes"] == 1
+        assert _operations(session_factory) == ["op2", "op3", "op4"]
+        await sink.stop()
+
+    asyncio.run(scenario())
+
+
+def test_submit_without_running_flusher_writes_synchronously(session_factory):
+    sink = GenerationLogSink(session_factory)
+    sink.submit(_row(0))
+    assert _operations(session_factory) == ["op0"]
+
+    # 给出调用方的 Session 时随其事务提交
+    db = session_factory()
+    sink.submit(_row(1), db=db)
+    assert _operations(session_factory) == ["op0"]
+    db.commit()
+    db.close()
+    assert _operations(session_factory) == ["op0", "op1"]
+
+
+def test_callback_enqueues_success_and_failure_rows(session_factory, monkeypatch):
+    sink = GenerationLogSink(session_factory, batch_size=10, flush_interval_ms=60_000)
+    monkeypatch.setattr(sink_module, "generation_log_sink", sink)
+    callback = GenerationLogCallback(project_id="p1", phase="intent", operation="agent_chat")
+
+    async def scenario():
+        await sink.start()
+        ok_run, failed_run = uuid4(), uuid4()
+        await callback.on_chat_model_start({}, [[HumanMessage(content="你好")]], run_id=ok_run)
+        message = AIMessage(content="在的", usage_metadata={
+            "input_tokens": 10, "output_tokens": 2, "total_tokens": 12,
+            "input_token_details": {"cache_read": 8},
+        })
+        await callback.on_llm_end(LLMResult(generations=[[ChatGeneration(message=message)]]), run_id=ok_run)
+        await callback.on_chat_model_start({}, [[HumanMessage(content="再来")]], run_id=failed_run)
+        await callback.on_llm_error(RuntimeError("超时"), run_id=failed_run)
+        assert sink.pending_count == 2
+        await sink.stop()
+
+    asyncio.run(scenario())
+    db = session_factory()
+    try:
+        logs = {log.status: log for log in db.query(GenerationLog)}
+        bodies = load_prompt_bodies(db, logs.values())
+        assert bodies[logs["success"].id][1] == "在的" and logs["success"].cache_read_tokens == 8
+        assert logs["failed"].error_message == "超时" and logs["failed"].operation == "agent_chat"
+    finally:
+        db.close()
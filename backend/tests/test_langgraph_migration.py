@@ -133,10 +133,10 @@ class TestOrchestrator:
         assert "tools" in nodes, f"Missing 'tools' node. Got: {nodes}"
 
     def test_agent_state_fields(self):
-        """AgentState 应该有 7 个字段（原 4 个 + mode/mode_prompt/memory_context）"""
+        """AgentState 应该有 9 个字段（原 4 个 + mode/mode_prompt/memory_context + token_total/token_counted）"""
         from core.orchestrator import AgentState
         fields = list(AgentState.__annotations__.keys())
-        assert len(fields) == 7, f"Expected 7 fields, got {len(fields)}: {fields}"
+        assert len(fields) == 9, f"Expected 9 fields, got {len(fields)}: {fields}"
         assert "messages" in fields
         assert "project_id" in fields
         assert "current_handler" in fields
@@ -144,6 +144,8 @@ class TestOrchestrator:
         assert "mode" in fields
         assert "mode_prompt" in fields
         assert "memory_context" in fields
+        assert "token_total" in fields
+        assert "token_counted" in fields
 
     def test_build_system_prompt(self):
         """build_system_prompt 应该返回非空字符串"""
@@ -291,6 +293,103 @@ class TestEditEngine:
         assert result == "X B C"  # 只有 e0 被应用
         assert any(c["status"] == "rejected" for c in changes)
     
+    def test_apply_edits_fuzzy_anchor_in_long_document(self):
+        """长文（超过原 5 万字上限）中的近似 anchor 应该模糊匹配成功，且不会超时"""
+        import time
+        from core.edit_engine import apply_edits, _find_anchor
+        paragraphs = [f"第{i}段：城市通勤人群在碎片时间里阅读，关注效率与情绪价值，编号{i * 7919 % 10007}。" for i in range(3000)]
+        original = "\n".join(paragraphs)
+        target = paragraphs[2500]
+        anchor = target.replace("碎片时间里", "碎片时间中").replace("情绪价值", "情绪的价值")
+        assert len(original) > 50000 and anchor not in original
+
+        started = time.perf_counter()
+        start, end, method = _find_anchor(original, anchor)
+        assert time.perf_counter() - started < 2.0
+        assert method == "fuzzy"
+        assert original[start:end] == target
+
+        result, changes = apply_edits(original, [{"type": "replace", "anchor": anchor, "new_text": "已改写"}])
+        assert changes[0]["status"] == "applied" and changes[0]["old_text"] == target
+        assert "已改写" in result and target not in result
+
+    def test_find_anchor_fuzzy_long_anchor_and_no_false_match(self):
+        """超过 500 字的 anchor 也能模糊匹配；无关文本仍返回 none"""
+        from core.edit_engine import _find_anchor
+        body = "".join(f"句子{i}讲述了一个关于产品设计的细节。" for i in range(200))
+        original = "前言。\n" + body + "\n后记。"
+        anchor = body[:600].replace("产品设计", "产品的设计", 3)
+        start, end, method = _find_anchor(original, anchor)
+        assert method == "fuzzy"
+        assert original[start:end] == body[:600]
+        assert _find_anchor(original, "完全不相关的一段话，没有任何重合") == (-1, -1, "none")
+
+    def test_find_anchor_fuzzy_long_anchor_in_repetitive_text(self):
+        """超过 200 字、用词高度重复的 anchor：高频字不能被 SequenceMatcher 当作 junk 丢弃"""
+        import difflib
+        from core.edit_engine import _find_anchor
+        repeated = "我们的产品让我们的生活更好，" * 20
+        target = "第一章开篇：" + repeated + "本章完。"
+        original = "前言。\n" + repeated + "\n" + target + "\n后记。" + repeated
+        anchor = target.replace("生活", "日子", 10)
+        # 默认 autojunk=True 时 ratio 远低于阈值
+        assert difflib.SequenceMatcher(None, anchor, target).ratio() < 0.85
+        start, end, method = _find_anchor(original, anchor)
+        assert method == "fuzzy"
+        assert original[start:end] == target
+
+    def test_find_anchor_fuzzy_long_repetitive_anchor_is_bounded(self, monkeypatch):
+        """上千字的重复性 anchor 在十万字级重复文本中：不逐个边界做平方级 ratio()，且有耗时上限"""
+        import time
+        from core import edit_engine
+        from core.edit_engine import _find_anchor
+        original = "我们的产品让我们的生活更好，" * 8000
+        anchor = original[7000:8400].replace("生活", "日子", 12)
+
+        started = time.perf_counter()
+        start, end, method = _find_anchor(original, anchor)
+        assert time.perf_counter() - started < 5.0
+        assert method == "fuzzy"
+        assert end - start == 1400 and original[start:end] == original[7000:8400]
+
+        monkeypatch.setattr(edit_engine, "_FUZZY_TIME_BUDGET_SECONDS", 0.0)
+        assert _find_anchor(original, anchor) == (-1, -1, "none")
+
+    def test_fuzzy_locate_boundaries_match_sliding_window(self):
+        """编辑距离相同的多个边界按 ratio 取最高：起止位置与原滑窗实现（80%~120% 窗口逐个打分）一致"""
+        import difflib
+        import random
+        from core.edit_engine import _fuzzy_locate
+
+        def sliding_window(text, pattern):
+            best_ratio, best = 0.85, None
+            m = len(pattern)
+            for size in range(max(1, int(m * 0.8)), min(len(text), int(m * 1.2)) + 1):
+                for start in range(len(text) - size + 1):
+                    ratio = difflib.SequenceMatcher(None, pattern, text[start:start + size]).ratio()
+                    if ratio > best_ratio:
+                        best_ratio, best = ratio, (start, start + size)
+            return best
+
+        chars = "的一是在不了有和人这中大为上个国我以要他时来用们生到作地于出就分对成会可主发年动同工也能下过子说产种面而方后多定行学法所民得经"
+        rng = random.Random(7)
+        for _ in range(40):
+            text = "".join(rng.choice(chars) for _ in range(rng.randint(120, 240)))
+            m = rng.randint(12, 30)
+            offset = rng.randrange(len(text) - m)
+            pattern = list(text[offset:offset + m])
+            for _ in range(rng.randint(1, 3)):
+                i, op = rng.randrange(len(pattern)), rng.random()
+                if op < 0.4:
+                    pattern[i] = rng.choice(chars)
+                elif op < 0.7:
+                    pattern.insert(i, rng.choice(chars))
+                else:
+                    del pattern[i]
+            pattern = "".join(pattern)
+            located = _fuzzy_locate(text, pattern)
+            assert (located[:2] if located else None) == sliding_window(text, pattern), pattern
+
     def test_generate_revision_markdown(self):
         """修订 markdown 应该包含 del/ins 标签"""
         from core.edit_engine import generate_revision_markdown
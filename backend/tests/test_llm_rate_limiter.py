@@ -0,0 +1,206 @@
+# backend/tests/test_llm_rate_limiter.py
+# 功能: 覆盖全局 LLM 调度器（core.llm_rate_limiter）及其在 ainvoke_with_retry / astream_with_retry 中的接入
+# 主要测试: 优先级排队、低优先级并发份额、令牌桶限速、429 冷却、ContextVar 优先级传递、重试路径归还额度
+# 数据结构: 独立 LLMRateLimiter 实例 + 伪造的 chat model（不发真实请求）
+
+import asyncio
+
+import pytest
+
+from core import llm_rate_limiter as rl
+from core.llm_rate_limiter import (
+    PRIORITY_BACKGROUND,
+    PRIORITY_BLOCK,
+    PRIORITY_EVAL,
+    PRIORITY_INTERACTIVE,
+    LLMRateLimiter,
+    RateLimits,
+    current_llm_priority,
+    iterate_with_llm_priority,
+    limiter_key_for_model,
+    llm_priority,
+    run_with_llm_priority,
+)
+
+KEY = ("openai", "gpt-test")
+
+
+def _limiter(**limits) -> LLMRateLimiter:
+    return LLMRateLimiter(lambda provider, model: RateLimits(**limits))
+
+
+async def _pending(coro, timeout: float = 0.1) -> bool:
+    task = asyncio.ensure_future(coro)
+    await asyncio.sleep(timeout)
+    pending = not task.done()
+    task.cancel()
+    try:
+        await task
+    except (asyncio.CancelledError, Exception):
+        pass
+    return pending
+
+
+class FakeChatAnthropic:
+    model = "claude-test"
+
+    def __init__(self, failures: int = 0):
+        self.failures = failures
+        self.calls = 0
+
+    async def ainvoke(self, messages, **kwargs):
+        self.calls += 1
+        if self.calls <= self.failures:
+            raise RuntimeError("Error code: 429 - rate_limit_error")
+        return type("Resp", (), {"content": "ok", "usage_metadata": {"input_tokens": 5, "output_tokens": 7}})()
+
+    async def astream(self, messages):
+        for part in ("a", "b"):
+            yield type("Chunk", (), {"content": part, "usage_metadata": None})()
+
+
+def test_waiters_are_released_in_priority_order():
+    limiter = _limiter(max_concurrency=1)
+    order = []
+
+    async def _take(name, priority):
+        lease = await limiter.acquire(KEY, priority=priority)
+        order.append(name)
+        lease.release()
+
+    async def _run():
+        holder = await limiter.acquire(KEY, priority=PRIORITY_BLOCK)
+        tasks = [
+            asyncio.create_task(_take("background", PRIORITY_BACKGROUND)),
+            asyncio.create_task(_take("eval", PRIORITY_EVAL)),
+            asyncio.create_task(_take("chat", PRIORITY_INTERACTIVE)),
+        ]
+        await asyncio.sleep(0.05)
+        assert order == []
+        holder.release()
+        await asyncio.gather(*tasks)
+
+    asyncio.run(_run())
+    assert order == ["chat", "eval", "background"]
+
+
+def test_low_priority_cannot_take_the_last_slots():
+    limiter = _limiter(max_concurrency=4)
+
+    async def _run():
+        eval_leases = [await limiter.acquire(KEY, priority=PRIORITY_EVAL) for _ in range(3)]
+        assert await _pending(limiter.acquire(KEY, priority=PRIORITY_EVAL))
+        chat = await asyncio.wait_for(limiter.acquire(KEY, priority=PRIORITY_INTERACTIVE), timeout=1)
+        assert limiter.snapshot()["openai/gpt-test"]["in_flight"] == 4
+        for lease in eval_leases + [chat]:
+            lease.release()
+        assert limiter.snapshot()["openai/gpt-test"] == {"in_flight": 0, "waiting": 0, "cooldown_seconds": 0.0}
+
+    asyncio.run(_run())
+
+
+def test_token_bucket_and_cooldown_delay_acquisition():
+    limiter = _limiter(tpm=600)
+
+    async def _run():
+        first = await limiter.acquire(KEY, estimated_tokens=600)
+        first.release(actual_tokens=600)
+        # 桶已耗尽：100 token 需约 10s 才能补回
+        assert await _pending(limiter.acquire(KEY, estimated_tokens=100))
+
+        other = ("anthropic", "claude-test")
+        limiter.penalize(other, 30)
+        assert await _pending(limiter.acquire(other))
+        assert limiter.snapshot()["anthropic/claude-test"]["cooldown_seconds"] > 0
+
+    asyncio.run(_run())
+
+
+def test_priority_context_propagates_to_tasks_and_iterators():
+    seen = {}
+
+    @run_with_llm_priority(PRIORITY_EVAL)
+    async def _eval_job():
+        seen["decorated"] = current_llm_priority()
+        seen["child_task"] = await asyncio.create_task(_read())
+
+    async def _read():
+        return current_llm_priority()
+
+    async def _stream():
+        for _ in range(2):
+            yield current_llm_priority()
+
+    async def _run():
+        await _eval_job()
+        seen["after"] = current_llm_priority()
+        seen["stream"] = [p async for p in iterate_with_llm_priority(PRIORITY_INTERACTIVE, _stream())]
+        with llm_priority(PRIORITY_BACKGROUND):
+            seen["with"] = current_llm_priority()
+
+    asyncio.run(_run())
+    assert seen == {
+        "decorated": PRIORITY_EVAL,
+        "child_task": PRIORITY_EVAL,
+        "after": PRIORITY_BLOCK,
+        "stream": [PRIORITY_INTERACTIVE, PRIORITY_INTERACTIVE],
+        "with": PRIORITY_BACKGROUND,
+    }
+
+
+def test_limiter_key_unwraps_lazy_and_bound_models():
+    from core.llm import LazyChatModel
+
+    model = FakeChatAnthropic()
+    bound = type("RunnableBinding", (), {"bound": model})()
+    assert limiter_key_for_model(LazyChatModel(lambda: bound)) == ("anthropic", "claude-test")
+
+
+def test_retry_helpers_acquire_release_and_penalize_on_429(monkeypatch):
+    from core.llm import ainvoke_with_retry, astream_with_retry
+
+    limiter = _limiter(max_concurrency=1)
+    monkeypatch.setattr(rl, "rate_limiter", limiter)
+    model = FakeChatAnthropic(failures=1)
+
+    async def _run():
+        response = await ainvoke_with_retry(model, ["hi"], base_delay=0.01, priority=PRIORITY_INTERACTIVE)
+        chunks = [c.content async for c in astream_with_retry(model, ["hi"])]
+        return response, chunks
+
+    response, chunks = asyncio.run(_run())
+    assert response.content == "ok"
+    assert model.calls == 2
+    assert chunks == ["a", "b"]
+    # 失败的首次调用与流式调用都已归还并发位
+    assert limiter.snapshot()["anthropic/claude-test"]["in_flight"] == 0
+
+
+def test_disabled_limiter_never_blocks(monkeypatch):
+    from core.config import settings
+
+    monkeypatch.setattr(settings, "llm_rate_limit_enabled", False)
+    limiter = _limiter(max_concurrency=1)
+
+    async def _run():
+        leases = [await asyncio.wait_for(limiter.acquire(KEY), timeout=1) for _ in range(3)]
+        for lease in leases:
+            lease.release()
+
+    asyncio.run(_run())
+    assert limiter.snapshot() == {}
+
+
+@pytest.mark.parametrize("overrides,expected", [
+    ("", RateLimits(max_concurrency=16, rpm=0, tpm=0)),
+    ('{"anthropic": {"rpm": 50}, "claude-test": {"max_concurrency": 2}}', RateLimits(max_concurrency=2, rpm=50, tpm=0)),
+    ("not-json", RateLimits(max_concurrency=16, rpm=0, tpm=0)),
+])
+def test_limits_from_settings_applies_provider_then_model_overrides(monkeypatch, overrides, expected):
+    from core.config import settings
+
+    monkeypatch.setattr(settings, "llm_max_concurrency", 16)
+    monkeypatch.setattr(settings, "llm_requests_per_minute", 0)
+    monkeypatch.setattr(settings, "llm_tokens_per_minute", 0)
+    monkeypatch.setattr(settings, "llm_rate_limit_overrides", overrides)
+    assert rl.limits_from_settings("anthropic", "claude-test") == expected
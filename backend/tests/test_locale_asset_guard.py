@@ -59,8 +59,9 @@ def test_ja_runtime_locale_texts_do_not_contain_known_cn_residue():
 
 def test_ja_orchestrator_branch_does_not_embed_known_cn_control_text():
     content = (ROOT / "backend/core/orchestrator.py").read_text(encoding="utf-8")
-    ja_start = content.index('if project_locale == "ja-JP":')
-    zh_fallback = content.index('\n    return f"""<identity>', ja_start)
+    stable_start = content.index("def _build_stable_prompt(")
+    ja_start = content.index('if locale == "ja-JP":', stable_start)
+    zh_fallback = content.index('\n    else:\n        body = f"""<identity>', ja_start)
     ja_branch = content[ja_start:zh_fallback]
 
     forbidden_tokens = [
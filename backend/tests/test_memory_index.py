@@ -0,0 +1,74 @@
+# backend/tests/test_memory_index.py
+# 功能: 覆盖记忆本地检索索引（core.memory_index）与 memory_service 的本地预筛选
+# 主要测试: 中日文 n-gram 分词、BM25 增删、sync 对账、embedding 混合、超阈值预筛选不调用 LLM
+# 数据结构: 纯内存索引 + 伪造 embedding 后端
+
+import asyncio
+
+from core import memory_service
+from core.memory_index import BM25Index, MemoryIndexRegistry, normalized_relevance, tokenize
+
+
+def test_tokenize_splits_cjk_into_ngrams_and_keeps_latin_words():
+    assert tokenize("偏好短句 API v2") == ["偏", "好", "短", "句", "偏好", "好短", "短句", "api", "v2"]
+    assert "ユー" in tokenize("ユーザー")
+
+
+def test_bm25_ranks_cjk_matches_and_supports_incremental_updates():
+    index = BM25Index.from_texts([
+        ("a", "用户偏好口语化表达"),
+        ("b", "禁止编造数据，必须保留引用来源"),
+        ("c", "团队午餐讨论"),
+    ])
+    scores = index.scores("不要编造引用")
+    assert max(scores, key=scores.get) == "b"
+    assert "c" not in scores
+
+    index.remove("b")
+    index.add("d", "引用必须注明出处")
+    scores = index.scores("引用")
+    assert max(scores, key=scores.get) == "d"
+    assert "b" not in scores
+    assert len(index) == 3
+
+
+def test_registry_sync_reconciles_with_rows_and_mixes_embeddings():
+    registry = MemoryIndexRegistry()
+    registry.sync("p1", [("m1", "偏好短句", 1), ("m2", "禁止编造", 1)])
+    registry.upsert("p1", [("m3", "标题要有悬念", 1)])
+    assert set(registry.relevance("p1", "标题")) == {"m3"}
+
+    # 库中 m2 已删除、m1 内容已修改
+    index = registry.sync("p1", [("m1", "偏好长句", 2), ("m3", "标题要有悬念", 1)])
+    assert sorted(index.doc_ids()) == ["m1", "m3"]
+    assert registry.relevance("p1", "长句") == {"m1": 1.0}
+
+    class AxisBackend:
+        def embed(self, texts):
+            return [[1.0, 0.0] if "标题" in text else [0.0, 1.0] for text in texts]
+
+    registry.set_embedding_backend(AxisBackend(), weight=1.0)
+    registry.sync("p1", [("m1", "偏好长句", 2), ("m3", "标题要有悬念", 1)])
+    scores = registry.relevance("p1", "起个标题")
+    assert scores["m3"] == 1.0 and scores["m1"] == 0.0
+
+
+def test_filter_above_threshold_is_local_and_prefers_relevant_memories(monkeypatch):
+    def _no_llm(*args, **kwargs):
+        raise AssertionError("预筛选不应调用 LLM")
+
+    monkeypatch.setattr("core.llm.ainvoke_with_retry", _no_llm)
+    lines = [(i, f"第{i}次讨论了午餐安排") for i in range(memory_service.FILTER_THRESHOLD + 20)]
+    lines[3] = (3, "用户要求：禁止编造数据，引用必须注明来源")
+
+    selected = asyncio.run(memory_service.filter_memories_by_relevance(
+        lines, mode="assistant", phase="intent", query_ctx="引用来源要准确，不要编造",
+    ))
+    assert len(selected) == memory_service.FILTER_TOP_N
+    assert selected == sorted(selected)
+    assert 3 in selected
+
+
+def test_normalized_relevance_handles_empty_query():
+    assert normalized_relevance(["a", "b"], "") == [0.0, 0.0]
+    assert normalized_relevance(["编造数据", "午餐"], "编造") == [1.0, 0.0]
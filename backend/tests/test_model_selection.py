@@ -1,6 +1,6 @@
 # backend/tests/test_model_selection.py
 # 功能: M5 模型选择功能的单元测试
-# 覆盖: resolve_model, get_chat_model 自动 provider, sanitize_messages(model=...), _infer_provider
+# 覆盖: resolve_model, get_chat_model 自动 provider / 实例缓存 / 连接池关闭, sanitize_messages(model=...), _infer_provider
 
 """
 M5 模型选择功能 — 单元测试
@@ -108,6 +108,81 @@ class TestGetChatModelAutoProvider:
             assert type(model).__name__ == "ChatOpenAI"
 
 
+# ============== get_chat_model client cache ==============
+
+class TestChatModelCache:
+    @pytest.fixture(autouse=True)
+    def _fake_keys(self, monkeypatch):
+        from core.config import settings
+        from core.llm import clear_chat_model_cache
+        monkeypatch.setattr(settings, "openai_api_key", "sk-test-cache")
+        monkeypatch.setattr(settings, "anthropic_api_key", "sk-ant-test-cache")
+        clear_chat_model_cache()
+        yield
+        clear_chat_model_cache()
+
+    def test_same_parameters_reuse_instance(self):
+        from core.llm import get_chat_model
+        first = get_chat_model(model="gpt-5.2", temperature=0.3)
+        assert get_chat_model(model="gpt-5.2", temperature=0.3) is first
+        assert get_chat_model(model="gpt-5.2", temperature=0.5) is not first
+        assert get_chat_model(model="gpt-5.2", temperature=0.3, streaming=False) is not first
+        claude = get_chat_model(model="claude-sonnet-4-6")
+        assert get_chat_model(model="claude-sonnet-4-6") is claude
+
+    def test_invalidate_model_cache_drops_instances(self):
+        from core.llm import get_chat_model
+        from core.llm_compat import invalidate_model_cache
+        first = get_chat_model(model="gpt-5.2")
+        invalidate_model_cache()
+        assert get_chat_model(model="gpt-5.2") is not first
+
+    def test_credential_change_is_part_of_cache_key(self, monkeypatch):
+        from core.config import settings
+        from core.llm import get_chat_model
+        first = get_chat_model(model="gpt-5.2")
+        monkeypatch.setattr(settings, "openai_api_key", "sk-test-rotated")
+        assert get_chat_model(model="gpt-5.2") is not first
+
+    def test_unhashable_kwargs_bypass_cache(self):
+        from core.llm import get_chat_model
+        first = get_chat_model(model="gpt-5.2", callbacks=[])
+        assert get_chat_model(model="gpt-5.2", callbacks=[]) is not first
+
+    def test_openai_models_share_async_http_client_within_loop(self):
+        import asyncio
+        from core.llm import get_chat_model
+
+        async def _build():
+            a = get_chat_model(model="gpt-5.2", temperature=0.1)
+            b = get_chat_model(model="gpt-4o-mini", temperature=0.9)
+            return a, b
+
+        a, b = asyncio.run(_build())
+        assert a.http_async_client is not None
+        assert a.http_async_client is b.http_async_client
+        assert a.http_client is b.http_client
+
+        # 另一个事件循环拿到独立实例与独立连接池
+        c, _ = asyncio.run(_build())
+        assert c is not a
+        assert c.http_async_client is not a.http_async_client
+
+    def test_close_http_clients_closes_async_pools_and_drops_instances(self):
+        import asyncio
+        from core.llm import close_http_clients, get_chat_model
+
+        async def _run():
+            first = get_chat_model(model="gpt-5.2")
+            await close_http_clients()
+            assert first.http_async_client.is_closed
+            second = get_chat_model(model="gpt-5.2")
+            assert second is not first and not second.http_async_client.is_closed
+            await close_http_clients()
+
+        asyncio.run(_run())
+
+
 # ============== sanitize_messages with model param ==============
 
 class TestSanitizeMessagesWithModel:
@@ -0,0 +1,302 @@
+# backend/tests/test_project_run_queue.py
+# 功能: 覆盖项目运行持久化队列（core.project_run_queue）与 run-jobs 状态接口
+# 主要测试: 重复请求合并、项目内串行 + 项目间公平、崩溃恢复、失败记录、心跳过期才回收（多进程不重跑 / inline 判失败）、
+#   条件领取防重复、请求路径运行与队列互斥、
+#   worker 唤醒、状态接口
+# 数据结构: 内存 SQLite + 伪造 runner（不触发真实生成）
+
+import asyncio
+from datetime import timedelta
+
+import pytest
+from fastapi.testclient import TestClient
+from sqlalchemy import create_engine, event
+from sqlalchemy.orm import sessionmaker
+from sqlalchemy.pool import StaticPool
+
+from core import dependency_regeneration_service
+from core.database import Base, get_db
+from core.models import Project, ProjectRunJob
+from core.models.base import utcnow_naive
+from core.project_run_queue import MAX_JOB_ATTEMPTS, STALE_HEARTBEAT_SECONDS, ProjectRunQueue
+
+
+@pytest.fixture
+def session_factory():
+    engine = create_engine(
+        "sqlite:///:memory:",
+        connect_args={"check_same_thread": False},
+        poolclass=StaticPool,
+    )
+    Base.metadata.create_all(bind=engine)
+    SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
+    session = SessionLocal()
+    for project_id in ("p1", "p2"):
+        session.add(Project(id=project_id, name=project_id))
+    session.commit()
+    session.close()
+    yield SessionLocal
+    engine.dispose()
+
+
+def _jobs(session_factory, project_id):
+    db = session_factory()
+    try:
+        return [
+            (job.mode, job.status)
+            for job in db.query(ProjectRunJob).filter(ProjectRunJob.project_id == project_id)
+            .order_by(ProjectRunJob.created_at.asc()).all()
+        ]
+    finally:
+        db.close()
+
+
+def test_enqueue_coalesces_and_projects_run_fairly(session_factory):
+    calls = []
+
+    async def runner(*, project_id, mode):
+        calls.append((project_id, mode))
+        return {"started_count": 1, "completed_count": 1, "failed_count": 0}
+
+    queue = ProjectRunQueue(session_factory, runner=runner)
+    first = queue.enqueue("p1")
+    assert queue.enqueue("p1") == first
+    queue.enqueue("p2")
+    queue.enqueue("p1", mode="start_all_ready")
+
+    assert asyncio.run(queue.run_pending()) == 3
+    assert calls == [("p1", "auto_trigger"), ("p2", "auto_trigger"), ("p1", "start_all_ready")]
+    assert _jobs(session_factory, "p1") == [("auto_trigger", "succeeded"), ("start_all_ready", "succeeded")]
+
+    status = queue.status("p1")
+    assert status["queued_count"] == 0 and status["running"] is None
+    assert status["jobs"][0]["summary"] == {"started_count": 1, "completed_count": 1, "failed_count": 0}
+
+
+def test_request_during_run_queues_exactly_one_rerun(session_factory):
+    queue = ProjectRunQueue(session_factory)
+    runs = []
+
+    async def runner(*, project_id, mode):
+        runs.append(project_id)
+        if len(runs) == 1:
+            # 运行期间的重复请求只折叠成一次补跑
+            queue.enqueue(project_id)
+            queue.enqueue(project_id)
+            assert queue._claim_next() is None  # 同项目运行中，补跑任务不可被并发领取
+        return {}
+
+    queue._runner = runner
+    queue.enqueue("p1")
+    assert asyncio.run(queue.run_pending()) == 2
+    assert runs == ["p1", "p1"]
+    assert _jobs(session_factory, "p1") == [("auto_trigger", "succeeded"), ("auto_trigger", "succeeded")]
+
+
+def test_interrupted_jobs_are_resumed_and_failures_recorded(session_factory):
+    async def runner(*, project_id, mode):
+        raise RuntimeError("boom")
+
+    queue = ProjectRunQueue(session_factory, runner=runner)
+    queue.enqueue("p1")
+    queue.enqueue("p2")
+    db = session_factory()
+    db.query(ProjectRunJob).filter(ProjectRunJob.project_id == "p1").update({"status": "running", "attempts": 1})
+    db.query(ProjectRunJob).filter(ProjectRunJob.project_id == "p2").update(
+        {"status": "running", "attempts": MAX_JOB_ATTEMPTS}
+    )
+    db.commit()
+    db.close()
+
+    assert queue.recover_interrupted() == 2
+    assert _jobs(session_factory, "p1") == [("auto_trigger", "queued")]
+    assert _jobs(session_factory, "p2") == [("auto_trigger", "failed")]
+
+    asyncio.run(queue.run_pending())
+    job = queue.status("p1")["jobs"][0]
+    assert job["status"] == "failed"
+    assert job["attempts"] == 2
+    assert job["last_error"] == "boom"
+
+
+def test_only_jobs_with_stale_heartbeat_are_reclaimed(session_factory):
+    first = ProjectRunQueue(session_factory, owner_id="proc-a")
+    job_id = first.enqueue("p1")
+    assert first._claim_next() == (job_id, "p1", "auto_trigger")
+
+    # 另一个进程启动：proc-a 心跳仍新鲜，它的任务不能被放回队列重跑
+    second = ProjectRunQueue(session_factory, owner_id="proc-b")
+    assert second.recover_interrupted() == 0
+    assert _jobs(session_factory, "p1") == [("auto_trigger", "running")]
+
+    db = session_factory()
+    db.query(ProjectRunJob).filter(ProjectRunJob.id == job_id).update(
+        {"heartbeat_at": utcnow_naive() - timedelta(seconds=STALE_HEARTBEAT_SECONDS + 1)}
+    )
+    db.commit()
+    db.close()
+    assert first.heartbeat() == 1
+    assert second.recover_interrupted() == 0
+
+    db = session_factory()
+    db.query(ProjectRunJob).filter(ProjectRunJob.id == job_id).update(
+        {"heartbeat_at": utcnow_naive() - timedelta(seconds=STALE_HEARTBEAT_SECONDS + 1)}
+    )
+    db.commit()
+    db.close()
+    assert second.recover_interrupted() == 1
+    assert _jobs(session_factory, "p1") == [("auto_trigger", "queued")]
+
+    # 已被回收的任务，原持有者迟到的结果不会覆盖回收后的状态
+    first._finish(job_id, ok=True)
+    assert _jobs(session_factory, "p1") == [("auto_trigger", "queued")]
+
+
+def test_interrupted_inline_runs_fail_instead_of_rerunning(session_factory):
+    queue = ProjectRunQueue(session_factory, owner_id="proc-a")
+    job_id = queue._claim_inline("p1", "start_all_ready")
+    assert job_id is not None
+    db = session_factory()
+    db.query(ProjectRunJob).filter(ProjectRunJob.id == job_id).update({"heartbeat_at": None})
+    db.commit()
+    db.close()
+
+    assert ProjectRunQueue(session_factory, owner_id="proc-b").recover_interrupted() == 1
+    job = queue.status("p1")["jobs"][0]
+    assert job["inline"] is True
+    assert job["status"] == "failed"
+    assert job["last_error"]
+    assert asyncio.run(queue.run_pending()) == 0
+
+
+def test_claim_is_a_conditional_update_so_racing_workers_never_share_a_job(session_factory):
+    first = ProjectRunQueue(session_factory)
+    second = ProjectRunQueue(session_factory)
+    job_id = first.enqueue("p1")
+    raced = []
+
+    def _interleave(state):
+        # 第一个 worker 选出候选之后、UPDATE 之前，另一个 worker（或进程）抢先领取同一任务
+        if state.is_update and not raced:
+            raced.append(None)
+            raced[0] = second._claim_next()
+
+    event.listen(session_factory, "do_orm_execute", _interleave)
+    try:
+        assert first._claim_next() is None
+    finally:
+        event.remove(session_factory, "do_orm_execute", _interleave)
+    assert raced == [(job_id, "p1", "auto_trigger")]
+    assert _jobs(session_factory, "p1") == [("auto_trigger", "running")]
+
+
+def test_inline_runs_are_serialized_with_queued_jobs(session_factory, monkeypatch):
+    from core import project_run_queue as queue_module
+
+    monkeypatch.setattr(queue_module, "_INLINE_CLAIM_POLL_SECONDS", 0.01)
+    calls = []
+
+    async def runner(*, project_id, mode):
+        calls.append((project_id, mode))
+        return {}
+
+    async def _run():
+        queue = ProjectRunQueue(session_factory, runner=runner)
+        release = asyncio.Event()
+        order, queued = [], []
+
+        async def slow_run():
+            order.append("first")
+            await release.wait()
+            return {"started_count": 2, "completed_count": 2, "failed_count": 0}
+
+        async def second_run():
+            order.append("second")
+            raise RuntimeError("boom")
+
+        first = asyncio.create_task(queue.run_inline("p1", "start_all_ready", slow_run))
+        await asyncio.sleep(0)
+        queue.enqueue("p1")
+        queue.enqueue("p2")
+        # 请求路径的运行占住 p1：worker 只能领取 p2
+        assert await queue.run_pending() == 1
+        second = asyncio.create_task(
+            queue.run_inline("p1", "start_all_ready", second_run, on_queued=lambda: queued.append(True))
+        )
+        await asyncio.sleep(0.05)
+        assert order == ["first"] and queued == [True]
+
+        release.set()
+        assert (await first)["completed_count"] == 2
+        with pytest.raises(RuntimeError):
+            await second
+        assert order == ["first", "second"]
+        assert await queue.run_pending() == 1
+        return queue
+
+    queue = asyncio.run(_run())
+    assert calls == [("p2", "auto_trigger"), ("p1", "auto_trigger")]
+    jobs = queue.status("p1")["jobs"]
+    assert sorted((job["mode"], job["status"]) for job in jobs) == [
+        ("auto_trigger", "succeeded"), ("start_all_ready", "failed"), ("start_all_ready", "succeeded"),
+    ]
+    assert {job["last_error"] for job in jobs if job["status"] == "failed"} == {"boom"}
+
+
+def test_workers_pick_up_jobs_enqueued_after_start(session_factory):
+    done = []
+
+    async def runner(*, project_id, mode):
+        await asyncio.sleep(0)
+        done.append(project_id)
+        return {}
+
+    async def _run():
+        queue = ProjectRunQueue(session_factory, runner=runner, workers=2)
+        await queue.start()
+        try:
+            queue.enqueue("p1")
+            queue.enqueue("p2")
+            for _ in range(100):
+                if len(done) == 2:
+                    break
+                await asyncio.sleep(0.01)
+        finally:
+            await queue.stop()
+        return queue
+
+    queue = asyncio.run(_run())
+    assert sorted(done) == ["p1", "p2"]
+    assert not queue.running
+
+
+def test_schedule_auto_trigger_enqueues_and_status_endpoint_reports_it(session_factory, monkeypatch):
+    from core import project_run_queue as queue_module
+    from main import app
+
+    queue = ProjectRunQueue(session_factory)
+    monkeypatch.setattr(queue_module, "project_run_queue", queue)
+    monkeypatch.setattr("api.blocks.project_run_queue", queue)
+
+    dependency_regeneration_service.schedule_project_auto_trigger("p1")
+    dependency_regeneration_service.schedule_project_auto_trigger("p1")
+
+    def override_get_db():
+        db = session_factory()
+        try:
+            yield db
+        finally:
+            db.close()
+
+    app.dependency_overrides[get_db] = override_get_db
+    try:
+        client = TestClient(app)
+        resp = client.get("/api/blocks/project/p1/run-jobs")
+        assert client.get("/api/blocks/project/missing/run-jobs").status_code == 404
+    finally:
+        app.dependency_overrides.clear()
+
+    assert resp.status_code == 200
+    body = resp.json()
+    assert body["queued_count"] == 1
+    assert [job["status"] for job in body["jobs"]] == ["queued"]
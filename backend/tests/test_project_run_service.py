@@ -2,12 +2,14 @@ import asyncio
 from datetime import datetime
 
 import pytest
+from fastapi import HTTPException
 from sqlalchemy import create_engine
 from sqlalchemy.orm import sessionmaker
 from sqlalchemy.pool import StaticPool
 
 from core.database import Base
 from core.models import ContentBlock, Project, ProjectStructureDraft
+from core.project_run_queue import ProjectRunQueue
 from core.project_structure_apply_service import apply_project_structure_draft
 from core.project_run_service import list_ready_blocks, run_project_blocks
 
@@ -440,3 +442,142 @@ def test_run_project_blocks_handles_auto_split_applied_blocks(db_session, monkey
     assert summary_block is not None
     assert summary_block.status == "completed"
     assert summary_block.content == "自动生成的摘要内容"
+
+
+def _add_pending_fields(session, project_id, specs):
+    for index, (block_id, depends_on) in enumerate(specs):
+        session.add(ContentBlock(
+            id=block_id,
+            project_id=project_id,
+            parent_id=None,
+            name=block_id,
+            block_type="field",
+            depth=0,
+            order_index=index,
+            status="pending",
+            depends_on=depends_on,
+        ))
+    session.commit()
+    return sessionmaker(autocommit=False, autoflush=False, bind=session.get_bind())
+
+
+def test_run_project_blocks_starts_dependents_without_waiting_for_slow_siblings(db_session, monkeypatch):
+    from core import project_run_service as run_service
+
+    project = create_project(db_session)
+    session_factory = _add_pending_fields(db_session, project.id, [
+        ("slow", []),
+        ("fast", []),
+        ("after-fast", ["fast"]),
+    ])
+    timeline = []
+
+    async def fake_generate_block_content_sync(*, block_id: str, db):
+        timeline.append(("start", block_id))
+        await asyncio.sleep(0.2 if block_id == "slow" else 0.01)
+        block = db.query(ContentBlock).filter(ContentBlock.id == block_id).first()
+        block.content = f"{block_id} 内容"
+        block.status = "completed"
+        db.commit()
+        timeline.append(("end", block_id))
+        return {"block_id": block_id, "status": "completed"}
+
+    monkeypatch.setattr(run_service, "get_session_maker", lambda: session_factory)
+    monkeypatch.setattr(run_service, "generate_block_content_sync", fake_generate_block_content_sync)
+
+    result = asyncio.run(run_project_blocks(project_id=project.id, mode="start_all_ready", max_concurrency=2))
+
+    assert result["completed_count"] == 3
+    assert timeline.index(("start", "after-fast")) < timeline.index(("end", "slow"))
+    # 汇总仍按依赖波次分组
+    assert [r["started_ids"] for r in result["rounds"]] == [["fast", "slow"], ["after-fast"]]
+
+
+def test_run_project_blocks_prefers_critical_path_and_reports_progress(db_session, monkeypatch):
+    from core import project_run_service as run_service
+
+    project = create_project(db_session)
+    session_factory = _add_pending_fields(db_session, project.id, [
+        ("leaf", []),
+        ("head", []),
+        ("middle", ["head"]),
+        ("tail", ["middle"]),
+        ("broken", ["missing-dep"]),
+    ])
+    order = []
+
+    async def fake_generate_block_content_sync(*, block_id: str, db):
+        order.append(block_id)
+        block = db.query(ContentBlock).filter(ContentBlock.id == block_id).first()
+        if block_id == "middle":
+            raise HTTPException(status_code=500, detail="生成失败")
+        block.content = f"{block_id} 内容"
+        block.status = "completed"
+        db.commit()
+        return {"block_id": block_id, "status": "completed"}
+
+    monkeypatch.setattr(run_service, "get_session_maker", lambda: session_factory)
+    monkeypatch.setattr(run_service, "generate_block_content_sync", fake_generate_block_content_sync)
+
+    events = []
+
+    async def on_event(event):
+        events.append(event)
+
+    result = asyncio.run(run_project_blocks(
+        project_id=project.id,
+        mode="start_all_ready",
+        max_concurrency=1,
+        on_event=on_event,
+    ))
+
+    # head 位于最长链上，先于 order_index 更小的 leaf 执行；middle 失败后 tail 不再执行
+    assert order == ["head", "middle", "leaf"]
+    assert result["failed_items"] == [{"block_id": "middle", "error": "生成失败"}]
+    assert events[0]["type"] == "plan"
+    assert events[0]["ready_ids"] == ["head", "leaf"]
+    assert events[0]["blocked_ids"] == ["broken"]
+    assert [e["type"] for e in events[1:]] == [
+        "block_started", "block_completed",
+        "block_started", "block_failed",
+        "block_started", "block_completed",
+        "done",
+    ]
+    assert events[2]["unlocked_ids"] == ["middle"]
+    assert events[-1]["failed_count"] == 1
+
+
+def test_run_stream_endpoint_relays_progress_events(db_session, monkeypatch):
+    import json
+
+    from fastapi.testclient import TestClient
+
+    from core.database import get_db
+    from main import app
+
+    project = create_project(db_session)
+
+    async def fake_run_project_blocks(*, project_id, mode, max_concurrency, on_event):
+        on_event({"type": "plan", "planned_ids": ["a"]})
+        on_event({"type": "block_completed", "block_id": "a"})
+        on_event({"type": "done", "project_id": project_id, "mode": mode, "completed_count": 1})
+
+    monkeypatch.setattr("api.blocks.run_project_blocks", fake_run_project_blocks)
+    monkeypatch.setattr(
+        "api.blocks.project_run_queue",
+        ProjectRunQueue(sessionmaker(autocommit=False, autoflush=False, bind=db_session.get_bind())),
+    )
+    app.dependency_overrides[get_db] = lambda: db_session
+    try:
+        client = TestClient(app)
+        resp = client.post(f"/api/blocks/project/{project.id}/run-stream", json={"mode": "start_all_ready"})
+        missing = client.post("/api/blocks/project/missing/run-stream", json={})
+    finally:
+        app.dependency_overrides.clear()
+
+    assert resp.status_code == 200
+    assert resp.headers["content-type"].startswith("text/event-stream")
+    events = [json.loads(line[len("data: "):]) for line in resp.text.splitlines() if line.startswith("data: ")]
+    assert [e["type"] for e in events] == ["plan", "block_completed", "done"]
+    assert events[-1]["mode"] == "start_all_ready"
+    assert missing.status_code == 404
@@ -0,0 +1,203 @@
+# backend/tests/test_project_search_index.py
+# 功能: 覆盖项目全局搜索 / 替换的 FTS5 索引（core.search_index_service）与 /search、/replace 接口
+# 主要测试: 触发器同步（写入 / 修改 / 软删除）、中文子串与相关度排序、跨项目搜索（区分大小写时分页补足）、
+#   替换只处理候选行、短查询与无索引时退回全量扫描、建表后未填充即中断时自动重建
+# 数据结构: 内存 SQLite 中的 Project / ProjectField / ContentBlock
+
+from datetime import datetime
+
+import pytest
+from fastapi.testclient import TestClient
+from sqlalchemy import create_engine, text
+from sqlalchemy.orm import sessionmaker
+from sqlalchemy.pool import StaticPool
+
+from core.database import Base, get_db
+from core.models import ContentBlock, Project, ProjectField
+from core.search_index_service import (
+    FTS_TABLE, ROWS_TABLE, ensure_search_index, find_matching_items, rebuild_search_index,
+)
+
+
+def _engine():
+    engine = create_engine(
+        "sqlite:///:memory:",
+        connect_args={"check_same_thread": False},
+        poolclass=StaticPool,
+    )
+    Base.metadata.create_all(bind=engine)
+    return engine
+
+
+def _seed(session):
+    session.add_all([Project(id="p1", name="项目一"), Project(id="p2", name="项目二")])
+    session.add_all([
+        ContentBlock(id="b1", project_id="p1", name="场景库", block_type="field", order_index=0,
+                     content="场景库：通勤场景、居家场景、场景切换"),
+        ContentBlock(id="b2", project_id="p1", name="用户画像", block_type="field", order_index=1,
+                     content="用户画像里提到一次场景"),
+        ContentBlock(id="b3", project_id="p1", name="无关", block_type="field", order_index=2,
+                     content="Hello World"),
+        ContentBlock(id="b4", project_id="p2", name="别的项目", block_type="field", order_index=0,
+                     content="另一个项目的通勤场景"),
+    ])
+    session.add(ProjectField(id="f1", project_id="p1", phase="intent", name="意图", content="目标：梳理场景"))
+    session.commit()
+
+
+@pytest.fixture
+def session_factory():
+    engine = _engine()
+    # 建索引前已有的数据由首次 ensure 全量导入
+    SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
+    session = SessionLocal()
+    _seed(session)
+    session.close()
+    assert ensure_search_index(engine)
+    yield SessionLocal
+    engine.dispose()
+
+
+@pytest.fixture
+def client(session_factory):
+    from main import app
+
+    def override_get_db():
+        db = session_factory()
+        try:
+            yield db
+        finally:
+            db.close()
+
+    app.dependency_overrides[get_db] = override_get_db
+    try:
+        yield TestClient(app)
+    finally:
+        app.dependency_overrides.clear()
+
+
+def _hit_ids(db, query, **kwargs):
+    return [hit.item_id for hit in find_matching_items(db, query, **kwargs)]
+
+
+def test_index_tracks_inserts_updates_and_soft_deletes(session_factory):
+    db = session_factory()
+    try:
+        assert set(_hit_ids(db, "通勤场景")) == {"b1", "b4"}
+        assert _hit_ids(db, "通勤场景", project_ids=["p1"]) == ["b1"]
+        # 索引不区分大小写（精确大小写由调用方复核）
+        assert _hit_ids(db, "hello world") == ["b3"]
+
+        db.get(ContentBlock, "b3").content = "改成通勤场景"
+        db.get(ContentBlock, "b4").deleted_at = datetime(2026, 1, 1)
+        db.add(ContentBlock(id="b5", project_id="p1", name="新块", block_type="field", order_index=3,
+                            content="新写入的通勤场景"))
+        db.commit()
+        assert set(_hit_ids(db, "通勤场景")) == {"b1", "b3", "b5"}
+        assert _hit_ids(db, "hello world") == []
+
+        db.delete(db.get(ContentBlock, "b5"))
+        db.commit()
+        rebuild_search_index(db.get_bind())
+        assert set(_hit_ids(db, "通勤场景")) == {"b1", "b3"}
+        # trigram 无法索引少于 3 个字符的查询
+        assert find_matching_items(db, "场景") is None
+    finally:
+        db.close()
+
+
+def test_project_search_ranks_results_and_keeps_snippets(client):
+    resp = client.post("/api/projects/p1/search", json={"query": "场景"})
+    assert resp.status_code == 200
+    # 两个字符的查询走全量扫描，结果与原实现一致
+    assert {r["id"] for r in resp.json()["results"]} == {"f1", "b1", "b2"}
+    assert resp.json()["total_matches"] == 6
+
+    body = client.post("/api/projects/p1/search", json={"query": "场景库"}).json()
+    assert [r["id"] for r in body["results"]] == ["b1"]
+    assert body["results"][0]["snippets"][0]["match"] == "场景库"
+    assert body["results"][0]["score"] is not None
+
+    assert client.post("/api/projects/p1/search", json={"query": "HELLO", "case_sensitive": True}).json() == {
+        "results": [], "total_matches": 0,
+    }
+
+
+def test_cross_project_search_returns_project_names(client):
+    body = client.post("/api/projects/search", json={"query": "通勤场景"}).json()
+    assert {(r["project_id"], r["project_name"], r["id"]) for r in body["results"]} == {
+        ("p1", "项目一", "b1"), ("p2", "项目二", "b4"),
+    }
+    limited = client.post("/api/projects/search", json={"query": "通勤场景", "project_ids": ["p2"]}).json()
+    assert [r["id"] for r in limited["results"]] == ["b4"]
+
+
+def test_cross_project_case_sensitive_search_pages_past_case_mismatches(client, session_factory):
+    db = session_factory()
+    try:
+        # 大小写不同、相关度更高的候选排在前面，会占满第一页
+        db.add_all([
+            ContentBlock(id=f"lower{i}", project_id="p2", name=f"小写{i}", block_type="field", order_index=i + 1,
+                         content="hello world hello world hello world")
+            for i in range(4)
+        ])
+        db.commit()
+    finally:
+        db.close()
+
+    body = client.post("/api/projects/search", json={"query": "Hello World", "case_sensitive": True, "limit": 2}).json()
+    assert [r["id"] for r in body["results"]] == ["b3"]
+    insensitive = client.post("/api/projects/search", json={"query": "Hello World", "limit": 3}).json()
+    assert len(insensitive["results"]) == 3
+
+
+def test_replace_all_only_touches_matching_rows(client, session_factory):
+    resp = client.post("/api/projects/p1/replace", json={"query": "通勤场景", "replacement": "出行场景"})
+    assert resp.status_code == 200
+    assert resp.json()["affected_items"] == [{"type": "block", "id": "b1", "name": "场景库", "count": 1}]
+
+    db = session_factory()
+    try:
+        assert db.get(ContentBlock, "b1").content.startswith("场景库：出行场景")
+        assert db.get(ContentBlock, "b4").content == "另一个项目的通勤场景"
+        assert _hit_ids(db, "出行场景") == ["b1"]
+    finally:
+        db.close()
+
+
+def test_search_falls_back_to_scan_without_index():
+    engine = _engine()
+    SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
+    db = SessionLocal()
+    try:
+        _seed(db)
+        assert find_matching_items(db, "通勤场景") is None
+
+        from api.projects import SearchRequest, search_project
+
+        body = search_project("p1", SearchRequest(query="通勤场景"), db=db)
+        assert [r["id"] for r in body["results"]] == ["b1"]
+        assert body["results"][0]["score"] is None
+    finally:
+        db.close()
+        engine.dispose()
+
+
+def test_index_interrupted_before_first_fill_is_rebuilt():
+    engine = _engine()
+    SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
+    db = SessionLocal()
+    try:
+        _seed(db)
+        assert ensure_search_index(engine)
+        # 模拟上次启动建好表后、全量填充前进程退出：表在，但索引为空
+        with engine.begin() as conn:
+            conn.execute(text(f"DELETE FROM {FTS_TABLE}"))
+            conn.execute(text(f"DELETE FROM {ROWS_TABLE}"))
+        assert _hit_ids(db, "通勤场景") == []
+
+        assert ensure_search_index(engine)
+        assert sorted(_hit_ids(db, "通勤场景")) == ["b1", "b4"]
+    finally:
+        db.close()
+        engine.dispose()
@@ -0,0 +1,194 @@
+# backend/tests/test_project_stream_transfer.py
+# 功能: 覆盖项目流式导出 / 导入（/export-stream、/import-stream）与共用导出查询后的 /export
+# 主要测试: gzip / 未压缩往返后引用关系重映射、小批量 flush、JSON 导出内容不变、非法文件返回 400
+# 数据结构: 内存 SQLite 中的 Project / ContentBlock / Conversation / ChatMessage / EvalRun / EvalTrial
+
+import gzip
+import json
+from datetime import datetime
+
+import pytest
+from fastapi.testclient import TestClient
+from sqlalchemy import create_engine
+from sqlalchemy.orm import sessionmaker
+from sqlalchemy.pool import StaticPool
+
+import api.projects as projects_api
+from core.database import Base, get_db
+from core.models import (
+    ContentBlock, Conversation, CreatorProfile, EvalRun, EvalTrial, Project, ProjectField,
+)
+from core.models.chat_history import ChatMessage
+from core.models.content_version import ContentVersion
+
+
+@pytest.fixture
+def session_factory():
+    engine = create_engine(
+        "sqlite:///:memory:",
+        connect_args={"check_same_thread": False},
+        poolclass=StaticPool,
+    )
+    Base.metadata.create_all(bind=engine)
+    SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
+    yield SessionLocal
+    engine.dispose()
+
+
+@pytest.fixture
+def client(session_factory, monkeypatch):
+    from main import app
+
+    def override_get_db():
+        db = session_factory()
+        try:
+            yield db
+        finally:
+            db.close()
+
+    app.dependency_overrides[get_db] = override_get_db
+    # 流式响应自行打开 Session
+    monkeypatch.setattr(projects_api, "get_session_maker", lambda: session_factory)
+    try:
+        yield TestClient(app)
+    finally:
+        app.dependency_overrides.clear()
+
+
+def _seed(session):
+    session.add(CreatorProfile(id="cp1", name="科技博主", stable_key="科技博主", traits={"tone": "轻松"}))
+    session.add(Project(id="p1", name="源项目", creator_profile_id="cp1"))
+    session.add_all([
+        ContentBlock(id="root", project_id="p1", name="阶段", block_type="phase", order_index=0),
+        ContentBlock(id="b1", project_id="p1", parent_id="root", name="场景库", block_type="field",
+                     order_index=1, content="通勤场景"),
+        ContentBlock(id="b2", project_id="p1", parent_id="root", name="脚本", block_type="field",
+                     order_index=2, content="开头", depends_on=["b1"]),
+        ContentBlock(id="gone", project_id="p1", name="已删除", block_type="field", order_index=3,
+                     deleted_at=datetime(2026, 1, 1)),
+    ])
+    session.add(ProjectField(id="f1", project_id="p1", phase="intent", name="意图", content="目标"))
+    session.add(ContentVersion(id="v1", block_id="b1", version_number=1, content="旧场景"))
+    session.add(Conversation(id="c1", project_id="p1", title="对话"))
+    session.add_all([
+        ChatMessage(id="m1", project_id="p1", conversation_id="c1", role="user", content="你好",
+                    created_at=datetime(2026, 1, 1, 10)),
+        ChatMessage(id="m2", project_id="p1", conversation_id="c1", role="assistant", content="在的",
+                    parent_message_id="m1", created_at=datetime(2026, 1, 1, 11)),
+    ])
+    session.add(EvalRun(id="r1", project_id="p1", name="评估", content_block_id="b2"))
+    session.add(EvalTrial(id="t1", eval_run_id="r1", role="coach", input_block_ids=["b1", "b2"],
+                          llm_calls=[{"step": "review", "output": "x" * 500}]))
+    session.commit()
+
+
+def _imported_project(session, name="源项目"):
+    return session.query(Project).filter(Project.name == name, Project.id != "p1").one()
+
+
+def _assert_round_trip(session, project_id):
+    blocks = {b.name: b for b in session.query(ContentBlock).filter(ContentBlock.project_id == project_id)}
+    assert set(blocks) == {"阶段", "场景库", "脚本"}
+    assert blocks["场景库"].parent_id == blocks["阶段"].id != "root"
+    assert blocks["脚本"].depends_on == [blocks["场景库"].id]
+
+    versions = session.query(ContentVersion).filter(ContentVersion.block_id == blocks["场景库"].id).all()
+    assert [v.content for v in versions] == ["旧场景"]
+
+    conversation = session.query(Conversation).filter(Conversation.project_id == project_id).one()
+    messages = {m.content: m for m in session.query(ChatMessage).filter(ChatMessage.project_id == project_id)}
+    assert {m.conversation_id for m in messages.values()} == {conversation.id}
+    assert messages["在的"].parent_message_id == messages["你好"].id
+
+    run = session.query(EvalRun).filter(EvalRun.project_id == project_id).one()
+    assert run.content_block_id == blocks["脚本"].id
+    trial = session.query(EvalTrial).filter(EvalTrial.eval_run_id == run.id).one()
+    assert trial.input_block_ids == [blocks["场景库"].id, blocks["脚本"].id]
+    assert trial.llm_calls[0]["output"] == "x" * 500
+
+
+@pytest.mark.parametrize("compression", ["gzip", "none"])
+def test_stream_export_round_trips_through_stream_import(client, session_factory, monkeypatch, compression):
+    session = session_factory()
+    _seed(session)
+
+    resp = client.get("/api/projects/p1/export-stream", params={"compression": compression})
+    assert resp.status_code == 200
+    payload = resp.content
+    if compression == "gzip":
+        assert resp.headers["content-type"] == "application/gzip"
+        assert 'filename="project-p1.ndjson.gz"' in resp.headers["content-disposition"]
+        text = gzip.decompress(payload).decode("utf-8")
+    else:
+        assert resp.headers["content-type"].startswith("application/x-ndjson")
+        text = payload.decode("utf-8")
+
+    records = [json.loads(line) for line in text.splitlines()]
+    assert [r["type"] for r in records[:3]] == ["header", "creator_profile", "project"]
+    assert records[-1] == {"type": "end", "counts": records[-1]["counts"]}
+    assert records[-1]["counts"]["content_blocks"] == 3
+
+    # 每 2 行 flush 一次，验证分批写入时跨批引用仍正确
+    monkeypatch.setattr(projects_api, "IMPORT_BATCH_SIZE", 2)
+    resp = client.post(
+        "/api/projects/import-stream",
+        files={"file": ("project.ndjson", payload, "application/octet-stream")},
+        params={"match_creator_profile": "false"},
+    )
+    assert resp.status_code == 200, resp.text
+    body = resp.json()
+    assert body["stats"]["content_blocks"] == 3
+    assert body["stats"]["chat_messages"] == 2
+
+    session.expire_all()
+    imported = _imported_project(session)
+    assert imported.creator_profile_id not in (None, "cp1")
+    _assert_round_trip(session, imported.id)
+    session.close()
+
+
+def test_json_export_matches_stream_sections_and_still_imports(client, session_factory):
+    session = session_factory()
+    _seed(session)
+
+    exported = client.get("/api/projects/p1/export").json()
+    assert exported["export_version"] == "2.0"
+    assert [b["id"] for b in exported["content_blocks"]] == ["root", "b1", "b2"]
+    assert [v["id"] for v in exported["content_versions"]] == ["v1"]
+    assert [m["id"] for m in exported["chat_messages"]] == ["m1", "m2"]
+    assert exported["generation_logs"] == []
+    assert exported["creator_profile"]["id"] == "cp1"
+
+    resp = client.post("/api/projects/import", json={"data": exported})
+    assert resp.status_code == 200, resp.text
+    assert resp.json()["stats"]["content_blocks"] == 3
+
+    session.expire_all()
+    imported = _imported_project(session)
+    # 同名创作者特质被复用
+    assert imported.creator_profile_id == "cp1"
+    _assert_round_trip(session, imported.id)
+    session.close()
+
+
+def test_stream_import_rejects_invalid_files(client, session_factory):
+    session = session_factory()
+    _seed(session)
+
+    not_export = client.post(
+        "/api/projects/import-stream",
+        files={"file": ("x.ndjson", b'{"type": "row", "section": "content_blocks", "row": {}}\n')},
+    )
+    assert not_export.status_code == 400
+
+    header = json.dumps({"type": "header", "format": "content-factory-project"}).encode()
+    broken = client.post(
+        "/api/projects/import-stream",
+        files={"file": ("x.ndjson.gz", gzip.compress(header + b"\n{not json\n"))},
+    )
+    assert broken.status_code == 400
+    assert "第 2 行" in broken.json()["detail"]
+
+    assert client.get("/api/projects/missing/export-stream").status_code == 404
+    assert session.query(Project).count() == 1
+    session.close()
@@ -0,0 +1,187 @@
+# backend/tests/test_prompt_blob_store.py
+# 功能: 覆盖生成日志 prompt 正文的内容寻址存储（core.prompt_blob_store）与 /settings/logs 读取路径
+# 主要测试: 相同 system prompt / 历史前缀只存一份、逐字节还原、旧记录兼容、列表不含正文、详情与导出按需还原、
+#   项目导出还原正文、引用计数随写入/删除项目增减并清理归零的 blob、启动重算旧库空计数
+# 数据结构: 临时 SQLite 文件库（同步 Session + aiosqlite AsyncSession）+ GenerationLog / PromptBlob
+
+import json
+
+import pytest
+from fastapi.testclient import TestClient
+from sqlalchemy import create_engine
+from sqlalchemy.ext.asyncio import async_sessionmaker, create_async_engine
+from sqlalchemy.orm import sessionmaker
+from sqlalchemy.pool import NullPool, StaticPool
+
+from core.database import Base, get_async_db, get_db, to_async_database_url
+from core.generation_log_sink import GenerationLogSink
+from core.models import GenerationLog, Project, PromptBlob
+from core.prompt_blob_store import content_hash, load_prompt_bodies, purge_unreferenced_blobs
+
+SYSTEM = {"role": "system", "content": "你是内容生产助手。" * 200}
+
+
+def _messages(*entries):
+    return json.dumps([SYSTEM, *entries], ensure_ascii=False)
+
+
+@pytest.fixture
+def db_url(tmp_path):
+    return f"sqlite:///{tmp_path / 'prompt_blobs.db'}"
+
+
+@pytest.fixture
+def session_factory(db_url):
+    engine = create_engine(
+        db_url,
+        connect_args={"check_same_thread": False},
+        poolclass=StaticPool,
+    )
+    Base.metadata.create_all(bind=engine)
+    SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
+    db = SessionLocal()
+    db.add(Project(id="p1", name="p1"))
+    db.commit()
+    db.close()
+    yield SessionLocal
+    engine.dispose()
+
+
+@pytest.fixture
+def client(session_factory, db_url):
+    from main import app
+
+    async_engine = create_async_engine(to_async_database_url(db_url), poolclass=NullPool)
+    AsyncSessionLocal = async_sessionmaker(async_engine, expire_on_commit=False)
+
+    def override_get_db():
+        db = session_factory()
+        try:
+            yield db
+        finally:
+            db.close()
+
+    async def override_get_async_db():
+        async with AsyncSessionLocal() as db:
+            yield db
+
+    app.dependency_overrides[get_db] = override_get_db
+    app.dependency_overrides[get_async_db] = override_get_async_db
+    try:
+        yield TestClient(app)
+    finally:
+        app.dependency_overrides.clear()
+
+
+def _seed_logs(session_factory):
+    user = {"role": "human", "content": "写一个开头"}
+    tool = {"role": "ai", "content": "", "tool_calls": [{"name": "read_field", "args": {"name": "场景库"}}]}
+    inputs = [
+        _messages(user),
+        _messages(user, tool),
+        _messages(user, tool, {"role": "tool", "content": "通勤场景", "tool_call_id": "t1"}),
+        "纯文本 system prompt",
+    ]
+    sink = GenerationLogSink(session_factory)
+    for idx, prompt_input in enumerate(inputs):
+        sink.submit({"project_id": "p1", "operation": f"op{idx}", "prompt_input": prompt_input,
+                     "prompt_output": "好的" if idx < 3 else ""})
+    db = session_factory()
+    db.add(GenerationLog(id="legacy", project_id="p1", operation="legacy",
+                         prompt_input="旧记录输入", prompt_output="旧记录输出"))
+    db.commit()
+    db.close()
+    return inputs
+
+
+def test_identical_prefixes_are_stored_once_and_restored_exactly(session_factory):
+    inputs = _seed_logs(session_factory)
+    db = session_factory()
+    try:
+        # system + user + tool_call + tool_result + 纯文本 + 输出“好的”
+        assert db.query(PromptBlob).count() == 6
+        logs = {log.operation: log for log in db.query(GenerationLog)}
+        assert all(log.prompt_input == "" for op, log in logs.items() if op != "legacy")
+        assert logs["op0"].prompt_refs["input_kind"] == "messages"
+        assert logs["op3"].prompt_refs["input_kind"] == "text" and logs["op3"].prompt_refs["output"] is None
+        assert logs["legacy"].prompt_refs is None
+
+        bodies = load_prompt_bodies(db, logs.values())
+        by_operation = {op: bodies[log.id] for op, log in logs.items()}
+        assert [by_operation[f"op{idx}"][0] for idx in range(4)] == inputs
+        assert by_operation["op0"][1] == "好的" and by_operation["op3"][1] == ""
+        assert by_operation["legacy"] == ("旧记录输入", "旧记录输出")
+
+        stored = sum(blob.size for blob in db.query(PromptBlob))
+        assert stored < sum(len(text.encode("utf-8")) for text in inputs) / 2
+    finally:
+        db.close()
+
+
+def test_log_list_omits_bodies_and_detail_export_restore_them(client, session_factory):
+    inputs = _seed_logs(session_factory)
+
+    listed = client.get("/api/settings/logs", params={"project_id": "p1"}).json()
+    assert len(listed) == 5 and all(item["prompt_input"] == "" for item in listed)
+
+    op1 = next(item for item in listed if item["operation"] == "op1")
+    detail = client.get(f"/api/settings/logs/{op1['id']}").json()
+    assert detail["prompt_input"] == inputs[1] and detail["prompt_output"] == "好的"
+    assert client.get("/api/settings/logs/missing").status_code == 404
+
+    lean = client.get("/api/settings/logs/export").json()["logs"]
+    assert "prompt_input" not in lean[0]
+    full = client.get("/api/settings/logs/export", params={"include_prompts": True}).json()["logs"]
+    assert {item["operation"]: item["prompt_input"] for item in full}["op2"] == inputs[2]
+
+    exported = client.get("/api/projects/p1/export", params={"include_logs": True}).json()
+    restored = {row["operation"]: row for row in exported["generation_logs"]}
+    assert restored["op0"]["prompt_input"] == inputs[0] and "prompt_refs" not in restored["op0"]
+    assert restored["legacy"]["prompt_output"] == "旧记录输出"
+
+
+def test_deleting_project_purges_blobs_only_it_referenced(client, session_factory):
+    inputs = _seed_logs(session_factory)
+    db = session_factory()
+    db.add(Project(id="p2", name="p2"))
+    db.commit()
+    db.close()
+    # p2 与 p1 共用 system prompt，另有一条独有的消息和输出
+    sink = GenerationLogSink(session_factory)
+    sink.submit({"project_id": "p2", "operation": "p2-op", "prompt_output": "p2 独有输出",
+                 "prompt_input": _messages({"role": "human", "content": "p2 独有问题"})})
+
+    system_hash = content_hash(json.dumps(SYSTEM, ensure_ascii=False))
+
+    def _ref_count(db, digest):
+        return db.query(PromptBlob.ref_count).filter(PromptBlob.content_hash == digest).scalar()
+
+    db = session_factory()
+    try:
+        assert db.query(PromptBlob).count() == 8
+        assert _ref_count(db, system_hash) == 4
+        assert _ref_count(db, content_hash("好的")) == 3
+    finally:
+        db.close()
+
+    assert client.delete("/api/projects/p2").status_code == 200
+    db = session_factory()
+    try:
+        assert db.query(PromptBlob).count() == 6
+        assert _ref_count(db, system_hash) == 3
+        logs = db.query(GenerationLog).filter(GenerationLog.project_id == "p1").all()
+        bodies = load_prompt_bodies(db, logs)
+        assert sorted(bodies[log.id][0] for log in logs if log.operation != "legacy") == sorted(inputs)
+        assert purge_unreferenced_blobs(db) == 0
+
+        # 旧库补列后计数为空：删除项目时保留，启动重算后恢复
+        db.query(PromptBlob).update({"ref_count": None})
+        assert purge_unreferenced_blobs(db) == 0
+        assert _ref_count(db, system_hash) == 3
+
+        db.query(GenerationLog).delete()
+        assert purge_unreferenced_blobs(db) == 6
+        db.commit()
+        assert db.query(PromptBlob).count() == 0
+    finally:
+        db.close()
@@ -0,0 +1,126 @@
+# backend/tests/test_prompt_cache_layout.py
+# 功能: 覆盖 system prompt 分段布局（stable / project / volatile）与 prompt caching 断点、缓存 token 记录
+# 主要测试: 前缀跨时间/建议卡片稳定、Anthropic 断点标记、其他 provider 原样返回、GenerationLog 缓存 token 提取
+# 数据结构: 纯内存 AgentState（无 project_id，不查库）+ 伪造 LLMResult
+
+from langchain_core.messages import AIMessage, HumanMessage, SystemMessage, ToolMessage
+from langchain_core.outputs import ChatGeneration, LLMResult
+from sqlalchemy import create_engine
+from sqlalchemy.orm import sessionmaker
+from sqlalchemy.pool import StaticPool
+
+from core import agent_tools
+from core.database import Base
+from core.llm_compat import PROMPT_CACHE_CONTROL, apply_prompt_cache_breakpoints
+from core.llm_logger import _extract_usage
+from core.orchestrator import build_system_prompt, build_system_prompt_segments
+from core.suggestion_store import SuggestionStore
+
+
+def _state(**overrides):
+    state = {
+        "messages": [],
+        "project_id": "",
+        "current_handler": "general",
+        "creator_profile": "科技博主",
+        "mode": "assistant",
+        "mode_prompt": "",
+        "memory_context": "- 偏好短句",
+    }
+    state.update(overrides)
+    return state
+
+
+def _suggestion_store() -> SuggestionStore:
+    engine = create_engine("sqlite:///:memory:", connect_args={"check_same_thread": False}, poolclass=StaticPool)
+    Base.metadata.create_all(bind=engine)
+    return SuggestionStore(sessionmaker(autocommit=False, autoflush=False, bind=engine))
+
+
+def test_volatile_sections_come_last_and_prefix_stays_stable(monkeypatch):
+    store = _suggestion_store()
+    monkeypatch.setattr(agent_tools, "PENDING_SUGGESTIONS", store)
+    first = build_system_prompt_segments(_state())
+
+    store["abcdef123456"] = {"target_field": "场景库", "summary": "补充数据", "source_mode": "assistant"}
+    second = build_system_prompt_segments(_state())
+
+    assert first.stable == second.stable and first.project == second.project
+    assert "<active_suggestions>" in second.volatile and "<active_suggestions>" not in first.volatile
+    assert "<current_time_anchor>" in first.volatile
+    assert "<current_time_anchor>" not in first.stable + first.project
+    assert "科技博主" in first.project and "偏好短句" in first.project
+
+    prompt = build_system_prompt(_state())
+    assert prompt.index("</project_context>") < prompt.index("<current_time_anchor>")
+    assert prompt.startswith(second.stable)
+
+
+def test_stable_segment_follows_mode_and_locale():
+    default = build_system_prompt_segments(_state())
+    custom = build_system_prompt_segments(_state(mode_prompt="你是一个严格的审稿人"))
+    ja = build_system_prompt_segments(_state(project_locale="ja-JP"))
+
+    assert "你是一个严格的审稿人" in custom.stable and custom.stable != default.stable
+    assert custom.project == default.project
+    assert "<project_context>" in ja.project and ja.stable != default.stable
+
+
+def test_anthropic_gets_breakpoints_on_prefix_segments_and_latest_message():
+    segments = build_system_prompt_segments(_state())
+    messages = [
+        SystemMessage(content=segments.text()),
+        HumanMessage(content="帮我改一下开头"),
+        AIMessage(content="", tool_calls=[{"id": "t1", "name": "read_field", "args": {}}]),
+        ToolMessage(content="开头内容", tool_call_id="t1"),
+    ]
+
+    result = apply_prompt_cache_breakpoints(messages, system_segments=segments, provider="anthropic")
+
+    blocks = result[0].content
+    assert [block["text"] for block in blocks] == [segments.stable, segments.project, segments.volatile]
+    assert [block.get("cache_control") for block in blocks] == [PROMPT_CACHE_CONTROL, PROMPT_CACHE_CONTROL, None]
+    assert result[-1].content == [{"type": "text", "text": "开头内容", "cache_control": PROMPT_CACHE_CONTROL}]
+    assert result[-1].tool_call_id == "t1"
+    # 原消息不被修改（checkpointer 中的历史保持原样）
+    assert messages[0].content == segments.text() and messages[-1].content == "开头内容"
+    assert result[1] is messages[1]
+
+
+def test_other_providers_and_rewritten_system_are_left_untouched():
+    segments = build_system_prompt_segments(_state())
+    messages = [SystemMessage(content=segments.text()), HumanMessage(content="你好")]
+
+    assert apply_prompt_cache_breakpoints(messages, system_segments=segments, provider="openai") is messages
+    rewritten = [SystemMessage(content="旧的 system"), HumanMessage(content="你好")]
+    assert apply_prompt_cache_breakpoints(rewritten, system_segments=segments, provider="anthropic") is rewritten
+
+
+def _result(message=None, llm_output=None):
+    generations = [[ChatGeneration(message=message or AIMessage(content="ok"))]]
+    return LLMResult(generations=generations, llm_output=llm_output)
+
+
+def test_extract_usage_reports_cache_tokens_from_each_provider_shape():
+    message = AIMessage(content="ok", usage_metadata={
+        "input_tokens": 1200, "output_tokens": 50, "total_tokens": 1250,
+        "input_token_details": {"cache_read": 1000, "cache_creation": 100},
+    })
+    assert _extract_usage(_result(message)) == {
+        "tokens_in": 1200, "tokens_out": 50, "cache_read_tokens": 1000, "cache_creation_tokens": 100,
+    }
+
+    openai = _result(llm_output={"token_usage": {
+        "prompt_tokens": 900, "completion_tokens": 30, "prompt_tokens_details": {"cached_tokens": 768},
+    }})
+    assert _extract_usage(openai) == {
+        "tokens_in": 900, "tokens_out": 30, "cache_read_tokens": 768, "cache_creation_tokens": 0,
+    }
+
+    anthropic = _result(llm_output={"usage": {
+        "input_tokens": 20, "output_tokens": 40,
+        "cache_read_input_tokens": 3000, "cache_creation_input_tokens": 500,
+    }})
+    assert _extract_usage(anthropic) == {
+        "tokens_in": 3520, "tokens_out": 40, "cache_read_tokens": 3000, "cache_creation_tokens": 500,
+    }
@@ -0,0 +1,175 @@
+# backend/tests/test_suggestion_store.py
+# 功能: 覆盖未确认 SuggestionCard 的存储（core.suggestion_store）与 confirm-suggestion 的读取路径
+# 主要测试: 写穿透后“重启”仍可读取、按 (project_id, mode, status) 查询、LRU 淘汰后回读数据库、TTL 过期、
+#   patch 持久化、其他 worker 改写的卡片以数据库为准、重启后 confirm-suggestion 按 group 应用卡片
+# 数据结构: 内存 SQLite + PendingSuggestion / Project / ContentBlock
+
+import pytest
+from fastapi.testclient import TestClient
+from sqlalchemy import create_engine
+from sqlalchemy.orm import sessionmaker
+from sqlalchemy.pool import StaticPool
+
+from core import agent_tools
+from core.database import Base, get_db
+from core.models import ContentBlock, PendingSuggestion, Project, generate_uuid
+from core.models.base import utcnow_naive
+from core.suggestion_store import SuggestionStore
+
+
+@pytest.fixture
+def session_factory():
+    engine = create_engine(
+        "sqlite:///:memory:",
+        connect_args={"check_same_thread": False},
+        poolclass=StaticPool,
+    )
+    Base.metadata.create_all(bind=engine)
+    yield sessionmaker(autocommit=False, autoflush=False, bind=engine)
+    engine.dispose()
+
+
+def _card(project_id: str, mode: str = "assistant", **extra) -> dict:
+    card_id = generate_uuid()
+    return {
+        "id": card_id,
+        "project_id": project_id,
+        "source_mode": mode,
+        "status": "pending",
+        "target_field": "场景库",
+        "summary": f"修改 {card_id[:4]}",
+        **extra,
+    }
+
+
+def test_cards_survive_restart_and_are_scoped_by_project_and_mode(session_factory):
+    store = SuggestionStore(session_factory)
+    a1, a2, b1 = _card("p1"), _card("p1", mode="critic"), _card("p2")
+    for card in (a1, a2, b1):
+        store[card["id"]] = card
+    store.patch(a1["id"], message_id="m1")
+
+    restarted = SuggestionStore(session_factory)
+    assert len(restarted) == 3
+    assert list(restarted) == [a1["id"], a2["id"], b1["id"]]
+    assert restarted[a1["id"]]["message_id"] == "m1"
+    assert [cid for cid, _ in restarted.list_pending("p1", "assistant")] == [a1["id"]]
+    assert [cid for cid, _ in restarted.list_pending("p1")] == [a1["id"], a2["id"]]
+    assert restarted.list_pending("p3", "assistant") == []
+
+    restarted.pop(a1["id"])
+    assert a1["id"] not in store
+    assert store.pop(a1["id"], None) is None
+    db = session_factory()
+    try:
+        assert {row.id for row in db.query(PendingSuggestion)} == {a2["id"], b1["id"]}
+    finally:
+        db.close()
+
+
+def test_lru_eviction_falls_back_to_database_and_ttl_expires(session_factory):
+    store = SuggestionStore(session_factory, max_cached=2)
+    cards = [_card("p1") for _ in range(4)]
+    for card in cards:
+        store[card["id"]] = card
+    # 内存缓存只留 2 张，映射视图仍覆盖数据库中的全部卡片
+    assert len(store._cards) == 2
+    assert len(store) == 4 and list(store) == [card["id"] for card in cards]
+    assert store[cards[0]["id"]]["summary"] == cards[0]["summary"]
+    assert len(store.list_pending("p1")) == 4
+
+    db = session_factory()
+    try:
+        db.query(PendingSuggestion).filter(PendingSuggestion.id == cards[1]["id"]).update(
+            {"expires_at": utcnow_naive()}, synchronize_session=False,
+        )
+        db.commit()
+    finally:
+        db.close()
+    fresh = SuggestionStore(session_factory)
+    assert cards[1]["id"] not in fresh
+    assert len(fresh) == 3 and cards[1]["id"] not in list(fresh)
+    assert len(fresh.list_pending("p1")) == 3
+    assert fresh.purge_expired() == 1
+
+
+def test_reads_reflect_rows_changed_by_another_worker(session_factory):
+    store = SuggestionStore(session_factory)
+    card = _card("p1")
+    store[card["id"]] = card
+    held = store[card["id"]]
+
+    # 另一个 worker 的 patch 与状态更新直接落在数据库上
+    other = SuggestionStore(session_factory)
+    other.patch(card["id"], message_id="m2")
+    db = session_factory()
+    try:
+        row = db.get(PendingSuggestion, card["id"])
+        row.status = "accepted"
+        row.card = {**row.card, "status": "accepted"}
+        db.commit()
+    finally:
+        db.close()
+
+    assert store[card["id"]]["message_id"] == "m2"
+    assert store[card["id"]]["status"] == "accepted"
+    assert held is store[card["id"]] and held["status"] == "accepted"
+    assert store.list_pending("p1") == []
+
+    # confirm 流程先改内存中的 status 再 pop：pop 返回的仍是改过的同一对象
+    held["status"] = "rejected"
+    assert store.pop(card["id"]) is held and held["status"] == "rejected"
+    assert card["id"] not in other
+
+
+def test_confirm_suggestion_applies_group_after_restart(session_factory, monkeypatch):
+    from main import app
+    import api.agent as agent_api
+
+    monkeypatch.setattr(agent_api, "schedule_project_auto_trigger", lambda *args, **kwargs: None)
+
+    db = session_factory()
+    project = Project(id=generate_uuid(), name="建议存储")
+    block = ContentBlock(
+        id=generate_uuid(), project_id=project.id, name="场景库", block_type="field",
+        content="旧内容", status="completed",
+    )
+    db.add_all([project, block])
+    db.commit()
+    project_id, block_id = project.id, block.id
+    db.close()
+
+    group_id = generate_uuid()
+    card = _card(
+        project_id, group_id=group_id, card_type="full_rewrite", target_entity_id=block_id,
+        original_content="旧内容", modified_content="新内容", edits=[],
+    )
+    SuggestionStore(session_factory)[card["id"]] = card
+    monkeypatch.setattr(agent_tools, "PENDING_SUGGESTIONS", SuggestionStore(session_factory))
+
+    def override_get_db():
+        session = session_factory()
+        try:
+            yield session
+        finally:
+            session.close()
+
+    app.dependency_overrides[get_db] = override_get_db
+    try:
+        resp = TestClient(app).post("/api/agent/confirm-suggestion", json={
+            "project_id": project_id,
+            "suggestion_id": group_id,
+            "action": "accept",
+            "accepted_card_ids": [],
+        })
+    finally:
+        app.dependency_overrides.clear()
+
+    assert resp.status_code == 200, resp.text
+    assert [c["card_id"] for c in resp.json()["applied_cards"]] == [card["id"]]
+    db = session_factory()
+    try:
+        assert db.get(ContentBlock, block_id).content == "新内容"
+        assert db.query(PendingSuggestion).count() == 0
+    finally:
+        db.close()
@@ -0,0 +1,108 @@
+# backend/tests/test_token_service.py
+# 功能: 覆盖 token 计数服务（core.token_service）与 orchestrator 的增量 token 累计
+# 主要测试: 近似计数与旧算法一致、按消息备忘（键为摘要、不持有正文，内容变化重新计数）、增量累计只计新增消息、
+#   编码器只加载一次
+# 数据结构: LangChain 消息对象 + 伪造 tiktoken 模块
+
+import sys
+import types
+
+from langchain_core.messages import AIMessage, HumanMessage, ToolMessage
+
+from core import token_service
+from core.token_service import (
+    approx_text_tokens,
+    count_message_tokens,
+    count_messages_tokens,
+    count_text_tokens,
+    update_running_total,
+)
+
+
+def _legacy_count(messages):
+    total = 0
+    for msg in messages:
+        content = msg.content
+        cn = sum(1 for c in content if "一" <= c <= "鿿")
+        total += int(cn * 1.5 + (len(content) - cn) / 4) + 4
+    return total
+
+
+def test_approximate_count_matches_previous_per_character_estimate():
+    messages = [
+        HumanMessage(content="请帮我写一段产品介绍 for the launch"),
+        AIMessage(content="好的，下面是草稿：" + "内容" * 200),
+        ToolMessage(content="tool output " * 30, tool_call_id="t1"),
+    ]
+    assert count_messages_tokens(messages) == _legacy_count(messages)
+    assert approx_text_tokens("中文abcd") == 4
+
+
+def test_message_counts_are_memoized(monkeypatch):
+    token_service.clear_token_caches()
+    calls = []
+    original = token_service.approx_text_tokens
+
+    def _counting(text):
+        calls.append(text)
+        return original(text)
+
+    monkeypatch.setattr(token_service, "approx_text_tokens", _counting)
+    msg = HumanMessage(content="重复计数的消息", id="m1")
+    for _ in range(5):
+        count_message_tokens(msg)
+    assert len(calls) == 1
+
+    # 备忘键只含长度与短摘要，不持有消息正文；同 ID 内容变化（同长度）时重新计数
+    long_text = "长消息正文" * 2000
+    count_message_tokens(HumanMessage(content=long_text, id="m2"))
+    assert all(len(repr(key)) < 100 for key in token_service._message_memo._data)
+    count_message_tokens(HumanMessage(content="重复计数的信息", id="m1"))
+    assert len(calls) == 3
+
+
+def test_running_total_only_counts_new_messages(monkeypatch):
+    history = [HumanMessage(content=f"第{i}条消息") for i in range(10)]
+    total, counted = update_running_total(history)
+    assert (total, counted) == (count_messages_tokens(history), 10)
+
+    seen = []
+    original = token_service.count_messages_tokens
+    monkeypatch.setattr(token_service, "count_messages_tokens", lambda msgs: seen.append(len(msgs)) or original(msgs))
+    history.append(ToolMessage(content="结果", tool_call_id="t"))
+    total, counted = update_running_total(history, total=total, counted=counted)
+    assert seen == [1]
+    assert total == original(history) and counted == 11
+
+    # 历史被替换为更短的列表时整体重算
+    assert update_running_total(history[:3], total=total, counted=counted) == (original(history[:3]), 3)
+
+
+def test_encoder_loaded_once_and_text_counts_memoized(monkeypatch):
+    loads = []
+
+    class FakeEncoding:
+        def encode(self, text, disallowed_special=()):
+            return text.split()
+
+    fake = types.SimpleNamespace(get_encoding=lambda name: loads.append(name) or FakeEncoding())
+    monkeypatch.setitem(sys.modules, "tiktoken", fake)
+    monkeypatch.setattr(token_service, "_encoder_loaded", False)
+    monkeypatch.setattr(token_service, "_encoder", None)
+    token_service.clear_token_caches()
+
+    assert count_text_tokens("a b c") == 3
+    assert count_text_tokens("a b c d") == 4
+    assert loads == ["cl100k_base"]
+
+
+def test_missing_encoder_falls_back_to_approximation(monkeypatch):
+    def _fail(name):
+        raise OSError("offline")
+
+    monkeypatch.setitem(sys.modules, "tiktoken", types.SimpleNamespace(get_encoding=_fail))
+    monkeypatch.setattr(token_service, "_encoder_loaded", False)
+    monkeypatch.setattr(token_service, "_encoder", None)
+    token_service.clear_token_caches()
+    assert count_text_tokens("中文abcd") == 4
+    token_service.clear_token_caches()
@@ -0,0 +1,154 @@
+# backend/tests/test_version_service.py
+# 功能: 覆盖内容版本的快照 + 增量存储（core.version_service）与 /api/versions 读取、回滚路径
+# 主要测试: 定期快照与增量逐字节还原、版本计数器、旧数据按现有版本续号、保留上限压缩、
+#   版本 API 与回滚还原增量版本、项目导出还原全文
+# 数据结构: 内存 SQLite + Project / ContentBlock / ContentVersion / ContentVersionHead
+
+import pytest
+from fastapi.testclient import TestClient
+from sqlalchemy import create_engine
+from sqlalchemy.orm import sessionmaker
+from sqlalchemy.pool import StaticPool
+
+from core.config import settings
+from core.database import Base, get_db
+from core.models import ContentBlock, ContentVersion, ContentVersionHead, Project
+from core.version_service import (
+    apply_delta,
+    encode_delta,
+    list_versions_with_content,
+    load_version_contents,
+    save_content_version,
+)
+
+
+@pytest.fixture
+def session_factory(monkeypatch):
+    monkeypatch.setattr(settings, "content_version_snapshot_interval", 5)
+    monkeypatch.setattr(settings, "content_version_max_per_block", 0)
+    engine = create_engine(
+        "sqlite:///:memory:",
+        connect_args={"check_same_thread": False},
+        poolclass=StaticPool,
+    )
+    Base.metadata.create_all(bind=engine)
+    SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
+    db = SessionLocal()
+    db.add(Project(id="p1", name="p1"))
+    db.add(ContentBlock(id="b1", project_id="p1", name="脚本", block_type="field", content=""))
+    db.commit()
+    db.close()
+    yield SessionLocal
+    engine.dispose()
+
+
+def _draft(idx: int) -> str:
+    """反复迭代的长文：每一版只改动一行。"""
+    lines = [f"第 {n} 段：通勤场景下的用户痛点与解决方案描述。\n" for n in range(60)]
+    lines[idx % 60] = f"第 {idx % 60} 段：第 {idx} 次修改后的内容。\n"
+    return "".join(lines) + ("结尾没有换行" if idx % 2 else "")
+
+
+def _save_drafts(db, count: int, block_id: str = "b1") -> list[str]:
+    drafts = [_draft(idx) for idx in range(count)]
+    for draft in drafts:
+        assert save_content_version(db, block_id, draft, "agent")
+    db.commit()
+    return drafts
+
+
+def test_delta_round_trip():
+    for old, new in [("", "a\nb"), ("a\nb\n", ""), ("a\nb\nc", "a\nB\nc\nd\n"), ("同一行", "同一行")]:
+        assert apply_delta(old, encode_delta(old, new)) == new
+
+
+def test_snapshots_and_deltas_restore_every_version(session_factory):
+    db = session_factory()
+    try:
+        drafts = _save_drafts(db, 12)
+        versions = db.query(ContentVersion).order_by(ContentVersion.version_number).all()
+        assert [v.version_number for v in versions] == list(range(1, 13))
+        assert [v.version_number for v in versions if v.storage == "full"] == [1, 6, 11]
+        assert all(v.content == "" and v.delta for v in versions if v.storage == "delta")
+
+        head = db.query(ContentVersionHead).filter(ContentVersionHead.block_id == "b1").one()
+        assert (head.last_version, head.last_snapshot, head.version_count) == (12, 11, 12)
+        assert head.head_content == drafts[-1]
+
+        assert [content for _, content in list_versions_with_content(db, "b1")] == drafts
+        assert load_version_contents(db, "b1", [4, 9]) == {4: drafts[3], 9: drafts[8]}
+
+        stored = sum(len(v.content.encode("utf-8")) + len(v.delta or b"") for v in versions)
+        assert stored < sum(len(d.encode("utf-8")) for d in drafts) / 3
+    finally:
+        db.close()
+
+
+def test_legacy_versions_continue_numbering_and_retention_compacts(session_factory, monkeypatch):
+    db = session_factory()
+    try:
+        db.add_all([
+            ContentVersion(id=f"legacy{n}", block_id="b1", version_number=n, content=f"旧版本 {n}\n", source="manual")
+            for n in (1, 2)
+        ])
+        db.commit()
+
+        save_content_version(db, "b1", "旧版本 2\n新增一行\n" * 20, "agent")
+        db.commit()
+        latest = db.query(ContentVersion).filter(ContentVersion.version_number == 3).one()
+        assert latest.storage == "delta"
+        assert load_version_contents(db, "b1", [3])[3] == "旧版本 2\n新增一行\n" * 20
+
+        monkeypatch.setattr(settings, "content_version_max_per_block", 4)
+        drafts = _save_drafts(db, 6)
+        numbers = [v.version_number for v in db.query(ContentVersion).order_by(ContentVersion.version_number)]
+        assert numbers == [6, 7, 8, 9]
+        oldest = db.query(ContentVersion).filter(ContentVersion.version_number == 6).one()
+        assert oldest.storage == "full"
+        assert [content for _, content in list_versions_with_content(db, "b1")] == drafts[-4:]
+        assert db.query(ContentVersionHead).one().version_count == 4
+    finally:
+        db.close()
+
+
+def test_versions_api_and_rollback_restore_delta_versions(session_factory):
+    from main import app
+
+    def override_get_db():
+        db = session_factory()
+        try:
+            yield db
+        finally:
+            db.close()
+
+    db = session_factory()
+    drafts = _save_drafts(db, 8)
+    block = db.get(ContentBlock, "b1")
+    block.content = "当前内容"
+    db.commit()
+    db.close()
+
+    app.dependency_overrides[get_db] = override_get_db
+    try:
+        client = TestClient(app)
+        listed = client.get("/api/versions/b1").json()["versions"]
+        assert [item["content"] for item in listed] == drafts[::-1]
+
+        target = next(item for item in listed if item["version_number"] == 4)
+        assert client.get(f"/api/versions/b1/{target['id']}").json()["content"] == drafts[3]
+
+        assert client.post(f"/api/versions/b1/rollback/{target['id']}").status_code == 200
+        listed = client.get("/api/versions/b1").json()["versions"]
+        assert listed[0]["version_number"] == 9 and listed[0]["content"] == "当前内容"
+
+        exported = client.get("/api/projects/p1/export").json()["content_versions"]
+        assert [row["content"] for row in exported] == drafts + ["当前内容"]
+        assert all(row["storage"] == "full" and "delta" not in row for row in exported)
+    finally:
+        app.dependency_overrides.clear()
+
+    db = session_factory()
+    try:
+        assert db.get(ContentBlock, "b1").content == drafts[3]
+    finally:
+        db.close()
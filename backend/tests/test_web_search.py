@@ -0,0 +1,134 @@
+# backend/tests/test_web_search.py
+# 功能: 覆盖 DeepResearch 异步搜索层（core.tools.web_search）与 deep_research 的并发扇出
+# 主要测试: 查询并发执行且不阻塞事件循环、单查询超时不影响其余查询、TTL 缓存命中与过期、
+#   deep_research 使用可替换的本地搜索后端、shutdown 时关闭共享连接池
+# 数据结构: LocalSearchBackend（本地语料替身）
+
+import asyncio
+import importlib
+import time
+
+import pytest
+
+from core.config import settings
+from core.tools import web_search
+from core.tools.deep_research import ResearchReport
+from core.tools.web_search import LocalSearchBackend, search_many
+
+# core.tools 包导出了同名函数 deep_research，这里取模块本身
+deep_research_module = importlib.import_module("core.tools.deep_research")
+
+CORPUS = [
+    {"title": "通勤人群调研", "url": "https://example.com/commute", "content": "通勤 用户 痛点 时间碎片"},
+    {"title": "职场妈妈画像", "url": "https://example.com/moms", "content": "职场 妈妈 用户 育儿 焦虑"},
+    {"title": "学生党消费", "url": "https://example.com/students", "content": "学生 消费 预算 有限"},
+]
+
+
+@pytest.fixture
+def local_backend(monkeypatch):
+    monkeypatch.setattr(settings, "research_search_timeout", 1.0)
+    monkeypatch.setattr(settings, "research_search_cache_ttl", 3600)
+    backend = LocalSearchBackend(CORPUS, latency=0.1)
+    web_search.set_search_backend(backend)
+    try:
+        yield backend
+    finally:
+        web_search.set_search_backend(None)
+
+
+@pytest.mark.asyncio
+async def test_queries_run_concurrently_without_blocking_the_loop(local_backend):
+    ticks = 0
+
+    async def heartbeat():
+        nonlocal ticks
+        while True:
+            await asyncio.sleep(0.01)
+            ticks += 1
+
+    beat = asyncio.create_task(heartbeat())
+    started = time.monotonic()
+    results = await search_many(["通勤 痛点", "职场 妈妈", "学生 预算", "通勤 痛点"])
+    elapsed = time.monotonic() - started
+    beat.cancel()
+
+    assert elapsed < 0.3  # 3 个不同查询 × 0.1s，串行至少 0.3s
+    assert ticks >= 5
+    assert [r[0]["url"] for r in results] == [
+        "https://example.com/commute", "https://example.com/moms",
+        "https://example.com/students", "https://example.com/commute",
+    ]
+    assert len(local_backend.calls) == 3
+
+
+@pytest.mark.asyncio
+async def test_slow_query_times_out_alone_and_results_are_cached(local_backend, monkeypatch):
+    monkeypatch.setattr(settings, "research_search_timeout", 0.2)
+
+    def corpus(query, max_results, depth):
+        return [{"title": query, "url": f"https://example.com/{query}", "content": query}]
+
+    async def slow_search(query, max_results=5, depth="advanced"):
+        local_backend.calls.append((query, depth))
+        await asyncio.sleep(1.0 if query == "slow" else 0.0)
+        return corpus(query, max_results, depth)
+
+    monkeypatch.setattr(local_backend, "search", slow_search)
+
+    first = await search_many(["slow", "fast"])
+    assert first[0] == [] and first[1][0]["title"] == "fast"
+
+    second = await search_many(["fast"], depth="advanced")
+    assert second == [first[1]]
+    assert local_backend.calls.count(("fast", "advanced")) == 1
+
+    await search_many(["fast"], depth="basic")
+    assert ("fast", "basic") in local_backend.calls
+
+    monkeypatch.setattr(settings, "research_search_cache_ttl", 0)
+    web_search.clear_search_cache()
+    await search_many(["fast"])
+    await search_many(["fast"])
+    assert local_backend.calls.count(("fast", "advanced")) == 3
+
+
+@pytest.mark.asyncio
+async def test_deep_research_fans_out_through_pluggable_backend(local_backend, monkeypatch):
+    async def fake_plan(query, intent, research_type="consumer", config=None):
+        return ["通勤 痛点", "职场 妈妈", "学生 预算"]
+
+    captured = {}
+
+    async def fake_synthesize(contents, query, intent, config=None):
+        captured["urls"] = [c["url"] for c in contents]
+        return ResearchReport(summary="概述", pain_points=[], value_propositions=[], personas=[])
+
+    monkeypatch.setattr(deep_research_module, "plan_search_queries", fake_plan)
+    monkeypatch.setattr(deep_research_module, "synthesize_report", fake_synthesize)
+
+    started = time.monotonic()
+    report = await deep_research_module.deep_research("目标用户", "做一个效率工具")
+    assert time.monotonic() - started < 0.3
+    assert captured["urls"] == [doc["url"] for doc in CORPUS]
+    assert report.sources == captured["urls"]
+    assert report.search_queries == ["通勤 痛点", "职场 妈妈", "学生 预算"]
+
+
+@pytest.mark.asyncio
+async def test_close_search_backend_closes_the_loop_client():
+    backend = web_search.TavilySearchBackend(api_key="test")
+    web_search.set_search_backend(backend)
+    try:
+        client = backend._client()
+        assert backend._client() is client
+        await web_search.close_search_backend()
+        assert client.is_closed
+        # 关闭后再次搜索按需重建连接池
+        assert backend._client() is not client
+    finally:
+        await web_search.close_search_backend()
+        web_search.set_search_backend(None)
+
+    with pytest.raises(TypeError):
+        web_search.SearchBackend()
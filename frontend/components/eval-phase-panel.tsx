@@ -10,7 +10,7 @@
 import React, { useState, useEffect, useCallback } from "react";
 import { blockAPI, evalV2API, graderAPI } from "@/lib/api";
 import type { ContentBlock } from "@/lib/api";
-import type { EvalV2Task, EvalV2TrialConfig, GraderData } from "@/lib/api";
+import type { EvalV2ProgressEvent, EvalV2Task, EvalV2TrialConfig, GraderData } from "@/lib/api";
 import { useUiIsJa } from "@/lib/ui-locale";
 import { EvalPersonaSetup } from "./eval-field-editors";
 import { sendNotification } from "@/lib/utils";
@@ -260,14 +260,40 @@ function EvalV2TaskConfigPanel({ projectId, projectLocale, personaBlock, onUpdat
     loadData(false);
   }, [loadData]);
 
+  const hasRunning = tasks.some((t) => t.status === "running" || t.progress?.is_running || t.progress?.pause_requested);
+
+  // 运行中订阅项目进度事件流（SSE），逐条更新进度；Task 暂停 / 终止 / 结束时再整体刷新一次
   useEffect(() => {
-    const hasRunning = tasks.some((t) => t.status === "running" || t.progress?.is_running || t.progress?.pause_requested);
     if (!hasRunning) return;
-    const timer = setInterval(() => {
-      loadData(true);
-    }, 1000);
-    return () => clearInterval(timer);
-  }, [tasks, loadData]);
+    const source = new EventSource(evalV2API.projectEventsUrl(projectId));
+    source.onmessage = (message) => {
+      const event = JSON.parse(message.data) as EvalV2ProgressEvent;
+      if (event.type === "snapshot" && event.tasks) {
+        // 连接建立时的完整状态（覆盖 listTasks 之后、订阅之前发生的变化）
+        const byId = new Map(event.tasks.map((snap) => [snap.task_id, snap]));
+        setTasks((prev) => prev.map((t) => {
+          const snap = byId.get(t.id);
+          return snap ? { ...t, status: snap.status, latest_overall: snap.latest_overall, progress: snap.progress } : t;
+        }));
+      } else if (event.type === "trial_finished" && event.total) {
+        const completed = event.completed ?? 0;
+        const total = event.total;
+        setTasks((prev) => prev.map((t) => (t.id !== event.task_id ? t : {
+          ...t,
+          progress: {
+            ...t.progress,
+            completed,
+            total,
+            percent: Math.round((completed * 100) / total),
+            cache_hits: (t.progress?.cache_hits || 0) + (event.cache_hit ? 1 : 0),
+          },
+        })));
+      } else if (["run_started", "paused", "stopped", "finished", "resync"].includes(event.type)) {
+        loadData(true);
+      }
+    };
+    return () => source.close();
+  }, [hasRunning, projectId, loadData]);
 
   const newTrial = (): EvalV2TrialConfig => ({
     name: isJa ? "新しいトライアル" : "新试验",
@@ -374,10 +400,14 @@ function EvalV2TaskConfigPanel({ projectId, projectLocale, personaBlock, onUpdat
 
   const executeAll = async () => {
     try {
-      await evalV2API.executeAll(projectId);
+      const resp = await evalV2API.executeAll(projectId);
       await loadData();
       onUpdate?.();
-      sendNotification(isJa ? "一括実行が完了しました" : "批量执行已完成", "success");
+      const hits = resp?.cache?.trial_hits || 0;
+      const cacheNote = hits
+        ? (isJa ? `（${hits} 件の Trial は前回の結果を再利用）` : `（${hits} 个 Trial 复用了上次结果）`)
+        : "";
+      sendNotification((isJa ? "一括実行が完了しました" : "批量执行已完成") + cacheNote, "success");
     } catch (e: unknown) {
       sendNotification(`${isJa ? "一括実行に失敗しました" : "批量执行失败"}: ${errorMessage(e, isJa)}`, "error");
     }
@@ -7,7 +7,7 @@
 
 "use client";
 
-import { useState, useMemo, useCallback } from "react";
+import { useState, useMemo, useCallback, useEffect } from "react";
 import { settingsAPI } from "@/lib/api";
 import { useSettingsUiIsJa } from "./shared";
 
@@ -116,7 +116,17 @@ function parsePromptInput(raw: string, isJa: boolean): { parsed: PromptMessage[]
 }
 
 // ---- 日志详情弹窗 ----
-function LogDetailModal({ log, onClose, isJa }: { log: LogItem; onClose: () => void; isJa: boolean }) {
+function LogDetailModal({ log: summary, onClose, isJa }: { log: LogItem; onClose: () => void; isJa: boolean }) {
+  // 列表项不含 prompt 正文，打开时取完整日志
+  const [log, setLog] = useState<LogItem>(summary);
+  useEffect(() => {
+    let cancelled = false;
+    setLog(summary);
+    settingsAPI.getLog(summary.id)
+      .then((full) => { if (!cancelled) setLog(full); })
+      .catch(() => {});
+    return () => { cancelled = true; };
+  }, [summary]);
   const { parsed: messages, rawText } = useMemo(() => parsePromptInput(log.prompt_input || "", isJa), [isJa, log.prompt_input]);
   const [showRawInput, setShowRawInput] = useState(false);
 
@@ -294,7 +304,13 @@ export function LogsSection({ logs, onRefresh }: { logs: LogItem[]; onRefresh?:
   }, [isJa]);
 
   // 单项下载
-  const handleDownloadSingle = useCallback((log: LogItem) => {
+  const handleDownloadSingle = useCallback(async (summary: LogItem) => {
+    let log = summary;
+    try {
+      log = await settingsAPI.getLog(summary.id);
+    } catch {
+      // 取详情失败时仍下载摘要
+    }
     const data = formatLogForDownload(log);
     const ts = (log.created_at || "").replace(/[:.]/g, "-").slice(0, 19);
     const op = log.operation || "log";
@@ -302,9 +318,11 @@ export function LogsSection({ logs, onRefresh }: { logs: LogItem[]; onRefresh?:
   }, []);
 
   // 批量下载选中项
-  const handleDownloadSelected = useCallback(() => {
+  const handleDownloadSelected = useCallback(async () => {
     if (selectedIds.size === 0) return;
-    const selectedLogs = logs.filter((l) => selectedIds.has(l.id));
+    const selectedLogs: LogItem[] = await Promise.all(
+      logs.filter((l) => selectedIds.has(l.id)).map((l) => settingsAPI.getLog(l.id).catch(() => l)),
+    );
     const data = {
       exported_at: new Date().toISOString(),
       count: selectedLogs.length,
@@ -246,6 +246,15 @@ export const projectAPI = {
   exportProject: (id: string, includeVersions: boolean = false) =>
     fetchAPI<any>(`/api/projects/${id}/export${includeVersions ? "?include_versions=true" : ""}`),
 
+  // 流式导出（NDJSON，默认 gzip）：直接作为下载链接使用，大项目不经过前端内存
+  exportProjectStreamUrl: (id: string, options?: { includeLogs?: boolean; compression?: "gzip" | "none" }) => {
+    const params = new URLSearchParams({
+      include_logs: String(options?.includeLogs || false),
+      compression: options?.compression || "gzip",
+    });
+    return `${API_BASE}/api/projects/${id}/export-stream?${params.toString()}`;
+  },
+
   exportProjectMarkdown: (id: string) =>
     fetchAPI<{ markdown: string; filename: string }>(`/api/projects/${id}/export-markdown`),
 
@@ -318,12 +327,40 @@ export const projectAPI = {
       body: JSON.stringify({ data, as_new: asNew }),
     }),
 
+  // 导入流式导出文件（.ndjson / .ndjson.gz），以 multipart 上传
+  importProjectStream: async (file: File, matchCreatorProfile: boolean = true) => {
+    const form = new FormData();
+    form.append("file", file);
+    const params = new URLSearchParams({ match_creator_profile: String(matchCreatorProfile) });
+    const response = await fetch(`${API_BASE}/api/projects/import-stream?${params.toString()}`, {
+      method: "POST",
+      body: form,
+    });
+    if (!response.ok) {
+      const error = await response.json().catch(() => ({ detail: "Unknown error" }));
+      throw new Error(typeof error.detail === "string" ? error.detail : `API error: ${response.status}`);
+    }
+    return response.json();
+  },
+
   search: (projectId: string, query: string, caseSensitive: boolean = false) =>
     fetchAPI<{ results: SearchResult[]; total_matches: number }>(`/api/projects/${projectId}/search`, {
       method: "POST",
       body: JSON.stringify({ query, case_sensitive: caseSensitive }),
     }),
 
+  // 跨项目搜索（按相关度排序；不传 projectIds 则搜索全部项目）
+  searchAll: (query: string, options?: { caseSensitive?: boolean; projectIds?: string[]; limit?: number }) =>
+    fetchAPI<{ results: GlobalSearchResult[]; total_matches: number }>("/api/projects/search", {
+      method: "POST",
+      body: JSON.stringify({
+        query,
+        case_sensitive: options?.caseSensitive || false,
+        project_ids: options?.projectIds,
+        limit: options?.limit,
+      }),
+    }),
+
   replace: (projectId: string, query: string, replacement: string, options?: {
     caseSensitive?: boolean;
     targets?: { type: string; id: string; indices?: number[] }[];
@@ -608,6 +645,10 @@ export const settingsAPI = {
     const query = projectId ? `?project_id=${projectId}` : "";
     return fetchAPI<any[]>(`/api/settings/logs${query}`);
   },
+
+  // 列表不含 prompt 正文，详情 / 下载时按 ID 取完整日志
+  getLog: (logId: string) =>
+    fetchAPI<any>(`/api/settings/logs/${logId}`),
   
   exportLogs: (projectId?: string) => {
     const query = projectId ? `?project_id=${projectId}` : "";
@@ -752,6 +793,73 @@ export interface BlockTree {
   total_count: number;
 }
 
+/** 内容块大纲节点（view=outline）：不含正文，正文按需通过 get / batchGet 拉取 */
+export interface BlockOutline {
+  id: string;
+  project_id: string;
+  parent_id: string | null;
+  name: string;
+  block_type: "field" | "group";
+  depth: number;
+  order_index: number;
+  status: "pending" | "in_progress" | "completed" | "failed";
+  depends_on: string[];
+  special_handler: string | null;
+  need_review: boolean;
+  auto_generate: boolean;
+  needs_regeneration: boolean;
+  is_collapsed: boolean;
+  content_length: number;
+  content_hash: string;
+  children: BlockOutline[];
+  created_at: string | null;
+  updated_at: string | null;
+}
+
+export interface BlockOutlineTree {
+  project_id: string;
+  view: "outline";
+  blocks: BlockOutline[];
+  total_count: number;
+}
+
+/** 项目后台运行任务（auto_trigger 持久化队列） */
+export interface ProjectRunJob {
+  id: string;
+  project_id: string;
+  mode: "auto_trigger" | "start_all_ready";
+  status: "queued" | "running" | "succeeded" | "failed";
+  attempts: number;
+  created_at: string | null;
+  started_at: string | null;
+  finished_at: string | null;
+  last_error: string;
+  summary: { started_count?: number; completed_count?: number; failed_count?: number };
+}
+
+export interface ProjectRunJobStatus {
+  project_id: string;
+  queued_count: number;
+  running: ProjectRunJob | null;
+  workers_active: boolean;
+  jobs: ProjectRunJob[];
+}
+
+/** run-stream 推送的项目运行进度事件 */
+export type ProjectRunEvent =
+  | { type: "plan"; project_id: string; mode: string; planned_ids: string[]; ready_ids: string[]; blocked_ids: string[] }
+  | { type: "block_started"; block_id: string; name: string; wave: number; critical_path: number }
+  | {
+      type: "block_completed" | "block_failed";
+      block_id: string;
+      name: string;
+      status: string;
+      error: string;
+      unlocked_ids: string[];
+    }
+  | { type: "done"; project_id: string; mode: string; started_count: number; completed_count: number; failed_count: number }
+  | { type: "error"; error: string };
+
 /** 从内容块选中文字后传递到 Agent Panel 的引用上下文 */
 export interface AgentSelectionRef {
   blockId: string;
@@ -895,6 +1003,17 @@ export const blockAPI = {
   getProjectBlocks: (projectId: string) =>
     fetchAPI<BlockTree>(`/api/blocks/project/${projectId}`),
 
+  // 获取项目内容块大纲（不含正文，适合高频轮询）
+  getProjectOutline: (projectId: string) =>
+    fetchAPI<BlockOutlineTree>(`/api/blocks/project/${projectId}?view=outline`),
+
+  // 按 ID 批量获取内容块完整内容（不含子块）
+  batchGet: (blockIds: string[]) =>
+    fetchAPI<{ blocks: ContentBlock[]; missing_ids: string[] }>("/api/blocks/batch-get", {
+      method: "POST",
+      body: JSON.stringify({ block_ids: blockIds }),
+    }),
+
   // 获取单个内容块
   get: (blockId: string, includeChildren = false) =>
     fetchAPI<ContentBlock>(`/api/blocks/${blockId}?include_children=${includeChildren}`),
@@ -1050,6 +1169,26 @@ export const blockAPI = {
       }),
     }),
 
+  // 按依赖 DAG 运行并以 SSE 推送进度（返回原始 Response 用于 SSE 读取，事件见 ProjectRunEvent）
+  runProjectStream: (
+    projectId: string,
+    data?: { mode?: "auto_trigger" | "start_all_ready"; max_concurrency?: number },
+    signal?: AbortSignal,
+  ): Promise<Response> =>
+    fetch(`${API_BASE}/api/blocks/project/${projectId}/run-stream`, {
+      method: "POST",
+      headers: { "Content-Type": "application/json" },
+      body: JSON.stringify({
+        mode: data?.mode || "auto_trigger",
+        max_concurrency: data?.max_concurrency ?? 4,
+      }),
+      signal,
+    }),
+
+  // 后台运行队列状态（auto_trigger 自动生成是否仍在排队/运行）
+  getRunJobs: (projectId: string, limit = 10) =>
+    fetchAPI<ProjectRunJobStatus>(`/api/blocks/project/${projectId}/run-jobs?limit=${limit}`),
+
   // 复制内容块
   duplicate: (blockId: string) =>
     fetchAPI<ContentBlock>(`/api/blocks/${blockId}/duplicate`, {
@@ -1286,6 +1425,32 @@ export interface EvalV2Task {
   trial_configs: EvalV2TrialConfig[];
 }
 
+// Eval V2 进度事件（/events SSE；SSE id 为 "<epoch>:<seq>" 续传游标，epoch 随服务重启变化）
+export interface EvalV2ProgressEvent {
+  epoch: string;
+  seq: number;
+  type:
+    | "snapshot"
+    | "resync"
+    | "run_started"
+    | "trial_started"
+    | "trial_finished"
+    | "grader_finished"
+    | "paused"
+    | "stopped"
+    | "finished";
+  task_id: string;
+  project_id: string;
+  batch_id?: string;
+  completed?: number;
+  total?: number;
+  status?: string;
+  overall_score?: number | null;
+  cache_hit?: boolean;
+  tasks?: { task_id: string; status: string; latest_overall: number | null; progress: Record<string, any> }[];
+  [key: string]: any;
+}
+
 export const evalV2API = {
   listTasks: (projectId: string) =>
     fetchAPI<{ tasks: EvalV2Task[] }>(`/api/eval/tasks/${projectId}`),
@@ -1307,8 +1472,9 @@ export const evalV2API = {
       method: "DELETE",
     }),
 
-  startTask: (taskId: string) =>
-    fetchAPI<any>(`/api/eval/task/${taskId}/start`, {
+  // force=true 时不复用结果缓存（输入未变的 Trial / Grader 默认直接复用上次结果）
+  startTask: (taskId: string, force = false) =>
+    fetchAPI<any>(`/api/eval/task/${taskId}/start${force ? "?force=true" : ""}`, {
       method: "POST",
     }),
 
@@ -1327,11 +1493,33 @@ export const evalV2API = {
       method: "POST",
     }),
 
-  executeAll: (projectId: string) =>
-    fetchAPI<any>(`/api/eval/tasks/${projectId}/execute-all`, {
+  executeAll: (projectId: string, force = false) =>
+    fetchAPI<any>(`/api/eval/tasks/${projectId}/execute-all${force ? "?force=true" : ""}`, {
+      method: "POST",
+    }),
+
+  pauseAll: (projectId: string) =>
+    fetchAPI<any>(`/api/eval/tasks/${projectId}/pause-all`, {
       method: "POST",
     }),
 
+  stopAll: (projectId: string) =>
+    fetchAPI<any>(`/api/eval/tasks/${projectId}/stop-all`, {
+      method: "POST",
+    }),
+
+  // 进度事件流 URL（用于 EventSource；断线重连时浏览器自动带 Last-Event-ID 续传）
+  projectEventsUrl: (projectId: string, cursor?: string) =>
+    `${API_BASE}/api/eval/tasks/${projectId}/events${cursor != null ? `?cursor=${encodeURIComponent(cursor)}` : ""}`,
+
+  taskEventsUrl: (taskId: string, options?: { batchId?: string; cursor?: string }) => {
+    const params = new URLSearchParams();
+    if (options?.batchId) params.set("batch_id", options.batchId);
+    if (options?.cursor != null) params.set("cursor", options.cursor);
+    const query = params.toString();
+    return `${API_BASE}/api/eval/task/${taskId}/events${query ? `?${query}` : ""}`;
+  },
+
   executionReport: (projectId: string) =>
     fetchAPI<{ executions: any[] }>(`/api/eval/tasks/${projectId}/executions`),
 
@@ -1556,6 +1744,13 @@ export interface SearchResult {
     suffix: string;
     line: number;
   }[];
+  // 全文索引给出的相关度（索引不可用时为 null）
+  score?: number | null;
+}
+
+export interface GlobalSearchResult extends SearchResult {
+  project_id: string;
+  project_name: string;
 }
 
 // ============== Auto Trigger Chain ==============